@@ -1,5 +1,13 @@
 # flake8: noqa
-from dataframe_sql.sql_select_query import query, register_temp_table, remove_temp_table
+from dataframe_sql.exceptions import MemoryLimitExceeded
+from dataframe_sql.execution.stats import QueryStats
+from dataframe_sql.sql_select_query import (
+    get_memory_limit,
+    query,
+    register_temp_table,
+    remove_temp_table,
+    set_memory_limit,
+)
 
 from ._version import get_versions
 
@@ -0,0 +1,3 @@
+"""
+Benchmarks of dataframe_sql queries on data sets built from the bundled data
+"""
@@ -0,0 +1,115 @@
+"""
+Benchmark of the approximate aggregates against the exact aggregates
+
+APPROX_COUNT_DISTINCT is timed at several precisions against counting distinct
+values with a DISTINCT subquery, and APPROX_PERCENTILE at several compressions
+against the exact median of pandas. Besides the time of every query, the largest
+relative error of the approximate aggregates over all groups is reported.
+"""
+from argparse import ArgumentParser
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.star_schema import time_execution
+
+PRECISIONS = (10, 12, 14, 16)
+COMPRESSIONS = (50, 100, 200, 500)
+
+EXACT_COUNT_DISTINCT = """select grp, count(*) as value from
+    (select distinct grp, id from approximate_values) as distinct_values
+    group by grp"""
+
+
+def _timed(
+    function: Callable[[], pd.DataFrame], repeat: int
+) -> Tuple[float, pd.Series]:
+    """
+    Return the best time of the aggregation and its values by group
+    :param function: Query whose result has a grp and a value column
+    :param repeat: Number of timed executions
+    :return:
+    """
+    seconds = min(time_execution(function) for _ in range(repeat))
+    return seconds, function().set_index("grp")["value"].sort_index()
+
+
+def _largest_error(approximate: pd.Series, exact: pd.Series) -> float:
+    return float((approximate / exact - 1).abs().max())
+
+
+def run_approximate_benchmark(
+    rows: int = 1_000_000, groups: int = 100, repeat: int = 3, seed: int = 0
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Time the exact and approximate aggregates and measure the error of the
+    approximate ones
+    :param rows: Number of rows of the aggregated table
+    :param groups: Number of groups that the rows are aggregated into
+    :param repeat: Number of timed executions of each query, the best is reported
+    :param seed: Seed of the random values
+    :return: Best execution time in seconds and largest relative error of each
+             query by name
+    """
+    random_state = np.random.RandomState(seed)
+    frame = pd.DataFrame(
+        {
+            "grp": random_state.randint(0, groups, rows),
+            "id": random_state.randint(0, rows, rows),
+            "measure": random_state.lognormal(size=rows),
+        }
+    )
+    register_temp_table(frame, "approximate_values")
+    try:
+        seconds, exact_distinct = _timed(lambda: query(EXACT_COUNT_DISTINCT), repeat)
+        results = {"exact_count_distinct": (seconds, 0.0)}
+        for precision in PRECISIONS:
+            seconds, distinct = _timed(
+                lambda: query(
+                    f"""select grp, approx_count_distinct(id, {precision}) as value
+                    from approximate_values group by grp"""
+                ),
+                repeat,
+            )
+            results[f"approx_count_distinct_{precision}"] = (
+                seconds,
+                _largest_error(distinct, exact_distinct),
+            )
+        seconds, exact_median = _timed(
+            lambda: frame.groupby("grp")["measure"]
+            .median()
+            .rename("value")
+            .reset_index(),
+            repeat,
+        )
+        results["exact_median"] = (seconds, 0.0)
+        for compression in COMPRESSIONS:
+            seconds, median = _timed(
+                lambda: query(
+                    f"""select grp,
+                    approx_percentile(measure, 0.5, {compression}) as value
+                    from approximate_values group by grp"""
+                ),
+                repeat,
+            )
+            results[f"approx_percentile_{compression}"] = (
+                seconds,
+                _largest_error(median, exact_median),
+            )
+        return results
+    finally:
+        remove_temp_table("approximate_values")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    for query_name, (seconds, error) in run_approximate_benchmark(
+        arguments.rows, arguments.groups, arguments.repeat
+    ).items():
+        print(f"{query_name}: {seconds:.3f}s, largest relative error {error:.2%}")
@@ -0,0 +1,73 @@
+"""
+Benchmark of the numba engine against the pandas engine
+
+Filtered and grouped aggregations over synthetic forest fires data are timed with
+both engines, after one untimed run that compiles the kernels of the numba
+engine. Without Numba installed the numba engine runs on pandas, which the
+benchmark reports instead of timing it.
+"""
+from argparse import ArgumentParser
+from typing import Dict, Tuple
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.data import forest_fires
+from dataframe_sql.benchmarks.star_schema import time_execution
+from dataframe_sql.execution.compiled_pipeline import jit_available
+
+PIPELINE_QUERIES: Dict[str, str] = {
+    "filter_sum": """select sum(area) as area from forest_fires
+        where temp > 20 and rh < 40""",
+    "filter_arithmetic": """select count(*) as fires, avg(wind) as wind
+        from forest_fires where temp * 2 + wind > rh and rain = 0""",
+    "group_by": """select month, count(*) as fires, sum(area) as area,
+        min(rh) as rh, max(temp) as temp from forest_fires
+        where ffmc > 90 group by month""",
+    "projection": """select day, sum(heat) as heat, avg(heat) as mean_heat from
+        (select day, temp * wind + dmc / 10 as heat from forest_fires) as fires
+        where heat > 100 group by day""",
+}
+
+
+def run_compiled_pipeline_benchmark(
+    scale: int = 1000, repeat: int = 3
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Time every query with the pandas and the numba engine
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param repeat: Number of timed executions of each query, the best is reported
+    :return: Best execution time in seconds with the pandas and the numba engine
+             of each query by name
+    """
+    register_temp_table(forest_fires(scale), "forest_fires")
+    try:
+        results = {}
+        for name, sql in PIPELINE_QUERIES.items():
+            seconds = []
+            for engine in ("pandas", "numba"):
+                query(sql, engine=engine)
+                seconds.append(
+                    min(
+                        time_execution(lambda: query(sql, engine=engine))
+                        for _ in range(repeat)
+                    )
+                )
+            results[name] = (seconds[0], seconds[1])
+        return results
+    finally:
+        remove_temp_table("forest_fires")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    if not jit_available():
+        parser.exit(1, "Numba is not installed, the numba engine runs on pandas\n")
+    for query_name, (pandas_seconds, numba_seconds) in run_compiled_pipeline_benchmark(
+        arguments.scale, arguments.repeat
+    ).items():
+        print(
+            f"{query_name}: pandas {pandas_seconds:.3f}s, numba {numba_seconds:.3f}s "
+            f"({pandas_seconds / numba_seconds:.1f}x)"
+        )
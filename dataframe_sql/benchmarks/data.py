@@ -0,0 +1,299 @@
+"""
+Synthetic versions of the bundled data sets at any scale
+
+Every column of a generated table follows the distribution of the bundled column
+it imitates. Unique increasing integer keys stay unique and increasing, other
+unique integers are shifted by a multiple of their range in every copy of the
+bundled column, unique strings are suffixed with the number of the copy they
+belong to, and the values of other discrete columns are drawn with the
+frequencies of the bundled values. Their number of distinct values and the skew
+of their frequencies can be changed. Continuous columns are resampled from the
+bundled values, so that floating point columns whose values happen to be unique,
+such as measurements, repeat them.
+
+Tables are generated deterministically from a seed and, when a Parquet engine
+such as pyarrow is installed, cached on disk so that large tables are generated
+only once. The cache directory is ~/.cache/dataframe_sql unless set with the
+DATAFRAME_SQL_CACHE_DIR environment variable.
+"""
+from functools import lru_cache
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_object_dtype
+
+DATA_PATH = Path(__file__).parent.parent / "data"
+BUNDLED_FILES = {
+    "forest_fires": "forestfires.csv",
+    "avocado": "avocado.csv",
+    "digimon_mon_list": "DigiDB_digimonlist.csv",
+    "digimon_move_list": "DigiDB_movelist.csv",
+    "digimon_support_list": "DigiDB_supportlist.csv",
+}
+CACHE_DIR_VARIABLE = "DATAFRAME_SQL_CACHE_DIR"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "dataframe_sql"
+# Tables with fewer rows are cheaper to generate than to read from disk
+MIN_CACHED_ROWS = 100_000
+
+Cardinality = Optional[Dict[str, int]]
+
+
+@lru_cache(maxsize=None)
+def bundled_table(name: str) -> pd.DataFrame:
+    """
+    Return a bundled data set, which must not be modified
+    :param name: One of BUNDLED_FILES
+    :return:
+    """
+    if name not in BUNDLED_FILES:
+        raise ValueError(
+            f"Unknown data set '{name}', expected one of {', '.join(BUNDLED_FILES)}"
+        )
+    return pd.read_csv(DATA_PATH / BUNDLED_FILES[name])
+
+
+def parquet_engine_available() -> bool:
+    """
+    Return whether pandas can read and write Parquet files
+    :return:
+    """
+    for engine in ("pyarrow", "fastparquet"):
+        try:
+            __import__(engine)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def cache_dir() -> Path:
+    return Path(os.environ.get(CACHE_DIR_VARIABLE, DEFAULT_CACHE_DIR))
+
+
+def _zipf_weights(count: int, skew: float) -> np.ndarray:
+    weights = 1 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def _suffixed(values: np.ndarray, copies: np.ndarray) -> np.ndarray:
+    """
+    Return the strings with the number of the copy they belong to appended, except
+    for those of the first copy
+    :param values:
+    :param copies:
+    :return:
+    """
+    strings = values.astype(str)
+    suffixed = np.char.add(np.char.add(strings, "_"), copies.astype(str))
+    return np.where(copies == 0, strings, suffixed).astype(object)
+
+
+def _discrete_pool(series: pd.Series, cardinality: Optional[int]) -> pd.Series:
+    """
+    Return the frequencies of the distinct values to draw from, most frequent
+    first. Values beyond those of the series are made up from them and are given
+    the frequency of the values they are made from.
+    :param series: Bundled column without nulls
+    :param cardinality: Number of distinct values, by default that of the series
+    :return:
+    """
+    frequencies = series.value_counts(normalize=True)
+    if cardinality is None or cardinality == len(frequencies):
+        return frequencies
+    if cardinality < 1:
+        raise ValueError(f"Cardinality of column '{series.name}' must be positive")
+    if cardinality < len(frequencies):
+        return frequencies.iloc[:cardinality] / frequencies.iloc[:cardinality].sum()
+    positions = np.arange(cardinality) % len(frequencies)
+    copies = np.arange(cardinality) // len(frequencies)
+    base_values = frequencies.index.to_numpy()[positions]
+    if is_object_dtype(series.dtype):
+        values = _suffixed(base_values, copies)
+    else:
+        values = base_values + copies * (base_values.max() - base_values.min() + 1)
+    extended = frequencies.to_numpy()[positions]
+    return pd.Series(extended / extended.sum(), index=values)
+
+
+def synthesize_column(
+    series: pd.Series,
+    rows: int,
+    random_state: np.random.Generator,
+    cardinality: Optional[int] = None,
+    skew: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Return values that follow the distribution of a bundled column
+    :param series: Bundled column
+    :param rows: Number of values to return
+    :param random_state:
+    :param cardinality: Number of distinct values of a discrete column
+    :param skew: Exponent of the Zipf distribution of the values of a discrete
+                 column, which by default have the frequencies of the series
+    :return:
+    """
+    if series.is_unique and cardinality is None:
+        positions = np.arange(rows)
+        copies = positions // len(series)
+        base_values = series.to_numpy()[positions % len(series)]
+        if is_integer_dtype(series.dtype):
+            if series.is_monotonic_increasing:
+                return positions.astype(series.dtype) + series.iloc[0]
+            span = series.max() - series.min() + 1
+            return (base_values + copies * span).astype(series.dtype)
+        if is_object_dtype(series.dtype):
+            return _suffixed(base_values, copies)
+    values = series.dropna()
+    if is_float_dtype(series.dtype) and cardinality is None:
+        sample = random_state.choice(values.to_numpy(), rows)
+    else:
+        pool = _discrete_pool(values, cardinality)
+        weights = pool.to_numpy() if skew is None else _zipf_weights(len(pool), skew)
+        sample = pool.index.to_numpy()[random_state.choice(len(pool), rows, p=weights)]
+    null_fraction = series.isna().mean()
+    if null_fraction:
+        sample = sample.astype(object if is_object_dtype(sample.dtype) else float)
+        sample[random_state.random(rows) < null_fraction] = None
+    return sample
+
+
+def synthesize_table(
+    frame: pd.DataFrame,
+    rows: int,
+    seed: int = 0,
+    cardinality: Cardinality = None,
+    skew: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Return a table of the given number of rows whose columns follow the
+    distributions of the columns of the frame
+    :param frame: Bundled table
+    :param rows: Number of rows
+    :param seed: Seed of the random values
+    :param cardinality: Number of distinct values by column name
+    :param skew: Exponent of the Zipf distribution of discrete columns
+    :return:
+    """
+    cardinality = cardinality or {}
+    unknown_columns = set(cardinality) - set(frame.columns)
+    if unknown_columns:
+        raise ValueError(f"Unknown columns {sorted(unknown_columns)}")
+    return pd.DataFrame(
+        {
+            column: synthesize_column(
+                frame[column],
+                rows,
+                # Seeded by position so that the values of a column do not depend
+                # on how many values the columns before it drew
+                np.random.default_rng([seed, position]),
+                cardinality.get(column),
+                skew,
+            )
+            for position, column in enumerate(frame.columns)
+        },
+        columns=frame.columns,
+    )
+
+
+def _cache_path(
+    name: str, rows: int, seed: int, cardinality: Cardinality, skew: Optional[float]
+) -> Path:
+    settings = repr((sorted((cardinality or {}).items()), skew)).encode()
+    digest = hashlib.sha1(settings).hexdigest()[:12]
+    return cache_dir() / f"{name}-{rows}-{seed}-{digest}.parquet"
+
+
+def generate(
+    name: str,
+    scale: Union[int, float] = 1,
+    seed: int = 0,
+    cardinality: Cardinality = None,
+    skew: Optional[float] = None,
+    cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Return a synthetic version of a bundled data set
+    :param name: One of BUNDLED_FILES
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param seed: Seed of the random values
+    :param cardinality: Number of distinct values by column name
+    :param skew: Exponent of the Zipf distribution of discrete columns
+    :param cache: Whether to read and write the table in the Parquet cache
+    :return:
+    """
+    frame = bundled_table(name)
+    rows = int(round(len(frame) * scale))
+    if rows < 1:
+        raise ValueError(f"Scale {scale} leaves no rows of '{name}'")
+    cache = cache and rows >= MIN_CACHED_ROWS and parquet_engine_available()
+    path = _cache_path(name, rows, seed, cardinality, skew)
+    if cache and path.exists():
+        return pd.read_parquet(path)
+    table = synthesize_table(frame, rows, seed, cardinality, skew)
+    if cache:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name so that an interrupted write is not read
+        temporary_path = path.with_suffix(".tmp")
+        table.to_parquet(temporary_path)
+        temporary_path.replace(path)
+    return table
+
+
+def forest_fires(scale: Union[int, float] = 1, seed: int = 0, **kwargs) -> pd.DataFrame:
+    """
+    Return a synthetic table of forest fires, see generate
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param seed: Seed of the random values
+    :return:
+    """
+    return generate("forest_fires", scale, seed, **kwargs)
+
+
+def avocado(scale: Union[int, float] = 1, seed: int = 0, **kwargs) -> pd.DataFrame:
+    """
+    Return a synthetic table of avocado prices, see generate
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param seed: Seed of the random values
+    :return:
+    """
+    return generate("avocado", scale, seed, **kwargs)
+
+
+def digimon_mon_list(
+    scale: Union[int, float] = 1, seed: int = 0, **kwargs
+) -> pd.DataFrame:
+    """
+    Return a synthetic table of Digimon, see generate
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param seed: Seed of the random values
+    :return:
+    """
+    return generate("digimon_mon_list", scale, seed, **kwargs)
+
+
+def digimon_move_list(
+    scale: Union[int, float] = 1, seed: int = 0, **kwargs
+) -> pd.DataFrame:
+    """
+    Return a synthetic table of Digimon moves, see generate
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param seed: Seed of the random values
+    :return:
+    """
+    return generate("digimon_move_list", scale, seed, **kwargs)
+
+
+def digimon_support_list(
+    scale: Union[int, float] = 1, seed: int = 0, **kwargs
+) -> pd.DataFrame:
+    """
+    Return a synthetic table of Digimon support skills, see generate
+    :param scale: Number of rows as a multiple of those of the bundled data set
+    :param seed: Seed of the random values
+    :return:
+    """
+    return generate("digimon_support_list", scale, seed, **kwargs)
@@ -0,0 +1,71 @@
+"""
+IN list benchmark for queries with 10, 1,000 and 100,000 literal values
+
+Every query filters a table of integer ids on an IN list, written either as SQL
+text, which is parsed on every query, or bound as an array parameter. Filtering
+the frame with pandas isin is timed as a baseline.
+"""
+from argparse import ArgumentParser
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.star_schema import time_execution
+
+IN_LIST_SIZES = (10, 1_000, 100_000)
+
+
+def run_in_list_benchmark(
+    rows: int = 1_000_000, repeat: int = 3, seed: int = 0
+) -> Dict[int, Dict[str, float]]:
+    """
+    Time IN list queries of every size written as SQL text and bound as an array
+    parameter
+    :param rows: Number of rows of the filtered table
+    :param repeat: Number of timed executions of each query, the best is reported
+    :param seed: Seed of the random ids
+    :return: Best execution time in seconds of each query by IN list size
+    """
+    random_state = np.random.RandomState(seed)
+    frame = pd.DataFrame(
+        {
+            "id": random_state.randint(0, rows, rows),
+            "value": random_state.random_sample(rows),
+        }
+    )
+    register_temp_table(frame, "in_list_ids")
+    try:
+        timings = {}
+        for size in IN_LIST_SIZES:
+            ids = random_state.choice(rows, size, replace=False)
+            sql_text = ", ".join(str(value) for value in ids)
+            queries = {
+                "sql_text": lambda: query(
+                    f"select * from in_list_ids where id in ({sql_text})"
+                ),
+                "bound_parameter": lambda: query(
+                    "select * from in_list_ids where id in :ids", params={"ids": ids}
+                ),
+                "pandas_isin": lambda: frame[frame["id"].isin(ids)],
+            }
+            timings[size] = {
+                query_name: min(time_execution(function) for _ in range(repeat))
+                for query_name, function in queries.items()
+            }
+        return timings
+    finally:
+        remove_temp_table("in_list_ids")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    for size, size_timings in run_in_list_benchmark(
+        arguments.rows, arguments.repeat
+    ).items():
+        for query_name, seconds in size_timings.items():
+            print(f"{size} values, {query_name}: {seconds:.3f}s")
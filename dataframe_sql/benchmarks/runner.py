@@ -0,0 +1,356 @@
+"""
+Timing, reporting and baseline comparison of benchmarks
+
+Every benchmark is called a few times to warm up caches before it is timed over
+repeated runs with time.perf_counter. Results are saved as JSON so that a later
+run can be compared with them, and a benchmark regresses when a statistic of its
+timings exceeds that of the baseline by more than a given fraction. When the peak
+memory of the benchmarks was traced, it regresses in the same way.
+"""
+from argparse import ArgumentParser, Namespace
+import json
+from pathlib import Path
+import platform
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.execution.stats import trace_peak_memory
+
+BENCHMARK_STATISTICS = ("median", "p95", "mean", "min", "max")
+DEFAULT_WARMUP = 2
+DEFAULT_REPEAT = 10
+DEFAULT_MAX_REGRESSION = 0.1
+DEFAULT_MAX_MEMORY_REGRESSION = 0.1
+PEAK_MEMORY = "peak_memory"
+
+
+class Benchmark:
+    """
+    Named function whose execution time is measured
+    """
+
+    def __init__(self, name: str, function: Callable[[], Any], description: str = ""):
+        self.name = name
+        self.function = function
+        self.description = description
+
+    def __repr__(self):
+        return f"Benchmark({self.name!r})"
+
+
+class BenchmarkResult:
+    """
+    Timings in seconds of the repeated runs of a benchmark, and the peak memory in
+    bytes allocated by a run if it was traced
+    """
+
+    def __init__(
+        self, name: str, timings: List[float], peak_memory: Optional[int] = None
+    ):
+        if not timings:
+            raise ValueError(f"Benchmark '{name}' has no timings")
+        self.name = name
+        self.timings = timings
+        self.peak_memory = peak_memory
+
+    @property
+    def median(self) -> float:
+        return float(np.median(self.timings))
+
+    @property
+    def p95(self) -> float:
+        return float(np.percentile(self.timings, 95))
+
+    @property
+    def mean(self) -> float:
+        return float(np.mean(self.timings))
+
+    @property
+    def min(self) -> float:
+        return float(np.min(self.timings))
+
+    @property
+    def max(self) -> float:
+        return float(np.max(self.timings))
+
+    def statistic(self, statistic: str) -> float:
+        """
+        Return a statistic of the timings
+        :param statistic: One of BENCHMARK_STATISTICS
+        :return:
+        """
+        if statistic not in BENCHMARK_STATISTICS:
+            raise ValueError(
+                f"Unknown statistic '{statistic}', expected one of "
+                f"{', '.join(BENCHMARK_STATISTICS)}"
+            )
+        return getattr(self, statistic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            statistic: self.statistic(statistic) for statistic in BENCHMARK_STATISTICS
+        }
+        result["repeat"] = len(self.timings)
+        result["timings"] = self.timings
+        if self.peak_memory is not None:
+            result["peak_memory"] = self.peak_memory
+        return result
+
+    @classmethod
+    def from_dict(cls, name: str, result: Dict[str, Any]) -> "BenchmarkResult":
+        return cls(
+            name,
+            [float(timing) for timing in result["timings"]],
+            result.get("peak_memory"),
+        )
+
+    def __repr__(self):
+        return (
+            f"BenchmarkResult({self.name!r}, median={self.median:.6f}s, "
+            f"p95={self.p95:.6f}s)"
+        )
+
+
+class Regression:
+    """
+    Statistic of a benchmark that got slower than in the baseline, or peak memory
+    that grew
+    """
+
+    def __init__(self, name: str, statistic: str, baseline: float, current: float):
+        self.name = name
+        self.statistic = statistic
+        self.baseline = baseline
+        self.current = current
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def __str__(self):
+        if self.statistic == PEAK_MEMORY:
+            baseline = f"{self.baseline / 2 ** 20:.1f}MiB"
+            current = f"{self.current / 2 ** 20:.1f}MiB"
+        else:
+            baseline = f"{self.baseline:.6f}s"
+            current = f"{self.current:.6f}s"
+        return (
+            f"{self.name}: {self.statistic} went from {baseline} to {current} "
+            f"({self.ratio - 1:+.1%})"
+        )
+
+
+def measure(
+    benchmark: Benchmark,
+    warmup: int = DEFAULT_WARMUP,
+    repeat: int = DEFAULT_REPEAT,
+    trace_memory: bool = False,
+) -> BenchmarkResult:
+    """
+    Return the timings of repeated runs of the benchmark after warming it up
+    :param benchmark:
+    :param warmup: Number of untimed runs
+    :param repeat: Number of timed runs
+    :param trace_memory: Whether to measure the peak memory of one more run
+    :return:
+    """
+    if repeat < 1:
+        raise ValueError("A benchmark must be repeated at least once")
+    for _ in range(warmup):
+        benchmark.function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark.function()
+        timings.append(time.perf_counter() - start)
+    peak_memory = trace_peak_memory(benchmark.function) if trace_memory else None
+    return BenchmarkResult(benchmark.name, timings, peak_memory)
+
+
+def run_benchmarks(
+    benchmarks: Iterable[Benchmark],
+    warmup: int = DEFAULT_WARMUP,
+    repeat: int = DEFAULT_REPEAT,
+    report: Optional[Callable[[BenchmarkResult], None]] = None,
+    trace_memory: bool = False,
+) -> Dict[str, BenchmarkResult]:
+    """
+    Measure every benchmark
+    :param benchmarks:
+    :param warmup: Number of untimed runs of each benchmark
+    :param repeat: Number of timed runs of each benchmark
+    :param report: Called with the result of each benchmark once it is measured
+    :param trace_memory: Whether to measure the peak memory of each benchmark
+    :return: Results by benchmark name
+    """
+    results = {}
+    for benchmark in benchmarks:
+        result = measure(benchmark, warmup, repeat, trace_memory)
+        if report is not None:
+            report(result)
+        results[benchmark.name] = result
+    return results
+
+
+def environment_info() -> Dict[str, str]:
+    """
+    Return a description of the machine and library versions a run happened on,
+    since timings are only comparable on the same environment
+    :return:
+    """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def save_results(
+    results: Dict[str, BenchmarkResult],
+    path: Union[str, Path],
+    metadata: Optional[Dict[str, Any]] = None,
+):
+    """
+    Write the results as JSON
+    :param results:
+    :param path:
+    :param metadata: Settings of the run, such as the scale of the data
+    :return:
+    """
+    document = {
+        "environment": environment_info(),
+        "metadata": metadata or {},
+        "benchmarks": {name: result.to_dict() for name, result in results.items()},
+    }
+    Path(path).write_text(json.dumps(document, indent=2, sort_keys=True))
+
+
+def load_results(path: Union[str, Path]) -> Dict[str, BenchmarkResult]:
+    """
+    Read results written by save_results
+    :param path:
+    :return:
+    """
+    document = json.loads(Path(path).read_text())
+    return {
+        name: BenchmarkResult.from_dict(name, result)
+        for name, result in document["benchmarks"].items()
+    }
+
+
+def find_regressions(
+    results: Dict[str, BenchmarkResult],
+    baseline: Dict[str, BenchmarkResult],
+    max_regression: float = DEFAULT_MAX_REGRESSION,
+    statistics: Iterable[str] = ("median",),
+    max_memory_regression: Optional[float] = DEFAULT_MAX_MEMORY_REGRESSION,
+) -> List[Regression]:
+    """
+    Return the statistics of benchmarks that are slower than in the baseline by
+    more than max_regression, and the peak memory of those that allocate more
+    than in the baseline by more than max_memory_regression. Benchmarks missing
+    from either side are ignored, as is peak memory that was not traced.
+    :param results: Results of the current run
+    :param baseline: Results of the run to compare with
+    :param max_regression: Allowed slowdown as a fraction of the baseline
+    :param statistics: Statistics of the timings that are compared
+    :param max_memory_regression: Allowed growth of the peak memory as a fraction
+                                  of the baseline, None not to compare it
+    :return:
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for statistic in statistics:
+            baseline_value = baseline[name].statistic(statistic)
+            current_value = result.statistic(statistic)
+            if current_value > baseline_value * (1 + max_regression):
+                regressions.append(
+                    Regression(name, statistic, baseline_value, current_value)
+                )
+        baseline_memory = baseline[name].peak_memory
+        if (
+            max_memory_regression is not None
+            and baseline_memory
+            and result.peak_memory is not None
+            and result.peak_memory > baseline_memory * (1 + max_memory_regression)
+        ):
+            regressions.append(
+                Regression(name, PEAK_MEMORY, baseline_memory, result.peak_memory)
+            )
+    return regressions
+
+
+def add_run_arguments(parser: ArgumentParser):
+    """
+    Add the options of a benchmark run and of the comparison with a baseline
+    :param parser:
+    :return:
+    """
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results in this JSON file")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help="Allowed slowdown compared with the baseline, as a fraction",
+    )
+    parser.add_argument(
+        "--statistic",
+        action="append",
+        choices=BENCHMARK_STATISTICS,
+        help="Statistic compared with the baseline, median by default",
+    )
+    parser.add_argument(
+        "--max-memory-regression",
+        type=float,
+        default=DEFAULT_MAX_MEMORY_REGRESSION,
+        help="Allowed growth of the peak memory compared with the baseline, as a "
+        "fraction",
+    )
+
+
+def print_result(result: BenchmarkResult):
+    line = (
+        f"{result.name:<16} median {result.median * 1000:9.2f}ms   "
+        f"p95 {result.p95 * 1000:9.2f}ms"
+    )
+    if result.peak_memory is not None:
+        line += f"   peak memory {result.peak_memory / 2 ** 20:9.1f}MiB"
+    print(line)
+
+
+def save_and_compare(
+    results: Dict[str, BenchmarkResult], options: Namespace, metadata: Dict[str, Any]
+) -> int:
+    """
+    Save the results and compare them with the baseline as the command line options
+    added by add_run_arguments ask
+    :param results:
+    :param options:
+    :param metadata: Settings of the run
+    :return: Exit status, which is 1 if a benchmark regressed
+    """
+    if options.output:
+        metadata = dict(metadata, warmup=options.warmup, repeat=options.repeat)
+        save_results(results, options.output, metadata)
+    if not options.baseline:
+        return 0
+    regressions = find_regressions(
+        results,
+        load_results(options.baseline),
+        options.max_regression,
+        options.statistic or ["median"],
+        options.max_memory_regression,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,109 @@
+"""
+Star schema benchmark for the join order optimizer
+
+A fact table of synthetic forest fires at any scale of the bundled data is joined
+to four dimension tables. The tables are written dimensions first, so joining
+them in written order builds cross products of the dimensions before the fact
+table is reached.
+"""
+from argparse import ArgumentParser
+import time
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+from sql_to_ibis import query as ibis_query
+
+from dataframe_sql import register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.data import avocado, digimon_mon_list, forest_fires
+from dataframe_sql.optimizer.join_order import reorder_joins, written_order
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun"]
+MONTHS += ["jul", "aug", "sep", "oct", "nov", "dec"]
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+STAR_SCHEMA_QUERY = """
+select month_number, day_number, digimon, region, temp, area
+from dim_month, dim_day, dim_digimon, dim_avocado, fires
+where fires.month = dim_month.month_key
+and fires.day = dim_day.day_key
+and fires.fire_digimon = dim_digimon.digimon_number
+and fires.fire_avocado = dim_avocado.avocado_id
+and dim_digimon.stage = 'Mega'
+"""
+
+
+def star_schema_tables(scale: int) -> Dict[str, pd.DataFrame]:
+    """
+    Return the fact and dimension tables of the star schema
+    :param scale: Number of rows of the fact table as a multiple of those of the
+                  bundled forest fires data
+    :return:
+    """
+    digimon = digimon_mon_list()
+    avocado_prices = avocado()
+
+    fires = forest_fires(scale)
+    fires["fire_digimon"] = np.arange(len(fires)) % len(digimon) + 1
+    fires["fire_avocado"] = np.arange(len(fires)) % len(avocado_prices)
+    return {
+        "fires": fires,
+        "dim_month": pd.DataFrame(
+            {"month_key": MONTHS, "month_number": np.arange(1, len(MONTHS) + 1)}
+        ),
+        "dim_day": pd.DataFrame(
+            {"day_key": DAYS, "day_number": np.arange(1, len(DAYS) + 1)}
+        ),
+        "dim_digimon": digimon[["Number", "Digimon", "Stage"]].rename(
+            columns={"Number": "digimon_number"}
+        ),
+        "dim_avocado": avocado_prices[["avocado_id", "region", "year"]],
+    }
+
+
+def time_execution(function: Callable) -> float:
+    """
+    Return the number of seconds it takes to call the function
+    :param function:
+    :return:
+    """
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run_star_schema_benchmark(scale: int = 100, repeat: int = 3) -> Dict[str, float]:
+    """
+    Time the star schema query with joins in the cost based order and in written
+    order
+    :param scale: Number of rows of the fact table as a multiple of those of the
+                  bundled forest fires data
+    :param repeat: Number of timed executions of each plan, the best is reported
+    :return: Best execution time in seconds of each plan
+    """
+    tables = star_schema_tables(scale)
+    for table_name, frame in tables.items():
+        register_temp_table(frame, table_name)
+    try:
+        expr = ibis_query(STAR_SCHEMA_QUERY)
+        plans = {
+            "cost_based": reorder_joins(expr),
+            "written_order": reorder_joins(expr, choose_order=written_order),
+        }
+        return {
+            plan_name: min(time_execution(plan.execute) for _ in range(repeat))
+            for plan_name, plan in plans.items()
+        }
+    finally:
+        for table_name in tables:
+            remove_temp_table(table_name)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    timings = run_star_schema_benchmark(arguments.scale, arguments.repeat)
+    for plan_name, seconds in timings.items():
+        print(f"{plan_name}: {seconds:.3f}s")
@@ -0,0 +1,162 @@
+"""
+Benchmark suite of the query shapes that dataframe_sql supports
+
+Each benchmark runs one query shape, such as a filter, an aggregation or a join,
+over synthetic versions of the bundled data sets. Results can be written as
+JSON and compared with a saved baseline, in which case the run fails when a
+benchmark got slower or its peak memory grew:
+
+    python -m dataframe_sql.benchmarks.suite --output baseline.json
+    python -m dataframe_sql.benchmarks.suite --baseline baseline.json
+"""
+from argparse import ArgumentParser
+from contextlib import contextmanager
+import re
+import sys
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.data import digimon_mon_list, forest_fires
+from dataframe_sql.benchmarks.runner import (
+    DEFAULT_REPEAT,
+    DEFAULT_WARMUP,
+    Benchmark,
+    BenchmarkResult,
+    add_run_arguments,
+    print_result,
+    run_benchmarks,
+    save_and_compare,
+)
+
+QUERY_SHAPES: Dict[str, str] = {
+    "select_all": "select * from forest_fires",
+    "filter": "select * from forest_fires where temp > 20 and rh < 40",
+    "projection": """select x * y as grid, temp + wind as heat, area / 2 as half_area
+        from forest_fires""",
+    "case_when": """select case when temp > 20 then 'hot' when temp > 10 then 'mild'
+        else 'cold' end as climate from forest_fires""",
+    "case_when_many": "select case "
+    + " ".join(f"when temp < {bucket} then {bucket}" for bucket in range(2, 34))
+    + " else 99 end as bucket from forest_fires",
+    "in_list": """select * from forest_fires
+        where month in ('jan', 'mar', 'may', 'jul', 'sep', 'nov')""",
+    "distinct": "select distinct month, day from forest_fires",
+    "group_by": """select month, day, count(*) as fires, sum(area) as area,
+        avg(temp) as temp from forest_fires group by month, day""",
+    "having": """select month, max(temp) as max_temp from forest_fires
+        group by month having max(temp) > 25""",
+    "order_by_limit": "select * from forest_fires order by temp desc, area limit 100",
+    "join": """select month, digimon, area from forest_fires
+        join digimon_mon_list on forest_fires.x = digimon_mon_list.number""",
+    "in_subquery": """select * from forest_fires where x in
+        (select memory from digimon_mon_list where stage = 'Rookie')""",
+    "union_all": """select month, area from forest_fires where rain > 0
+        union all select month, area from forest_fires where area > 10""",
+    "table_sample": """select month, avg(temp) as temp from forest_fires
+        tablesample system (1) repeatable (0) group by month""",
+    "approx_count_distinct": """select month, approx_count_distinct(area) as areas
+        from forest_fires group by month""",
+    "approx_percentile": """select month, approx_percentile(temp, 0.5) as median_temp
+        from forest_fires group by month""",
+}
+
+
+def benchmark_tables(scale: int) -> Dict[str, pd.DataFrame]:
+    """
+    Return the tables that the query shapes read
+    :param scale: Number of rows of the fact table as a multiple of those of the
+                  bundled forest fires data
+    :return:
+    """
+    return {"forest_fires": forest_fires(scale), "digimon_mon_list": digimon_mon_list()}
+
+
+def _query_function(sql: str) -> Callable[[], pd.DataFrame]:
+    return lambda: query(sql)
+
+
+def query_benchmarks(pattern: Optional[str] = None) -> List[Benchmark]:
+    """
+    Return a benchmark for every query shape
+    :param pattern: Regular expression that the names of the returned benchmarks
+                    must contain
+    :return:
+    """
+    return [
+        Benchmark(name, _query_function(sql), sql)
+        for name, sql in QUERY_SHAPES.items()
+        if pattern is None or re.search(pattern, name)
+    ]
+
+
+@contextmanager
+def registered_tables(tables: Dict[str, pd.DataFrame]) -> Iterator[None]:
+    """
+    Register the tables for the duration of a benchmark run
+    :param tables: Frames by table name
+    :return:
+    """
+    for table_name, frame in tables.items():
+        register_temp_table(frame, table_name)
+    try:
+        yield
+    finally:
+        for table_name in tables:
+            remove_temp_table(table_name)
+
+
+def run_suite(
+    scale: int = 100,
+    warmup: int = DEFAULT_WARMUP,
+    repeat: int = DEFAULT_REPEAT,
+    pattern: Optional[str] = None,
+    report: Optional[Callable[[BenchmarkResult], None]] = None,
+    trace_memory: bool = True,
+) -> Dict[str, BenchmarkResult]:
+    """
+    Measure every query shape over the benchmark tables
+    :param scale: Number of rows of the fact table as a multiple of those of the
+                  bundled forest fires data
+    :param warmup: Number of untimed runs of each benchmark
+    :param repeat: Number of timed runs of each benchmark
+    :param pattern: Regular expression that the names of the benchmarks to run
+                    must contain
+    :param report: Called with the result of each benchmark once it is measured
+    :param trace_memory: Whether to measure the peak memory of each benchmark
+    :return: Results by benchmark name
+    """
+    with registered_tables(benchmark_tables(scale)):
+        return run_benchmarks(
+            query_benchmarks(pattern), warmup, repeat, report, trace_memory
+        )
+
+
+def _run_from_command_line(arguments: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument(
+        "--filter", dest="pattern", help="Only run benchmarks matching this regex"
+    )
+    parser.add_argument(
+        "--no-trace-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="Do not measure the peak memory of the benchmarks",
+    )
+    add_run_arguments(parser)
+    options = parser.parse_args(arguments)
+    results = run_suite(
+        options.scale,
+        options.warmup,
+        options.repeat,
+        options.pattern,
+        print_result,
+        options.trace_memory,
+    )
+    return save_and_compare(results, options, {"scale": options.scale})
+
+
+if __name__ == "__main__":
+    sys.exit(_run_from_command_line())
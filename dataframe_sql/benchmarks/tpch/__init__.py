@@ -0,0 +1,14 @@
+"""
+TPC-H style analytic workload over locally generated tables
+
+The eight TPC-H tables are generated at a scale factor, typically from 0.01 to
+10, and registered with register_temp_table. Each of the queries that can be
+written in the supported SQL is timed and its peak memory measured:
+
+    python -m dataframe_sql.benchmarks.tpch --scale-factor 0.1
+"""
+from dataframe_sql.benchmarks.tpch.generator import generate_tables
+from dataframe_sql.benchmarks.tpch.queries import QUERIES
+from dataframe_sql.benchmarks.tpch.workload import run_tpch, tpch_benchmarks
+
+__all__ = ["generate_tables", "QUERIES", "run_tpch", "tpch_benchmarks"]
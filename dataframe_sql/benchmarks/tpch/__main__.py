@@ -0,0 +1,45 @@
+from argparse import ArgumentParser
+import sys
+from typing import List, Optional
+
+from dataframe_sql.benchmarks import tpch
+from dataframe_sql.benchmarks.runner import (
+    add_run_arguments,
+    print_result,
+    save_and_compare,
+)
+from dataframe_sql.benchmarks.tpch.workload import (
+    DEFAULT_TPCH_REPEAT,
+    DEFAULT_TPCH_WARMUP,
+)
+
+
+def _run_from_command_line(arguments: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description=tpch.__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale-factor", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--query",
+        dest="queries",
+        type=int,
+        action="append",
+        help="Number of a query to run, by default all supported queries run",
+    )
+    add_run_arguments(parser)
+    parser.set_defaults(warmup=DEFAULT_TPCH_WARMUP, repeat=DEFAULT_TPCH_REPEAT)
+    options = parser.parse_args(arguments)
+    results = tpch.run_tpch(
+        options.scale_factor,
+        options.queries,
+        options.warmup,
+        options.repeat,
+        options.seed,
+        print_result,
+    )
+    return save_and_compare(
+        results, options, {"scale_factor": options.scale_factor, "seed": options.seed}
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(_run_from_command_line())
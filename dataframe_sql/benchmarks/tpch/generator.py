@@ -0,0 +1,319 @@
+"""
+Generator of the eight TPC-H tables at a scale factor, following the row counts,
+keys and value distributions of the TPC-H specification. Comment, address and
+part name columns are left out, since none of the supported queries read them,
+and order keys are dense rather than sparse.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+REGIONS = ["AFRICA", "AMERICA", "ASIA", "EUROPE", "MIDDLE EAST"]
+NATIONS = [
+    ("ALGERIA", 0),
+    ("ARGENTINA", 1),
+    ("BRAZIL", 1),
+    ("CANADA", 1),
+    ("EGYPT", 4),
+    ("ETHIOPIA", 0),
+    ("FRANCE", 3),
+    ("GERMANY", 3),
+    ("INDIA", 2),
+    ("INDONESIA", 2),
+    ("IRAN", 4),
+    ("IRAQ", 4),
+    ("JAPAN", 2),
+    ("JORDAN", 4),
+    ("KENYA", 0),
+    ("MOROCCO", 0),
+    ("MOZAMBIQUE", 0),
+    ("PERU", 1),
+    ("CHINA", 2),
+    ("ROMANIA", 3),
+    ("SAUDI ARABIA", 4),
+    ("VIETNAM", 2),
+    ("RUSSIA", 3),
+    ("UNITED KINGDOM", 3),
+    ("UNITED STATES", 1),
+]
+MARKET_SEGMENTS = ["AUTOMOBILE", "BUILDING", "FURNITURE", "MACHINERY", "HOUSEHOLD"]
+ORDER_PRIORITIES = ["1-URGENT", "2-HIGH", "3-MEDIUM", "4-NOT SPECIFIED", "5-LOW"]
+SHIP_INSTRUCTIONS = ["DELIVER IN PERSON", "COLLECT COD", "NONE", "TAKE BACK RETURN"]
+SHIP_MODES = ["REG AIR", "AIR", "RAIL", "SHIP", "TRUCK", "MAIL", "FOB"]
+TYPE_SYLLABLES = (
+    ["STANDARD", "SMALL", "MEDIUM", "LARGE", "ECONOMY", "PROMO"],
+    ["ANODIZED", "BURNISHED", "PLATED", "POLISHED", "BRUSHED"],
+    ["TIN", "NICKEL", "BRASS", "STEEL", "COPPER"],
+)
+CONTAINER_SYLLABLES = (
+    ["SM", "LG", "MED", "JUMBO", "WRAP"],
+    ["CASE", "BOX", "BAG", "JAR", "PKG", "PACK", "CAN", "DRUM"],
+)
+
+START_DATE = np.datetime64("1992-01-01")
+# Orders are placed until 151 days before the end date of 1998-12-31, so that
+# all of their line items are received by then
+LAST_ORDER_DATE = np.datetime64("1998-08-02")
+CURRENT_DATE = np.datetime64("1995-06-17")
+SUPPLIERS_PER_PART = 4
+MAX_LINES_PER_ORDER = 7
+
+
+def _row_count(base_count: int, scale_factor: float) -> int:
+    return max(int(base_count * scale_factor), 1)
+
+
+def _keyed_names(prefix: str, keys: np.ndarray) -> np.ndarray:
+    """
+    Return names such as Customer#000000001 for the keys
+    :param prefix:
+    :param keys:
+    :return:
+    """
+    return np.char.add(prefix, np.char.zfill(keys.astype(str), 9)).astype(object)
+
+
+def _words(rng: np.random.Generator, syllables, count: int) -> np.ndarray:
+    """
+    Return strings made of one random word of every syllable list
+    :param rng:
+    :param syllables:
+    :param count:
+    :return:
+    """
+    words = np.array([""], dtype=object)
+    for syllable_list in syllables:
+        separator = " " if len(words[0]) else ""
+        words = np.array(
+            [
+                f"{word}{separator}{syllable}"
+                for word in words
+                for syllable in syllable_list
+            ],
+            dtype=object,
+        )
+    return words[rng.integers(0, len(words), count)]
+
+
+def _money(rng: np.random.Generator, low: float, high: float, count: int):
+    return np.round(rng.uniform(low, high, count), 2)
+
+
+def _days(rng: np.random.Generator, low: int, high: int, count: int) -> np.ndarray:
+    return rng.integers(low, high + 1, count).astype("timedelta64[D]")
+
+
+def part_retail_price(part_keys: np.ndarray) -> np.ndarray:
+    """
+    Return the retail price of parts as defined by the specification
+    :param part_keys:
+    :return:
+    """
+    return (90000 + (part_keys // 10) % 20001 + 100 * (part_keys % 1000)) / 100
+
+
+def part_supplier(
+    part_keys: np.ndarray, supplier_index: np.ndarray, supplier_count: int
+) -> np.ndarray:
+    """
+    Return the key of one of the suppliers of each part as defined by the
+    specification
+    :param part_keys:
+    :param supplier_index: Which of the suppliers of the part, from 0 to 3
+    :param supplier_count:
+    :return:
+    """
+    stride = supplier_count // SUPPLIERS_PER_PART + (part_keys - 1) // supplier_count
+    return (part_keys + supplier_index * stride) % supplier_count + 1
+
+
+def generate_tables(
+    scale_factor: float = 0.01, seed: int = 0
+) -> Dict[str, pd.DataFrame]:
+    """
+    Return the TPC-H tables at a scale factor, where a scale factor of 1 has 6
+    million line items
+    :param scale_factor: Size of the data relative to scale factor 1
+    :param seed: Seed of the random values
+    :return: Tables by name
+    """
+    if scale_factor <= 0:
+        raise ValueError("The scale factor must be positive")
+    rng = np.random.default_rng(seed)
+    supplier_count = _row_count(10_000, scale_factor)
+    part_count = _row_count(200_000, scale_factor)
+    customer_count = _row_count(150_000, scale_factor)
+    order_count = _row_count(1_500_000, scale_factor)
+    clerk_count = _row_count(1_000, scale_factor)
+
+    region = pd.DataFrame(
+        {"r_regionkey": np.arange(len(REGIONS)), "r_name": np.array(REGIONS, object)}
+    )
+    nation = pd.DataFrame(
+        {
+            "n_nationkey": np.arange(len(NATIONS)),
+            "n_name": np.array([name for name, _ in NATIONS], dtype=object),
+            "n_regionkey": np.array([region_key for _, region_key in NATIONS]),
+        }
+    )
+
+    supplier_keys = np.arange(1, supplier_count + 1)
+    supplier = pd.DataFrame(
+        {
+            "s_suppkey": supplier_keys,
+            "s_name": _keyed_names("Supplier#", supplier_keys),
+            "s_nationkey": rng.integers(0, len(NATIONS), supplier_count),
+            "s_acctbal": _money(rng, -999.99, 9999.99, supplier_count),
+        }
+    )
+
+    part_keys = np.arange(1, part_count + 1)
+    manufacturers = rng.integers(1, 6, part_count)
+    brands = manufacturers * 10 + rng.integers(1, 6, part_count)
+    part = pd.DataFrame(
+        {
+            "p_partkey": part_keys,
+            "p_mfgr": np.char.add("Manufacturer#", manufacturers.astype(str)).astype(
+                object
+            ),
+            "p_brand": np.char.add("Brand#", brands.astype(str)).astype(object),
+            "p_type": _words(rng, TYPE_SYLLABLES, part_count),
+            "p_size": rng.integers(1, 51, part_count),
+            "p_container": _words(rng, CONTAINER_SYLLABLES, part_count),
+            "p_retailprice": part_retail_price(part_keys),
+        }
+    )
+
+    partsupp_parts = np.repeat(part_keys, SUPPLIERS_PER_PART)
+    partsupp_index = np.tile(np.arange(SUPPLIERS_PER_PART), part_count)
+    partsupp = pd.DataFrame(
+        {
+            "ps_partkey": partsupp_parts,
+            "ps_suppkey": part_supplier(partsupp_parts, partsupp_index, supplier_count),
+            "ps_availqty": rng.integers(1, 10_000, len(partsupp_parts)),
+            "ps_supplycost": _money(rng, 1.0, 1000.0, len(partsupp_parts)),
+        }
+    )
+
+    customer_keys = np.arange(1, customer_count + 1)
+    customer_nations = rng.integers(0, len(NATIONS), customer_count)
+    phone_parts = [
+        (customer_nations + 10).astype(str),
+        rng.integers(100, 1000, customer_count).astype(str),
+        rng.integers(100, 1000, customer_count).astype(str),
+        rng.integers(1000, 10_000, customer_count).astype(str),
+    ]
+    phones = phone_parts[0]
+    for phone_part in phone_parts[1:]:
+        phones = np.char.add(np.char.add(phones, "-"), phone_part)
+    customer = pd.DataFrame(
+        {
+            "c_custkey": customer_keys,
+            "c_name": _keyed_names("Customer#", customer_keys),
+            "c_nationkey": customer_nations,
+            "c_phone": phones.astype(object),
+            "c_acctbal": _money(rng, -999.99, 9999.99, customer_count),
+            "c_mktsegment": np.array(MARKET_SEGMENTS, dtype=object)[
+                rng.integers(0, len(MARKET_SEGMENTS), customer_count)
+            ],
+        }
+    )
+
+    # A third of the customers, those with keys divisible by three, never order
+    ordering_customers = customer_keys[customer_keys % 3 != 0]
+    if not len(ordering_customers):
+        ordering_customers = customer_keys
+    order_keys = np.arange(1, order_count + 1)
+    order_dates = START_DATE + _days(
+        rng, 0, int((LAST_ORDER_DATE - START_DATE).astype(int)), order_count
+    )
+
+    lines_per_order = rng.integers(1, MAX_LINES_PER_ORDER + 1, order_count)
+    line_count = int(lines_per_order.sum())
+    line_orders = np.repeat(np.arange(order_count), lines_per_order)
+    first_lines = np.cumsum(lines_per_order) - lines_per_order
+    line_parts = rng.integers(1, part_count + 1, line_count)
+    quantities = rng.integers(1, 51, line_count).astype(np.float64)
+    extended_prices = np.round(quantities * part_retail_price(line_parts), 2)
+    discounts = rng.integers(0, 11, line_count) / 100
+    taxes = rng.integers(0, 9, line_count) / 100
+    line_order_dates = order_dates[line_orders]
+    ship_dates = line_order_dates + _days(rng, 1, 121, line_count)
+    commit_dates = line_order_dates + _days(rng, 30, 90, line_count)
+    receipt_dates = ship_dates + _days(rng, 1, 30, line_count)
+    returned = rng.integers(0, 2, line_count).astype(bool)
+    return_flags = np.where(
+        receipt_dates <= CURRENT_DATE, np.where(returned, "R", "A"), "N"
+    ).astype(object)
+    shipped = ship_dates <= CURRENT_DATE
+    lineitem = pd.DataFrame(
+        {
+            "l_orderkey": order_keys[line_orders],
+            "l_partkey": line_parts,
+            "l_suppkey": part_supplier(
+                line_parts,
+                rng.integers(0, SUPPLIERS_PER_PART, line_count),
+                supplier_count,
+            ),
+            "l_linenumber": np.arange(line_count) - first_lines[line_orders] + 1,
+            "l_quantity": quantities,
+            "l_extendedprice": extended_prices,
+            "l_discount": discounts,
+            "l_tax": taxes,
+            "l_returnflag": return_flags,
+            "l_linestatus": np.where(shipped, "F", "O").astype(object),
+            "l_shipdate": ship_dates.astype("datetime64[ns]"),
+            "l_commitdate": commit_dates.astype("datetime64[ns]"),
+            "l_receiptdate": receipt_dates.astype("datetime64[ns]"),
+            "l_shipinstruct": np.array(SHIP_INSTRUCTIONS, dtype=object)[
+                rng.integers(0, len(SHIP_INSTRUCTIONS), line_count)
+            ],
+            "l_shipmode": np.array(SHIP_MODES, dtype=object)[
+                rng.integers(0, len(SHIP_MODES), line_count)
+            ],
+        }
+    )
+
+    # An order is fulfilled when all of its line items shipped, open when none did
+    # and partially fulfilled otherwise
+    shipped_lines = np.bincount(line_orders, weights=shipped, minlength=order_count)
+    order_status = np.where(
+        shipped_lines == lines_per_order,
+        "F",
+        np.where(shipped_lines == 0, "O", "P"),
+    ).astype(object)
+    total_prices = np.bincount(
+        line_orders,
+        weights=extended_prices * (1 + taxes) * (1 - discounts),
+        minlength=order_count,
+    )
+    orders = pd.DataFrame(
+        {
+            "o_orderkey": order_keys,
+            "o_custkey": ordering_customers[
+                rng.integers(0, len(ordering_customers), order_count)
+            ],
+            "o_orderstatus": order_status,
+            "o_totalprice": np.round(total_prices, 2),
+            "o_orderdate": order_dates.astype("datetime64[ns]"),
+            "o_orderpriority": np.array(ORDER_PRIORITIES, dtype=object)[
+                rng.integers(0, len(ORDER_PRIORITIES), order_count)
+            ],
+            "o_clerk": _keyed_names(
+                "Clerk#", rng.integers(1, clerk_count + 1, order_count)
+            ),
+            "o_shippriority": np.zeros(order_count, dtype=np.int64),
+        }
+    )
+
+    return {
+        "region": region,
+        "nation": nation,
+        "supplier": supplier,
+        "part": part,
+        "partsupp": partsupp,
+        "customer": customer,
+        "orders": orders,
+        "lineitem": lineitem,
+    }
@@ -0,0 +1,125 @@
+"""
+The TPC-H queries that can be written in the supported SQL, with the substitution
+parameters of the validation run of the specification
+
+Aggregates can only be taken of columns, so aggregated expressions are computed
+in a derived table first. The other queries need LIKE (2, 9, 13, 14, 16, 20),
+EXTRACT (7, 8, 9), scalar subqueries (2, 11, 15, 17, 20, 22), correlation on an
+inequality (21) or nested disjunctions (19), which are not supported.
+"""
+from typing import Dict
+
+QUERIES: Dict[int, str] = {
+    1: """
+select l_returnflag, l_linestatus, sum(l_quantity) as sum_qty,
+    sum(l_extendedprice) as sum_base_price, sum(disc_price) as sum_disc_price,
+    sum(charge) as sum_charge, avg(l_quantity) as avg_qty,
+    avg(l_extendedprice) as avg_price, avg(l_discount) as avg_disc,
+    count(*) as count_order
+from (
+    select l_returnflag, l_linestatus, l_quantity, l_extendedprice, l_discount,
+        l_extendedprice * (1 - l_discount) as disc_price,
+        l_extendedprice * (1 - l_discount) * (1 + l_tax) as charge
+    from lineitem
+    where l_shipdate <= '1998-09-02'
+) as priced
+group by l_returnflag, l_linestatus
+order by l_returnflag, l_linestatus
+""",
+    3: """
+select l_orderkey, sum(line_revenue) as revenue, o_orderdate, o_shippriority
+from (
+    select l_orderkey, l_extendedprice * (1 - l_discount) as line_revenue,
+        o_orderdate, o_shippriority
+    from customer, orders, lineitem
+    where c_mktsegment = 'BUILDING' and c_custkey = o_custkey
+        and l_orderkey = o_orderkey and o_orderdate < '1995-03-15'
+        and l_shipdate > '1995-03-15'
+) as shipping
+group by l_orderkey, o_orderdate, o_shippriority
+order by revenue desc, o_orderdate
+limit 10
+""",
+    4: """
+select o_orderpriority, count(*) as order_count
+from orders
+where o_orderdate >= '1993-07-01' and o_orderdate < '1993-10-01'
+    and exists (
+        select * from lineitem
+        where l_orderkey = o_orderkey and l_commitdate < l_receiptdate
+    )
+group by o_orderpriority
+order by o_orderpriority
+""",
+    5: """
+select n_name, sum(line_revenue) as revenue
+from (
+    select n_name, l_extendedprice * (1 - l_discount) as line_revenue
+    from customer, orders, lineitem, supplier, nation, region
+    where c_custkey = o_custkey and l_orderkey = o_orderkey
+        and l_suppkey = s_suppkey and c_nationkey = s_nationkey
+        and s_nationkey = n_nationkey and n_regionkey = r_regionkey
+        and r_name = 'ASIA' and o_orderdate >= '1994-01-01'
+        and o_orderdate < '1995-01-01'
+) as local_supplier
+group by n_name
+order by revenue desc
+""",
+    6: """
+select sum(line_revenue) as revenue
+from (
+    select l_extendedprice * l_discount as line_revenue
+    from lineitem
+    where l_shipdate >= '1994-01-01' and l_shipdate < '1995-01-01'
+        and l_discount between 0.05 and 0.07 and l_quantity < 24
+) as forecast
+""",
+    10: """
+select c_custkey, c_name, sum(line_revenue) as revenue, c_acctbal, n_name,
+    c_phone
+from (
+    select c_custkey, c_name, l_extendedprice * (1 - l_discount) as line_revenue,
+        c_acctbal, n_name, c_phone
+    from customer, orders, lineitem, nation
+    where c_custkey = o_custkey and l_orderkey = o_orderkey
+        and o_orderdate >= '1993-10-01' and o_orderdate < '1994-01-01'
+        and l_returnflag = 'R' and c_nationkey = n_nationkey
+) as returned
+group by c_custkey, c_name, c_acctbal, c_phone, n_name
+order by revenue desc
+limit 20
+""",
+    12: """
+select l_shipmode, sum(high_line) as high_line_count,
+    sum(low_line) as low_line_count
+from (
+    select l_shipmode,
+        case when o_orderpriority = '1-URGENT' or o_orderpriority = '2-HIGH'
+            then 1 else 0 end as high_line,
+        case when o_orderpriority <> '1-URGENT' and o_orderpriority <> '2-HIGH'
+            then 1 else 0 end as low_line
+    from orders, lineitem
+    where o_orderkey = l_orderkey and l_shipmode in ('MAIL', 'SHIP')
+        and l_commitdate < l_receiptdate and l_shipdate < l_commitdate
+        and l_receiptdate >= '1994-01-01' and l_receiptdate < '1995-01-01'
+) as shipping_modes
+group by l_shipmode
+order by l_shipmode
+""",
+    18: """
+select c_name, c_custkey, o_orderkey, o_orderdate, o_totalprice,
+    sum(l_quantity) as sum_quantity
+from customer, orders, lineitem
+where o_orderkey in (
+        select l_orderkey from (
+            select l_orderkey, sum(l_quantity) as order_quantity
+            from lineitem group by l_orderkey
+        ) as order_quantities
+        where order_quantity > 300
+    )
+    and c_custkey = o_custkey and o_orderkey = l_orderkey
+group by c_name, c_custkey, o_orderkey, o_orderdate, o_totalprice
+order by o_totalprice desc, o_orderdate
+limit 100
+""",
+}
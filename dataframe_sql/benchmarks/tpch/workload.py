@@ -0,0 +1,66 @@
+"""
+Timing and peak memory of the TPC-H queries over generated tables
+"""
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from dataframe_sql import query
+from dataframe_sql.benchmarks.runner import Benchmark, BenchmarkResult, run_benchmarks
+from dataframe_sql.benchmarks.suite import registered_tables
+from dataframe_sql.benchmarks.tpch.generator import generate_tables
+from dataframe_sql.benchmarks.tpch.queries import QUERIES
+
+DEFAULT_TPCH_WARMUP = 1
+DEFAULT_TPCH_REPEAT = 3
+
+
+def query_name(number: int) -> str:
+    return f"q{number:02d}"
+
+
+def _query_function(sql: str) -> Callable[[], pd.DataFrame]:
+    return lambda: query(sql)
+
+
+def tpch_benchmarks(numbers: Optional[Iterable[int]] = None) -> List[Benchmark]:
+    """
+    Return a benchmark for each of the TPC-H queries
+    :param numbers: Numbers of the queries, by default all supported queries
+    :return:
+    """
+    numbers = list(QUERIES) if numbers is None else list(numbers)
+    unsupported = [number for number in numbers if number not in QUERIES]
+    if unsupported:
+        raise ValueError(
+            f"TPC-H queries {unsupported} are not supported, the supported queries "
+            f"are {list(QUERIES)}"
+        )
+    return [
+        Benchmark(query_name(number), _query_function(QUERIES[number]), QUERIES[number])
+        for number in numbers
+    ]
+
+
+def run_tpch(
+    scale_factor: float = 0.01,
+    numbers: Optional[Iterable[int]] = None,
+    warmup: int = DEFAULT_TPCH_WARMUP,
+    repeat: int = DEFAULT_TPCH_REPEAT,
+    seed: int = 0,
+    report: Optional[Callable[[BenchmarkResult], None]] = None,
+) -> Dict[str, BenchmarkResult]:
+    """
+    Generate the TPC-H tables, register them and measure the time and peak memory
+    of each query
+    :param scale_factor: Size of the data, where 1 has 6 million line items
+    :param numbers: Numbers of the queries to run, by default all supported ones
+    :param warmup: Number of untimed runs of each query
+    :param repeat: Number of timed runs of each query
+    :param seed: Seed of the generated data
+    :param report: Called with the result of each query once it is measured
+    :return: Results by query name, such as q01
+    """
+    benchmarks = tpch_benchmarks(numbers)
+    with registered_tables(generate_tables(scale_factor, seed)):
+        return run_benchmarks(benchmarks, warmup, repeat, report, trace_memory=True)
@@ -0,0 +1,9 @@
+"""
+Exceptions raised by dataframe_sql
+"""
+
+
+class MemoryLimitExceeded(MemoryError):
+    """
+    Raised when a query would use more memory than its memory limit allows
+    """
@@ -0,0 +1,19 @@
+"""
+Execution rules for the operations that dataframe_sql adds to ibis
+"""
+# flake8: noqa
+import dataframe_sql.execution.aggregation
+import dataframe_sql.execution.case_select
+import dataframe_sql.execution.compiled_pipeline
+import dataframe_sql.execution.external_sort
+import dataframe_sql.execution.fused
+import dataframe_sql.execution.in_list
+import dataframe_sql.execution.join
+import dataframe_sql.execution.late_materialization
+import dataframe_sql.execution.partitioned_aggregation
+import dataframe_sql.execution.sample
+import dataframe_sql.execution.sketches
+import dataframe_sql.execution.sorted_table
+import dataframe_sql.execution.stats
+import dataframe_sql.execution.subquery
+import dataframe_sql.execution.zone_maps
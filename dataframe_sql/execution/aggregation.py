@@ -0,0 +1,144 @@
+"""
+Execution of aggregations that are sorted by their group keys, and of HAVING
+clauses of aggregations without group keys, which the pandas backend of ibis
+does not execute. The HAVING clause of such an aggregation is evaluated first,
+and the aggregates are only computed if it holds.
+"""
+from functools import reduce
+import operator
+
+from ibis.backends.pandas.core import execute
+from ibis.backends.pandas.dispatch import execute_node
+from ibis.backends.pandas.execution.generic import execute_aggregation_dataframe
+import ibis.expr.operations as ops
+from ibis.expr.scope import Scope
+import ibis.expr.types as ir
+import pandas as pd
+
+from dataframe_sql.execution.late_materialization import filter_columns
+
+
+@execute_node.register(ops.Aggregation, pd.DataFrame)
+def execute_sorted_aggregation(op, data, scope=None, timecontext=None, **kwargs):
+    """
+    Aggregate and then sort the groups. ibis folds an ORDER BY on the group keys
+    of an aggregation into the aggregation itself, which its pandas backend does
+    not execute. The rows that pass the filter of the aggregation are gathered
+    with only the columns that it reads.
+    :param op:
+    :param data:
+    :param scope:
+    :param timecontext:
+    :return:
+    """
+    # Computed group keys are evaluated in the scope of the query, where the
+    # table is not the gathered rows
+    if (
+        op.predicates
+        and not isinstance(op.table.op(), ops.Join)
+        and all(isinstance(key.op(), ops.TableColumn) for key in op.by)
+    ):
+        rows, _ = filter_columns(
+            op,
+            data,
+            [*op.metrics, *op.by, *op.having, *op.sort_keys],
+            Scope() if scope is None else scope,
+            timecontext,
+            **kwargs,
+        )
+        if rows is not None:
+            op = ops.Aggregation(
+                op.table, op.metrics, op.by, op.having, [], op.sort_keys
+            )
+            data = rows
+    kwargs.update(scope=scope, timecontext=timecontext)
+    if op.having and not op.by:
+        return execute_global_having(op, data, **kwargs)
+    if not op.sort_keys:
+        return execute_aggregation_dataframe(op, data, **kwargs)
+    unsorted_op = ops.Aggregation(op.table, op.metrics, op.by, op.having, op.predicates)
+    result = execute_aggregation_dataframe(unsorted_op, data, **kwargs)
+    return sort_aggregation_result(op, result)
+
+
+def _holds(condition: ir.BooleanValue, **kwargs) -> bool:
+    """
+    Return whether a condition on aggregates holds, evaluating the operands of
+    AND, OR and NOT only until its value is known
+    :param condition:
+    :return:
+    """
+    op = condition.op()
+    if isinstance(op, ops.And):
+        return _holds(op.left, **kwargs) and _holds(op.right, **kwargs)
+    if isinstance(op, ops.Or):
+        return _holds(op.left, **kwargs) or _holds(op.right, **kwargs)
+    if isinstance(op, ops.Not):
+        return not _holds(op.arg, **kwargs)
+    value = execute(condition, **kwargs)
+    # Null conditions do not hold
+    return not pd.isnull(value) and bool(value)
+
+
+def execute_global_having(
+    op: ops.Aggregation, data: pd.DataFrame, scope=None, timecontext=None, **kwargs
+):
+    """
+    Return the single row of an aggregation without group keys if its HAVING
+    clause holds, or no rows otherwise. The conditions of the clause are
+    evaluated one at a time until one does not hold, and the aggregates of the
+    result are only computed if they all do.
+    :param op:
+    :param data:
+    :param scope:
+    :param timecontext:
+    :return:
+    """
+    if op.predicates:
+        predicate = reduce(
+            operator.and_,
+            (
+                execute(predicate, scope=scope, timecontext=timecontext, **kwargs)
+                for predicate in op.predicates
+            ),
+        )
+        data = data.loc[predicate]
+    having_scope = scope.merge_scope(Scope({op.table.op(): data}, timecontext))
+    holds = all(
+        _holds(having, scope=having_scope, timecontext=timecontext, **kwargs)
+        for having in op.having
+    )
+    if not holds:
+        data = data.iloc[:0]
+    result = execute_aggregation_dataframe(
+        ops.Aggregation(op.table, op.metrics),
+        data,
+        scope=scope,
+        timecontext=timecontext,
+        **kwargs,
+    )
+    return result if holds else result.iloc[:0]
+
+
+def sort_aggregation_result(op: ops.Aggregation, result: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort the result of an aggregation by its sort keys
+    :param op:
+    :param result:
+    :return:
+    """
+    if not op.sort_keys:
+        return result
+    names = []
+    ascending = []
+    for sort_key in op.sort_keys:
+        sort_key_op = sort_key.op()
+        name = sort_key_op.expr.get_name()
+        if name not in result.columns:
+            raise NotImplementedError(
+                "Sorting an aggregation on a column it does not select is not "
+                "implemented"
+            )
+        names.append(name)
+        ascending.append(sort_key_op.ascending)
+    return result.sort_values(names, ascending=ascending).reset_index(drop=True)
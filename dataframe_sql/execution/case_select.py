@@ -0,0 +1,151 @@
+"""
+Evaluation of searched CASE expressions as one selection
+
+The pandas backend of ibis evaluates every condition of a CASE expression over
+every row before selecting the results with np.select. Here the conditions are
+evaluated in order, each over the rows that no earlier condition matched, so
+rows drop out of the evaluation as soon as they are matched and the remaining
+conditions are skipped once every row is. The result is then assembled by
+writing the rows of every branch once.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+from ibis.backends.pandas.dispatch import execute_node
+from ibis.backends.pandas.execution.constants import IBIS_TYPE_TO_PANDAS_TYPE
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.execution.fused import evaluate_arrays, evaluate_series
+from dataframe_sql.operations import CaseSelect
+
+
+def _renumber(program: tuple, positions: Dict[int, int]) -> tuple:
+    """
+    Return the program reading column positions[j] instead of column j, adding
+    the columns it reads to positions in the order it reads them
+    :param program:
+    :param positions:
+    :return:
+    """
+    name, *operands = program
+    if name == "column":
+        return ("column", positions.setdefault(operands[0], len(positions)))
+    if name == "literal":
+        return program
+    return (name, *(_renumber(operand, positions) for operand in operands))
+
+
+def _local_program(program: tuple) -> Tuple[tuple, List[int]]:
+    """
+    Return the program numbering only the columns it reads, and the positions of
+    those columns
+    :param program:
+    :return:
+    """
+    positions: Dict[int, int] = {}
+    local = _renumber(program, positions)
+    return local, list(positions)
+
+
+def _is_numpy_column(column: pd.Series) -> bool:
+    return isinstance(column.dtype, np.dtype) and column.dtype.kind in "biuf"
+
+
+def select_branches(
+    conditions: Sequence[tuple], columns: Sequence[pd.Series]
+) -> List[np.ndarray]:
+    """
+    Return the positions of the rows that take each branch: the rows for which
+    each condition is the first to be true, followed by the rows for which none
+    is
+    :param conditions: Programs of the conditions in order
+    :param columns: Columns that the programs read
+    :return:
+    """
+    numpy = all(_is_numpy_column(column) for column in columns)
+    arrays = [column.to_numpy() for column in columns] if numpy else list(columns)
+    rows = len(columns[0])
+    remaining = np.arange(rows)
+    branches = []
+    for condition in conditions:
+        if not len(remaining):
+            branches.append(remaining)
+            continue
+        program, positions = _local_program(condition)
+        inputs = [arrays[position] for position in positions]
+        if len(remaining) < rows:
+            inputs = [
+                array[remaining] if numpy else array.iloc[remaining] for array in inputs
+            ]
+        if numpy:
+            matched = np.asarray(evaluate_arrays(program, inputs), dtype=bool)
+        else:
+            # Null conditions are not true
+            matched = (
+                pd.Series(evaluate_series(program, inputs))
+                .fillna(False)
+                .to_numpy(dtype=bool)
+            )
+        branches.append(remaining[matched])
+        remaining = remaining[~matched]
+    branches.append(remaining)
+    return branches
+
+
+def _scalar_value(choice):
+    """
+    Return a scalar result as the numpy value that pandas holds it as, so that
+    timestamps keep their type
+    :param choice:
+    :return:
+    """
+    return choice if pd.isnull(choice) else pd.Series([choice]).to_numpy()[0]
+
+
+def _result_dtype(choices: Sequence) -> np.dtype:
+    """
+    Return the type that holds every result, where null results are NaN, or NaT
+    if the other results are timestamps or time intervals
+    :param choices: Result columns as arrays and scalar results
+    :return:
+    """
+    dtypes = [
+        choice.dtype if isinstance(choice, np.ndarray) else np.asarray(choice).dtype
+        for choice in choices
+        if isinstance(choice, np.ndarray) or not pd.isnull(choice)
+    ]
+    if not dtypes:
+        return np.dtype(np.float64)
+    if any(dtype.kind in "OSU" for dtype in dtypes):
+        return np.dtype(object)
+    if len(dtypes) < len(choices) and not all(dtype.kind in "mM" for dtype in dtypes):
+        dtypes.append(np.dtype(np.float64))
+    try:
+        return np.result_type(*dtypes)
+    except TypeError:
+        return np.dtype(object)
+
+
+@execute_node.register(CaseSelect, [object])
+def execute_case_select(op, *values, **kwargs):
+    columns = values[: len(op.columns)]
+    choices = [
+        value.to_numpy() if isinstance(value, pd.Series) else _scalar_value(value)
+        for value in values[len(op.columns) :]
+    ]
+    branches = select_branches(op.conditions, columns)
+    raw = np.empty(len(columns[0]), dtype=_result_dtype(choices))
+    null = np.array("NaT", dtype=raw.dtype) if raw.dtype.kind in "mM" else np.nan
+    for choice, rows in zip(choices, branches):
+        if not len(rows):
+            continue
+        if isinstance(choice, np.ndarray):
+            raw[rows] = choice[rows]
+        else:
+            raw[rows] = null if pd.isnull(choice) else choice
+    dtype = IBIS_TYPE_TO_PANDAS_TYPE.get(op.original.type())
+    # Results with nulls keep the type that holds them
+    if dtype is not None and raw.dtype not in (dtype, object):
+        if not pd.isnull(raw).any():
+            raw = raw.astype(dtype)
+    return pd.Series(raw, index=columns[0].index)
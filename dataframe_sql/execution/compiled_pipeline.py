@@ -0,0 +1,305 @@
+"""
+Execution of filter, projection and aggregation pipelines compiled with Numba
+
+The planner describes a pipeline as programs like those of fused expressions: a
+predicate over the columns of a table and the argument of every aggregate. Every
+operation of the programs becomes a small function of the columns and a row,
+composed with those of its operands, and the aggregates become functions that
+add a row to their accumulators. One loop over the rows calls them, skipping the
+rows that fail the predicate, and Numba compiles it with the functions it calls
+to machine code. Groups are numbered with pandas before the loop, so that the
+loop only indexes arrays.
+
+Compiled kernels are cached by their programs and Numba compiles each of them
+once for every tuple of column types, so queries of the same shape over tables
+with the same types compile once. Without Numba the planner leaves the pipelines
+to pandas.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ibis.backends.pandas.dispatch import execute_node
+import ibis.expr.datatypes as dt
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.operations import CompiledAggregation
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+COMPILED_AGGREGATES = ("sum", "count", "count_star", "min", "max", "mean")
+
+_KERNELS: Dict[Tuple[Optional[tuple], Tuple[tuple, ...]], Callable] = {}
+
+
+def jit_available() -> bool:
+    return numba is not None
+
+
+def _jit(function: Callable) -> Callable:
+    # Division by zero gives infinity or NaN as in numpy instead of raising
+    return numba.njit(error_model="numpy", nogil=True)(function)
+
+
+def _binary_function(name: str, left: Callable, right: Callable) -> Callable:
+    """
+    Return the function of a row of an operation with two operands. Numba
+    compiles the functions of the operands into it.
+    :param name: Name of the operation
+    :param left: Function of the left operand
+    :param right: Function of the right operand
+    :return:
+    """
+    if name == "add":
+        return lambda columns, i: left(columns, i) + right(columns, i)
+    if name == "subtract":
+        return lambda columns, i: left(columns, i) - right(columns, i)
+    if name == "multiply":
+        return lambda columns, i: left(columns, i) * right(columns, i)
+    if name == "divide":
+        return lambda columns, i: left(columns, i) / right(columns, i)
+    if name == "equals":
+        return lambda columns, i: left(columns, i) == right(columns, i)
+    if name == "not_equals":
+        return lambda columns, i: left(columns, i) != right(columns, i)
+    if name == "greater":
+        return lambda columns, i: left(columns, i) > right(columns, i)
+    if name == "greater_equal":
+        return lambda columns, i: left(columns, i) >= right(columns, i)
+    if name == "less":
+        return lambda columns, i: left(columns, i) < right(columns, i)
+    if name == "less_equal":
+        return lambda columns, i: left(columns, i) <= right(columns, i)
+    if name == "and":
+        return lambda columns, i: left(columns, i) and right(columns, i)
+    if name == "or":
+        return lambda columns, i: left(columns, i) or right(columns, i)
+    raise ValueError(f"Unknown operation '{name}'")
+
+
+def row_function(program: tuple, jit: Callable) -> Callable:
+    """
+    Return the compiled function that evaluates a program at row i of a tuple of
+    columns
+    :param program:
+    :param jit: Compiler of Python functions
+    :return:
+    """
+    name, *operands = program
+    if name == "column":
+        position = operands[0]
+        return jit(lambda columns, i: columns[position][i])
+    if name == "literal":
+        value = operands[0]
+        return jit(lambda columns, i: value)
+    functions = [row_function(operand, jit) for operand in operands]
+    if name == "negate":
+        operand = functions[0]
+        return jit(lambda columns, i: -operand(columns, i))
+    if name == "not":
+        operand = functions[0]
+        return jit(lambda columns, i: not operand(columns, i))
+    return jit(_binary_function(name, *functions))
+
+
+def _accumulate_function(
+    kind: str, argument: Callable, position: int, previous: Callable
+) -> Callable:
+    """
+    Return the function that adds row i of group g to the accumulators of a
+    metric and of the metrics before it
+    :param kind: Kind of aggregate
+    :param argument: Function of the argument of the aggregate
+    :param position: Position of the metric, whose value and count accumulators
+                     are at 2 * position and 2 * position + 1
+    :param previous: Function that adds the row to the metrics before it
+    :return:
+    """
+    value_position, count_position = 2 * position, 2 * position + 1
+
+    def accumulate_sum(columns, i, g, accumulators):
+        previous(columns, i, g, accumulators)
+        x = argument(columns, i)
+        if x == x:
+            accumulators[value_position][g] += x
+            accumulators[count_position][g] += 1
+
+    def accumulate_min(columns, i, g, accumulators):
+        previous(columns, i, g, accumulators)
+        x = argument(columns, i)
+        if x == x:
+            values, counts = accumulators[value_position], accumulators[count_position]
+            if counts[g] == 0 or x < values[g]:
+                values[g] = x
+            counts[g] += 1
+
+    def accumulate_max(columns, i, g, accumulators):
+        previous(columns, i, g, accumulators)
+        x = argument(columns, i)
+        if x == x:
+            values, counts = accumulators[value_position], accumulators[count_position]
+            if counts[g] == 0 or x > values[g]:
+                values[g] = x
+            counts[g] += 1
+
+    def accumulate_count(columns, i, g, accumulators):
+        previous(columns, i, g, accumulators)
+        x = argument(columns, i)
+        if x == x:
+            accumulators[count_position][g] += 1
+
+    if kind in ("sum", "mean"):
+        return accumulate_sum
+    if kind == "min":
+        return accumulate_min
+    if kind == "max":
+        return accumulate_max
+    return accumulate_count
+
+
+def _no_accumulation(columns, i, g, accumulators):
+    pass
+
+
+def _always(columns, i):
+    return True
+
+
+def compile_kernel(
+    predicate: Optional[tuple], metrics: Sequence[tuple], jit: Optional[Callable] = None
+) -> Callable:
+    """
+    Return the loop of a pipeline. The kernel takes the number of rows, the group
+    number of every row, the tuple of the columns, the number of rows of every
+    group and the tuple of a value and a count accumulator for every metric.
+    :param predicate: Program of the filter or None
+    :param metrics: Kind and argument program of every aggregate
+    :param jit: Compiler of Python functions, Numba by default
+    :return:
+    """
+    if jit is None:
+        key = (predicate, tuple(metrics))
+        if key not in _KERNELS:
+            _KERNELS[key] = compile_kernel(predicate, metrics, _jit)
+        return _KERNELS[key]
+    accept = jit(_always) if predicate is None else row_function(predicate, jit)
+    accumulate = jit(_no_accumulation)
+    for position, (kind, program) in enumerate(metrics):
+        if kind != "count_star":
+            accumulate = jit(
+                _accumulate_function(
+                    kind, row_function(program, jit), position, accumulate
+                )
+            )
+
+    def kernel(row_count, groups, columns, rows, accumulators):
+        for i in range(row_count):
+            g = groups[i]
+            if g < 0 or not accept(columns, i):
+                continue
+            rows[g] += 1
+            accumulate(columns, i, g, accumulators)
+
+    return jit(kernel)
+
+
+def _group_numbers(data: pd.DataFrame, by: Sequence[str]):
+    """
+    Return the group number of every row, -1 for rows with null keys, and the
+    keys of the groups in sorted order
+    :param data:
+    :param by:
+    :return:
+    """
+    if not by:
+        return np.zeros(len(data), dtype=np.int64), None
+    if len(by) == 1:
+        groups, keys = pd.factorize(data[by[0]], sort=True)
+        return groups.astype(np.int64), pd.DataFrame({by[0]: keys})
+    grouped = data.groupby(list(by), sort=True)
+    # Some pandas versions number the rows with null keys NaN instead of -1
+    groups = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return groups, grouped.grouper.result_index.to_frame(index=False)
+
+
+def _metric_values(
+    kind: str, values: np.ndarray, counts: np.ndarray, rows: np.ndarray
+) -> np.ndarray:
+    if kind == "count_star":
+        return rows
+    if kind == "count":
+        return counts
+    if kind == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return values / counts
+    if kind in ("min", "max") and not counts.all():
+        return np.where(counts > 0, values, np.nan)
+    return values
+
+
+def run_pipeline(
+    data: pd.DataFrame,
+    columns: Sequence[str],
+    predicate: Optional[tuple],
+    by: Sequence[str],
+    metrics: Sequence[tuple],
+    value_dtypes: Sequence[np.dtype],
+    jit: Optional[Callable] = None,
+) -> Tuple[Optional[pd.DataFrame], List[np.ndarray]]:
+    """
+    Filter and aggregate the rows of a table in one compiled loop
+    :param data: Table to scan
+    :param columns: Names of the columns that the programs read
+    :param predicate: Program of the filter or None
+    :param by: Names of the group keys
+    :param metrics: Kind and argument program of every aggregate
+    :param value_dtypes: Types that the aggregates are accumulated in
+    :param jit: Compiler of the kernel, Numba by default
+    :return: Keys of the groups that have rows, or None if the aggregation is not
+             grouped, and the values of every aggregate for those groups
+    """
+    groups, keys = _group_numbers(data, by)
+    group_count = 1 if keys is None else len(keys)
+    arrays = [data[column].to_numpy() for column in columns]
+    kernel = compile_kernel(predicate, metrics, jit)
+    rows = np.zeros(group_count, dtype=np.int64)
+    accumulators = []
+    for dtype in value_dtypes:
+        accumulators.append(np.zeros(group_count, dtype=dtype))
+        accumulators.append(np.zeros(group_count, dtype=np.int64))
+    kernel(len(data), groups, tuple(arrays), rows, tuple(accumulators))
+    if keys is not None:
+        # Grouping after the filter leaves out the groups that none of the rows pass
+        has_rows = rows > 0
+        keys = keys[has_rows].reset_index(drop=True)
+        rows = rows[has_rows]
+        accumulators = [accumulator[has_rows] for accumulator in accumulators]
+    values = [
+        _metric_values(kind, value, count, rows)
+        for (kind, _), value, count in zip(
+            metrics, accumulators[::2], accumulators[1::2]
+        )
+    ]
+    return keys, values
+
+
+@execute_node.register(CompiledAggregation, pd.DataFrame)
+def execute_compiled_aggregation(op, data, **kwargs):
+    schema = op.aggregation.schema()
+    metric_names = schema.names[len(op.by) :]
+    value_dtypes = [
+        np.dtype(np.int64)
+        if isinstance(schema[name], dt.Integer)
+        else np.dtype(np.float64)
+        for name in metric_names
+    ]
+    keys, values = run_pipeline(
+        data, op.columns, op.predicate, op.by, op.metrics, value_dtypes
+    )
+    result = pd.DataFrame(dict(zip(metric_names, values)))
+    if keys is not None:
+        keys.columns = schema.names[: len(op.by)]
+        result = pd.concat([keys, result], axis=1)
+    return result
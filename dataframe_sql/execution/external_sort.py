@@ -0,0 +1,283 @@
+"""
+External merge sort of inputs that do not fit in memory
+
+The input is cut into runs of a bounded number of rows, each run is sorted and
+spilled to disk, and the runs are merged a block at a time. The merge holds a
+buffer of about a run's worth of rows read from every run. Every row that sorts
+no later than the first of the last rows read from the unfinished runs is in its
+final place, since the rows of any run that are still on disk sort after the
+last row read from it. Those rows are sorted and emitted, and the runs they used
+up read their next blocks.
+
+Ties are broken by the position of the rows in the input, so the result is that
+of a stable sort. With a limit, runs only keep the rows that can be part of the
+result and the merge stops once they are emitted.
+"""
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype
+
+from dataframe_sql.execution.spill import SpilledFrame, spill_directory
+from dataframe_sql.operations import ExternalSort
+
+DEFAULT_RUN_ROWS = 1_000_000
+# Runs are spilled in blocks of a fraction of their size, so that the merge can
+# read as many blocks of each run as fit in its buffer
+BLOCKS_PER_RUN = 16
+MIN_BLOCK_ROWS = 1024
+
+# Position of a row in the input, which breaks ties between equal sort keys
+_ORDER = "__external_sort_order__"
+
+
+def _sort(frame: pd.DataFrame, by: List[str], ascending: List[bool]) -> pd.DataFrame:
+    return frame.sort_values(by, ascending=ascending, kind="mergesort")
+
+
+def _sort_in_input_order(
+    frame: pd.DataFrame, by: List[str], ascending: List[bool]
+) -> pd.DataFrame:
+    """
+    Sort rows read from several runs so that equal rows keep the order of the input
+    :param frame:
+    :param by:
+    :param ascending:
+    :return:
+    """
+    frame = frame.iloc[np.argsort(frame[_ORDER].to_numpy(), kind="stable")]
+    return _sort(frame, by, ascending)
+
+
+def _runs(chunks: Iterable[pd.DataFrame], run_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Regroup the chunks into runs of run_rows rows, except for the last run
+    :param chunks:
+    :param run_rows:
+    :return:
+    """
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        pending.append(chunk)
+        pending_rows += len(chunk)
+        while pending_rows >= run_rows:
+            frame = pd.concat(pending) if len(pending) > 1 else pending[0]
+            yield frame.iloc[:run_rows]
+            pending = [frame.iloc[run_rows:]]
+            pending_rows -= run_rows
+    if pending_rows:
+        yield pd.concat(pending) if len(pending) > 1 else pending[0]
+
+
+def _drain(first: List[pd.DataFrame], rest: Iterator[pd.DataFrame]):
+    """
+    Yield the frames of the list, which are removed from it so that they can be
+    freed once used, and then the rest
+    :param first:
+    :param rest:
+    :return:
+    """
+    while first:
+        yield first.pop(0)
+    yield from rest
+
+
+def _comparable(series: pd.Series) -> np.ndarray:
+    """
+    Return values that compare in the order the series is sorted in, with nulls
+    as NaN or None
+    :param series:
+    :return:
+    """
+    if is_categorical_dtype(series.dtype):
+        codes = series.cat.codes.to_numpy().astype(np.float64)
+        codes[codes < 0] = np.nan
+        return codes
+    return series.to_numpy()
+
+
+def _sorts_before_or_at(
+    frame: pd.DataFrame, bound: int, by: List[str], ascending: List[bool]
+) -> np.ndarray:
+    """
+    Return which rows of the frame come no later than the row at position bound
+    in the order of the sort keys and then of the input. Nulls sort last in
+    either direction.
+    :param frame:
+    :param bound: Position of the bound row in the frame
+    :param by:
+    :param ascending:
+    :return:
+    """
+    before = np.zeros(len(frame), dtype=bool)
+    tied = np.ones(len(frame), dtype=bool)
+    for name, is_ascending in zip(by + [_ORDER], ascending + [True]):
+        values = _comparable(frame[name])
+        bound_value = values[bound]
+        nulls = pd.isna(values)
+        if pd.isna(bound_value):
+            before |= tied & ~nulls
+            tied &= nulls
+            continue
+        candidates = np.flatnonzero(tied & ~nulls)
+        candidate_values = values[candidates]
+        if is_ascending:
+            before[candidates[candidate_values < bound_value]] = True
+        else:
+            before[candidates[candidate_values > bound_value]] = True
+        tied[:] = False
+        tied[candidates[candidate_values == bound_value]] = True
+    return before | tied
+
+
+def _merge(
+    runs: List[SpilledFrame],
+    by: List[str],
+    ascending: List[bool],
+    buffer_rows: int,
+    rows: Optional[int],
+) -> Iterator[pd.DataFrame]:
+    """
+    Merge sorted spilled runs
+    :param runs: Runs in the order of the input
+    :param by: Names of the sort keys
+    :param ascending: Direction of each sort key
+    :param buffer_rows: Number of rows to read from all runs together at once
+    :param rows: Number of rows to emit, all rows if None
+    :return: Sorted frames of rows
+    """
+    run_offsets = np.cumsum([0] + [run.rows for run in runs])[:-1]
+    run_rows = np.array([run.rows for run in runs], dtype=np.int64)
+    read_rows = np.zeros(len(runs), dtype=np.int64)
+    buffer: Optional[pd.DataFrame] = None
+    emitted = 0
+    while rows is None or emitted < rows:
+        loaded = []
+        buffered_runs = np.zeros(len(runs), dtype=bool)
+        if buffer is not None and len(buffer):
+            loaded.append(buffer)
+            buffered_runs[
+                np.searchsorted(run_offsets, buffer[_ORDER].to_numpy(), "right") - 1
+            ] = True
+        for run_number in np.flatnonzero(~buffered_runs & (read_rows < run_rows)):
+            run = runs[run_number]
+            first_block = read_rows[run_number] // run.block_rows
+            block_count = max(buffer_rows // len(runs) // run.block_rows, 1)
+            blocks = [
+                run.read_block(block_number)
+                for block_number in range(
+                    first_block, min(first_block + block_count, run.blocks)
+                )
+            ]
+            block = pd.concat(blocks, ignore_index=True)
+            start = run_offsets[run_number] + read_rows[run_number]
+            block[_ORDER] = np.arange(start, start + len(block))
+            loaded.append(block)
+            read_rows[run_number] += len(block)
+        if not loaded:
+            return
+        buffer = pd.concat(loaded, ignore_index=True)
+        open_runs = np.flatnonzero(read_rows < run_rows)
+        if len(open_runs):
+            # The first of the last rows read from unfinished runs bounds the rows
+            # that are in their final place
+            last_read = buffer[_ORDER].isin(
+                run_offsets[open_runs] + read_rows[open_runs] - 1
+            )
+            last_rows = _sort_in_input_order(
+                buffer[last_read.to_numpy()], by, ascending
+            )
+            bound = buffer.index.get_loc(last_rows.index[0])
+            is_final = _sorts_before_or_at(buffer, bound, by, ascending)
+        else:
+            is_final = np.ones(len(buffer), dtype=bool)
+        final = _sort_in_input_order(buffer[is_final], by, ascending)
+        buffer = buffer[~is_final]
+        if rows is not None:
+            final = final.iloc[: rows - emitted]
+        emitted += len(final)
+        yield final.drop(columns=[_ORDER])
+
+
+def external_sort(
+    chunks: Iterable[pd.DataFrame],
+    by: Sequence[str],
+    ascending: Sequence[bool] = (),
+    run_rows: int = DEFAULT_RUN_ROWS,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Iterator[pd.DataFrame]:
+    """
+    Sort frames that together may not fit in memory, holding about run_rows rows
+    at a time
+    :param chunks: Frames with the same columns, such as the chunks of a file read
+                   with pandas.read_csv(..., chunksize=n)
+    :param by: Names of the sort keys
+    :param ascending: Direction of each sort key, ascending by default
+    :param run_rows: Number of rows sorted in memory at once
+    :param limit: Number of rows to return, all rows if None
+    :param offset: Number of leading rows to skip
+    :return: Sorted frames with a default index
+    """
+    by = list(by)
+    ascending = list(ascending) or [True] * len(by)
+    if len(ascending) != len(by):
+        raise ValueError("Give a direction for every sort key")
+    if run_rows < 1:
+        raise ValueError("Runs must hold at least one row")
+    kept_rows = None if limit is None else offset + limit
+    runs = _runs(chunks, run_rows)
+    first_runs = list(islice(runs, 2))
+    if not first_runs:
+        return
+    if len(first_runs) == 1:
+        # Everything fits in a single run, which needs no spilling
+        result = _sort(first_runs.pop(), by, ascending)
+        yield result.iloc[offset:kept_rows].reset_index(drop=True)
+        return
+    with spill_directory("dataframe_sql-sort-") as directory:
+        spilled_runs: List[SpilledFrame] = []
+        for run_number, run in enumerate(_drain(first_runs, runs)):
+            sorted_run = _sort(run, by, ascending)
+            if kept_rows is not None:
+                sorted_run = sorted_run.iloc[:kept_rows]
+            spilled_runs.append(
+                SpilledFrame(
+                    directory / str(run_number),
+                    sorted_run,
+                    max(run_rows // BLOCKS_PER_RUN, MIN_BLOCK_ROWS),
+                )
+            )
+            del run, sorted_run
+        skipped = 0
+        try:
+            for block in _merge(spilled_runs, by, ascending, run_rows, kept_rows):
+                if skipped < offset:
+                    skip = min(offset - skipped, len(block))
+                    skipped += skip
+                    block = block.iloc[skip:]
+                if len(block):
+                    yield block.reset_index(drop=True)
+        finally:
+            for spilled_run in spilled_runs:
+                spilled_run.close()
+
+
+@execute_node.register(ExternalSort, pd.DataFrame)
+def execute_external_sort(op, data, **kwargs):
+    chunks = (
+        data.iloc[start : start + op.run_rows]
+        for start in range(0, len(data), op.run_rows)
+    )
+    sorted_chunks = list(
+        external_sort(chunks, op.by, op.ascending, op.run_rows, op.limit, op.offset)
+    )
+    if not sorted_chunks:
+        return data.iloc[:0].reset_index(drop=True)
+    return pd.concat(sorted_chunks, ignore_index=True)
@@ -0,0 +1,165 @@
+"""
+Evaluation of fused arithmetic and boolean expressions
+
+When numexpr is installed, a fused expression over numpy columns is compiled to
+a numexpr program, which evaluates it in cache sized blocks on several threads.
+Otherwise the expression is evaluated with numpy a block of rows at a time, so
+that the results of the operations inside the expression stay small and in
+cache, and only the result is written to a full column. Columns that numpy
+cannot hold without losing their nulls, such as nullable integers, are
+evaluated with pandas one operation at a time.
+"""
+import operator
+from typing import Callable, Dict, List, Sequence
+
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.operations import FusedExpression
+
+try:
+    import numexpr
+except ImportError:  # pragma: no cover
+    numexpr = None
+
+BLOCK_ROWS = 1 << 14
+
+_NUMPY_FUNCTIONS: Dict[str, Callable] = {
+    "add": np.add,
+    "subtract": np.subtract,
+    "multiply": np.multiply,
+    "divide": np.true_divide,
+    "negate": np.negative,
+    "equals": np.equal,
+    "not_equals": np.not_equal,
+    "greater": np.greater,
+    "greater_equal": np.greater_equal,
+    "less": np.less,
+    "less_equal": np.less_equal,
+    "and": np.logical_and,
+    "or": np.logical_or,
+    "not": np.logical_not,
+}
+_PANDAS_FUNCTIONS: Dict[str, Callable] = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+    "negate": operator.neg,
+    "equals": operator.eq,
+    "not_equals": operator.ne,
+    "greater": operator.gt,
+    "greater_equal": operator.ge,
+    "less": operator.lt,
+    "less_equal": operator.le,
+    "and": operator.and_,
+    "or": operator.or_,
+    "not": operator.invert,
+}
+_NUMEXPR_OPERATORS = {
+    "add": "+",
+    "subtract": "-",
+    "multiply": "*",
+    "divide": "/",
+    "equals": "==",
+    "not_equals": "!=",
+    "greater": ">",
+    "greater_equal": ">=",
+    "less": "<",
+    "less_equal": "<=",
+    "and": "&",
+    "or": "|",
+}
+# numexpr has no 8 or 16 bit integers and types its constants differently from
+# numpy for other integers, which could change the type of the result
+_NUMEXPR_DTYPES = {np.dtype(np.bool_), np.dtype(np.int64), np.dtype(np.float64)}
+
+
+def numexpr_source(program: tuple) -> str:
+    """
+    Return the numexpr source of a fused program, reading column i as c{i}
+    :param program:
+    :return:
+    """
+    name, *operands = program
+    if name == "column":
+        return f"c{operands[0]}"
+    if name == "literal":
+        return repr(operands[0])
+    sources = [numexpr_source(operand) for operand in operands]
+    if name == "negate":
+        return f"(-{sources[0]})"
+    if name == "not":
+        return f"(~{sources[0]})"
+    return f"({sources[0]} {_NUMEXPR_OPERATORS[name]} {sources[1]})"
+
+
+def _evaluate_block(program: tuple, arrays: Sequence[np.ndarray]):
+    name, *operands = program
+    if name == "column":
+        return arrays[operands[0]]
+    if name == "literal":
+        return operands[0]
+    return _NUMPY_FUNCTIONS[name](
+        *(_evaluate_block(operand, arrays) for operand in operands)
+    )
+
+
+def evaluate_arrays(
+    program: tuple, arrays: List[np.ndarray], block_rows: int = BLOCK_ROWS
+) -> np.ndarray:
+    """
+    Evaluate a fused program over numpy columns
+    :param program:
+    :param arrays: Columns of equal length that the program reads
+    :param block_rows: Number of rows to evaluate at a time without numexpr
+    :return:
+    """
+    if numexpr is not None and all(array.dtype in _NUMEXPR_DTYPES for array in arrays):
+        local_dict = {f"c{position}": array for position, array in enumerate(arrays)}
+        return numexpr.evaluate(
+            numexpr_source(program), local_dict=local_dict, truediv=True
+        )
+    rows = len(arrays[0])
+    with np.errstate(all="ignore"):
+        first = np.asarray(
+            _evaluate_block(program, [array[:block_rows] for array in arrays])
+        )
+        if rows <= block_rows:
+            return first
+        result = np.empty(rows, dtype=first.dtype)
+        result[:block_rows] = first
+        for start in range(block_rows, rows, block_rows):
+            block = [array[start : start + block_rows] for array in arrays]
+            result[start : start + block_rows] = _evaluate_block(program, block)
+    return result
+
+
+def evaluate_series(program: tuple, series: Sequence[pd.Series]):
+    """
+    Evaluate a fused program with pandas, one operation at a time
+    :param program:
+    :param series:
+    :return:
+    """
+    name, *operands = program
+    if name == "column":
+        return series[operands[0]]
+    if name == "literal":
+        return operands[0]
+    return _PANDAS_FUNCTIONS[name](
+        *(evaluate_series(operand, series) for operand in operands)
+    )
+
+
+def _is_numpy_column(column: pd.Series) -> bool:
+    return isinstance(column.dtype, np.dtype) and column.dtype.kind in "biuf"
+
+
+@execute_node.register(FusedExpression, [pd.Series])
+def execute_fused_expression(op, *columns, **kwargs):
+    if not all(_is_numpy_column(column) for column in columns):
+        return evaluate_series(op.program, columns)
+    result = evaluate_arrays(op.program, [column.to_numpy() for column in columns])
+    return pd.Series(result, index=columns[0].index)
@@ -0,0 +1,114 @@
+"""
+Grace hash join of inputs that do not fit in memory together
+
+Both inputs are partitioned by the hash of their join keys, buffering the
+partitions and spilling them to disk while too many rows are buffered. Rows with
+equal keys land in partitions with the same number on both sides, so the result
+is the union of the joins of every pair of partitions, which only needs one
+pair in memory at a time. Null keys never match, so rows with null keys may go
+to any partition and still appear once in the result of an outer join.
+"""
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from dataframe_sql.execution.spill import (
+    SpilledPartitions,
+    partition_numbers,
+    spill_directory,
+)
+
+DEFAULT_PARTITIONS = 16
+DEFAULT_BUFFER_ROWS = 1_000_000
+
+
+def _partition_input(
+    chunks: Iterable[pd.DataFrame], on: Sequence[str], partitions: SpilledPartitions
+) -> pd.DataFrame:
+    """
+    Add the rows of the chunks to their partitions
+    :param chunks:
+    :param on: Names of the join keys
+    :param partitions:
+    :return: Empty frame with the columns of the input
+    """
+    empty: Optional[pd.DataFrame] = None
+    for chunk in chunks:
+        if empty is None:
+            empty = chunk.iloc[:0].copy()
+        if len(chunk):
+            partitions.append(
+                chunk, partition_numbers(chunk[list(on)], partitions.partitions)
+            )
+    if empty is None:
+        raise ValueError("Every join input needs at least one chunk, even if empty")
+    return empty
+
+
+def _read_partition(
+    partitions: SpilledPartitions, number: int, empty: pd.DataFrame
+) -> pd.DataFrame:
+    if not partitions.rows(number):
+        return empty
+    return pd.concat(partitions.read(number))
+
+
+def _produces_rows(how: str, left_rows: int, right_rows: int) -> bool:
+    if how == "inner":
+        return bool(left_rows and right_rows)
+    if how == "left":
+        return bool(left_rows)
+    if how == "right":
+        return bool(right_rows)
+    return bool(left_rows or right_rows)
+
+
+def grace_hash_join(
+    left_chunks: Iterable[pd.DataFrame],
+    right_chunks: Iterable[pd.DataFrame],
+    left_on: Sequence[str],
+    right_on: Sequence[str],
+    join: Callable[[pd.DataFrame, pd.DataFrame], pd.DataFrame],
+    partitions: int = DEFAULT_PARTITIONS,
+    buffer_rows: int = DEFAULT_BUFFER_ROWS,
+    how: str = "inner",
+) -> Iterator[pd.DataFrame]:
+    """
+    Join inputs that together may not fit in memory, holding one pair of
+    partitions at a time
+    :param left_chunks: Frames with the columns of the left input, such as the
+                        chunks of a file read with pandas.read_csv(..., chunksize=n)
+    :param right_chunks: Frames with the columns of the right input
+    :param left_on: Names of the join keys of the left input
+    :param right_on: Names of the join keys of the right input, in the order of
+                     left_on
+    :param join: Function that joins a partition of the left input with the
+                 partition of the right input with the same number, such as
+                 lambda left, right: left.merge(right, how, left_on, right_on)
+    :param partitions: Number of partitions to hash the rows of each input into
+    :param buffer_rows: Number of rows of each input to buffer before spilling
+    :param how: Join type, only used to skip pairs of partitions that cannot
+                produce rows
+    :return: Joined partitions, in no particular order
+    """
+    if len(left_on) != len(right_on):
+        raise ValueError("Give a right join key for every left join key")
+    if partitions < 1:
+        raise ValueError("Rows must be hashed into at least one partition")
+    if buffer_rows < 1:
+        raise ValueError("Buffers must hold at least one row")
+    with spill_directory("dataframe_sql-join-") as directory:
+        sides: Tuple[SpilledPartitions, SpilledPartitions] = (
+            SpilledPartitions(directory / "left", partitions, buffer_rows),
+            SpilledPartitions(directory / "right", partitions, buffer_rows),
+        )
+        left_empty = _partition_input(left_chunks, left_on, sides[0])
+        right_empty = _partition_input(right_chunks, right_on, sides[1])
+        for number in range(partitions):
+            left_rows, right_rows = sides[0].rows(number), sides[1].rows(number)
+            if not _produces_rows(how, left_rows, right_rows):
+                continue
+            yield join(
+                _read_partition(sides[0], number, left_empty),
+                _read_partition(sides[1], number, right_empty),
+            )
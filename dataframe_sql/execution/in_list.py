@@ -0,0 +1,38 @@
+"""
+Execution of IN lists by probing a hash set of their values
+"""
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.operations import InValues, ValueSet
+
+# Lists up to this length are compared value by value, which is faster than
+# hashing every row
+IN_LIST_HASH_THRESHOLD = 16
+
+
+def value_set_matches(values: pd.Series, value_set: ValueSet) -> np.ndarray:
+    """
+    Return whether each value is in the set. Null values never match.
+    :param values:
+    :param value_set:
+    :return:
+    """
+    if len(value_set) <= IN_LIST_HASH_THRESHOLD:
+        matches = np.zeros(len(values), dtype=bool)
+        for value in value_set.values:
+            matches |= (values == value).to_numpy(dtype=bool, na_value=False)
+        return matches
+    return value_set.hash_table.get_indexer(values) >= 0
+
+
+@execute_node.register(InValues, pd.Series)
+def execute_in_values(op, data, **kwargs):
+    matches = value_set_matches(data, op.value_set)
+    if op.kind == "not_in":
+        if op.value_set.has_nulls:
+            matches = np.zeros(len(data), dtype=bool)
+        else:
+            matches = ~matches & data.notnull().to_numpy()
+    return pd.Series(matches, index=data.index, name=data.name)
@@ -0,0 +1,323 @@
+"""
+Execution of the joins chosen by the query planner
+"""
+from typing import Container, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ibis.backends.pandas.core import execute
+from ibis.backends.pandas.dispatch import execute_node
+from ibis.backends.pandas.execution import constants
+from ibis.backends.pandas.execution.join import execute_cross_join
+from ibis.expr.analysis import fully_originate_from
+import ibis.expr.operations as ops
+from ibis.expr.scope import Scope
+import ibis.expr.types as ir
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_extension_array_dtype
+
+from dataframe_sql.execution.grace_join import DEFAULT_PARTITIONS, grace_hash_join
+from dataframe_sql.execution.join_algorithms import (
+    Indexers,
+    broadcast_join,
+    factorize_join_keys,
+    hash_join,
+    merge_join,
+    sort_merge_join,
+)
+from dataframe_sql.operations import PhysicalJoin
+
+JoinKey = Union[str, pd.Series]
+
+# Columns that carry the positions of the input rows and the computed join keys
+# through the partitions of a grace join
+_LEFT_ROW = "__grace_join_left_row__"
+_RIGHT_ROW = "__grace_join_right_row__"
+_LEFT_KEY = "__grace_join_left_key_{}__"
+_RIGHT_KEY = "__grace_join_right_key_{}__"
+MIN_GRACE_BUFFER_ROWS = 1024
+
+
+def compute_join_key(
+    key_expr: ir.ValueExpr, frame: pd.DataFrame, scope: Optional[Scope] = None, **kwargs
+) -> JoinKey:
+    """
+    Return the name of the column in frame that holds the key or the computed key
+    values if the key is an expression
+    :param key_expr: Key expression from a join predicate
+    :param frame: Materialized join input that the key originates from
+    :param scope: Scope of the join execution
+    :return:
+    """
+    key_op = key_expr.op()
+    if isinstance(key_op, ops.TableColumn) and key_op.name in frame.columns:
+        return key_op.name
+    timecontext = kwargs.get("timecontext")
+    key_scope = Scope(
+        {root: frame for root in key_op.root_tables()},
+        timecontext,
+    )
+    if scope is not None:
+        key_scope = scope.merge_scope(key_scope)
+    values = execute(key_expr, scope=key_scope, **kwargs)
+    return pd.Series(values, index=frame.index)
+
+
+def compute_join_keys(
+    op: PhysicalJoin, left: pd.DataFrame, right: pd.DataFrame, **kwargs
+) -> Tuple[List[JoinKey], List[JoinKey]]:
+    """
+    Split the equality predicates of the join into the keys of each side
+    :param op: Join operation
+    :param left: Materialized left input
+    :param right: Materialized right input
+    :return:
+    """
+    left_on: List[JoinKey] = []
+    right_on: List[JoinKey] = []
+    for predicate in op.predicates:
+        predicate_op = predicate.op()
+        if not isinstance(predicate_op, ops.Equals):
+            raise TypeError("Only equality join predicates are supported")
+        left_key, right_key = predicate_op.left, predicate_op.right
+        if not fully_originate_from(left_key, [op.left]):
+            left_key, right_key = right_key, left_key
+        left_on.append(compute_join_key(left_key, left, **kwargs))
+        right_on.append(compute_join_key(right_key, right, **kwargs))
+    return left_on, right_on
+
+
+def _take(values: pd.Series, index: np.ndarray, allow_fill: bool):
+    if is_extension_array_dtype(values.dtype):
+        return values.array.take(index, allow_fill=allow_fill)
+    return pd.api.extensions.take(values.to_numpy(), index, allow_fill=allow_fill)
+
+
+def materialize_join(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    left_on: List[JoinKey],
+    right_on: List[JoinKey],
+    left_index: np.ndarray,
+    right_index: np.ndarray,
+    columns: Optional[Container[str]] = None,
+) -> pd.DataFrame:
+    """
+    Build the joined frame from the rows that the join algorithm paired. Like
+    :func:`pandas.merge`, a key column that has the same name in both inputs
+    appears once and other overlapping column names get the ibis join suffixes.
+    :param left: Left input
+    :param right: Right input
+    :param left_on: Keys of the left input
+    :param right_on: Keys of the right input
+    :param left_index: Left indexer, -1 for rows missing from the left input
+    :param right_index: Right indexer, -1 for rows missing from the right input
+    :param columns: Names of the input columns to gather, None for all of them
+    :return:
+    """
+    left_missing = bool((left_index < 0).any())
+    right_missing = bool((right_index < 0).any())
+    shared_keys = {
+        left_key
+        for left_key, right_key in zip(left_on, right_on)
+        if isinstance(left_key, str) and left_key == right_key
+    }
+    overlapping = set(left.columns).intersection(right.columns) - shared_keys
+    left_suffix, right_suffix = constants.JOIN_SUFFIXES
+    gathered = {}
+    for name in left.columns:
+        if columns is not None and name not in columns:
+            continue
+        values = _take(left[name], left_index, left_missing)
+        if name in shared_keys and left_missing:
+            values = np.where(
+                left_index < 0,
+                _take(right[name], right_index, right_missing),
+                values,
+            )
+        gathered[name + left_suffix if name in overlapping else name] = values
+    for name in right.columns:
+        if name in shared_keys or (columns is not None and name not in columns):
+            continue
+        values = _take(right[name], right_index, right_missing)
+        gathered[name + right_suffix if name in overlapping else name] = values
+    # The index keeps the number of rows when no column is gathered
+    return pd.DataFrame(
+        gathered, columns=list(gathered), index=pd.RangeIndex(len(left_index))
+    )
+
+
+def _key_values(key: JoinKey, frame: pd.DataFrame) -> pd.Series:
+    if isinstance(key, str):
+        return frame[key]
+    return key
+
+
+def _grace_join_key_names(keys: List[JoinKey], key_name: str) -> List[str]:
+    return [
+        key if isinstance(key, str) else key_name.format(position)
+        for position, key in enumerate(keys)
+    ]
+
+
+def _grace_join_chunks(
+    frame: pd.DataFrame,
+    keys: List[JoinKey],
+    key_names: List[str],
+    row_name: str,
+    chunk_rows: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield chunks of a grace join input with the positions of its rows and its
+    computed keys as columns. An empty input still gives a chunk, so that its
+    columns are known.
+    :param frame: Join input
+    :param keys: Keys of the input
+    :param key_names: Names of the key columns
+    :param row_name: Name of the column of row positions
+    :param chunk_rows: Number of rows in each chunk
+    :return:
+    """
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        stop = min(start + chunk_rows, len(frame))
+        columns = {row_name: np.arange(start, stop)}
+        for key, name in zip(keys, key_names):
+            if not isinstance(key, str):
+                columns[name] = key.to_numpy()[start:stop]
+        yield frame.iloc[start:stop].assign(**columns)
+
+
+def execute_grace_join(
+    op: PhysicalJoin,
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    left_on: List[JoinKey],
+    right_on: List[JoinKey],
+) -> pd.DataFrame:
+    """
+    Join pairs of partitions of the inputs spilled to disk with a hash join each,
+    and put the rows in the order that a hash join of the whole inputs gives
+    :param op: Join operation
+    :param left: Left input
+    :param right: Right input
+    :param left_on: Keys of the left input
+    :param right_on: Keys of the right input
+    :return:
+    """
+    partitions = op.partitions or DEFAULT_PARTITIONS
+    build = right if op.build_side == "right" else left
+    chunk_rows = max(-(-len(build) // partitions), MIN_GRACE_BUFFER_ROWS)
+    left_names = _grace_join_key_names(left_on, _LEFT_KEY)
+    right_names = _grace_join_key_names(right_on, _RIGHT_KEY)
+    # The positions of the rows and the computed keys order the result
+    columns = (
+        None
+        if op.columns is None
+        else {*op.columns, _LEFT_ROW, _RIGHT_ROW, *left_names, *right_names}
+    )
+
+    def join_partition(left_partition, right_partition):
+        left_codes, right_codes = factorize_join_keys(
+            [left_partition[name] for name in left_names],
+            [right_partition[name] for name in right_names],
+            sort=False,
+        )
+        left_index, right_index = hash_join(
+            left_codes, right_codes, op.how, op.build_side
+        )
+        return materialize_join(
+            left_partition,
+            right_partition,
+            left_names,
+            right_names,
+            left_index,
+            right_index,
+            columns,
+        )
+
+    frames = list(
+        grace_hash_join(
+            _grace_join_chunks(left, left_on, left_names, _LEFT_ROW, chunk_rows),
+            _grace_join_chunks(right, right_on, right_names, _RIGHT_ROW, chunk_rows),
+            left_names,
+            right_names,
+            join_partition,
+            partitions,
+            chunk_rows,
+            op.how,
+        )
+    )
+    if not frames:
+        frames = [
+            join_partition(
+                next(
+                    _grace_join_chunks(left.iloc[:0], left_on, left_names, _LEFT_ROW, 1)
+                ),
+                next(
+                    _grace_join_chunks(
+                        right.iloc[:0], right_on, right_names, _RIGHT_ROW, 1
+                    )
+                ),
+            )
+        ]
+    result = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    # Only the indexers of the join of the whole inputs are computed in memory,
+    # to find the position of every row in the order of a hash join
+    left_codes, right_codes = factorize_join_keys(
+        [_key_values(key, left) for key in left_on],
+        [_key_values(key, right) for key in right_on],
+        sort=op.how == "outer",
+    )
+    left_index, right_index = merge_join(left_codes, right_codes, op.how)
+    width = len(right) + 1
+    pairs = pd.Index((left_index + 1) * width + right_index + 1)
+    order = np.argsort(
+        pairs.get_indexer(
+            (result[_LEFT_ROW].fillna(-1).to_numpy(dtype=np.int64) + 1) * width
+            + result[_RIGHT_ROW].fillna(-1).to_numpy(dtype=np.int64)
+            + 1
+        )
+    )
+    temporary = [_LEFT_ROW, _RIGHT_ROW] + [
+        name
+        for key, name in zip(left_on + right_on, left_names + right_names)
+        if not isinstance(key, str)
+    ]
+    return result.take(order).drop(columns=temporary).reset_index(drop=True)
+
+
+@execute_node.register(PhysicalJoin, pd.DataFrame, pd.DataFrame)
+def execute_physical_join(op, left, right, **kwargs):
+    if not op.predicates:
+        return execute_cross_join(op, left, right, **kwargs)
+    left_on, right_on = compute_join_keys(op, left, right, **kwargs)
+    if op.strategy == "grace":
+        return execute_grace_join(op, left, right, left_on, right_on)
+    left_codes, right_codes = factorize_join_keys(
+        [_key_values(key, left) for key in left_on],
+        [_key_values(key, right) for key in right_on],
+        # pandas.merge orders the keys of an outer join by value
+        sort=op.strategy == "sort_merge"
+        or (op.strategy == "hash" and op.how == "outer"),
+    )
+    partitions: Iterable[Indexers]
+    if op.strategy == "sort_merge":
+        partitions = [sort_merge_join(left_codes, right_codes, op.how)]
+    elif op.strategy == "broadcast":
+        partitions = broadcast_join(left_codes, right_codes, op.how, op.build_side)
+    else:
+        partitions = [merge_join(left_codes, right_codes, op.how)]
+    frames = [
+        materialize_join(
+            left, right, left_on, right_on, left_index, right_index, op.columns
+        )
+        for left_index, right_index in partitions
+    ]
+    if not frames:
+        # A broadcast join of an empty probe input pairs no rows
+        no_rows = np.array([], dtype=np.int64)
+        return materialize_join(
+            left, right, left_on, right_on, no_rows, no_rows, op.columns
+        )
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
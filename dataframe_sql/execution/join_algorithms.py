@@ -0,0 +1,309 @@
+"""
+Join algorithms that compute which rows of the two join inputs are paired
+
+Every algorithm works on integer join key codes, where rows with equal keys have
+equal codes and rows with a null key have the code -1, and returns a pair of
+indexers into the left and right input. An indexer value of -1 marks a row that
+is missing from that side in the result of an outer join. Null keys never match,
+following SQL semantics.
+"""
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+Indexers = Tuple[np.ndarray, np.ndarray]
+
+PARTITION_ROWS = 1 << 16
+
+_SWAPPED_HOW = {"inner": "inner", "left": "right", "right": "left", "outer": "outer"}
+
+
+def factorize_join_keys(
+    left_keys: Sequence[pd.Series], right_keys: Sequence[pd.Series], sort: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the join key codes of the rows of each input
+    :param left_keys: Key values of the left input, one series per key
+    :param right_keys: Key values of the right input, one series per key
+    :param sort: Whether the codes must follow the sort order of the keys
+    :return:
+    """
+    left_length = len(left_keys[0])
+    codes = np.zeros(left_length + len(right_keys[0]), dtype=np.int64)
+    nulls = np.zeros(len(codes), dtype=bool)
+    for index, (left_key, right_key) in enumerate(zip(left_keys, right_keys)):
+        values = pd.concat(
+            [pd.Series(left_key), pd.Series(right_key)], ignore_index=True
+        )
+        key_codes, uniques = pd.factorize(values, sort=sort)
+        nulls |= key_codes < 0
+        if index == 0:
+            codes = key_codes.astype(np.int64)
+        else:
+            codes, _ = pd.factorize(codes * len(uniques) + key_codes, sort=sort)
+    codes = np.where(nulls, -1, codes)
+    return codes[:left_length], codes[left_length:]
+
+
+def _expand_matches(
+    probe_positions: np.ndarray,
+    match_starts: np.ndarray,
+    match_counts: np.ndarray,
+    build_order: np.ndarray,
+    keep_unmatched: bool,
+) -> Indexers:
+    """
+    Pair every probe row with its matching build rows
+    :param probe_positions: Positions of the probe rows in their input
+    :param match_starts: Offset into build_order of the first match of each probe
+                         row
+    :param match_counts: Number of matches of each probe row
+    :param build_order: Positions of the build rows, grouped by key
+    :param keep_unmatched: Whether probe rows without a match are kept
+    :return: Probe and build indexers
+    """
+    repeats = np.maximum(match_counts, 1) if keep_unmatched else match_counts
+    probe_index = np.repeat(probe_positions, repeats)
+    group_starts = np.cumsum(repeats) - repeats
+    offsets = np.arange(len(probe_index)) - np.repeat(group_starts, repeats)
+    matched = np.repeat(match_counts > 0, repeats)
+    if not len(build_order):
+        return probe_index, np.full(len(probe_index), -1, dtype=np.int64)
+    build_positions = np.where(matched, np.repeat(match_starts, repeats) + offsets, 0)
+    build_index = np.where(matched, build_order[build_positions], -1)
+    return probe_index, build_index
+
+
+def _unmatched(index: np.ndarray, length: int) -> np.ndarray:
+    matched = np.zeros(length, dtype=bool)
+    matched[index[index >= 0]] = True
+    return np.flatnonzero(~matched)
+
+
+def _append_unmatched_build_rows(
+    probe_index: np.ndarray, build_index: np.ndarray, build_length: int
+) -> Indexers:
+    unmatched = _unmatched(build_index, build_length)
+    return (
+        np.concatenate([probe_index, np.full(len(unmatched), -1, dtype=np.int64)]),
+        np.concatenate([build_index, unmatched]),
+    )
+
+
+class HashTable:
+    """
+    Rows of the build input grouped by join key code
+    """
+
+    def __init__(self, build_codes: np.ndarray, code_count: int):
+        valid = build_codes >= 0
+        self.length = len(build_codes)
+        self.counts = np.bincount(build_codes[valid], minlength=code_count)
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.order = np.flatnonzero(valid)[
+            np.argsort(build_codes[valid], kind="stable")
+        ]
+
+    def probe(
+        self, probe_codes: np.ndarray, probe_positions: np.ndarray, keep_unmatched: bool
+    ) -> Indexers:
+        """
+        Return the probe and build indexers of the probe rows
+        :param probe_codes: Join key codes of the probe rows
+        :param probe_positions: Positions of the probe rows in their input
+        :param keep_unmatched: Whether probe rows without a match are kept
+        :return:
+        """
+        valid = probe_codes >= 0
+        codes = np.where(valid, probe_codes, 0)
+        if len(self.counts):
+            match_counts = np.where(valid, self.counts[codes], 0)
+            match_starts = self.starts[codes]
+        else:
+            match_counts = np.zeros(len(codes), dtype=np.int64)
+            match_starts = match_counts
+        return _expand_matches(
+            probe_positions, match_starts, match_counts, self.order, keep_unmatched
+        )
+
+
+def _code_count(left_codes: np.ndarray, right_codes: np.ndarray) -> int:
+    return int(max(left_codes.max(initial=-1), right_codes.max(initial=-1))) + 1
+
+
+def _orient(
+    left_codes: np.ndarray, right_codes: np.ndarray, how: str, build_side: str
+) -> Tuple[np.ndarray, np.ndarray, bool, bool]:
+    """
+    Return the probe codes, build codes and whether unmatched probe and build rows
+    are kept
+    """
+    if build_side == "left":
+        left_codes, right_codes = right_codes, left_codes
+        how = _SWAPPED_HOW[how]
+    return (
+        left_codes,
+        right_codes,
+        how in ("left", "outer"),
+        how in ("right", "outer"),
+    )
+
+
+def _reorient(probe_index: np.ndarray, build_index: np.ndarray, build_side: str):
+    if build_side == "left":
+        return build_index, probe_index
+    return probe_index, build_index
+
+
+def hash_join(
+    left_codes: np.ndarray,
+    right_codes: np.ndarray,
+    how: str = "inner",
+    build_side: str = "right",
+) -> Indexers:
+    """
+    Join by building a hash table of the build input and probing it with every
+    row of the other input. The result follows the order of the probe input.
+    :param left_codes: Join key codes of the left input
+    :param right_codes: Join key codes of the right input
+    :param how: Join type
+    :param build_side: Input the hash table is built from
+    :return:
+    """
+    probe_codes, build_codes, keep_probe, keep_build = _orient(
+        left_codes, right_codes, how, build_side
+    )
+    table = HashTable(build_codes, _code_count(probe_codes, build_codes))
+    probe_index, build_index = table.probe(
+        probe_codes, np.arange(len(probe_codes)), keep_probe
+    )
+    if keep_build:
+        probe_index, build_index = _append_unmatched_build_rows(
+            probe_index, build_index, table.length
+        )
+    return _reorient(probe_index, build_index, build_side)
+
+
+def merge_join(
+    left_codes: np.ndarray, right_codes: np.ndarray, how: str = "inner"
+) -> Indexers:
+    """
+    Join with :func:`pandas.merge`, which gives the rows in the order that the
+    pandas backend gave them before joins were planned. Null keys of the right
+    input are given a code of their own, so that they match nothing.
+    :param left_codes: Join key codes of the left input
+    :param right_codes: Join key codes of the right input
+    :param how: Join type
+    :return:
+    """
+    left = pd.DataFrame({"code": left_codes, "left": np.arange(len(left_codes))})
+    right = pd.DataFrame(
+        {
+            "code": np.where(right_codes < 0, -2, right_codes),
+            "right": np.arange(len(right_codes)),
+        }
+    )
+    merged = pd.merge(left, right, on="code", how=how, sort=False)
+    return (
+        merged["left"].fillna(-1).to_numpy(dtype=np.int64),
+        merged["right"].fillna(-1).to_numpy(dtype=np.int64),
+    )
+
+
+def semi_join(left_codes: np.ndarray, right_codes: np.ndarray) -> np.ndarray:
+    """
+    Return whether each left row has a matching right row, by building a hash set
+    of the right join key codes and probing it with every left row. An anti join
+    is the negation, apart from the handling of null keys.
+    :param left_codes: Join key codes of the left input
+    :param right_codes: Join key codes of the right input
+    :return: Boolean mask of the left rows
+    """
+    present = np.zeros(max(_code_count(left_codes, right_codes), 1), dtype=bool)
+    present[right_codes[right_codes >= 0]] = True
+    return (left_codes >= 0) & present[np.maximum(left_codes, 0)]
+
+
+def broadcast_join(
+    left_codes: np.ndarray,
+    right_codes: np.ndarray,
+    how: str = "inner",
+    build_side: str = "right",
+    partition_rows: int = PARTITION_ROWS,
+) -> Iterator[Indexers]:
+    """
+    Join by broadcasting the hash table of a small build input to every partition
+    of the probe input. The indexers of each partition are produced separately so
+    that the result can be assembled one partition at a time.
+    :param left_codes: Join key codes of the left input
+    :param right_codes: Join key codes of the right input
+    :param how: Join type
+    :param build_side: Input that is broadcast
+    :param partition_rows: Number of probe rows in each partition
+    :return: Iterator over the indexers of every partition
+    """
+    probe_codes, build_codes, keep_probe, keep_build = _orient(
+        left_codes, right_codes, how, build_side
+    )
+    table = HashTable(build_codes, _code_count(probe_codes, build_codes))
+    matched: List[np.ndarray] = []
+    for start in range(0, len(probe_codes), partition_rows):
+        positions = np.arange(start, min(start + partition_rows, len(probe_codes)))
+        probe_index, build_index = table.probe(
+            probe_codes[positions], positions, keep_probe
+        )
+        if keep_build:
+            matched.append(build_index)
+        yield _reorient(probe_index, build_index, build_side)
+    if keep_build:
+        all_matched = np.concatenate(matched) if matched else np.array([], dtype=int)
+        unmatched = _unmatched(all_matched, table.length)
+        yield _reorient(
+            np.full(len(unmatched), -1, dtype=np.int64), unmatched, build_side
+        )
+
+
+def _sorted_order(codes: np.ndarray) -> np.ndarray:
+    """
+    Return the positions of the codes in sorted order, skipping the sort when the
+    codes are already sorted
+    :param codes:
+    :return:
+    """
+    if len(codes) < 2 or bool(np.all(codes[:-1] <= codes[1:])):
+        return np.arange(len(codes))
+    return np.argsort(codes, kind="stable")
+
+
+def sort_merge_join(
+    left_codes: np.ndarray, right_codes: np.ndarray, how: str = "inner"
+) -> Indexers:
+    """
+    Join by sorting both inputs on the join keys and merging them. Inputs that are
+    already sorted are not sorted again. The result is ordered by the join keys,
+    so the codes must follow the sort order of the keys.
+    :param left_codes: Join key codes of the left input
+    :param right_codes: Join key codes of the right input
+    :param how: Join type
+    :return:
+    """
+    left_order = _sorted_order(left_codes)
+    right_order = _sorted_order(right_codes)
+    sorted_left = left_codes[left_order]
+    sorted_right = right_codes[right_order]
+    match_starts = np.searchsorted(sorted_right, sorted_left, side="left")
+    match_ends = np.searchsorted(sorted_right, sorted_left, side="right")
+    match_counts = np.where(sorted_left >= 0, match_ends - match_starts, 0)
+    left_index, right_index = _expand_matches(
+        left_order,
+        match_starts,
+        match_counts,
+        right_order,
+        keep_unmatched=how in ("left", "outer"),
+    )
+    if how in ("right", "outer"):
+        left_index, right_index = _append_unmatched_build_rows(
+            left_index, right_index, len(right_codes)
+        )
+    return left_index, right_index
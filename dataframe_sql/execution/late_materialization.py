@@ -0,0 +1,113 @@
+"""
+Execution of filters that gather only the columns that are read above them
+
+The predicates of a filter are computed over all the rows of its input, which
+gives the positions of the rows that pass. Only the columns that the projection
+or aggregation over the filter reads are gathered at those positions, and the
+projection is computed over the gathered rows alone. Filters of joins are left
+to the pandas backend, since the joins already gather only the columns that are
+read above them.
+"""
+from functools import reduce
+import operator
+from typing import Iterable, Optional, Tuple
+
+from ibis.backends.pandas.dispatch import execute_node
+from ibis.backends.pandas.execution.selection import (
+    _compute_predicates,
+    execute_selection_dataframe,
+)
+import ibis.expr.operations as ops
+from ibis.expr.scope import Scope
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_extension_array_dtype
+
+from dataframe_sql.optimizer.late_materialization import read_columns
+
+
+def gather_rows(
+    data: pd.DataFrame, positions: np.ndarray, columns: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Return the rows of a frame at the given positions with only the given columns
+    :param data:
+    :param positions: Positions of the rows in ascending order
+    :param columns: Names of the columns to gather, None for all of them
+    :return:
+    """
+    names = list(data.columns) if columns is None else list(columns)
+    gathered = {}
+    for name in names:
+        column = data[name]
+        if is_extension_array_dtype(column.dtype):
+            gathered[name] = column.array.take(positions)
+        else:
+            gathered[name] = column.to_numpy()[positions]
+    return pd.DataFrame(gathered, columns=names, index=data.index[positions])
+
+
+def filter_columns(
+    op: ops.Node,
+    data: pd.DataFrame,
+    exprs: Iterable,
+    scope: Scope,
+    timecontext=None,
+    row_wise: bool = False,
+    **kwargs,
+) -> Tuple[Optional[pd.DataFrame], Scope]:
+    """
+    Return the rows of the input of a selection or aggregation that pass its
+    predicates, with only the columns that the expressions read, and the scope
+    in which its table is those rows. The rows are None if the predicates are not
+    a boolean mask or the expressions do not give the columns that they read.
+    :param op:
+    :param data: Input of the operation
+    :param exprs: Expressions over the rows that pass
+    :param scope:
+    :param timecontext:
+    :param row_wise: Whether the expressions must be computed row by row
+    :return:
+    """
+    columns = read_columns(exprs, op.table, row_wise)
+    if columns is None:
+        return None, scope
+    predicate = reduce(
+        operator.and_,
+        _compute_predicates(
+            op.table.op(), op.predicates, data, scope, timecontext, **kwargs
+        ),
+    )
+    if not is_bool_dtype(predicate.dtype):
+        return None, scope
+    rows = gather_rows(
+        data,
+        np.flatnonzero(predicate.to_numpy()),
+        [name for name in data.columns if name in columns],
+    )
+    return rows, scope.merge_scope(
+        Scope({op.table.op(): rows}, timecontext), overwrite=True
+    )
+
+
+@execute_node.register(ops.Selection, pd.DataFrame)
+def execute_late_selection(op, data, scope=None, timecontext=None, **kwargs):
+    rows = None
+    if op.predicates and op.selections and not isinstance(op.table.op(), ops.Join):
+        rows, scope = filter_columns(
+            op,
+            data,
+            [*op.selections, *op.sort_keys],
+            Scope() if scope is None else scope,
+            timecontext,
+            row_wise=True,
+            **kwargs,
+        )
+    if rows is None:
+        return execute_selection_dataframe(
+            op, data, scope=scope, timecontext=timecontext, **kwargs
+        )
+    projection = ops.Selection(op.table, op.selections, [], op.sort_keys)
+    return execute_selection_dataframe(
+        projection, rows, scope=scope, timecontext=timecontext, **kwargs
+    )
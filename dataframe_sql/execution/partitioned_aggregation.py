@@ -0,0 +1,209 @@
+"""
+Hash aggregation of inputs whose groups do not fit in memory together
+
+Rows are assigned to partitions by the hash of their group keys, so every row of
+a group lands in the same partition and each partition is aggregated on its own.
+Partitions are buffered in memory until the buffers hold more than a budget of
+rows, at which point the largest buffer is spilled to disk. A partition that is
+still larger than the budget once all the input is read is partitioned again
+with another hash, unless it was already partitioned MAX_REPARTITIONS times,
+which happens when a few groups hold most of the rows.
+
+Rows keep the order of the input within each partition, so aggregates such as
+floating point sums come out exactly as the in-memory aggregation computes them.
+"""
+import functools
+import operator
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Sequence
+
+from ibis.backends.pandas.core import execute
+from ibis.backends.pandas.dispatch import execute_node
+from ibis.backends.pandas.execution.generic import execute_aggregation_dataframe
+import ibis.expr.operations as ops
+from ibis.expr.scope import Scope
+import ibis.expr.types as ir
+import pandas as pd
+
+from dataframe_sql.execution.aggregation import sort_aggregation_result
+from dataframe_sql.execution.spill import (
+    SpilledPartitions,
+    partition_numbers,
+    spill_directory,
+)
+from dataframe_sql.operations import PartitionedAggregation
+
+DEFAULT_PARTITIONS = 64
+DEFAULT_PARTITION_ROWS = 1_000_000
+MAX_REPARTITIONS = 3
+
+
+def _aggregate_partitions(
+    chunks: Iterable[pd.DataFrame],
+    by: List[str],
+    aggregate: Callable[[pd.DataFrame], pd.DataFrame],
+    partitions: int,
+    partition_rows: int,
+    directory: Path,
+    level: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    Partition the chunks by the hash of the group keys and aggregate every
+    partition
+    :param chunks:
+    :param by:
+    :param aggregate:
+    :param partitions:
+    :param partition_rows: Number of rows to buffer before spilling
+    :param directory: Directory to spill partitions to
+    :param level: Number of times the rows were partitioned before
+    :return:
+    """
+    spilled_partitions = SpilledPartitions(directory, partitions, partition_rows)
+    for chunk in chunks:
+        if len(chunk):
+            spilled_partitions.append(
+                chunk, partition_numbers(chunk[by], partitions, level)
+            )
+    for number in range(partitions):
+        rows = spilled_partitions.rows(number)
+        if not rows:
+            continue
+        pieces = spilled_partitions.read(number)
+        if rows > partition_rows and level < MAX_REPARTITIONS:
+            yield from _aggregate_partitions(
+                pieces,
+                by,
+                aggregate,
+                partitions,
+                partition_rows,
+                directory / str(number),
+                level + 1,
+            )
+        else:
+            yield aggregate(pd.concat(pieces))
+
+
+def hash_aggregate(
+    chunks: Iterable[pd.DataFrame],
+    by: Sequence[str],
+    aggregate: Callable[[pd.DataFrame], pd.DataFrame],
+    partitions: int = DEFAULT_PARTITIONS,
+    partition_rows: int = DEFAULT_PARTITION_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Aggregate frames whose groups together may not fit in memory, buffering about
+    partition_rows rows at a time
+    :param chunks: Frames with the same columns, such as the chunks of a file read
+                   with pandas.read_csv(..., chunksize=n)
+    :param by: Names of the group keys
+    :param aggregate: Function that aggregates a frame that holds every row of the
+                      groups in it, such as lambda frame: frame.groupby(by).sum()
+    :param partitions: Number of partitions to hash the rows into
+    :param partition_rows: Number of rows to buffer before spilling
+    :return: Aggregated partitions, in no particular order
+    """
+    if partitions < 1:
+        raise ValueError("Rows must be hashed into at least one partition")
+    if partition_rows < 1:
+        raise ValueError("Partitions must hold at least one row")
+    with spill_directory("dataframe_sql-aggregation-") as directory:
+        yield from _aggregate_partitions(
+            chunks, list(by), aggregate, partitions, partition_rows, directory, 0
+        )
+
+
+def _input_columns(op: ops.Aggregation, data: pd.DataFrame) -> List[str]:
+    """
+    Return the columns of the input that the group keys, metrics and having
+    conditions of the aggregation use, or all of them when an expression uses
+    another table
+    :param op:
+    :param data:
+    :return:
+    """
+    table_op = op.table.op()
+    names = set()
+    pending: List[ir.Expr] = [*op.by, *op.metrics, *op.having]
+    while pending:
+        expr_op = pending.pop().op()
+        if isinstance(expr_op, ops.TableColumn):
+            if not expr_op.table.op().equals(table_op):
+                return list(data.columns)
+            names.add(expr_op.name)
+            continue
+        for arg in expr_op.flat_args():
+            if isinstance(arg, ir.TableExpr):
+                if not arg.op().equals(table_op):
+                    return list(data.columns)
+            elif isinstance(arg, ir.Expr):
+                pending.append(arg)
+    return [name for name in data.columns if name in names]
+
+
+def _filter(op: ops.Aggregation, chunk: pd.DataFrame, scope: Scope, **kwargs):
+    if not op.predicates:
+        return chunk
+    chunk_scope = scope.merge_scope(
+        Scope({op.table.op(): chunk}, kwargs.get("timecontext"))
+    )
+    predicate = functools.reduce(
+        operator.and_,
+        (
+            execute(predicate, scope=chunk_scope, **kwargs)
+            for predicate in op.predicates
+        ),
+    )
+    return chunk.loc[predicate]
+
+
+@execute_node.register(PartitionedAggregation, pd.DataFrame)
+def execute_partitioned_aggregation(op, data, scope=None, **kwargs):
+    """
+    Aggregate the partitions of the input and put the groups in the order that
+    the in-memory aggregation gives them, sorted by the group keys and then by
+    the sort keys of the aggregation
+    :param op:
+    :param data:
+    :param scope:
+    :return:
+    """
+    aggregation_op = op.aggregation.op()
+    partition_op = ops.Aggregation(
+        aggregation_op.table,
+        aggregation_op.metrics,
+        aggregation_op.by,
+        aggregation_op.having,
+    )
+    scope = Scope() if scope is None else scope
+    columns = _input_columns(aggregation_op, data)
+    chunks = (
+        _filter(
+            aggregation_op,
+            data.iloc[start : start + op.partition_rows],
+            scope,
+            **kwargs,
+        )[columns]
+        for start in range(0, len(data), op.partition_rows)
+    )
+    by = [by_expr.get_name() for by_expr in aggregation_op.by]
+    pieces = list(
+        hash_aggregate(
+            chunks,
+            by,
+            lambda partition: execute_aggregation_dataframe(
+                partition_op, partition, scope=scope, **kwargs
+            ),
+            op.partitions,
+            op.partition_rows,
+        )
+    )
+    if not pieces:
+        result = execute_aggregation_dataframe(
+            partition_op, data.iloc[:0], scope=scope, **kwargs
+        )
+    else:
+        result = pd.concat(pieces, ignore_index=True).sort_values(
+            by, kind="mergesort", ignore_index=True
+        )
+    return sort_aggregation_result(aggregation_op, result)
@@ -0,0 +1,60 @@
+"""
+Execution of TABLESAMPLE clauses
+
+BERNOULLI draws one random number per row and keeps the rows whose number is
+below the sampled fraction. SYSTEM draws one random number per block of
+consecutive rows and keeps whole blocks, which needs a fraction of the random
+numbers and copies contiguous slices, at the cost of a sample whose rows are
+correlated when the table is ordered. ROWS keeps a fixed number of rows chosen
+without replacement. Every method keeps the rows in the order of the table.
+"""
+from typing import Optional
+
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.operations import TableSample
+
+SYSTEM_BLOCK_ROWS = 4096
+# Small tables are cut into smaller blocks, so that their samples are not all or
+# nothing
+MIN_SYSTEM_BLOCKS = 100
+
+
+def sample_positions(
+    rows: int,
+    method: str,
+    size: float,
+    seed: Optional[int] = None,
+    block_rows: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Return the sorted positions of the sampled rows of a table
+    :param rows: Number of rows of the table
+    :param method: 'bernoulli', 'system' or 'rows'
+    :param size: Fraction of the rows or blocks to keep between 0 and 1, or the
+                 number of rows to keep for the rows method
+    :param seed: Seed of the random numbers, so that samples can be repeated
+    :param block_rows: Number of rows of the blocks of the system method, by
+                       default SYSTEM_BLOCK_ROWS or fewer for small tables
+    :return:
+    """
+    random_state = np.random.RandomState(seed)
+    if method == "rows":
+        if size >= rows:
+            return np.arange(rows)
+        return np.sort(random_state.choice(rows, int(size), replace=False))
+    if method == "bernoulli":
+        return np.flatnonzero(random_state.random_sample(rows) < size)
+    if block_rows is None:
+        block_rows = min(SYSTEM_BLOCK_ROWS, max(1, rows // MIN_SYSTEM_BLOCKS))
+    blocks = -(-rows // block_rows)
+    starts = np.flatnonzero(random_state.random_sample(blocks) < size) * block_rows
+    positions = (starts[:, np.newaxis] + np.arange(block_rows)).ravel()
+    return positions[positions < rows]
+
+
+@execute_node.register(TableSample, pd.DataFrame)
+def execute_table_sample(op, data, **kwargs):
+    return data.take(sample_positions(len(data), op.method, op.size, op.seed))
@@ -0,0 +1,439 @@
+"""
+Mergeable sketches behind the approximate aggregates
+
+APPROX_COUNT_DISTINCT keeps a HyperLogLog sketch of 2 ** precision registers.
+Every value is hashed to 64 bits, the first precision bits pick a register, and
+the register keeps the largest rank, the position of the first set bit, among
+the remaining bits of the values it receives. The number of distinct values
+follows from the harmonic mean of 2 ** -rank over the registers, with linear
+counting of the empty registers for small cardinalities. The relative standard
+error is about 1.04 / sqrt(2 ** precision), so every extra bit of precision
+doubles the memory and divides the error by sqrt(2).
+
+APPROX_PERCENTILE keeps a merging t-digest, which summarizes sorted values as
+centroids of a mean and a weight. Centroids are merged while they span at most
+one unit of the scale function k(q) = compression / (2 pi) * asin(2q - 1), so
+centroids are small near the extreme quantiles and large around the median, and
+a digest holds about compression / 2 of them. Percentiles are interpolated
+linearly between the centroids like the exact percentiles of numpy, which they
+equal as long as every centroid holds a single value.
+
+Both sketches merge: registers by taking the largest rank and digests by
+compressing their centroids together, so sketches of chunks or partitions
+combine into the sketch of all their values. Grouped aggregates build the
+sketches of all groups at once with array operations.
+"""
+from typing import Iterable, Optional, Tuple
+
+from ibis.backends.pandas.aggcontext import Summarize
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+from pandas.core.groupby import SeriesGroupBy
+
+from dataframe_sql.operations import ApproxCountDistinct, ApproxPercentile
+
+DEFAULT_PRECISION = 14
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+DEFAULT_COMPRESSION = 100.0
+MIN_COMPRESSION = 10.0
+
+# Ranks are counted in the first bits of the hash that follow the register
+# number, which float64 represents exactly
+_RANK_BITS = 50
+
+
+def validate_precision(precision: int) -> int:
+    if not MIN_PRECISION <= precision <= MAX_PRECISION:
+        raise ValueError(
+            f"The precision of APPROX_COUNT_DISTINCT must be between "
+            f"{MIN_PRECISION} and {MAX_PRECISION}, got {precision}"
+        )
+    return int(precision)
+
+
+def validate_compression(compression: float) -> float:
+    if compression < MIN_COMPRESSION:
+        raise ValueError(
+            f"The compression of APPROX_PERCENTILE must be at least "
+            f"{MIN_COMPRESSION:g}, got {compression}"
+        )
+    return float(compression)
+
+
+def validate_quantile(quantile: float) -> float:
+    if not 0 <= quantile <= 1:
+        raise ValueError(
+            f"The percentile of APPROX_PERCENTILE must be between 0 and 1, got "
+            f"{quantile}"
+        )
+    return float(quantile)
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """
+    Return a 64 bit hash of every value, which for categorical values is the hash
+    of the category
+    :param values:
+    :return:
+    """
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def register_ranks(hashes: np.ndarray, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the register and the rank of every hash
+    :param hashes:
+    :param precision:
+    :return:
+    """
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainders = (hashes << np.uint64(precision)) >> np.uint64(64 - _RANK_BITS)
+    # The exponent of the remainder is the position of its highest set bit
+    _, exponents = np.frexp(remainders.astype(np.float64))
+    return registers, (_RANK_BITS + 1 - exponents).astype(np.uint8)
+
+
+def estimate_cardinality(
+    inverse_sums: np.ndarray, empty_registers: np.ndarray, precision: int
+) -> np.ndarray:
+    """
+    Return the HyperLogLog estimates of sketches
+    :param inverse_sums: Sum of 2 ** -rank over the registers of every sketch
+    :param empty_registers: Number of registers of every sketch that no value
+                            reached
+    :param precision:
+    :return: Estimated number of distinct values of every sketch
+    """
+    register_count = 1 << precision
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(
+        register_count, 0.7213 / (1 + 1.079 / register_count)
+    )
+    estimates = alpha * register_count ** 2 / inverse_sums
+    linear_counting = (estimates <= 2.5 * register_count) & (empty_registers > 0)
+    estimates[linear_counting] = register_count * np.log(
+        register_count / empty_registers[linear_counting]
+    )
+    return np.rint(estimates).astype(np.int64)
+
+
+class HyperLogLog:
+    """
+    Sketch of the distinct values of a column with 2 ** precision registers. Add
+    values with update, combine sketches of the same precision with merge and
+    read the approximate number of distinct values with estimate.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        self.precision = validate_precision(precision)
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    def update(self, values: Iterable) -> "HyperLogLog":
+        values = pd.Series(values).dropna()
+        registers, ranks = register_ranks(hash_values(values), self.precision)
+        np.maximum.at(self.registers, registers, ranks)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Only sketches with the same precision can be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        inverse_sum = np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        empty_registers = np.count_nonzero(self.registers == 0)
+        return int(
+            estimate_cardinality(
+                np.array([inverse_sum]), np.array([empty_registers]), self.precision
+            )[0]
+        )
+
+
+def grouped_count_distinct(
+    values: pd.Series, groups: np.ndarray, group_count: int, precision: int
+) -> np.ndarray:
+    """
+    Return the approximate number of distinct values of every group, keeping
+    only the registers that the values of each group reach
+    :param values:
+    :param groups: Group number of every value, -1 for values in no group
+    :param group_count:
+    :param precision:
+    :return:
+    """
+    kept = values.notna().to_numpy() & (groups >= 0)
+    registers, ranks = register_ranks(hash_values(values[kept]), precision)
+    keys = groups[kept] * (1 << precision) + registers
+    max_ranks = pd.Series(ranks).groupby(keys).max()
+    key_groups = max_ranks.index.to_numpy() >> precision
+    inverse_sums = np.bincount(
+        key_groups,
+        weights=np.ldexp(1.0, -max_ranks.to_numpy().astype(np.int64)),
+        minlength=group_count,
+    )
+    empty_registers = (1 << precision) - np.bincount(key_groups, minlength=group_count)
+    return estimate_cardinality(
+        inverse_sums + empty_registers, empty_registers, precision
+    )
+
+
+def compress_centroids(
+    means: np.ndarray,
+    weights: np.ndarray,
+    groups: np.ndarray,
+    compression: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge the centroids of every group that fall in the same unit of the scale
+    function
+    :param means: Means of the centroids, sorted within every group
+    :param weights: Weights of the centroids
+    :param groups: Group number of every centroid, in ascending order
+    :param compression:
+    :return: Means, weights and group numbers of the merged centroids
+    """
+    if not len(means):
+        return means, weights, groups
+    totals = np.bincount(groups, weights=weights)
+    group_starts = np.cumsum(totals) - totals
+    before = np.cumsum(weights) - weights - group_starts[groups]
+    quantiles = np.clip(before / totals[groups], 0.0, 1.0)
+    units = np.floor(
+        compression / (2 * np.pi) * np.arcsin(2 * quantiles - 1) + compression / 4
+    ).astype(np.int64)
+    starts = np.flatnonzero(
+        np.concatenate(
+            [[True], (groups[1:] != groups[:-1]) | (units[1:] != units[:-1])]
+        )
+    )
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights, groups[starts]
+
+
+def interpolate_quantiles(
+    means: np.ndarray,
+    weights: np.ndarray,
+    groups: np.ndarray,
+    minimums: np.ndarray,
+    maximums: np.ndarray,
+    quantile: float,
+) -> np.ndarray:
+    """
+    Return the quantile of every group from its centroids. A centroid stands at
+    the middle of the weight it holds, and the minimum and maximum of the group
+    stand at the middle of its first and last value.
+    :param means: Means of the centroids, sorted within every group
+    :param weights: Weights of the centroids
+    :param groups: Group number of every centroid, in ascending order
+    :param minimums: Smallest value of every group
+    :param maximums: Largest value of every group
+    :param quantile:
+    :return: Quantile of every group, NaN for groups without centroids
+    """
+    group_count = len(minimums)
+    result = np.full(group_count, np.nan)
+    if not len(means):
+        return result
+    totals = np.bincount(groups, weights=weights, minlength=group_count)
+    group_starts = np.cumsum(totals) - totals
+    # Positions increase across groups, so that the groups can be interpolated
+    # all at once
+    positions = np.cumsum(weights) - weights / 2
+    present = np.flatnonzero(totals > 0)
+    first = np.searchsorted(groups, present)
+    last = np.searchsorted(groups, present, side="right") - 1
+    with_minimum = present[weights[first] > 1]
+    with_maximum = present[weights[last] > 1]
+    points = np.concatenate(
+        [
+            group_starts[with_minimum] + 0.5,
+            positions,
+            group_starts[with_maximum] + totals[with_maximum] - 0.5,
+        ]
+    )
+    values = np.concatenate([minimums[with_minimum], means, maximums[with_maximum]])
+    order = np.argsort(points, kind="mergesort")
+    targets = group_starts[present] + 0.5 + quantile * (totals[present] - 1)
+    result[present] = np.interp(targets, points[order], values[order])
+    return result
+
+
+class TDigest:
+    """
+    Sketch of the distribution of a numeric column as centroids whose number
+    grows with the compression. Add values with update, combine sketches with
+    merge and read approximate percentiles with quantile.
+    """
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = validate_compression(compression)
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.minimum = np.nan
+        self.maximum = np.nan
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _add_centroids(
+        self, means: np.ndarray, weights: np.ndarray, minimum, maximum
+    ) -> "TDigest":
+        if not len(means):
+            return self
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind="mergesort")
+        self.means, self.weights, _ = compress_centroids(
+            means[order],
+            weights[order],
+            np.zeros(len(means), dtype=np.int64),
+            self.compression,
+        )
+        self.minimum = np.fmin(self.minimum, minimum)
+        self.maximum = np.fmax(self.maximum, maximum)
+        return self
+
+    def update(self, values: Iterable) -> "TDigest":
+        points = pd.Series(values).dropna().to_numpy(dtype=np.float64)
+        if not len(points):
+            return self
+        return self._add_centroids(
+            points, np.ones(len(points)), points.min(), points.max()
+        )
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        return self._add_centroids(
+            other.means, other.weights, other.minimum, other.maximum
+        )
+
+    def quantile(self, quantile: float) -> float:
+        return float(
+            interpolate_quantiles(
+                self.means,
+                self.weights,
+                np.zeros(len(self.means), dtype=np.int64),
+                np.array([self.minimum]),
+                np.array([self.maximum]),
+                validate_quantile(quantile),
+            )[0]
+        )
+
+
+def grouped_percentile(
+    values: pd.Series,
+    groups: np.ndarray,
+    group_count: int,
+    quantile: float,
+    compression: float,
+) -> np.ndarray:
+    """
+    Return the approximate percentile of the values of every group
+    :param values:
+    :param groups: Group number of every value, -1 for values in no group
+    :param group_count:
+    :param quantile:
+    :param compression:
+    :return:
+    """
+    kept = values.notna().to_numpy() & (groups >= 0)
+    numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)[kept]
+    groups = groups[kept]
+    order = np.lexsort((numbers, groups))
+    numbers, groups = numbers[order], groups[order]
+    minimums = np.full(group_count, np.nan)
+    maximums = np.full(group_count, np.nan)
+    if len(numbers):
+        starts = np.flatnonzero(np.concatenate([[True], groups[1:] != groups[:-1]]))
+        ends = np.concatenate([starts[1:], [len(numbers)]]) - 1
+        minimums[groups[starts]] = numbers[starts]
+        maximums[groups[starts]] = numbers[ends]
+    means, weights, centroid_groups = compress_centroids(
+        numbers, np.ones(len(numbers)), groups, compression
+    )
+    return interpolate_quantiles(
+        means, weights, centroid_groups, minimums, maximums, quantile
+    )
+
+
+def _group_numbers(data: SeriesGroupBy) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Return the group number of every row, -1 for rows in no group, and the group
+    keys in the order of the numbers
+    :param data:
+    :return:
+    """
+    # Rows with null keys are numbered NaN instead of -1 by some pandas versions
+    groups = data.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return groups, data.grouper.result_index
+
+
+def _masked(data: pd.Series, mask: Optional[pd.Series]) -> pd.Series:
+    return data if mask is None else data[mask]
+
+
+@execute_node.register(ApproxCountDistinct, pd.Series, (pd.Series, type(None)))
+def execute_approx_count_distinct_series(op, data, mask, **kwargs):
+    data = _masked(data, mask)
+    return int(
+        grouped_count_distinct(
+            data, np.zeros(len(data), dtype=np.int64), 1, op.precision
+        )[0]
+    )
+
+
+@execute_node.register(ApproxCountDistinct, SeriesGroupBy, type(None))
+def execute_approx_count_distinct_series_groupby(
+    op, data, mask, aggcontext=None, **kwargs
+):
+    if not isinstance(aggcontext, Summarize):
+        return aggcontext.agg(
+            data,
+            lambda values: grouped_count_distinct(
+                values, np.zeros(len(values), dtype=np.int64), 1, op.precision
+            )[0],
+        )
+    groups, keys = _group_numbers(data)
+    return pd.Series(
+        grouped_count_distinct(data.obj, groups, len(keys), op.precision),
+        index=keys,
+        name=data.obj.name,
+    )
+
+
+@execute_node.register(ApproxPercentile, pd.Series, (pd.Series, type(None)))
+def execute_approx_percentile_series(op, data, mask, **kwargs):
+    data = _masked(data, mask)
+    return float(
+        grouped_percentile(
+            data,
+            np.zeros(len(data), dtype=np.int64),
+            1,
+            op.quantile,
+            op.compression,
+        )[0]
+    )
+
+
+@execute_node.register(ApproxPercentile, SeriesGroupBy, type(None))
+def execute_approx_percentile_series_groupby(op, data, mask, aggcontext=None, **kwargs):
+    if not isinstance(aggcontext, Summarize):
+        return aggcontext.agg(
+            data,
+            lambda values: grouped_percentile(
+                values,
+                np.zeros(len(values), dtype=np.int64),
+                1,
+                op.quantile,
+                op.compression,
+            )[0],
+        )
+    groups, keys = _group_numbers(data)
+    return pd.Series(
+        grouped_percentile(data.obj, groups, len(keys), op.quantile, op.compression),
+        index=keys,
+        name=data.obj.name,
+    )
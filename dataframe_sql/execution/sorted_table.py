@@ -0,0 +1,168 @@
+"""
+Execution of aggregations and filters over tables in a known order
+
+An aggregation over runs finds the first row of every group as the rows whose
+keys differ from those of the row before, and reduces the values of every run
+with one call of the reduceat method of a numpy ufunc. A range scan finds the
+first and last rows of a range of a sorted column with two binary searches and
+takes the rows between them as one slice. Inputs whose keys or values have
+nulls, which pandas leaves out of groups and comparisons, are aggregated and
+filtered as they otherwise would be.
+"""
+import functools
+import operator
+from typing import Dict, Optional, Sequence
+
+from ibis.backends.pandas.core import execute
+from ibis.backends.pandas.dispatch import execute_node
+from ibis.backends.pandas.execution.generic import execute_aggregation_dataframe
+import ibis.expr.operations as ops
+from ibis.expr.scope import Scope
+import ibis.expr.types as ir
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.execution.aggregation import sort_aggregation_result
+from dataframe_sql.operations import RunAggregation, SortedRangeScan
+
+_RUN_UFUNCS: Dict[type, np.ufunc] = {
+    ops.Sum: np.add,
+    ops.Min: np.minimum,
+    ops.Max: np.maximum,
+}
+
+
+def _filter(
+    table: ir.TableExpr,
+    predicates: Sequence[ir.Expr],
+    data: pd.DataFrame,
+    scope: Optional[Scope],
+    **kwargs,
+) -> pd.DataFrame:
+    if not predicates:
+        return data
+    scope = Scope() if scope is None else scope
+    data_scope = scope.merge_scope(Scope({table.op(): data}, kwargs.get("timecontext")))
+    predicate = functools.reduce(
+        operator.and_,
+        (execute(predicate, scope=data_scope, **kwargs) for predicate in predicates),
+    )
+    return data.loc[predicate]
+
+
+def run_starts(keys: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Return the positions of the rows that start a run of equal keys
+    :param keys: Key values of the rows, one array per key
+    :return:
+    """
+    rows = len(keys[0])
+    if not rows:
+        return np.zeros(0, dtype=np.int64)
+    changed = np.zeros(rows - 1, dtype=bool)
+    for key in keys:
+        changed |= key[1:] != key[:-1]
+    return np.concatenate([[0], np.flatnonzero(changed) + 1])
+
+
+def _has_nulls(column: pd.Series) -> bool:
+    return bool(column.isna().any())
+
+
+def _run_values(metric: ir.Expr, data: pd.DataFrame, starts, counts):
+    """
+    Return the value of a metric for every run, or None if it cannot be computed
+    from runs because its column has nulls or is not numeric
+    :param metric:
+    :param data:
+    :param starts:
+    :param counts:
+    :return:
+    """
+    op = metric.op()
+    if isinstance(op, ops.Count) and isinstance(op.arg, ir.TableExpr):
+        return counts
+    column = data[op.arg.op().name]
+    if _has_nulls(column):
+        return None
+    if isinstance(op, ops.Count):
+        return counts
+    values = column.to_numpy()
+    if values.dtype.kind not in "iuf":
+        return None
+    if isinstance(op, ops.Mean):
+        return np.add.reduceat(values.astype(np.float64), starts) / counts
+    return _RUN_UFUNCS[type(op)].reduceat(values, starts)
+
+
+@execute_node.register(RunAggregation, pd.DataFrame)
+def execute_run_aggregation(op, data, scope=None, **kwargs):
+    aggregation_op = op.aggregation.op()
+    data = _filter(
+        aggregation_op.table, aggregation_op.predicates, data, scope, **kwargs
+    )
+    key_columns = [data[key.op().name] for key in aggregation_op.by]
+    result: Optional[dict] = None
+    if len(data) and not any(_has_nulls(column) for column in key_columns):
+        keys = [column.to_numpy() for column in key_columns]
+        starts = run_starts(keys)
+        counts = np.diff(np.append(starts, len(data)))
+        result = {
+            key.get_name(): values[starts]
+            for key, values in zip(aggregation_op.by, keys)
+        }
+        for metric in aggregation_op.metrics:
+            values = _run_values(metric, data, starts, counts)
+            if values is None:
+                result = None
+                break
+            result[metric.get_name()] = values
+    if result is None:
+        unfiltered = ops.Aggregation(
+            aggregation_op.table, aggregation_op.metrics, aggregation_op.by
+        )
+        return sort_aggregation_result(
+            aggregation_op,
+            execute_aggregation_dataframe(unfiltered, data, scope=scope, **kwargs),
+        )
+    return sort_aggregation_result(aggregation_op, pd.DataFrame(result))
+
+
+def sorted_range(
+    column: pd.Series,
+    lower=None,
+    lower_inclusive: bool = True,
+    upper=None,
+    upper_inclusive: bool = True,
+) -> slice:
+    """
+    Return the slice of the rows of a sorted column whose values lie in a range
+    :param column: Column in ascending order without nulls
+    :param lower: Lower bound, or None for no lower bound
+    :param lower_inclusive:
+    :param upper: Upper bound, or None for no upper bound
+    :param upper_inclusive:
+    :return:
+    """
+    start = 0
+    stop = len(column)
+    if lower is not None:
+        start = int(
+            column.searchsorted(lower, side="left" if lower_inclusive else "right")
+        )
+    if upper is not None:
+        stop = int(
+            column.searchsorted(upper, side="right" if upper_inclusive else "left")
+        )
+    return slice(start, max(start, stop))
+
+
+@execute_node.register(SortedRangeScan, pd.DataFrame)
+def execute_sorted_range_scan(op, data, scope=None, **kwargs):
+    column = data[op.column]
+    # Nulls are sorted first or last, and would be taken as in the range
+    if len(column) and (pd.isnull(column.iloc[0]) or pd.isnull(column.iloc[-1])):
+        return _filter(op.table, op.predicates, data, scope, **kwargs)
+    return data.iloc[
+        sorted_range(column, op.lower, op.lower_inclusive, op.upper, op.upper_inclusive)
+    ]
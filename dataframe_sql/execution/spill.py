@@ -0,0 +1,217 @@
+"""
+Temporary storage of frames that out-of-core operators spill to local disk
+
+Frames are written in a columnar layout of .npy files, so that a block of rows
+of a spilled frame is read back without reading the rest of it. Operators that
+partition their input by the hash of some keys buffer the partitions in memory
+and spill the largest ones while the buffers hold too many rows.
+
+Spill files live in a temporary directory that is removed once the operator is
+done, under the directory named by the DATAFRAME_SQL_SPILL_DIR environment
+variable or else the system temporary directory.
+"""
+from contextlib import contextmanager
+import os
+from pathlib import Path
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype, is_numeric_dtype
+
+SPILL_DIR_VARIABLE = "DATAFRAME_SQL_SPILL_DIR"
+
+
+@contextmanager
+def spill_directory(prefix: str) -> Iterator[Path]:
+    """
+    Create a temporary directory for spill files that is removed on exit
+    :param prefix: Prefix of the name of the directory
+    :return:
+    """
+    parent: Optional[str] = os.environ.get(SPILL_DIR_VARIABLE)
+    if parent is not None:
+        Path(parent).mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=prefix, dir=parent) as directory:
+        yield Path(directory)
+
+
+def partition_numbers(
+    keys: pd.DataFrame, partitions: int, level: int = 0
+) -> np.ndarray:
+    """
+    Return the partition of every row by the hash of its keys. Numeric keys are
+    hashed as floats, so that equal numbers of different dtypes, such as the keys
+    of the two inputs of a join, land in the same partition.
+    :param keys: Key columns
+    :param partitions: Number of partitions
+    :param level: Number of times the rows were partitioned before, which selects
+                  a different hash
+    :return:
+    """
+    keys = keys.apply(
+        lambda values: values.astype(np.float64)
+        if is_numeric_dtype(values.dtype) and not is_categorical_dtype(values.dtype)
+        else values
+    )
+    hashes = pd.util.hash_pandas_object(
+        keys, index=False, hash_key=f"dataframe_sql{level:03d}"
+    ).to_numpy()
+    return (hashes % np.uint64(partitions)).astype(np.intp)
+
+
+def _is_numpy_dtype(dtype) -> bool:
+    return isinstance(dtype, np.dtype) and dtype != np.dtype(object)
+
+
+class SpilledFrame:
+    """
+    Frame written to disk column by column. Columns of a NumPy dtype are written
+    to one file each that is memory mapped when read, and other columns to one
+    file per block of rows.
+    """
+
+    def __init__(self, directory: Path, frame: pd.DataFrame, block_rows: int):
+        self.directory = directory
+        self.columns = frame.columns
+        self.dtypes = list(frame.dtypes)
+        # Copied so that it does not keep the spilled frame alive
+        self._empty = frame.iloc[:0].copy()
+        self.rows = len(frame)
+        self.block_rows = max(block_rows, 1)
+        self._mapped: Dict[int, np.ndarray] = {}
+        directory.mkdir(parents=True)
+        for position, dtype in enumerate(self.dtypes):
+            values = frame.iloc[:, position].to_numpy()
+            if _is_numpy_dtype(dtype):
+                np.save(self._path(position), values)
+                continue
+            for block_number in range(self.blocks):
+                start = block_number * self.block_rows
+                np.save(
+                    self._path(position, block_number),
+                    values[start : start + self.block_rows],
+                    allow_pickle=True,
+                )
+
+    @property
+    def blocks(self) -> int:
+        return -(-self.rows // self.block_rows)
+
+    def _path(self, position: int, block_number: Optional[int] = None) -> Path:
+        if block_number is None:
+            return self.directory / f"{position}.npy"
+        return self.directory / f"{position}-{block_number}.npy"
+
+    def _read_column(self, position: int, block_number: int) -> pd.Series:
+        dtype = self.dtypes[position]
+        if not _is_numpy_dtype(dtype):
+            values = np.load(self._path(position, block_number), allow_pickle=True)
+            return pd.Series(values).astype(dtype, copy=False)
+        if position not in self._mapped:
+            self._mapped[position] = np.load(self._path(position), mmap_mode="r")
+        start = block_number * self.block_rows
+        return pd.Series(
+            np.array(self._mapped[position][start : start + self.block_rows])
+        )
+
+    def read_block(self, block_number: int) -> pd.DataFrame:
+        """
+        Read a block of rows back with the dtypes of the spilled frame
+        :param block_number:
+        :return:
+        """
+        block = pd.DataFrame(
+            {
+                position: self._read_column(position, block_number)
+                for position in range(len(self.dtypes))
+            },
+            columns=range(len(self.dtypes)),
+        )
+        block.columns = self.columns
+        return block
+
+    def close(self):
+        """
+        Release the memory mapped columns, which must be done before the files are
+        removed on some platforms
+        :return:
+        """
+        self._mapped.clear()
+
+    def read(self) -> pd.DataFrame:
+        """
+        Read the whole frame back
+        :return:
+        """
+        return pd.concat(
+            [self.read_block(block_number) for block_number in range(self.blocks)]
+            or [self._empty],
+            ignore_index=True,
+        )
+
+
+class SpilledPartitions:
+    """
+    Rows split into partitions that are buffered in memory, spilling the largest
+    buffer to disk while the buffers hold more than buffer_rows rows. The rows of
+    every partition are read back in the order they were added.
+    """
+
+    def __init__(self, directory: Path, partitions: int, buffer_rows: int):
+        self.directory = directory
+        self.partitions = partitions
+        self.buffer_rows = buffer_rows
+        self._buffered: List[List[pd.DataFrame]] = [[] for _ in range(partitions)]
+        self._buffered_rows = np.zeros(partitions, dtype=np.int64)
+        self._spilled: List[List[SpilledFrame]] = [[] for _ in range(partitions)]
+        self._spilled_rows = np.zeros(partitions, dtype=np.int64)
+
+    def rows(self, number: int) -> int:
+        return int(self._buffered_rows[number] + self._spilled_rows[number])
+
+    def append(self, chunk: pd.DataFrame, numbers: np.ndarray):
+        """
+        Add the rows of a chunk to their partitions
+        :param chunk:
+        :param numbers: Partition of every row
+        :return:
+        """
+        ends = np.cumsum(np.bincount(numbers, minlength=self.partitions))
+        chunk = chunk.iloc[np.argsort(numbers, kind="stable")]
+        start = 0
+        for number, end in enumerate(ends):
+            if end > start:
+                self._buffered[number].append(chunk.iloc[start:end])
+                self._buffered_rows[number] += end - start
+            start = end
+        del chunk
+        while self._buffered_rows.sum() > self.buffer_rows:
+            self._spill(int(np.argmax(self._buffered_rows)))
+
+    def _spill(self, number: int):
+        frame = pd.concat(self._buffered[number])
+        spilled = self._spilled[number]
+        spilled.append(
+            SpilledFrame(self.directory / f"{number}-{len(spilled)}", frame, len(frame))
+        )
+        self._spilled_rows[number] += len(frame)
+        self._buffered[number] = []
+        self._buffered_rows[number] = 0
+
+    def read(self, number: int) -> Iterator[pd.DataFrame]:
+        """
+        Yield the rows of a partition, releasing them as they are read
+        :param number:
+        :return:
+        """
+        spilled = self._spilled[number]
+        buffered = self._buffered[number]
+        while spilled:
+            spilled_frame = spilled.pop(0)
+            frame = spilled_frame.read()
+            spilled_frame.close()
+            yield frame
+        while buffered:
+            yield buffered.pop(0)
@@ -0,0 +1,351 @@
+"""
+Accounting of the time and memory used by a query and by each of its operators
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import re
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from ibis.backends.pandas.dispatch import post_execute
+import ibis.expr.operations as ops
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.exceptions import MemoryLimitExceeded
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+# Object columns are sized from a sample of their values
+OBJECT_SAMPLE_SIZE = 1000
+MEMORY_UNITS = {
+    "": 1,
+    "b": 1,
+    "kb": 10 ** 3,
+    "mb": 10 ** 6,
+    "gb": 10 ** 9,
+    "tb": 10 ** 12,
+    "kib": 2 ** 10,
+    "mib": 2 ** 20,
+    "gib": 2 ** 30,
+    "tib": 2 ** 40,
+}
+MEMORY_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d*)?|\.\d+)\s*([a-z]*)\s*$")
+
+_ACTIVE_STATS: ContextVar[Optional["QueryStats"]] = ContextVar(
+    "active_query_stats", default=None
+)
+_MEMORY_LIMIT: ContextVar[Optional[int]] = ContextVar("memory_limit", default=None)
+
+
+class OperatorStats:
+    """
+    Size of the frame or series that an operator of the query produced. Scans of
+    the blocks of tables with zone maps also count the blocks of the table and
+    the blocks that they skipped.
+    """
+
+    def __init__(
+        self,
+        operator: str,
+        rows: int,
+        size: int,
+        blocks: Optional[int] = None,
+        blocks_skipped: Optional[int] = None,
+    ):
+        self.operator = operator
+        self.rows = rows
+        self.size = size
+        self.blocks = blocks
+        self.blocks_skipped = blocks_skipped
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {"operator": self.operator, "rows": self.rows, "bytes": self.size}
+        if self.blocks is not None:
+            result["blocks"] = self.blocks
+            result["blocks_skipped"] = self.blocks_skipped
+        return result
+
+    def __repr__(self):
+        blocks = (
+            ""
+            if self.blocks is None
+            else f", blocks_skipped={self.blocks_skipped}/{self.blocks}"
+        )
+        return (
+            f"OperatorStats({self.operator}, rows={self.rows}, "
+            f"bytes={self.size}{blocks})"
+        )
+
+
+class QueryStats:
+    """
+    Execution statistics of a query. Intermediate sizes are those of the frames
+    and series produced by each operator, which may share memory with the frames
+    they were computed from. The peak RSS is the high water mark of the process,
+    and the RSS growth how much the query raised it.
+    """
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.operators: List[OperatorStats] = []
+        self.elapsed: float = 0.0
+        self.result_rows: Optional[int] = None
+        self.result_size: Optional[int] = None
+        self.peak_traced_memory: Optional[int] = None
+        self.peak_rss: Optional[int] = None
+        self.rss_growth: Optional[int] = None
+        # Blocks counted by scans of zone maps until their results are recorded
+        self._block_counts: Dict[ops.Node, Tuple[int, int]] = {}
+
+    @property
+    def peak_intermediate_size(self) -> int:
+        """
+        Size in bytes of the largest intermediate result
+        :return:
+        """
+        return max((operator.size for operator in self.operators), default=0)
+
+    @property
+    def total_intermediate_size(self) -> int:
+        """
+        Sum of the sizes in bytes of all intermediate results
+        :return:
+        """
+        return sum(operator.size for operator in self.operators)
+
+    @property
+    def blocks_skipped(self) -> int:
+        """
+        Number of blocks of tables that scans of zone maps skipped
+        :return:
+        """
+        return sum(operator.blocks_skipped or 0 for operator in self.operators)
+
+    def record_result(self, result: pd.DataFrame):
+        self.result_rows = len(result)
+        self.result_size = estimate_size(result)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "elapsed": self.elapsed,
+            "result_rows": self.result_rows,
+            "result_bytes": self.result_size,
+            "peak_intermediate_bytes": self.peak_intermediate_size,
+            "total_intermediate_bytes": self.total_intermediate_size,
+            "peak_traced_memory": self.peak_traced_memory,
+            "peak_rss": self.peak_rss,
+            "rss_growth": self.rss_growth,
+            "blocks_skipped": self.blocks_skipped,
+            "operators": [operator.to_dict() for operator in self.operators],
+        }
+
+    def __repr__(self):
+        return (
+            f"QueryStats(elapsed={self.elapsed:.6f}s, "
+            f"operators={len(self.operators)}, "
+            f"peak_intermediate_bytes={self.peak_intermediate_size}, "
+            f"peak_traced_memory={self.peak_traced_memory}, "
+            f"peak_rss={self.peak_rss})"
+        )
+
+
+def estimate_size(data: Union[pd.DataFrame, pd.Series]) -> int:
+    """
+    Return the approximate number of bytes that a frame or series holds, including
+    the strings and other objects its object columns point to
+    :param data:
+    :return:
+    """
+    size = data.memory_usage(index=True, deep=False)
+    size = int(size.sum()) if isinstance(size, pd.Series) else int(size)
+    columns = data.items() if isinstance(data, pd.DataFrame) else [(None, data)]
+    for _, column in columns:
+        if column.dtype == np.dtype(object) and len(column):
+            values = column.to_numpy()
+            step = max(len(values) // OBJECT_SAMPLE_SIZE, 1)
+            sample = values[::step][:OBJECT_SAMPLE_SIZE]
+            size += int(
+                np.mean([sys.getsizeof(value) for value in sample]) * len(values)
+            )
+    return size
+
+
+def parse_memory_size(size: Union[int, str]) -> int:
+    """
+    Return the number of bytes of a memory size such as 4GB, 512MiB or 1000
+    :param size: Number of bytes, or a number followed by a decimal (KB, MB, GB,
+                 TB) or binary (KiB, MiB, GiB, TiB) unit
+    :return:
+    """
+    if isinstance(size, (int, np.integer)) and not isinstance(size, bool):
+        number, unit = float(size), ""
+    else:
+        match = MEMORY_SIZE_PATTERN.match(str(size).lower())
+        if match is None or match.group(2) not in MEMORY_UNITS:
+            raise ValueError(
+                f"Invalid memory size '{size}', expected a number of bytes or a "
+                f"size such as '4GB' or '512MiB'"
+            )
+        number, unit = float(match.group(1)), match.group(2)
+    if number <= 0:
+        raise ValueError(f"Memory size '{size}' must be positive")
+    return int(number * MEMORY_UNITS[unit])
+
+
+def format_memory_size(size: float) -> str:
+    """
+    Return a number of bytes in the largest binary unit it reaches
+    :param size:
+    :return:
+    """
+    for unit in ("TiB", "GiB", "MiB", "KiB"):
+        if size >= MEMORY_UNITS[unit.lower()]:
+            return f"{size / MEMORY_UNITS[unit.lower()]:.1f}{unit}"
+    return f"{int(size)}B"
+
+
+def max_rss() -> Optional[int]:
+    """
+    Return the highest resident set size of the process so far in bytes, or None
+    where the platform does not report it
+    :return:
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def record_block_counts(op: ops.Node, blocks: int, blocks_skipped: int):
+    """
+    Record how many blocks of its table a scan had and how many it skipped, which
+    are reported with the size of its result when statistics are collected
+    :param op:
+    :param blocks:
+    :param blocks_skipped:
+    :return:
+    """
+    stats = _ACTIVE_STATS.get()
+    if stats is not None:
+        stats._block_counts[op] = (blocks, blocks_skipped)
+
+
+@post_execute.register(ops.Node, object)
+def account_operator_result(op, data, **kwargs):
+    """
+    Record the size of the result of an operator when statistics are collected,
+    and stop the query when it exceeds the memory limit
+    :param op:
+    :param data:
+    :return:
+    """
+    stats = _ACTIVE_STATS.get()
+    memory_limit = _MEMORY_LIMIT.get()
+    # Registered tables are not allocated by the query
+    if (
+        (stats is not None or memory_limit is not None)
+        and isinstance(data, (pd.DataFrame, pd.Series))
+        and not isinstance(op, ops.PhysicalTable)
+    ):
+        size = estimate_size(data)
+        if stats is not None:
+            stats.operators.append(
+                OperatorStats(
+                    type(op).__name__,
+                    len(data),
+                    size,
+                    *stats._block_counts.pop(op, (None, None)),
+                )
+            )
+        if memory_limit is not None and size > memory_limit:
+            raise MemoryLimitExceeded(
+                f"The result of {type(op).__name__} takes "
+                f"{format_memory_size(size)}, more than the memory limit of "
+                f"{format_memory_size(memory_limit)}"
+            )
+    return data
+
+
+@contextmanager
+def enforce_memory_limit(memory_limit: Optional[int]) -> Iterator[None]:
+    """
+    Stop the query executed in the context as soon as the result of one of its
+    operators takes more than the memory limit
+    :param memory_limit: Limit in bytes, None for no limit
+    :return:
+    """
+    token = _MEMORY_LIMIT.set(memory_limit)
+    try:
+        yield
+    finally:
+        _MEMORY_LIMIT.reset(token)
+
+
+@contextmanager
+def _traced_memory(enabled: bool) -> Iterator[List[int]]:
+    """
+    Trace allocations while in the context and leave the peak number of bytes
+    allocated in the yielded list
+    :param enabled: Whether to trace, in which case no tracing may be under way
+    :return:
+    """
+    peak: List[int] = []
+    if not enabled:
+        yield peak
+        return
+    if tracemalloc.is_tracing():
+        raise RuntimeError("Memory allocations are already being traced")
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        yield peak
+        peak.append(tracemalloc.get_traced_memory()[1] - start)
+    finally:
+        tracemalloc.stop()
+
+
+def trace_peak_memory(function: Callable[[], Any]) -> int:
+    """
+    Return the peak number of bytes allocated while calling the function, beyond
+    those allocated before it was called. Tracing slows down allocations, so the
+    function should not be timed at the same time.
+    :param function:
+    :return:
+    """
+    with _traced_memory(True) as peak:
+        function()
+    return peak[0]
+
+
+@contextmanager
+def collect_query_stats(sql: str, trace_memory: bool = False) -> Iterator[QueryStats]:
+    """
+    Record the statistics of the query executed in the context
+    :param sql: Query text
+    :param trace_memory: Whether to trace allocations with tracemalloc, which
+                         slows down the query
+    :return:
+    """
+    stats = QueryStats(sql)
+    token = _ACTIVE_STATS.set(stats)
+    rss_before = max_rss()
+    start = time.perf_counter()
+    try:
+        with _traced_memory(trace_memory) as peak:
+            yield stats
+        if peak:
+            stats.peak_traced_memory = peak[0]
+    finally:
+        stats.elapsed = time.perf_counter() - start
+        _ACTIVE_STATS.reset(token)
+        stats.peak_rss = max_rss()
+        if stats.peak_rss is not None and rss_before is not None:
+            stats.rss_growth = stats.peak_rss - rss_before
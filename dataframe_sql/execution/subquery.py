@@ -0,0 +1,87 @@
+"""
+Execution of subquery predicates as hash semi joins and anti joins
+"""
+from typing import List, Sequence
+
+from ibis.backends.pandas.core import execute
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.execution.join_algorithms import factorize_join_keys, semi_join
+from dataframe_sql.operations import SubqueryMembership
+
+
+def _matches(
+    outer_keys: Sequence[pd.Series],
+    inner_keys: Sequence[pd.Series],
+    outer_length: int,
+    inner_length: int,
+) -> np.ndarray:
+    """
+    Return whether each row of the enclosing query matches a row of the subquery
+    on all keys. Without keys every row matches if the subquery has any rows.
+    :param outer_keys: Key values of the enclosing query
+    :param inner_keys: Key values of the subquery
+    :param outer_length: Number of rows of the enclosing query
+    :param inner_length: Number of rows of the subquery
+    :return:
+    """
+    if not outer_keys:
+        return np.full(outer_length, inner_length > 0)
+    outer_codes, inner_codes = factorize_join_keys(outer_keys, inner_keys, sort=False)
+    return semi_join(outer_codes, inner_codes)
+
+
+def _not_in(
+    value: pd.Series,
+    inner_value: pd.Series,
+    keys: List[pd.Series],
+    inner_keys: List[pd.Series],
+) -> np.ndarray:
+    """
+    Evaluate NOT IN with the SQL null semantics: the predicate is true when the
+    subquery has no rows for the correlation keys of the row, and otherwise only
+    when the value is not null, has no match and the subquery has no null value,
+    since comparisons with null are unknown rather than false
+    :param value: Tested values of the enclosing query
+    :param inner_value: Selected values of the subquery
+    :param keys: Correlation keys of the enclosing query
+    :param inner_keys: Correlation keys of the subquery
+    :return:
+    """
+    length = len(value)
+    has_rows = _matches(keys, inner_keys, length, len(inner_value))
+    matched = _matches([value] + keys, [inner_value] + inner_keys, length, 0)
+    inner_nulls = inner_value.isnull().to_numpy()
+    has_nulls = _matches(
+        keys,
+        [inner_key[inner_nulls] for inner_key in inner_keys],
+        length,
+        int(inner_nulls.sum()),
+    )
+    return ~has_rows | (value.notnull().to_numpy() & ~matched & ~has_nulls)
+
+
+@execute_node.register(SubqueryMembership, pd.Series)
+def execute_subquery_membership(op, anchor, **kwargs):
+    values = [
+        pd.Series(execute(value, **kwargs), index=anchor.index) for value in op.values
+    ]
+    subquery = execute(op.subquery)
+    inner_columns = [
+        subquery.iloc[:, position] for position in range(subquery.shape[1])
+    ]
+    tests_value = op.kind in ("in", "not_in")
+    keys = list(values[1:] if tests_value else values)
+    inner_keys = inner_columns[len(inner_columns) - len(keys) :]
+    if op.kind == "not_in":
+        mask = _not_in(values[0], inner_columns[0], keys, inner_keys)
+    else:
+        if tests_value:
+            keys = [values[0]] + keys
+            inner_keys = [inner_columns[0]] + inner_keys
+        mask = _matches(keys, inner_keys, len(anchor), len(subquery))
+        if op.kind == "not_exists":
+            mask = ~mask
+    return pd.Series(mask, index=anchor.index)
@@ -0,0 +1,69 @@
+"""
+Execution of scans of the blocks of tables that zone maps cannot rule out
+
+The blocks that may have rows in the range of every column of the scan are
+found from the minimums and maximums of the zone maps alone, and their rows are
+taken together without reading the values of the others. The table is returned
+as it is when no block is skipped, and a slice of it when the blocks that are
+read are consecutive, as they are for ranges of columns that the table is
+ordered by.
+"""
+from typing import Union
+
+from ibis.backends.pandas.dispatch import execute_node
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.execution.stats import record_block_counts
+from dataframe_sql.operations import ZoneMapScan
+from dataframe_sql.optimizer.cardinality import table_statistics
+
+
+def block_rows(
+    blocks: np.ndarray, block_size: int, rows: int
+) -> Union[slice, np.ndarray]:
+    """
+    Return the positions of the rows of the blocks of a table, as a slice if the
+    blocks are consecutive
+    :param blocks: Whether each block of the table is taken
+    :param block_size: Number of rows of every block except the last
+    :param rows: Number of rows of the table
+    :return:
+    """
+    taken = np.flatnonzero(blocks)
+    if not len(taken):
+        return slice(0, 0)
+    if taken[-1] - taken[0] + 1 == len(taken):
+        return slice(taken[0] * block_size, min((taken[-1] + 1) * block_size, rows))
+    positions = (taken[:, np.newaxis] * block_size + np.arange(block_size)).ravel()
+    return positions[positions < rows]
+
+
+@execute_node.register(ZoneMapScan, pd.DataFrame)
+def execute_zone_map_scan(op, data, **kwargs):
+    statistics = table_statistics(op.table.op())
+    if (
+        statistics is None
+        or statistics.zone_map_block_size is None
+        or statistics.row_count != len(data)
+    ):
+        return data
+    blocks = None
+    for column, lower, lower_inclusive, upper, upper_inclusive in op.ranges:
+        zone_map = statistics.zone_map(column)
+        if zone_map is None:
+            continue
+        if pd.api.types.is_datetime64_dtype(data[column].dtype):
+            lower = None if lower is None else pd.Timestamp(lower).to_datetime64()
+            upper = None if upper is None else pd.Timestamp(upper).to_datetime64()
+        in_range = zone_map.blocks_in_range(
+            lower, lower_inclusive, upper, upper_inclusive
+        )
+        blocks = in_range if blocks is None else blocks & in_range
+    if blocks is None:
+        return data
+    skipped = len(blocks) - int(blocks.sum())
+    record_block_counts(op, len(blocks), skipped)
+    if not skipped:
+        return data
+    return data.iloc[block_rows(blocks, statistics.zone_map_block_size, len(data))]
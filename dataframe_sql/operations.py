@@ -0,0 +1,528 @@
+"""
+Operations that dataframe_sql adds on top of the ibis expression language
+"""
+import functools
+from typing import Optional
+
+import ibis.expr.datatypes as dt
+import ibis.expr.operations as ops
+import ibis.expr.rules as rlz
+from ibis.expr.signature import Argument as Arg
+import ibis.expr.types as ir
+import numpy as np
+import pandas as pd
+
+JOIN_TYPES = ("inner", "left", "right", "outer")
+JOIN_STRATEGIES = ("hash", "sort_merge", "broadcast", "grace")
+JOIN_SIDES = ("left", "right")
+SUBQUERY_MEMBERSHIP_KINDS = ("in", "not_in", "exists", "not_exists")
+IN_LIST_KINDS = ("in", "not_in")
+SAMPLE_METHODS = ("bernoulli", "system", "rows")
+
+
+class PhysicalJoin(ops.Join):
+    """
+    Join chosen by the query planner. Unlike the ibis joins, the predicates may
+    reference any table beneath either input, so physical joins can be nested in
+    any order.
+
+    The strategy selects the join algorithm and the build side is the input that
+    the hash table is built from, or that is broadcast to every partition of the
+    other input. A grace join spills both inputs to disk in the given number of
+    partitions, or in a default number of them when it is None.
+
+    Columns are the names of the columns of the inputs that are read above the
+    join, which are the only ones whose paired rows it gathers, or None to
+    gather all of them.
+    """
+
+    how = Arg(rlz.isin(set(JOIN_TYPES)), default="inner")
+    strategy = Arg(rlz.isin(set(JOIN_STRATEGIES)), default="hash")
+    build_side = Arg(rlz.isin(set(JOIN_SIDES)), default="right")
+    partitions = Arg(rlz.noop, default=None)
+    columns = Arg(rlz.noop, default=None)
+
+    def __init__(
+        self,
+        left,
+        right,
+        predicates,
+        how="inner",
+        strategy="hash",
+        build_side="right",
+        partitions=None,
+        columns=None,
+    ):
+        ops._validate_join_tables(left, right)
+        left, right, predicates = ops._make_distinct_join_predicates(
+            left, right, predicates
+        )
+        if columns is not None:
+            columns = tuple(sorted(columns))
+        ops.TableNode.__init__(
+            self,
+            left,
+            right,
+            predicates,
+            how,
+            strategy,
+            build_side,
+            partitions,
+            columns,
+        )
+
+    @property
+    def inputs(self):
+        return self.left, self.right
+
+
+class ExternalSort(ops.TableNode):
+    """
+    Sort that spills sorted runs of run_rows rows to disk and merges them, chosen
+    by the query planner for sorts that would exceed the memory limit. The sort
+    keys are columns of the table. Only the limit rows after the first offset
+    rows are kept if a limit is given.
+    """
+
+    table = Arg(ir.TableExpr)
+    by = Arg(rlz.noop)
+    ascending = Arg(rlz.noop)
+    run_rows = Arg(rlz.validator(int))
+    limit = Arg(rlz.noop, default=None)
+    offset = Arg(rlz.validator(int), default=0)
+
+    def __init__(self, table, by, ascending, run_rows, limit=None, offset=0):
+        super().__init__(table, tuple(by), tuple(ascending), run_rows, limit, offset)
+
+    @property
+    def inputs(self):
+        return (self.table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.table.schema()
+
+    def has_schema(self):
+        return self.table.op().has_schema()
+
+    def root_tables(self):
+        return [self]
+
+
+class PartitionedAggregation(ops.TableNode):
+    """
+    Aggregation that partitions its input by the hash of the group keys, spills
+    partitions to disk while more than partition_rows rows are buffered, and
+    aggregates every partition on its own. It is chosen by the query planner for
+    aggregations that would exceed the memory limit. The group keys are columns
+    of the table, and the groups of the result are in the order that the
+    aggregation it replaces would give them.
+    """
+
+    aggregation = Arg(ir.TableExpr)
+    partitions = Arg(rlz.validator(int))
+    partition_rows = Arg(rlz.validator(int))
+
+    @property
+    def inputs(self):
+        return (self.aggregation.op().table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.aggregation.schema()
+
+    def has_schema(self):
+        return True
+
+    def root_tables(self):
+        return [self]
+
+
+class CompiledAggregation(ops.TableNode):
+    """
+    Filter, projection and aggregation of a table that the query planner compiled
+    into a single loop over the columns of the table. The columns are the names of
+    the columns of the table that the programs read, in the order that the
+    programs number them, as in FusedExpression. Rows for which the predicate
+    program is true are aggregated, by the values of the columns named by if any.
+    Every metric is a pair of the kind of aggregate, such as "sum" or
+    "count_star", and the program of its argument.
+    """
+
+    aggregation = Arg(ir.TableExpr)
+    table = Arg(ir.TableExpr)
+    columns = Arg(rlz.noop)
+    predicate = Arg(rlz.noop)
+    by = Arg(rlz.noop)
+    metrics = Arg(rlz.noop)
+
+    def __init__(self, aggregation, table, columns, predicate, by, metrics):
+        super().__init__(
+            aggregation, table, tuple(columns), predicate, tuple(by), tuple(metrics)
+        )
+
+    @property
+    def inputs(self):
+        return (self.table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.aggregation.schema()
+
+    def has_schema(self):
+        return True
+
+    def root_tables(self):
+        return [self]
+
+
+class RunAggregation(ops.TableNode):
+    """
+    Aggregation of a table that is sorted by its group keys, so that the rows of
+    every group are consecutive. Groups are found where the keys change from one
+    row to the next instead of by hashing the keys. It is chosen by the query
+    planner, and the groups of the result are in the order that the aggregation
+    it replaces would give them.
+    """
+
+    aggregation = Arg(ir.TableExpr)
+
+    @property
+    def inputs(self):
+        return (self.aggregation.op().table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.aggregation.schema()
+
+    def has_schema(self):
+        return True
+
+    def root_tables(self):
+        return [self]
+
+
+class SortedRangeScan(ops.TableNode):
+    """
+    Rows of a table that is sorted by a column whose values of the column lie in
+    a range, which are found by binary search instead of comparing every value.
+    A bound of None leaves the range open on that side. The predicates are those
+    that the range replaces.
+    """
+
+    table = Arg(ir.TableExpr)
+    column = Arg(rlz.instance_of(str))
+    lower = Arg(rlz.noop)
+    lower_inclusive = Arg(rlz.validator(bool))
+    upper = Arg(rlz.noop)
+    upper_inclusive = Arg(rlz.validator(bool))
+    predicates = Arg(rlz.noop)
+
+    def __init__(
+        self, table, column, lower, lower_inclusive, upper, upper_inclusive, predicates
+    ):
+        super().__init__(
+            table,
+            column,
+            lower,
+            lower_inclusive,
+            upper,
+            upper_inclusive,
+            tuple(predicates),
+        )
+
+    @property
+    def inputs(self):
+        return (self.table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.table.schema()
+
+    def has_schema(self):
+        return self.table.op().has_schema()
+
+    def root_tables(self):
+        return [self]
+
+
+class ZoneMapScan(ops.TableNode):
+    """
+    Rows of the blocks of a table whose zone maps allow values in the ranges of
+    columns, given as tuples of the column name, the lower bound, whether it is
+    inclusive, the upper bound and whether it is inclusive. A bound of None
+    leaves the range open on that side. Rows of the blocks that are read may
+    still be outside of the ranges, so the filter whose comparisons gave them is
+    still applied.
+    """
+
+    table = Arg(ir.TableExpr)
+    ranges = Arg(rlz.noop)
+
+    def __init__(self, table, ranges):
+        super().__init__(table, tuple(tuple(column_range) for column_range in ranges))
+
+    @property
+    def inputs(self):
+        return (self.table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.table.schema()
+
+    def has_schema(self):
+        return self.table.op().has_schema()
+
+    def root_tables(self):
+        return [self]
+
+
+class TableSample(ops.TableNode):
+    """
+    Random sample of the rows of a table from a TABLESAMPLE clause. BERNOULLI
+    keeps every row with probability size, SYSTEM keeps every block of
+    consecutive rows with probability size and ROWS keeps size rows. The same
+    seed selects the same rows of the same table, a seed of None different rows
+    every time.
+    """
+
+    table = Arg(ir.TableExpr)
+    method = Arg(rlz.isin(set(SAMPLE_METHODS)))
+    size = Arg(rlz.noop)
+    seed = Arg(rlz.noop, default=None)
+
+    @property
+    def inputs(self):
+        return (self.table,)
+
+    def blocks(self):
+        return True
+
+    @property
+    def schema(self):
+        return self.table.schema()
+
+    def has_schema(self):
+        return self.table.op().has_schema()
+
+    def root_tables(self):
+        return [self]
+
+
+class ApproxCountDistinct(ops.Reduction):
+    """
+    Approximate number of distinct non-null values, estimated with a HyperLogLog
+    sketch of 2 ** precision registers
+    """
+
+    arg = Arg(rlz.column(rlz.any))
+    precision = Arg(rlz.validator(int))
+    where = Arg(rlz.boolean, default=None)
+
+    def output_type(self):
+        return functools.partial(ir.IntegerScalar, dtype=dt.int64)
+
+    @property
+    def inputs(self):
+        return self.arg, self.where
+
+
+class ApproxPercentile(ops.Reduction):
+    """
+    Approximate percentile of the non-null values, interpolated from a t-digest
+    sketch whose number of centroids grows with the compression. The quantile is
+    between 0 and 1.
+    """
+
+    arg = Arg(rlz.column(rlz.numeric))
+    quantile = Arg(rlz.validator(float))
+    compression = Arg(rlz.validator(float))
+    where = Arg(rlz.boolean, default=None)
+
+    def output_type(self):
+        return dt.float64.scalar_type()
+
+    @property
+    def inputs(self):
+        return self.arg, self.where
+
+
+class SubqueryMembership(ops.ValueOp):
+    """
+    IN, NOT IN, EXISTS or NOT EXISTS predicate over a subquery, evaluated as a hash
+    semi join or anti join of the rows of the enclosing query with the rows of
+    the subquery.
+
+    The values of every row are matched with the columns of the subquery in order.
+    For IN and NOT IN the first value is the tested value, and the remaining values
+    are the correlation keys of a correlated subquery. The anchor is a column that
+    gives the predicate the shape of the rows it filters.
+
+    The subquery is executed on its own, so it is left out of the dependencies
+    and roots of the predicate, which only depends on the rows it filters.
+    """
+
+    anchor = Arg(rlz.column(rlz.any))
+    values = Arg(rlz.noop)
+    subquery = Arg(ir.TableExpr)
+    kind = Arg(rlz.isin(set(SUBQUERY_MEMBERSHIP_KINDS)))
+
+    output_type = rlz.shape_like("anchor", dt.boolean)
+
+    def __init__(self, anchor, values, subquery, kind):
+        super().__init__(anchor, tuple(values), subquery, kind)
+
+    @property
+    def inputs(self):
+        return (self.anchor,)
+
+    def flat_args(self):
+        yield self.anchor
+        yield from self.values
+
+    def root_tables(self):
+        return ops.distinct_roots(self.anchor, *self.values)
+
+
+class FusedExpression(ops.ValueOp):
+    """
+    Arithmetic or boolean expression over columns that is evaluated in one pass
+    instead of one operation at a time. The program is a tree of tuples whose
+    first item names the operation: ("column", position) reads a column,
+    ("literal", value) is a constant and any other operation, such as
+    ("add", left, right), applies to the values of its operands. The original
+    expression is kept for estimates and for display.
+    """
+
+    columns = Arg(rlz.noop)
+    program = Arg(rlz.noop)
+    original = Arg(rlz.column(rlz.any))
+
+    def __init__(self, columns, program, original):
+        super().__init__(tuple(columns), program, original)
+
+    def output_type(self):
+        return rlz.shape_like(self.original, self.original.type())
+
+    @property
+    def inputs(self):
+        return self.columns
+
+    def flat_args(self):
+        yield from self.columns
+        yield self.original
+
+    def root_tables(self):
+        return ops.distinct_roots(*self.columns)
+
+
+class CaseSelect(ops.ValueOp):
+    """
+    Searched CASE expression that selects the result of the first condition every
+    row matches. The conditions are programs over the columns as in
+    FusedExpression, and each is only evaluated on the rows that no earlier
+    condition matched. Rows that match no condition take the default. The
+    original expression is kept for estimates and for display.
+    """
+
+    columns = Arg(rlz.noop)
+    conditions = Arg(rlz.noop)
+    results = Arg(rlz.noop)
+    default = Arg(rlz.any)
+    original = Arg(rlz.column(rlz.any))
+
+    def __init__(self, columns, conditions, results, default, original):
+        super().__init__(
+            tuple(columns), tuple(conditions), tuple(results), default, original
+        )
+
+    def output_type(self):
+        return rlz.shape_like(self.original, self.original.type())
+
+    @property
+    def inputs(self):
+        return (*self.columns, *self.results, self.default)
+
+    def flat_args(self):
+        yield from self.columns
+        yield from self.results
+        yield self.default
+        yield self.original
+
+    def root_tables(self):
+        return ops.distinct_roots(*self.columns, *self.results, self.default)
+
+
+class ValueSet:
+    """
+    Literal values of an IN list as one typed array. Null values are kept apart
+    since they never match. The hash table of the values is built once, when the
+    set is first probed, and reused by every later evaluation.
+    """
+
+    def __init__(self, values):
+        if isinstance(values, (set, frozenset)):
+            values = list(values)
+        # A series infers one dtype for numbers and keeps mixed values as objects
+        values = pd.Series(values).to_numpy()
+        nulls = pd.isnull(values)
+        self.has_nulls = bool(nulls.any())
+        self.values = values[~nulls]
+        self.values.setflags(write=False)
+        self._hash_table: Optional[pd.Index] = None
+
+    @property
+    def hash_table(self) -> pd.Index:
+        if self._hash_table is None:
+            self._hash_table = pd.Index(pd.unique(self.values))
+        return self._hash_table
+
+    def __len__(self):
+        return len(self.values)
+
+    def __hash__(self):
+        return hash((self.has_nulls, len(self.values), tuple(self.values[:8].tolist())))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ValueSet)
+            and self.has_nulls == other.has_nulls
+            and self.values.dtype == other.values.dtype
+            and np.array_equal(self.values, other.values)
+        )
+
+    def __repr__(self):
+        return f"ValueSet({len(self.values)} {self.values.dtype} values)"
+
+
+class InValues(ops.ValueOp):
+    """
+    IN or NOT IN predicate over a list of literal values, evaluated by probing a
+    hash set of the values instead of comparing with one literal expression per
+    value. Null values never match, so NOT IN is never true for a null value or
+    when the list contains a null.
+    """
+
+    arg = Arg(rlz.column(rlz.any))
+    value_set = Arg(rlz.instance_of(ValueSet))
+    kind = Arg(rlz.isin(set(IN_LIST_KINDS)), default="in")
+
+    output_type = rlz.shape_like("arg", dt.boolean)
@@ -0,0 +1,51 @@
+"""
+Rewrites that are applied to the ibis expression of a query before it is executed
+"""
+from typing import Callable, List, Optional
+
+import ibis.expr.types as ir
+
+from dataframe_sql.optimizer.case_select import compile_case_expressions
+from dataframe_sql.optimizer.common_subexpressions import (
+    eliminate_common_subexpressions,
+)
+from dataframe_sql.optimizer.constant_folding import fold_constants
+from dataframe_sql.optimizer.cross_join import convert_cross_joins
+import dataframe_sql.optimizer.external_sort  # noqa: F401
+from dataframe_sql.optimizer.fusion import fuse_expressions
+import dataframe_sql.optimizer.grace_join  # noqa: F401
+from dataframe_sql.optimizer.group_key_filters import push_group_key_filters
+from dataframe_sql.optimizer.join_order import reorder_joins
+from dataframe_sql.optimizer.join_strategy import plan_join_strategies
+from dataframe_sql.optimizer.late_materialization import prune_join_columns
+from dataframe_sql.optimizer.partial_aggregation import push_partial_aggregations
+import dataframe_sql.optimizer.partitioned_aggregation  # noqa: F401
+from dataframe_sql.optimizer.sort_order import use_sort_order
+from dataframe_sql.optimizer.zone_maps import use_zone_maps
+
+OPTIMIZER_PASSES: List[Callable[[ir.Expr], ir.Expr]] = [
+    fold_constants,
+    push_group_key_filters,
+    convert_cross_joins,
+    reorder_joins,
+    push_partial_aggregations,
+    eliminate_common_subexpressions,
+    use_sort_order,
+    use_zone_maps,
+    fuse_expressions,
+    compile_case_expressions,
+]
+
+
+def optimize_expression(expr: ir.Expr, join_strategy: Optional[str] = None) -> ir.Expr:
+    """
+    Apply every optimizer pass to the expression in order, then choose the
+    algorithm of every join and the columns that it gathers
+    :param expr: Ibis expression produced from the sql query
+    :param join_strategy: Join algorithm to use for every join, chosen from the
+                          table statistics if None
+    :return: Optimized ibis expression
+    """
+    for optimizer_pass in OPTIMIZER_PASSES:
+        expr = optimizer_pass(expr)
+    return prune_join_columns(plan_join_strategies(expr, join_strategy))
@@ -0,0 +1,313 @@
+"""
+Cardinality and selectivity estimates for ibis expressions based on the
+statistics of registered tables
+"""
+from functools import reduce
+from typing import Optional
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import (
+    CompiledAggregation,
+    FusedExpression,
+    InValues,
+    RunAggregation,
+    SortedRangeScan,
+    TableSample,
+    ZoneMapScan,
+)
+from dataframe_sql.statistics import TableStatistics, get_table_statistics
+
+DEFAULT_SELECTIVITY = 1 / 3
+DEFAULT_EQUALITY_SELECTIVITY = 1 / 10
+DEFAULT_NULL_SELECTIVITY = 1 / 20
+DEFAULT_ROW_COUNT = 1000.0
+
+
+def table_statistics(table_op: ops.Node) -> Optional[TableStatistics]:
+    """
+    Return statistics for a physical table operation if any are available
+    :param table_op:
+    :return:
+    """
+    if not isinstance(table_op, ops.DatabaseTable):
+        return None
+    statistics = get_table_statistics(table_op.name)
+    if statistics is None:
+        dictionary = getattr(table_op.source, "dictionary", {})
+        if table_op.name in dictionary:
+            statistics = TableStatistics(dictionary[table_op.name])
+    return statistics
+
+
+def _source_column(value_expr: ir.Expr):
+    """
+    Follow a column through filters back to the physical table it comes from
+    :param value_expr:
+    :return: Tuple of the physical table operation and column name or None
+    """
+    op = value_expr.op()
+    if not isinstance(op, ops.TableColumn):
+        return None
+    table_op = op.table.op()
+    name = op.name
+    while True:
+        if isinstance(table_op, ops.DatabaseTable):
+            return table_op, name
+        if isinstance(table_op, ops.Selection):
+            if not table_op.selections:
+                table_op = table_op.table.op()
+                continue
+            for selection in table_op.selections:
+                if (
+                    isinstance(selection, ir.ValueExpr)
+                    and selection.get_name() == name
+                    and isinstance(selection.op(), ops.TableColumn)
+                ):
+                    name = selection.op().name
+                    table_op = selection.op().table.op()
+                    break
+            else:
+                return None
+            continue
+        if isinstance(
+            table_op,
+            (ops.Limit, ops.Distinct, TableSample, SortedRangeScan, ZoneMapScan),
+        ):
+            table_op = table_op.table.op()
+            continue
+        return None
+
+
+def estimate_distinct_count(value_expr: ir.Expr) -> Optional[float]:
+    """
+    Estimate the number of distinct values in a column expression
+    :param value_expr:
+    :return: Estimated distinct count or None if it cannot be estimated
+    """
+    source = _source_column(value_expr)
+    if source is None:
+        return None
+    table_op, name = source
+    statistics = table_statistics(table_op)
+    if statistics is None:
+        return None
+    distinct_count = statistics.column(name).distinct_count
+    return float(min(distinct_count, estimate_row_count(value_expr.op().table)))
+
+
+def estimate_average_size(value_expr: ir.Expr) -> Optional[float]:
+    """
+    Estimate the number of bytes that a value of a column expression takes
+    :param value_expr:
+    :return: Estimated size or None if it cannot be estimated
+    """
+    source = _source_column(value_expr)
+    if source is None:
+        return None
+    table_op, name = source
+    statistics = table_statistics(table_op)
+    if statistics is None:
+        return None
+    return statistics.column(name).average_size
+
+
+def is_sorted_column(value_expr: ir.Expr) -> bool:
+    """
+    Return whether a column expression is known to be in ascending order
+    :param value_expr:
+    :return:
+    """
+    source = _source_column(value_expr)
+    if source is None:
+        return False
+    table_op, name = source
+    statistics = table_statistics(table_op)
+    if statistics is None:
+        return False
+    return statistics.column(name).is_sorted
+
+
+def _column_range(value_expr: ir.Expr):
+    source = _source_column(value_expr)
+    if source is None:
+        return None
+    table_op, name = source
+    statistics = table_statistics(table_op)
+    if statistics is None:
+        return None
+    column_statistics = statistics.column(name)
+    if column_statistics.min is None or column_statistics.max is None:
+        return None
+    return float(column_statistics.min), float(column_statistics.max)
+
+
+def _literal_value(value_expr: ir.Expr):
+    op = value_expr.op()
+    if isinstance(op, ops.Literal):
+        return op.value
+    return None
+
+
+def _range_selectivity(column: ir.Expr, value, greater: bool) -> float:
+    column_range = _column_range(column)
+    if column_range is None or not isinstance(value, (int, float)):
+        return DEFAULT_SELECTIVITY
+    low, high = column_range
+    if high <= low:
+        return DEFAULT_SELECTIVITY
+    fraction = (
+        (high - value) / (high - low) if greater else (value - low) / (high - low)
+    )
+    return min(max(fraction, 0.0), 1.0)
+
+
+def _equality_selectivity(left: ir.Expr, right: ir.Expr) -> float:
+    distinct_counts = [
+        count
+        for count in (estimate_distinct_count(left), estimate_distinct_count(right))
+        if count is not None
+    ]
+    if not distinct_counts:
+        return DEFAULT_EQUALITY_SELECTIVITY
+    return 1 / max(max(distinct_counts), 1.0)
+
+
+def estimate_selectivity(predicate: ir.Expr) -> float:
+    """
+    Estimate the fraction of rows that satisfy a boolean expression
+    :param predicate:
+    :return:
+    """
+    op = predicate.op()
+    if isinstance(op, FusedExpression):
+        return estimate_selectivity(op.original)
+    if isinstance(op, ops.And):
+        return estimate_selectivity(op.left) * estimate_selectivity(op.right)
+    if isinstance(op, ops.Or):
+        left = estimate_selectivity(op.left)
+        right = estimate_selectivity(op.right)
+        return left + right - left * right
+    if isinstance(op, ops.Not):
+        return 1 - estimate_selectivity(op.arg)
+    if isinstance(op, ops.Equals):
+        return _equality_selectivity(op.left, op.right)
+    if isinstance(op, ops.NotEquals):
+        return 1 - _equality_selectivity(op.left, op.right)
+    if isinstance(op, (ops.Greater, ops.GreaterEqual, ops.Less, ops.LessEqual)):
+        greater = isinstance(op, (ops.Greater, ops.GreaterEqual))
+        value = _literal_value(op.right)
+        if value is not None:
+            return _range_selectivity(op.left, value, greater)
+        value = _literal_value(op.left)
+        if value is not None:
+            return _range_selectivity(op.right, value, not greater)
+        return DEFAULT_SELECTIVITY
+    if isinstance(op, ops.Between):
+        lower = _literal_value(op.lower_bound)
+        upper = _literal_value(op.upper_bound)
+        if lower is None or upper is None:
+            return DEFAULT_SELECTIVITY ** 2
+        return max(
+            _range_selectivity(op.arg, lower, True)
+            + _range_selectivity(op.arg, upper, False)
+            - 1,
+            0.0,
+        )
+    if isinstance(op, ops.Contains):
+        distinct_count = estimate_distinct_count(op.value)
+        options = op.options if isinstance(op.options, (list, tuple)) else []
+        if distinct_count is None or not options:
+            selectivity = DEFAULT_SELECTIVITY
+        else:
+            selectivity = min(len(options) / distinct_count, 1.0)
+        if isinstance(op, ops.NotContains):
+            return 1 - selectivity
+        return selectivity
+    if isinstance(op, InValues):
+        distinct_count = estimate_distinct_count(op.arg)
+        if distinct_count is None:
+            selectivity = DEFAULT_SELECTIVITY
+        else:
+            selectivity = min(len(op.value_set) / distinct_count, 1.0)
+        if op.kind == "not_in":
+            return 0.0 if op.value_set.has_nulls else 1 - selectivity
+        return selectivity
+    if isinstance(op, ops.IsNull):
+        return DEFAULT_NULL_SELECTIVITY
+    if isinstance(op, ops.NotNull):
+        return 1 - DEFAULT_NULL_SELECTIVITY
+    return DEFAULT_SELECTIVITY
+
+
+def _product(values) -> float:
+    return reduce(lambda product, value: product * value, values, 1.0)
+
+
+def estimate_row_count(table_expr: ir.TableExpr) -> float:
+    """
+    Estimate the number of rows that a table expression produces
+    :param table_expr:
+    :return:
+    """
+    op = table_expr.op()
+    if isinstance(op, ops.DatabaseTable):
+        statistics = table_statistics(op)
+        if statistics is None:
+            return DEFAULT_ROW_COUNT
+        return float(statistics.row_count)
+    if isinstance(op, ops.Selection):
+        return estimate_row_count(op.table) * _product(
+            estimate_selectivity(predicate) for predicate in op.predicates
+        )
+    if isinstance(op, ops.Aggregation):
+        if not op.by:
+            return 1.0
+        input_rows = estimate_row_count(op.table)
+        group_counts = [estimate_distinct_count(key) for key in op.by]
+        if any(count is None for count in group_counts):
+            return input_rows
+        return min(input_rows, _product(group_counts))
+    if isinstance(op, (CompiledAggregation, RunAggregation)):
+        return estimate_row_count(op.aggregation)
+    if isinstance(op, SortedRangeScan):
+        return estimate_row_count(op.table) * _product(
+            estimate_selectivity(predicate) for predicate in op.predicates
+        )
+    if isinstance(op, ZoneMapScan):
+        # The filter over the scan estimates its selectivity
+        return estimate_row_count(op.table)
+    if isinstance(op, ops.Limit):
+        return min(float(op.n), estimate_row_count(op.table))
+    if isinstance(op, ops.Distinct):
+        return estimate_row_count(op.table)
+    if isinstance(op, TableSample):
+        if op.method == "rows":
+            return min(float(op.size), estimate_row_count(op.table))
+        return estimate_row_count(op.table) * op.size
+    if isinstance(op, ops.MaterializedJoin):
+        return estimate_row_count(op.join)
+    if isinstance(op, ops.Join):
+        left_rows = estimate_row_count(op.left)
+        right_rows = estimate_row_count(op.right)
+        rows = (
+            left_rows
+            * right_rows
+            * _product(estimate_selectivity(predicate) for predicate in op.predicates)
+        )
+        if isinstance(op, ops.LeftJoin):
+            return max(rows, left_rows)
+        if isinstance(op, ops.RightJoin):
+            return max(rows, right_rows)
+        if isinstance(op, ops.OuterJoin):
+            return max(rows, left_rows + right_rows)
+        return rows
+    if isinstance(op, ops.Union):
+        return estimate_row_count(op.left) + estimate_row_count(op.right)
+    if isinstance(op, ops.SetOp):
+        return estimate_row_count(op.left)
+    table_args = [arg for arg in op.args if isinstance(arg, ir.TableExpr)]
+    if table_args:
+        return max(estimate_row_count(arg) for arg in table_args)
+    return DEFAULT_ROW_COUNT
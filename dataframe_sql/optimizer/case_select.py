@@ -0,0 +1,79 @@
+"""
+Compilation of searched CASE expressions into selections
+
+Every searched CASE expression over columns is replaced by a case selection,
+which evaluates each condition only on the rows that earlier conditions left
+unmatched. Before that the branches are simplified: a condition that repeats an
+earlier one can never be the first to match and is dropped together with its
+result, adjacent branches with the same result are merged into one condition,
+branches at the end with the result of the default are left to the default,
+false and null literal conditions are dropped and a true literal condition
+becomes the default of the expression.
+"""
+from typing import List, Optional, Set
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import CaseSelect
+from dataframe_sql.optimizer.fusion import ProgramBuilder
+from dataframe_sql.optimizer.rewrite import rewrite
+
+
+def _same_result(left: ir.ValueExpr, right: ir.ValueExpr) -> bool:
+    return left.op().equals(right.op())
+
+
+def compile_case(expr: ir.ValueExpr) -> Optional[CaseSelect]:
+    """
+    Return the case selection of a searched CASE expression, or None if it is not
+    one or its conditions do not all read columns
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.SearchedCase) or not isinstance(expr, ir.ColumnExpr):
+        return None
+    builder = ProgramBuilder()
+    seen: Set[tuple] = set()
+    conditions: List[tuple] = []
+    results: List[ir.ValueExpr] = []
+    default = op.default
+    for case, result in zip(op.cases.values, op.results.values):
+        case_op = case.op()
+        if isinstance(case_op, ops.Literal):
+            if case_op.value:
+                default = result
+                break
+            continue
+        program = builder.build(case)
+        if program is None or program[0] == "literal":
+            return None
+        if program in seen:
+            continue
+        seen.add(program)
+        if results and _same_result(results[-1], result):
+            conditions[-1] = ("or", conditions[-1], program)
+            continue
+        conditions.append(program)
+        results.append(result)
+    while results and _same_result(results[-1], default):
+        conditions.pop()
+        results.pop()
+    if not conditions:
+        return None
+    return CaseSelect(builder.columns, conditions, results, default, expr)
+
+
+def _compile_value(expr: ir.Expr) -> Optional[ir.Expr]:
+    compiled = compile_case(expr) if isinstance(expr, ir.ValueExpr) else None
+    return None if compiled is None else compiled.to_expr()
+
+
+def compile_case_expressions(expr: ir.Expr) -> ir.Expr:
+    """
+    Replace the searched CASE expressions of the query with case selections
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _compile_value)
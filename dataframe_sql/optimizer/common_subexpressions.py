@@ -0,0 +1,240 @@
+"""
+Elimination of common subexpressions
+
+The pandas backend of ibis computes every expression of a projection, filter or
+sort on its own, so an expression that a query repeats is computed once for
+every time it appears. This pass finds the expressions over the columns of a
+table that appear more than once across the SELECT list, the WHERE clause and
+the ORDER BY clause, and computes each of them once in a projection of the
+table, which the repeated expressions then read as a column. Since ibis
+evaluates the SELECT list before filtering, the projection computes them on as
+many rows as the query did.
+
+Aggregates repeated in the HAVING clause of an aggregation, such as max(temp)
+in SELECT max(temp) ... HAVING max(temp) > 25, are read from the result of the
+aggregation instead of aggregating the groups again: the HAVING clause becomes a
+filter of the aggregated rows.
+"""
+from typing import Dict, List, Optional
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import SubqueryMembership
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+# Single operations cost about as much as the column that replaces them
+MIN_COMMON_OPERATIONS = 2
+
+COMMON_NAME_PREFIX = "_common"
+HAVING_NAME_PREFIX = "_having"
+
+# Operations that are not computed row by row from the columns of a table
+_OPAQUE_OPERATIONS = (
+    ops.Reduction,
+    ops.AnalyticOp,
+    ops.WindowOp,
+    SubqueryMembership,
+)
+
+
+def _value_args(op: ops.Node) -> List[ir.ValueExpr]:
+    return [arg for arg in op.flat_args() if isinstance(arg, ir.ValueExpr)]
+
+
+def _operation_count(expr: ir.ValueExpr, table: ir.TableExpr) -> Optional[int]:
+    """
+    Return the number of operations of an expression, or None if it does not
+    only compute row by row from columns of the table
+    :param expr:
+    :param table:
+    :return:
+    """
+    op = expr.op()
+    if isinstance(op, ops.TableColumn):
+        return 0 if op.table.equals(table) else None
+    if isinstance(op, ops.Literal):
+        return 0
+    if isinstance(op, _OPAQUE_OPERATIONS) or not isinstance(op, ops.ValueOp):
+        return None
+    count = 1
+    for arg in _value_args(op):
+        arg_count = _operation_count(arg, table)
+        if arg_count is None:
+            return None
+        count += arg_count
+    return count
+
+
+class _SubexpressionCounter:
+    """
+    Counts the occurrences of the subexpressions of a table's expressions that
+    could be computed once. Repeated occurrences are not descended into, so that
+    subexpressions are only counted again where they appear outside of them.
+    """
+
+    def __init__(self, table: ir.TableExpr):
+        self.table = table
+        self.counts: Dict[ops.Node, int] = {}
+        self.exprs: Dict[ops.Node, ir.ValueExpr] = {}
+
+    def count(self, expr: ir.ValueExpr):
+        op = expr.op()
+        if op in self.counts:
+            self.counts[op] += 1
+            return
+        if isinstance(expr, ir.ColumnExpr):
+            operations = _operation_count(expr, self.table)
+            if operations is not None and operations >= MIN_COMMON_OPERATIONS:
+                self.counts[op] = 1
+                self.exprs[op] = expr
+        for arg in _value_args(op):
+            self.count(arg)
+
+    def common(self) -> List[ir.ValueExpr]:
+        return [self.exprs[op] for op, count in self.counts.items() if count > 1]
+
+
+def _referenced_columns(
+    exprs: List[ir.Expr], table: ir.TableExpr, common: Dict[ops.Node, str]
+) -> List[str]:
+    """
+    Return the names of the columns of the table that the expressions read
+    outside of the common subexpressions, in the order of the table
+    :param exprs:
+    :param table:
+    :param common:
+    :return:
+    """
+    names = set()
+    pending = list(exprs)
+    while pending:
+        op = pending.pop().op()
+        if op in common:
+            continue
+        if isinstance(op, ops.TableColumn) and op.table.equals(table):
+            names.add(op.name)
+        pending.extend(arg for arg in op.flat_args() if isinstance(arg, ir.Expr))
+    return [name for name in table.schema().names if name in names]
+
+
+def _sort_expr(sort_key: ir.Expr) -> ir.ValueExpr:
+    return sort_key.op().expr
+
+
+def _eliminate_in_selection(op: ops.Selection) -> Optional[ir.TableExpr]:
+    """
+    Return the selection reading its common subexpressions from a projection of
+    its table, or None if it has none
+    :param op:
+    :return:
+    """
+    table = op.table
+    values = [
+        selection for selection in op.selections if isinstance(selection, ir.ValueExpr)
+    ]
+    roots = values + list(op.predicates) + [_sort_expr(key) for key in op.sort_keys]
+    counter = _SubexpressionCounter(table)
+    for root in roots:
+        counter.count(root)
+    common_exprs = counter.common()
+    if not common_exprs:
+        return None
+    schema_names = set(table.schema().names)
+    common: Dict[ops.Node, str] = {}
+    for common_expr in common_exprs:
+        name = f"{COMMON_NAME_PREFIX}{len(common)}"
+        while name in schema_names:
+            name = f"_{name}"
+        common[common_expr.op()] = name
+    definitions = [
+        common_expr.name(common[common_expr.op()]) for common_expr in common_exprs
+    ]
+    selects_table = any(selection.equals(table) for selection in op.selections)
+    if selects_table:
+        columns = table.schema().names
+        inner = ops.Selection(table, [table] + definitions).to_expr()
+    else:
+        columns = _referenced_columns(roots, table, common)
+        inner = ops.Selection(
+            table, [table[name] for name in columns] + definitions
+        ).to_expr()
+    mapping = {common_op: inner[name] for common_op, name in common.items()}
+    mapping.update({table[name].op(): inner[name] for name in columns})
+    selections: List[ir.Expr] = []
+    for selection in op.selections:
+        if selection.equals(table):
+            selections.extend(inner[name] for name in table.schema().names)
+        else:
+            selections.append(substitute(selection, mapping))
+    predicates = [substitute(predicate, mapping) for predicate in op.predicates]
+    sort_keys = [
+        ops.SortKey(substitute(_sort_expr(key), mapping), key.op().ascending).to_expr()
+        for key in op.sort_keys
+    ]
+    return ops.Selection(inner, selections, predicates, sort_keys).to_expr()
+
+
+def _reductions(expr: ir.Expr, found: Dict[ops.Node, ir.ValueExpr]):
+    op = expr.op()
+    if isinstance(op, ops.Reduction):
+        found.setdefault(op, expr)
+        return
+    for arg in op.flat_args():
+        if isinstance(arg, ir.Expr):
+            _reductions(arg, found)
+
+
+def _eliminate_in_having(op: ops.Aggregation) -> Optional[ir.TableExpr]:
+    """
+    Return the aggregation filtered by its HAVING clause after it is aggregated,
+    reading the aggregates of the clause from the aggregated columns, or None if
+    the clause repeats none of the aggregates of the aggregation
+    :param op:
+    :return:
+    """
+    if not op.having or not op.by or op.sort_keys:
+        return None
+    reductions: Dict[ops.Node, ir.ValueExpr] = {}
+    for having in op.having:
+        _reductions(having, reductions)
+    metric_names = {
+        metric.op(): metric.get_name()
+        for metric in op.metrics
+        if isinstance(metric.op(), ops.Reduction)
+    }
+    if not any(reduction in metric_names for reduction in reductions):
+        return None
+    names: Dict[ops.Node, str] = {}
+    hidden: List[ir.ValueExpr] = []
+    for reduction, reduction_expr in reductions.items():
+        if reduction in metric_names:
+            names[reduction] = metric_names[reduction]
+        else:
+            names[reduction] = f"{HAVING_NAME_PREFIX}{len(hidden)}"
+            hidden.append(reduction_expr.name(names[reduction]))
+    aggregation = ops.Aggregation(
+        op.table, list(op.metrics) + hidden, op.by, [], op.predicates
+    ).to_expr()
+    mapping = {reduction: aggregation[name] for reduction, name in names.items()}
+    having = [substitute(having, mapping) for having in op.having]
+    selections = [aggregation[name] for name in op.schema.names] if hidden else []
+    return ops.Selection(aggregation, selections, having).to_expr()
+
+
+def _eliminate_in_relation(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if isinstance(op, ops.Selection):
+        return _eliminate_in_selection(op)
+    if isinstance(op, ops.Aggregation):
+        return _eliminate_in_having(op)
+    return None
+
+
+def eliminate_common_subexpressions(expr: ir.Expr) -> ir.Expr:
+    """
+    Compute the expressions and aggregates that the query repeats only once
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _eliminate_in_relation)
@@ -0,0 +1,182 @@
+"""
+Compilation of filter, projection and aggregation pipelines into single loops
+
+An aggregation over a table, optionally through a filter and a projection of
+its columns, is replaced by a compiled aggregation that evaluates the
+predicates and the arguments of the aggregates row by row in one loop compiled
+with Numba, instead of materializing a mask, a filtered table and every
+projected column with pandas. Only sums, counts, minimums, maximums and means of
+numeric expressions without HAVING or ORDER BY clauses are compiled, by group
+keys that are columns of the table. Other aggregations, and every aggregation
+when Numba is not installed, are left to pandas.
+"""
+from functools import reduce
+import operator
+from typing import List, Optional
+
+import ibis.expr.datatypes as dt
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.execution.compiled_pipeline import jit_available
+from dataframe_sql.operations import CompiledAggregation
+from dataframe_sql.optimizer.fusion import ProgramBuilder
+from dataframe_sql.optimizer.rewrite import rewrite
+
+ENGINES = ("pandas", "numba")
+
+COMPILED_REDUCTIONS = {
+    ops.Sum: "sum",
+    ops.Count: "count",
+    ops.Min: "min",
+    ops.Max: "max",
+    ops.Mean: "mean",
+}
+
+
+class _TableProgramBuilder(ProgramBuilder):
+    """
+    Builds programs that only read columns of one table, looking through the
+    projection of the table to the expressions that define projected columns
+    """
+
+    def __init__(self, table: ir.TableExpr, projection: Optional[ops.Selection]):
+        super().__init__()
+        self.table = table
+        self._projection = projection
+
+    def definition(self, expr: ir.ValueExpr) -> Optional[ir.ValueExpr]:
+        """
+        Return the expression over the table that defines a column of the
+        projection, or None if there is none
+        :param expr:
+        :return:
+        """
+        op = expr.op()
+        if not isinstance(op, ops.TableColumn) or self._projection is None:
+            return None
+        if not op.table.op().equals(self._projection):
+            return None
+        for selection in self._projection.selections:
+            if isinstance(selection, ir.TableExpr):
+                if op.name in selection.schema():
+                    return selection[op.name]
+            elif selection.get_name() == op.name:
+                return selection
+        return None
+
+    def _column(self, expr: ir.ColumnExpr) -> Optional[tuple]:
+        definition = self.definition(expr)
+        if definition is not None:
+            return self.build(definition)
+        op = expr.op()
+        if not isinstance(op, ops.TableColumn) or not op.table.equals(self.table):
+            return None
+        return super()._column(expr)
+
+
+def _is_numeric(expr: ir.ValueExpr) -> bool:
+    return isinstance(expr.type(), (dt.Integer, dt.Floating))
+
+
+def _metric(builder: _TableProgramBuilder, expr: ir.ValueExpr) -> Optional[tuple]:
+    """
+    Return the kind and the argument program of an aggregate, or None if it
+    cannot be compiled
+    :param builder:
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    kind = COMPILED_REDUCTIONS.get(type(op))
+    if kind is None or op.where is not None:
+        return None
+    if kind == "count" and isinstance(op.arg, ir.TableExpr):
+        return ("count_star", None)
+    if not _is_numeric(op.arg):
+        return None
+    program = builder.build(op.arg)
+    return None if program is None else (kind, program)
+
+
+def _group_key(builder: _TableProgramBuilder, expr: ir.ValueExpr) -> Optional[str]:
+    """
+    Return the name of the column of the table that a group key reads, or None if
+    the key is not a column of the table
+    :param builder:
+    :param expr:
+    :return:
+    """
+    definition = builder.definition(expr)
+    if definition is not None:
+        expr = definition
+    op = expr.op()
+    if not isinstance(op, ops.TableColumn) or not op.table.equals(builder.table):
+        return None
+    if isinstance(expr.type(), dt.Category):
+        return None
+    return op.name
+
+
+def compile_aggregation(expr: ir.TableExpr) -> Optional[CompiledAggregation]:
+    """
+    Return the compiled aggregation of an aggregation, or None if it cannot be
+    compiled
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Aggregation) or op.having or op.sort_keys:
+        return None
+    table, projection = op.table, None
+    predicates = list(op.predicates)
+    if isinstance(table.op(), ops.Selection):
+        projection = table.op()
+        if projection.sort_keys:
+            return None
+        table = projection.table
+        predicates = list(projection.predicates) + predicates
+    if not isinstance(table.op(), ops.DatabaseTable):
+        return None
+    builder = _TableProgramBuilder(table, projection)
+    by: List[str] = []
+    for key in op.by:
+        name = _group_key(builder, key)
+        if name is None:
+            return None
+        by.append(name)
+    predicate = None
+    if predicates:
+        predicate = builder.build(reduce(operator.and_, predicates))
+        if predicate is None:
+            return None
+    metrics = []
+    for metric in op.metrics:
+        compiled = _metric(builder, metric)
+        if compiled is None:
+            return None
+        metrics.append(compiled)
+    columns = [column.get_name() for column in builder.columns]
+    return CompiledAggregation(expr, table, columns, predicate, by, metrics)
+
+
+def _compile_relation(expr: ir.Expr) -> Optional[ir.Expr]:
+    compiled = compile_aggregation(expr) if isinstance(expr, ir.TableExpr) else None
+    return None if compiled is None else compiled.to_expr()
+
+
+def compile_pipelines(expr: ir.Expr, engine: str = "numba") -> ir.Expr:
+    """
+    Replace the aggregations of the query that the engine can compile with
+    compiled aggregations
+    :param expr:
+    :param engine: One of ENGINES, only "numba" compiles aggregations
+    :return:
+    """
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}"
+        )
+    if engine == "pandas" or not jit_available():
+        return expr
+    return rewrite(expr, _compile_relation)
@@ -0,0 +1,67 @@
+"""
+Folding of constant expressions
+
+Operations whose arguments are all literals, such as 1 + 2 * 3 or the arithmetic
+of generated queries, are computed once when the query is planned and replaced
+with a literal of their value and type. The pandas backend of ibis evaluates a
+literal as a scalar and only broadcasts it when it is selected, so the folded
+value is never computed for every row. Operations that cannot be computed at
+planning are left to be computed, or to fail, when the query is executed.
+"""
+from typing import Optional
+
+import ibis
+from ibis.backends.pandas.core import execute
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+import numpy as np
+import pandas as pd
+
+from dataframe_sql.optimizer.rewrite import rewrite
+
+# Operations that do not compute the same value every time they are evaluated
+_UNFOLDED_OPERATIONS = (ops.Reduction, ops.AnalyticOp, ops.WindowOp)
+
+
+def _is_constant(op: ops.Node) -> bool:
+    """
+    Return whether the operation only computes from literals
+    :param op:
+    :return:
+    """
+    if not isinstance(op, ops.ValueOp) or isinstance(op, _UNFOLDED_OPERATIONS):
+        return False
+    args = [arg for arg in op.flat_args() if isinstance(arg, ir.Expr)]
+    return bool(args) and all(isinstance(arg.op(), ops.Literal) for arg in args)
+
+
+def fold_constant(expr: ir.Expr) -> Optional[ir.ScalarExpr]:
+    """
+    Return the literal of the value of an operation on literals, or None if it
+    is not one or its value cannot be computed
+    :param expr:
+    :return:
+    """
+    if not isinstance(expr, ir.ScalarExpr) or isinstance(expr.op(), ops.Literal):
+        return None
+    if not _is_constant(expr.op()):
+        return None
+    try:
+        value = execute(expr)
+    except Exception:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if pd.isnull(value):
+        return None
+    return ibis.literal(value, type=expr.type())
+
+
+def fold_constants(expr: ir.Expr) -> ir.Expr:
+    """
+    Replace the operations of the query that only compute from literals with
+    their values
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, fold_constant)
@@ -0,0 +1,108 @@
+"""
+Conversion of cross joins filtered by equality predicates into keyed joins
+
+A query like ``select * from a, b where a.k = b.k`` is parsed into a cross join
+of the two tables followed by a filter, which materializes every pair of rows.
+The join planner in :mod:`dataframe_sql.optimizer.join_order` handles tables
+without overlapping column names; this pass handles ``select *`` between two
+tables whose overlapping columns are renamed by a projection above the join.
+"""
+from typing import List, Optional
+
+from ibis.expr.analysis import fully_originate_from
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+
+def is_equi_join_predicate(
+    predicate: ir.BooleanValue, left: ir.TableExpr, right: ir.TableExpr
+) -> bool:
+    """
+    Return whether the predicate is an equality between a key of each table
+    :param predicate:
+    :param left:
+    :param right:
+    :return:
+    """
+    predicate_op = predicate.op()
+    if not isinstance(predicate_op, ops.Equals):
+        return False
+    first, second = predicate_op.left, predicate_op.right
+    return (
+        fully_originate_from(first, [left]) and fully_originate_from(second, [right])
+    ) or (fully_originate_from(first, [right]) and fully_originate_from(second, [left]))
+
+
+def _filter(table: ir.TableExpr, predicates: List[ir.BooleanValue]) -> ir.TableExpr:
+    if not predicates:
+        return table
+    return ops.Selection(table, [], predicates).to_expr()
+
+
+def _convert_filtered_cross_join(expr: ir.TableExpr) -> Optional[ir.TableExpr]:
+    """
+    Turn a filter over a projection of a cross join into a projection of a keyed
+    join on the equality predicates of the filter
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Selection) or op.selections or op.sort_keys:
+        return None
+    projection = op.table.op()
+    if (
+        not isinstance(projection, ops.Selection)
+        or projection.predicates
+        or projection.sort_keys
+    ):
+        return None
+    join_op = projection.table.op()
+    if type(join_op) not in (ops.CrossJoin, ops.InnerJoin):
+        return None
+    left, right = join_op.left, join_op.right
+    if any(isinstance(table.op(), ops.Join) for table in (left, right)):
+        return None
+
+    join_predicates = list(join_op.predicates)
+    left_filters = []
+    right_filters = []
+    remaining_filters = []
+    for predicate in op.predicates:
+        if is_equi_join_predicate(predicate, left, right):
+            join_predicates.append(predicate)
+        elif fully_originate_from(predicate, [left]):
+            left_filters.append(predicate)
+        elif fully_originate_from(predicate, [right]):
+            right_filters.append(predicate)
+        else:
+            remaining_filters.append(predicate)
+    if len(join_predicates) == len(join_op.predicates):
+        return None
+
+    filtered_left = _filter(left, left_filters)
+    filtered_right = _filter(right, right_filters)
+    mapping = {left.op(): filtered_left, right.op(): filtered_right}
+    joined = PhysicalJoin(
+        filtered_left,
+        filtered_right,
+        [substitute(predicate, mapping) for predicate in join_predicates],
+    ).to_expr()
+    mapping[join_op] = joined
+    return ops.Selection(
+        joined,
+        [substitute(selection, mapping) for selection in projection.selections],
+        [substitute(predicate, mapping) for predicate in remaining_filters],
+    ).to_expr()
+
+
+def convert_cross_joins(expr: ir.Expr) -> ir.Expr:
+    """
+    Turn every cross join of two tables with overlapping column names that is
+    filtered by equality predicates into a keyed join
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _convert_filtered_cross_join)
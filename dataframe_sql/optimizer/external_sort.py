@@ -0,0 +1,145 @@
+"""
+Replacement of sorts that would exceed the memory limit with external merge sorts
+
+The runs of an external sort get the memory that the limit leaves once the
+input it holds and its sorted result are accounted for. A LIMIT over an external
+sort is pushed into it, so that runs only keep the rows that can be returned. A
+sort under a LIMIT whose whole result would not fit is planned as an external
+sort that only keeps, and only counts, the rows of the limit and its offset.
+"""
+from typing import List, Optional, Tuple
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import ExternalSort
+from dataframe_sql.optimizer.memory import (
+    INDEXER_WIDTH,
+    LIMIT_PLANNERS,
+    OUT_OF_CORE_PLANNERS,
+    OUT_OF_CORE_REWRITES,
+    estimate_row_width,
+    estimate_table_size,
+    held_input_size,
+)
+
+MIN_RUN_ROWS = 1024
+
+
+def _sort_columns(op: ops.Selection) -> Optional[Tuple[List[str], List[bool]]]:
+    """
+    Return the names in the result of the selection of the columns it is sorted
+    by and their directions, or None if it is sorted by anything but its columns
+    :param op:
+    :return:
+    """
+    names = []
+    ascending = []
+    for sort_key in op.sort_keys:
+        key_expr = sort_key.op().expr
+        if not isinstance(key_expr.op(), ops.TableColumn):
+            return None
+        if not op.selections:
+            name = key_expr.get_name()
+        else:
+            matches = [
+                selection.get_name()
+                for selection in op.selections
+                if isinstance(selection, ir.ColumnExpr) and selection.equals(key_expr)
+            ]
+            if not matches:
+                return None
+            name = matches[0]
+        names.append(name)
+        ascending.append(sort_key.op().ascending)
+    return names, ascending
+
+
+def _external_sort(
+    expr: ir.TableExpr,
+    memory_limit: int,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Optional[ir.Expr]:
+    """
+    Return an external sort of a sort, or None if it is not a sort on columns or
+    even the rows it keeps would not fit
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :param limit: Number of rows to keep after the first offset rows, None for all
+    :param offset:
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Selection) or not op.sort_keys:
+        return None
+    sort_columns = _sort_columns(op)
+    if sort_columns is None:
+        return None
+    result_size = estimate_table_size(expr)
+    if limit is not None:
+        result_size = min(result_size, (limit + offset) * estimate_row_width(expr))
+    available = memory_limit - held_input_size(op.table) - result_size
+    if available <= 0:
+        return None
+    run_rows = max(
+        int(available / (estimate_row_width(expr) + INDEXER_WIDTH)), MIN_RUN_ROWS
+    )
+    unsorted = op.table
+    if op.selections or op.predicates:
+        unsorted = ops.Selection(op.table, op.selections, op.predicates).to_expr()
+    names, ascending = sort_columns
+    return ExternalSort(unsorted, names, ascending, run_rows, limit, offset).to_expr()
+
+
+def plan_external_sort(expr: ir.TableExpr, memory_limit: int) -> Optional[ir.Expr]:
+    """
+    Return an external sort of a sort that would exceed the memory limit, or None
+    if it is not a sort on columns or even its result would not fit
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    return _external_sort(expr, memory_limit)
+
+
+def plan_external_top_n(expr: ir.TableExpr, memory_limit: int) -> Optional[ir.Expr]:
+    """
+    Return an external sort that only keeps the rows of a limit over a sort that
+    would exceed the memory limit, or None if it is not a limit over a sort on
+    columns or even the rows of the limit would not fit
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Limit):
+        return None
+    return _external_sort(op.table, memory_limit, op.n, op.offset)
+
+
+def push_limit_into_external_sort(expr: ir.Expr) -> Optional[ir.Expr]:
+    """
+    Return an external sort that only keeps the rows of the limit above it
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Limit):
+        return None
+    sort_op = op.table.op()
+    if not isinstance(sort_op, ExternalSort) or sort_op.limit is not None:
+        return None
+    return ExternalSort(
+        sort_op.table,
+        sort_op.by,
+        sort_op.ascending,
+        sort_op.run_rows,
+        op.n,
+        op.offset,
+    ).to_expr()
+
+
+OUT_OF_CORE_PLANNERS.append(plan_external_sort)
+LIMIT_PLANNERS.append(plan_external_top_n)
+OUT_OF_CORE_REWRITES.append(push_limit_into_external_sort)
@@ -0,0 +1,204 @@
+"""
+Fusion of arithmetic and boolean expressions into single evaluations
+
+The pandas backend of ibis evaluates an expression such as temp * wind + rain
+one operation at a time, each allocating a column for its result. This pass
+replaces the largest trees of numeric and boolean operations over columns in
+projections and filters with a fused expression, which evaluates the whole tree
+at once, a block of rows at a time. The predicates of a filter are fused into a
+single conjunction, and operations that cannot be fused, such as comparisons of
+strings, become inputs of the fused expression.
+"""
+from functools import reduce
+import operator
+from typing import Dict, List, Optional, Tuple
+
+import ibis.expr.datatypes as dt
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import FusedExpression
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+# Single operations gain nothing from fusion
+MIN_FUSED_OPERATIONS = 2
+
+FUSABLE_OPERATIONS = {
+    ops.Add: "add",
+    ops.Subtract: "subtract",
+    ops.Multiply: "multiply",
+    ops.Divide: "divide",
+    ops.Negate: "negate",
+    ops.Equals: "equals",
+    ops.NotEquals: "not_equals",
+    ops.Greater: "greater",
+    ops.GreaterEqual: "greater_equal",
+    ops.Less: "less",
+    ops.LessEqual: "less_equal",
+    ops.And: "and",
+    ops.Or: "or",
+    ops.Not: "not",
+}
+
+
+def _has_fusable_type(expr: ir.ValueExpr) -> bool:
+    dtype = expr.type()
+    return isinstance(dtype, (dt.Integer, dt.Floating, dt.Boolean))
+
+
+def _reads_column(program: tuple) -> bool:
+    name, *operands = program
+    if name == "column":
+        return True
+    return name != "literal" and any(_reads_column(operand) for operand in operands)
+
+
+class ProgramBuilder:
+    """
+    Builds the program of a fused expression, numbering the distinct columns that
+    it reads
+    """
+
+    def __init__(self):
+        self.columns: List[ir.ColumnExpr] = []
+        self._positions: Dict[ops.Node, int] = {}
+        self.operations = 0
+
+    def _column(self, expr: ir.ColumnExpr) -> Optional[tuple]:
+        op = expr.op()
+        if op not in self._positions:
+            self._positions[op] = len(self.columns)
+            self.columns.append(expr)
+        return ("column", self._positions[op])
+
+    def _restore(self, columns: int, operations: int):
+        for column in self.columns[columns:]:
+            del self._positions[column.op()]
+        del self.columns[columns:]
+        self.operations = operations
+
+    def build(self, expr: ir.ValueExpr) -> Optional[tuple]:
+        """
+        Return the program of the expression, or None if it cannot be fused.
+        Columns and operations that cannot be fused, such as comparisons of
+        strings, are read as input columns if they have a numeric or boolean type.
+        :param expr:
+        :return:
+        """
+        if not _has_fusable_type(expr):
+            return None
+        op = expr.op()
+        if isinstance(op, ops.Literal):
+            return None if op.value is None else ("literal", op.value)
+        if isinstance(op, FusedExpression):
+            return self.build(op.original)
+        name = FUSABLE_OPERATIONS.get(type(op))
+        if name is not None:
+            columns, operations = len(self.columns), self.operations
+            operands = [
+                self.build(arg) if isinstance(arg, ir.ValueExpr) else None
+                for arg in op.args
+            ]
+            # Operations on literals alone are left to fail as they do unfused,
+            # as 1 / 0 does, instead of giving inf in a fused block
+            programs = [operand for operand in operands if operand is not None]
+            if len(programs) == len(operands) and any(map(_reads_column, programs)):
+                self.operations += 1
+                return (name, *programs)
+            self._restore(columns, operations)
+        return self._column(expr) if isinstance(expr, ir.ColumnExpr) else None
+
+
+def compile_expression(expr: ir.ValueExpr) -> Optional[FusedExpression]:
+    """
+    Return the fused expression of a tree of numeric and boolean operations over
+    columns, or None if it cannot be fused or is too small to gain from fusion
+    :param expr:
+    :return:
+    """
+    if not isinstance(expr, ir.ColumnExpr):
+        return None
+    builder = ProgramBuilder()
+    program = builder.build(expr)
+    if program is None or builder.operations < MIN_FUSED_OPERATIONS:
+        return None
+    return FusedExpression(builder.columns, program, expr)
+
+
+def _fusable_subtrees(expr: ir.ValueExpr, mapping: Dict[ops.Node, ir.Expr]):
+    """
+    Add the largest fusable trees of the expression to the mapping
+    :param expr:
+    :param mapping: Map of the roots of the trees to their fused expressions
+    :return:
+    """
+    op = expr.op()
+    if op in mapping or isinstance(op, FusedExpression):
+        return
+    fused = compile_expression(expr)
+    if fused is not None:
+        mapping[op] = fused.to_expr()
+        return
+    for arg in op.flat_args():
+        if isinstance(arg, ir.ValueExpr):
+            _fusable_subtrees(arg, mapping)
+
+
+def fuse_value(expr: ir.ValueExpr) -> ir.ValueExpr:
+    """
+    Return the expression with its largest fusable trees fused
+    :param expr:
+    :return:
+    """
+    mapping: Dict[ops.Node, ir.Expr] = {}
+    _fusable_subtrees(expr, mapping)
+    return substitute(expr, mapping)
+
+
+def _fuse_values(exprs) -> Tuple[list, bool]:
+    fused = [
+        fuse_value(expr) if isinstance(expr, ir.ValueExpr) else expr for expr in exprs
+    ]
+    return fused, any(new is not old for new, old in zip(fused, exprs))
+
+
+def _fuse_predicates(predicates) -> Tuple[list, bool]:
+    """
+    Fuse the predicates of a filter, which are combined into a single conjunction
+    so that one evaluation filters on all of them
+    :param predicates:
+    :return:
+    """
+    if len(predicates) > 1:
+        fused = compile_expression(reduce(operator.and_, predicates))
+        if fused is not None:
+            return [fused.to_expr()], True
+    return _fuse_values(predicates)
+
+
+def _fuse_relation(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if isinstance(op, ops.Selection):
+        selections, selections_changed = _fuse_values(op.selections)
+        predicates, predicates_changed = _fuse_predicates(op.predicates)
+        if selections_changed or predicates_changed:
+            return ops.Selection(
+                op.table, selections, predicates, op.sort_keys
+            ).to_expr()
+    if isinstance(op, ops.Aggregation):
+        predicates, predicates_changed = _fuse_predicates(op.predicates)
+        if predicates_changed:
+            return ops.Aggregation(
+                op.table, op.metrics, op.by, op.having, predicates, op.sort_keys
+            ).to_expr()
+    return None
+
+
+def fuse_expressions(expr: ir.Expr) -> ir.Expr:
+    """
+    Fuse the arithmetic and boolean expressions of the projections and filters
+    of the query
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _fuse_relation)
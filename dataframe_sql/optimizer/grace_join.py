@@ -0,0 +1,78 @@
+"""
+Replacement of joins that would exceed the memory limit with grace hash joins
+
+The partitions of a grace join get the memory that the limit leaves once the
+inputs it holds and its result are accounted for. There are enough partitions
+for the hash table of a partition of the build input to fit in that memory when
+the keys are spread evenly.
+"""
+from typing import Optional
+
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer.cardinality import estimate_row_count
+from dataframe_sql.optimizer.join_strategy import (
+    IBIS_JOIN_TYPES,
+    choose_join_strategy,
+    is_equi_join,
+)
+from dataframe_sql.optimizer.memory import (
+    HASH_ENTRY_WIDTH,
+    OUT_OF_CORE_PLANNERS,
+    estimate_row_width,
+    estimate_table_size,
+    held_input_size,
+)
+
+MIN_PARTITIONS = 2
+MAX_PARTITIONS = 256
+
+
+def plan_grace_join(expr: ir.TableExpr, memory_limit: int) -> Optional[ir.Expr]:
+    """
+    Return a grace hash join of an equality join that would exceed the memory
+    limit, or None if it is not such a join or even its result would not fit
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    op = expr.op()
+    columns = None
+    if isinstance(op, PhysicalJoin):
+        how, build_side, columns = op.how, op.build_side, op.columns
+    elif type(op) in IBIS_JOIN_TYPES:
+        how = IBIS_JOIN_TYPES[type(op)]
+        _, build_side = choose_join_strategy(op)
+    else:
+        return None
+    if not is_equi_join(op):
+        return None
+    available = (
+        memory_limit
+        - held_input_size(op.left)
+        - held_input_size(op.right)
+        - estimate_table_size(expr)
+    )
+    if available <= 0:
+        return None
+    build = op.right if build_side == "right" else op.left
+    build_size = estimate_row_count(build) * (
+        estimate_row_width(build) + HASH_ENTRY_WIDTH
+    )
+    partitions = min(
+        max(int(-(-build_size // available)), MIN_PARTITIONS), MAX_PARTITIONS
+    )
+    return PhysicalJoin(
+        op.left,
+        op.right,
+        op.predicates,
+        how,
+        "grace",
+        build_side,
+        partitions,
+        columns,
+    ).to_expr()
+
+
+OUT_OF_CORE_PLANNERS.append(plan_grace_join)
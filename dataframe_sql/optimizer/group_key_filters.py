@@ -0,0 +1,97 @@
+"""
+Filtering of aggregations by their group keys before grouping
+
+A filter of the result of an aggregation, such as the WHERE clause of a query
+over a grouped subquery, removes whole groups. Its conditions that only read
+group keys hold for every row of a group or for none, so they can filter the
+rows of the aggregated table instead, and fewer rows are grouped. The
+conditions of a HAVING clause that only read group keys are moved into the
+WHERE clause of the aggregation the same way when the query is parsed.
+"""
+from typing import Dict, List, Optional
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+
+def _reads_only(expr: ir.Expr, columns: Dict[ops.Node, ir.Expr]) -> bool:
+    """
+    Return whether the columns of tables that the expression reads are all in
+    columns
+    :param expr:
+    :param columns:
+    :return:
+    """
+    op = expr.op()
+    if op in columns:
+        return True
+    if isinstance(op, ops.TableColumn) or isinstance(op, ops.TableNode):
+        return False
+    return all(
+        _reads_only(arg, columns) for arg in op.flat_args() if isinstance(arg, ir.Expr)
+    )
+
+
+def _push_into_aggregation(op: ops.Selection) -> Optional[ir.TableExpr]:
+    """
+    Return the selection of an aggregation with the predicates that only read
+    group keys applied before grouping, or None if it has none
+    :param op:
+    :return:
+    """
+    aggregation = op.table
+    aggregation_op = aggregation.op()
+    if not isinstance(aggregation_op, ops.Aggregation) or not aggregation_op.by:
+        return None
+    # Group keys that are columns of the aggregated table
+    keys = {
+        aggregation[key.get_name()].op(): key
+        for key in aggregation_op.by
+        if isinstance(key.op(), ops.TableColumn)
+        and key.op().table.equals(aggregation_op.table)
+    }
+    pushed: List[ir.BooleanValue] = []
+    remaining: List[ir.BooleanValue] = []
+    for predicate in op.predicates:
+        if keys and _reads_only(predicate, keys):
+            pushed.append(substitute(predicate, keys))
+        else:
+            remaining.append(predicate)
+    if not pushed:
+        return None
+    new_aggregation = ops.Aggregation(
+        aggregation_op.table,
+        aggregation_op.metrics,
+        aggregation_op.by,
+        aggregation_op.having,
+        list(aggregation_op.predicates) + pushed,
+        aggregation_op.sort_keys,
+    ).to_expr()
+    if not remaining and not op.selections and not op.sort_keys:
+        return new_aggregation
+    mapping = {aggregation_op: new_aggregation}
+    return ops.Selection(
+        new_aggregation,
+        [substitute(selection, mapping) for selection in op.selections],
+        [substitute(predicate, mapping) for predicate in remaining],
+        [substitute(sort_key, mapping) for sort_key in op.sort_keys],
+    ).to_expr()
+
+
+def _push_group_key_filter(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if isinstance(op, ops.Selection):
+        return _push_into_aggregation(op)
+    return None
+
+
+def push_group_key_filters(expr: ir.Expr) -> ir.Expr:
+    """
+    Apply the conditions on group keys of the filters of aggregations to the
+    rows of the aggregated tables
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _push_group_key_filter)
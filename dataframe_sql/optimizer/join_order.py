@@ -0,0 +1,467 @@
+"""
+Cost based ordering of inner joins between three or more tables
+
+The tables of a chain of inner and cross joins, together with the equality
+predicates between them, form a join graph. Equality predicates from the where
+clause become join predicates, so a comma separated list of tables is joined on
+keys instead of through a cross product, and predicates on a single table filter
+that table before it is joined. For small graphs every join tree is
+enumerated with dynamic programming over subsets of tables; larger graphs are
+ordered greedily by always performing the join with the smallest result next.
+Cardinalities come from the statistics of the registered tables and the
+selectivity of each join predicate is estimated from column distinct counts.
+"""
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer.cardinality import estimate_row_count, estimate_selectivity
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+MIN_JOIN_TABLES = 2
+MIN_REORDER_TABLES = 3
+MAX_DYNAMIC_PROGRAMMING_TABLES = 8
+
+
+class JoinEdge:
+    """
+    Equality predicate between columns of two tables in the join graph
+    """
+
+    def __init__(self, predicate: ir.BooleanValue, left_index: int, right_index: int):
+        self.predicate = predicate
+        self.left_index = left_index
+        self.right_index = right_index
+        self.relations = (1 << left_index) | (1 << right_index)
+        self.selectivity = estimate_selectivity(predicate)
+
+
+class JoinPlan:
+    """
+    Join tree over a set of tables, represented as a bit mask of table indexes.
+    The right input of a join is the build side, which is always the smaller one.
+    """
+
+    def __init__(
+        self,
+        relations: int,
+        rows: float,
+        cost: float,
+        left: Optional["JoinPlan"] = None,
+        right: Optional["JoinPlan"] = None,
+        relation_index: Optional[int] = None,
+    ):
+        self.relations = relations
+        self.rows = rows
+        self.cost = cost
+        self.left = left
+        self.right = right
+        self.relation_index = relation_index
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.relation_index is not None
+
+    def __repr__(self):
+        if self.is_leaf:
+            return str(self.relation_index)
+        return f"({self.left!r} x {self.right!r})"
+
+
+class JoinGraph:
+    """
+    Tables that are inner joined together and the equality predicates that
+    connect them
+    """
+
+    def __init__(self, relations: List[ir.TableExpr], edges: List[JoinEdge]):
+        self.relations = relations
+        self.edges = edges
+        self.relation_rows = [
+            max(estimate_row_count(relation), 1.0) for relation in relations
+        ]
+        self._rows: Dict[int, float] = {}
+
+    def rows(self, relations: int) -> float:
+        """
+        Estimated number of rows produced by joining the given tables
+        :param relations: Bit mask of table indexes
+        :return:
+        """
+        if relations not in self._rows:
+            rows = 1.0
+            for index, relation_rows in enumerate(self.relation_rows):
+                if relations & (1 << index):
+                    rows *= relation_rows
+            for edge in self.edges:
+                if edge.relations & relations == edge.relations:
+                    rows *= edge.selectivity
+            self._rows[relations] = max(rows, 1.0)
+        return self._rows[relations]
+
+    def edges_between(self, first: int, second: int) -> List[JoinEdge]:
+        """
+        Return the edges that connect the two sets of tables
+        :param first: Bit mask of table indexes
+        :param second: Bit mask of table indexes
+        :return:
+        """
+        return [
+            edge
+            for edge in self.edges
+            if edge.relations & first and edge.relations & second
+        ]
+
+    def connected(self, first: int, second: int) -> bool:
+        return bool(self.edges_between(first, second))
+
+    def leaf_plan(self, index: int) -> JoinPlan:
+        return JoinPlan(
+            1 << index, self.relation_rows[index], 0.0, relation_index=index
+        )
+
+    def join_plans(self, first: JoinPlan, second: JoinPlan) -> JoinPlan:
+        """
+        Return the plan that joins the two plans, building on the smaller input
+        :param first:
+        :param second:
+        :return:
+        """
+        probe, build = (first, second) if first.rows >= second.rows else (second, first)
+        relations = first.relations | second.relations
+        rows = self.rows(relations)
+        cost = probe.cost + build.cost + probe.rows + build.rows + rows
+        return JoinPlan(relations, rows, cost, left=probe, right=build)
+
+
+def dynamic_programming_order(graph: JoinGraph) -> JoinPlan:
+    """
+    Return the cheapest join tree by enumerating every split of every subset of
+    tables. Only subsets that are connected by join predicates are considered,
+    unless the graph itself is disconnected, in which case cross products are
+    introduced where a subset cannot be split any other way.
+    :param graph:
+    :return:
+    """
+    best = _dynamic_programming_plans(graph, allow_cross_products=False)
+    all_relations = (1 << len(graph.relations)) - 1
+    if all_relations not in best:
+        best = _dynamic_programming_plans(graph, allow_cross_products=True)
+    return best[all_relations]
+
+
+def _dynamic_programming_plans(
+    graph: JoinGraph, allow_cross_products: bool
+) -> Dict[int, JoinPlan]:
+    """
+    Return the cheapest plan of every subset of tables that can be planned
+    :param graph:
+    :param allow_cross_products: Whether subsets without a connected split may be
+                                 planned with a cross product
+    :return:
+    """
+    relation_count = len(graph.relations)
+    best: Dict[int, JoinPlan] = {
+        1 << index: graph.leaf_plan(index) for index in range(relation_count)
+    }
+    all_relations = (1 << relation_count) - 1
+    subsets = sorted(range(1, all_relations + 1), key=lambda mask: bin(mask).count("1"))
+    for subset in subsets:
+        if subset in best:
+            continue
+        splits = []
+        first = (subset - 1) & subset
+        while first:
+            second = subset ^ first
+            if first < second and first in best and second in best:
+                splits.append((first, second))
+            first = (first - 1) & subset
+        connected_splits = [
+            split for split in splits if graph.connected(split[0], split[1])
+        ]
+        if not connected_splits and not allow_cross_products:
+            continue
+        for first, second in connected_splits or splits:
+            plan = graph.join_plans(best[first], best[second])
+            if subset not in best or plan.cost < best[subset].cost:
+                best[subset] = plan
+    return best
+
+
+def greedy_order(graph: JoinGraph) -> JoinPlan:
+    """
+    Return a join tree built by repeatedly performing the connected join with the
+    smallest estimated result
+    :param graph:
+    :return:
+    """
+    plans = [graph.leaf_plan(index) for index in range(len(graph.relations))]
+    while len(plans) > 1:
+        best_key = None
+        best_choice = None
+        for first, second in combinations(range(len(plans)), 2):
+            joined = graph.join_plans(plans[first], plans[second])
+            key = (
+                not graph.connected(plans[first].relations, plans[second].relations),
+                joined.rows,
+                joined.cost,
+            )
+            if best_key is None or key < best_key:
+                best_key = key
+                best_choice = (first, second, joined)
+        first, second, joined = best_choice  # type: ignore
+        plans = [
+            plan for index, plan in enumerate(plans) if index not in (first, second)
+        ]
+        plans.append(joined)
+    return plans[0]
+
+
+def written_order(graph: JoinGraph) -> JoinPlan:
+    """
+    Return the left deep join tree that joins the tables in the order they were
+    written in the query
+    :param graph:
+    :return:
+    """
+    plan = graph.leaf_plan(0)
+    for index in range(1, len(graph.relations)):
+        right = graph.leaf_plan(index)
+        relations = plan.relations | right.relations
+        rows = graph.rows(relations)
+        cost = plan.cost + plan.rows + right.rows + rows
+        plan = JoinPlan(relations, rows, cost, left=plan, right=right)
+    return plan
+
+
+def choose_join_order(graph: JoinGraph) -> JoinPlan:
+    """
+    Return the join tree to use for the graph
+    :param graph:
+    :return:
+    """
+    if len(graph.relations) <= MAX_DYNAMIC_PROGRAMMING_TABLES:
+        return dynamic_programming_order(graph)
+    return greedy_order(graph)
+
+
+JoinOrderChooser = Callable[[JoinGraph], JoinPlan]
+
+
+def is_inner_join(op: ops.Node) -> bool:
+    if isinstance(op, PhysicalJoin):
+        return op.how == "inner"
+    return type(op) in (ops.InnerJoin, ops.CrossJoin)
+
+
+def collect_join_inputs(
+    table: ir.TableExpr,
+    relations: List[ir.TableExpr],
+    predicates: List[ir.BooleanValue],
+):
+    """
+    Gather the tables and predicates of a tree of inner joins
+    :param table:
+    :param relations: List that the joined tables are added to
+    :param predicates: List that the join predicates are added to
+    :return:
+    """
+    op = table.op()
+    if is_inner_join(op):
+        collect_join_inputs(op.left, relations, predicates)
+        collect_join_inputs(op.right, relations, predicates)
+        predicates.extend(op.predicates)
+    else:
+        relations.append(table)
+
+
+def _referenced_relations(
+    expr: ir.Expr, root_to_relation: Dict[ops.Node, int]
+) -> Optional[Set[int]]:
+    referenced = set()
+    for root in expr.op().root_tables():
+        if root not in root_to_relation:
+            return None
+        referenced.add(root_to_relation[root])
+    return referenced
+
+
+def _build_join_graph(
+    relations: List[ir.TableExpr],
+    join_predicates: List[ir.BooleanValue],
+    filter_predicates: List[ir.BooleanValue],
+) -> Optional[Tuple[JoinGraph, List[ir.BooleanValue]]]:
+    """
+    Return the join graph and the filter predicates that must be applied to the
+    result of the joins, or None if the join cannot be reordered. Equality
+    predicates between two tables become join predicates and predicates on a
+    single table filter that table before it is joined.
+    :param relations: Joined tables
+    :param join_predicates: Predicates of the joins
+    :param filter_predicates: Predicates that filter the result of the joins
+    :return:
+    """
+    root_to_relation: Dict[ops.Node, int] = {}
+    column_names: Set[str] = set()
+    for index, relation in enumerate(relations):
+        if column_names.intersection(relation.columns):
+            return None
+        column_names.update(relation.columns)
+        for root in relation._root_tables():
+            if root in root_to_relation:
+                return None
+            root_to_relation[root] = index
+
+    def as_edge(predicate: ir.BooleanValue) -> Optional[Tuple[int, int]]:
+        predicate_op = predicate.op()
+        if not isinstance(predicate_op, ops.Equals):
+            return None
+        left = _referenced_relations(predicate_op.left, root_to_relation)
+        right = _referenced_relations(predicate_op.right, root_to_relation)
+        if left is None or right is None or len(left) != 1 or len(right) != 1:
+            return None
+        if left == right:
+            return None
+        return left.pop(), right.pop()
+
+    edges = []
+    for predicate in join_predicates:
+        edge = as_edge(predicate)
+        if edge is None:
+            return None
+        edges.append((predicate, edge))
+
+    relation_filters: List[List[ir.BooleanValue]] = [[] for _ in relations]
+    remaining_filters = []
+    for predicate in filter_predicates:
+        edge = as_edge(predicate)
+        referenced = _referenced_relations(predicate, root_to_relation)
+        if edge is not None:
+            edges.append((predicate, edge))
+        elif referenced is not None and len(referenced) == 1:
+            relation_filters[referenced.pop()].append(predicate)
+        else:
+            remaining_filters.append(predicate)
+
+    filtered_relations = [
+        ops.Selection(relation, [], predicates).to_expr() if predicates else relation
+        for relation, predicates in zip(relations, relation_filters)
+    ]
+    mapping = {
+        relation.op(): filtered
+        for relation, filtered in zip(relations, filtered_relations)
+        if relation is not filtered
+    }
+    join_edges = [
+        JoinEdge(substitute(predicate, mapping), left_index, right_index)
+        for predicate, (left_index, right_index) in edges
+    ]
+    return JoinGraph(filtered_relations, join_edges), remaining_filters
+
+
+def build_join_expr(plan: JoinPlan, graph: JoinGraph) -> ir.TableExpr:
+    """
+    Return the ibis expression that executes the join plan
+    :param plan:
+    :param graph:
+    :return:
+    """
+    if plan.relation_index is not None:
+        return graph.relations[plan.relation_index]
+    assert plan.left is not None and plan.right is not None
+    left = build_join_expr(plan.left, graph)
+    right = build_join_expr(plan.right, graph)
+    predicates = []
+    for edge in graph.edges_between(plan.left.relations, plan.right.relations):
+        left_key = edge.predicate.op().left
+        right_key = edge.predicate.op().right
+        if plan.right.relations & (1 << edge.left_index):
+            left_key, right_key = right_key, left_key
+        predicates.append(left_key == right_key)
+    return PhysicalJoin(left, right, predicates).to_expr()
+
+
+def _reorder_parent_of_join(
+    expr: ir.TableExpr, choose_order: JoinOrderChooser
+) -> Optional[ir.TableExpr]:
+    """
+    Reorder the joins beneath a selection or aggregation
+    :param expr:
+    :param choose_order: Function that picks the join tree for a join graph
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, (ops.Selection, ops.Aggregation)):
+        return None
+    join_op = op.table.op()
+    if isinstance(join_op, ops.MaterializedJoin):
+        join_op = join_op.join.op()
+    if not is_inner_join(join_op):
+        return None
+    if isinstance(op, ops.Selection) and any(
+        isinstance(selection, ir.TableExpr) for selection in op.selections
+    ):
+        return None
+
+    relations: List[ir.TableExpr] = []
+    join_predicates: List[ir.BooleanValue] = []
+    collect_join_inputs(join_op.to_expr(), relations, join_predicates)
+    if len(relations) < MIN_JOIN_TABLES:
+        return None
+    join_graph = _build_join_graph(relations, join_predicates, op.predicates)
+    if join_graph is None:
+        return None
+    graph, remaining_filters = join_graph
+    if len(relations) < MIN_REORDER_TABLES and len(graph.edges) == len(join_predicates):
+        # A join of two tables is only planned when equality predicates in the
+        # where clause turn it into a keyed join
+        return None
+
+    joined = build_join_expr(choose_order(graph), graph)
+    # Project the columns of every table so that the parent can reference them
+    # by name regardless of how deeply the joins are nested
+    projection = ops.Selection(
+        joined,
+        [relation[name] for relation in graph.relations for name in relation.columns],
+    ).to_expr()
+    mapping = {relation.op(): projection for relation in relations}
+    mapping[op.table.op()] = projection
+    mapping[join_op] = projection
+
+    def replace(values: list) -> list:
+        return [substitute(value, mapping) for value in values]
+
+    if isinstance(op, ops.Selection):
+        return ops.Selection(
+            projection,
+            replace(op.selections),
+            replace(remaining_filters),
+            replace(op.sort_keys),
+        ).to_expr()
+    return ops.Aggregation(
+        projection,
+        replace(op.metrics),
+        replace(op.by),
+        replace(op.having),
+        replace(remaining_filters),
+        replace(op.sort_keys),
+    ).to_expr()
+
+
+def reorder_joins(
+    expr: ir.Expr, choose_order: JoinOrderChooser = choose_join_order
+) -> ir.Expr:
+    """
+    Reorder every chain of inner joins between three or more tables in the
+    expression into the cheapest estimated order and turn cross joins filtered
+    by equality predicates into keyed joins
+    :param expr:
+    :param choose_order: Function that picks the join tree for a join graph
+    :return:
+    """
+    return rewrite(
+        expr, lambda sub_expr: _reorder_parent_of_join(sub_expr, choose_order)
+    )
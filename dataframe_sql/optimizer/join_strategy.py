@@ -0,0 +1,117 @@
+"""
+Selection of the algorithm and build side of every join
+
+Joins are hash joins that build on the smaller input, unless the statistics show
+that both inputs are already sorted on the join keys, in which case a sort merge
+join avoids building a hash table, or that one input is tiny compared to the
+other, in which case the tiny input is broadcast to every partition of the large
+one. Every equality join is planned, even a hash join, so that null keys match
+nothing whichever algorithm runs it.
+"""
+from typing import Optional, Tuple
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.execution.join_algorithms import PARTITION_ROWS
+from dataframe_sql.operations import JOIN_STRATEGIES, PhysicalJoin
+from dataframe_sql.optimizer.cardinality import estimate_row_count, is_sorted_column
+from dataframe_sql.optimizer.cross_join import is_equi_join_predicate
+from dataframe_sql.optimizer.rewrite import rewrite
+
+BROADCAST_MAX_BUILD_ROWS = 10000
+BROADCAST_MIN_PROBE_ROWS = 2 * PARTITION_ROWS
+
+IBIS_JOIN_TYPES = {
+    ops.InnerJoin: "inner",
+    ops.LeftJoin: "left",
+    ops.RightJoin: "right",
+    ops.OuterJoin: "outer",
+}
+
+
+def _join_keys_sorted(op: ops.Join) -> bool:
+    """
+    Return whether both inputs are known to be sorted on the join keys
+    :param op:
+    :return:
+    """
+    if len(op.predicates) != 1:
+        return False
+    predicate_op = op.predicates[0].op()
+    if not isinstance(predicate_op, ops.Equals):
+        return False
+    return is_sorted_column(predicate_op.left) and is_sorted_column(predicate_op.right)
+
+
+def choose_join_strategy(op: ops.Join) -> Tuple[str, str]:
+    """
+    Return the join algorithm and build side to use for a join
+    :param op:
+    :return:
+    """
+    left_rows = estimate_row_count(op.left)
+    right_rows = estimate_row_count(op.right)
+    build_side = "right" if right_rows <= left_rows else "left"
+    build_rows, probe_rows = sorted([left_rows, right_rows])
+    if _join_keys_sorted(op):
+        return "sort_merge", build_side
+    if (
+        build_rows <= BROADCAST_MAX_BUILD_ROWS
+        and probe_rows >= BROADCAST_MIN_PROBE_ROWS
+    ):
+        return "broadcast", build_side
+    return "hash", build_side
+
+
+def is_equi_join(op: ops.Join) -> bool:
+    return bool(op.predicates) and all(
+        is_equi_join_predicate(predicate, op.left, op.right)
+        for predicate in op.predicates
+    )
+
+
+def _plan_join(expr: ir.TableExpr, join_strategy: Optional[str]) -> Optional[ir.Expr]:
+    """
+    Return the join with its algorithm chosen, or None if it is unchanged
+    :param expr:
+    :param join_strategy: Algorithm requested by the user for every join
+    :return:
+    """
+    op = expr.op()
+    if isinstance(op, PhysicalJoin):
+        how = op.how
+    elif type(op) in IBIS_JOIN_TYPES:
+        how = IBIS_JOIN_TYPES[type(op)]
+    else:
+        return None
+    if not is_equi_join(op):
+        return None
+    strategy, build_side = choose_join_strategy(op)
+    if join_strategy is not None:
+        strategy = join_strategy
+    if isinstance(op, PhysicalJoin) and (op.strategy, op.build_side) == (
+        strategy,
+        build_side,
+    ):
+        return None
+    return PhysicalJoin(
+        op.left, op.right, op.predicates, how, strategy, build_side
+    ).to_expr()
+
+
+def plan_join_strategies(expr: ir.Expr, join_strategy: Optional[str] = None) -> ir.Expr:
+    """
+    Choose the algorithm and build side of every equality join in the expression
+    :param expr:
+    :param join_strategy: Algorithm to use for every join instead of choosing one
+                          from the statistics, one of "hash", "sort_merge" or
+                          "broadcast"
+    :return:
+    """
+    if join_strategy is not None and join_strategy not in JOIN_STRATEGIES:
+        raise ValueError(
+            f"Unknown join strategy '{join_strategy}', expected one of "
+            f"{', '.join(JOIN_STRATEGIES)}"
+        )
+    return rewrite(expr, lambda sub_expr: _plan_join(sub_expr, join_strategy))
@@ -0,0 +1,112 @@
+"""
+Late materialization of the columns of filtered and joined relations
+
+The pandas backend of ibis computes the columns of a filtered projection for
+every row and then copies the rows that pass the filter, and a join gathers the
+paired rows of every column of its inputs. Columns that are not read above the
+filter or join are copied for nothing, and so are the rows of computed columns
+that the filter removes. Filters instead compute which rows pass as a mask and
+gather only the columns that are read, and only at those rows, before computing
+the projection; the filters of aggregations do the same before grouping. This
+pass finds the columns that are read above each join, which are the only ones
+that it gathers from the positions of the rows that its algorithm paired.
+"""
+from typing import Iterable, Optional, Set
+
+from ibis.backends.pandas.execution import constants
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+# Operations whose values depend on rows other than their own
+_SET_OPERATIONS = (ops.Reduction, ops.AnalyticOp, ops.WindowOp)
+
+
+def read_columns(
+    exprs: Iterable[ir.Expr], table: ir.TableExpr, row_wise: bool = False
+) -> Optional[Set[str]]:
+    """
+    Return the names of the columns of a relation that expressions over it read,
+    or None if they read it whole or, when row_wise is set, if a value of one of
+    them is not computed from its own row alone
+    :param exprs:
+    :param table:
+    :param row_wise: Whether the expressions must be computed row by row
+    :return:
+    """
+    names: Set[str] = set()
+    seen: Set[ops.Node] = set()
+    pending = list(exprs)
+    while pending:
+        expr = pending.pop()
+        op = expr.op()
+        if op in seen:
+            continue
+        seen.add(op)
+        if isinstance(op, ops.TableColumn):
+            names.add(op.name)
+            for suffix in constants.JOIN_SUFFIXES:
+                if op.name.endswith(suffix):
+                    names.add(op.name[: -len(suffix)])
+            continue
+        if isinstance(expr, ir.TableExpr):
+            return None
+        if row_wise and isinstance(op, _SET_OPERATIONS):
+            return None
+        # Counting the rows of the relation reads none of its columns
+        if (
+            isinstance(op, ops.Count)
+            and isinstance(op.arg, ir.TableExpr)
+            and op.arg.equals(table)
+            and op.where is None
+        ):
+            continue
+        for arg in op.flat_args():
+            if isinstance(arg, ir.Expr):
+                pending.append(arg)
+    return names
+
+
+def parent_exprs(op: ops.Node) -> list:
+    """
+    Return the expressions of a selection or aggregation that read its table
+    :param op:
+    :return:
+    """
+    if isinstance(op, ops.Selection):
+        return [*op.selections, *op.predicates, *op.sort_keys]
+    return [*op.metrics, *op.by, *op.having, *op.predicates, *op.sort_keys]
+
+
+def _prune_join_columns(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if not isinstance(op, (ops.Selection, ops.Aggregation)):
+        return None
+    join = op.table.op()
+    if not isinstance(join, PhysicalJoin) or join.columns is not None:
+        return None
+    columns = read_columns(parent_exprs(op), op.table)
+    if columns is None:
+        return None
+    pruned = PhysicalJoin(
+        join.left,
+        join.right,
+        join.predicates,
+        join.how,
+        join.strategy,
+        join.build_side,
+        join.partitions,
+        columns,
+    ).to_expr()
+    return substitute(expr, {join: pruned})
+
+
+def prune_join_columns(expr: ir.Expr) -> ir.Expr:
+    """
+    Gather only the columns of the inputs of joins that are read above them
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _prune_join_columns)
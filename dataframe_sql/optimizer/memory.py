@@ -0,0 +1,184 @@
+"""
+Estimates of the memory that joins, aggregations and sorts need, checked against
+the memory limit of a query before it is executed
+
+An operator needs memory for the intermediate inputs it holds, for its working
+state, such as a hash table or a sort order, and for its result. Registered
+tables are already in memory, so they are not counted. An operator whose estimate
+exceeds the limit is handed to the out-of-core planners, which may replace it
+with an operator that spills to disk or streams its input. When none of them
+can, MemoryLimitExceeded is raised before any part of the query runs. Operators
+under a LIMIT are first handed to the limit planners, which may plan an operator
+that only keeps the rows that the limit returns, such as an external top-N sort.
+Once every operator is planned, the out-of-core rewrites adapt the operators
+around them.
+"""
+from typing import Callable, List, Optional
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+import numpy as np
+
+from dataframe_sql.exceptions import MemoryLimitExceeded
+from dataframe_sql.execution.stats import format_memory_size
+from dataframe_sql.optimizer.cardinality import (
+    estimate_average_size,
+    estimate_row_count,
+)
+from dataframe_sql.optimizer.rewrite import RewriteRule, rewrite
+
+# Bytes per value of an object column that no statistics describe
+DEFAULT_OBJECT_WIDTH = 64.0
+# Bytes per row of the positions, group codes and hash table entries that
+# operators build
+INDEXER_WIDTH = 8.0
+HASH_ENTRY_WIDTH = 16.0
+
+OutOfCorePlanner = Callable[[ir.TableExpr, int], Optional[ir.TableExpr]]
+
+OUT_OF_CORE_PLANNERS: List[OutOfCorePlanner] = []
+# Called with a limit over an operator that would exceed the memory limit
+LIMIT_PLANNERS: List[OutOfCorePlanner] = []
+OUT_OF_CORE_REWRITES: List[RewriteRule] = []
+
+
+def estimate_column_width(column_expr: ir.ValueExpr) -> float:
+    """
+    Estimate the number of bytes that a value of a column takes
+    :param column_expr:
+    :return:
+    """
+    try:
+        numpy_dtype = np.dtype(column_expr.type().to_pandas())
+    except (NotImplementedError, TypeError):
+        numpy_dtype = np.dtype(object)
+    if numpy_dtype != np.dtype(object):
+        return float(numpy_dtype.itemsize)
+    average_size = estimate_average_size(column_expr)
+    return DEFAULT_OBJECT_WIDTH if average_size is None else average_size
+
+
+def estimate_row_width(table_expr: ir.TableExpr) -> float:
+    """
+    Estimate the number of bytes that a row of a table takes, including its index
+    :param table_expr:
+    :return:
+    """
+    op = table_expr.op()
+    if isinstance(op, ops.Join):
+        return estimate_row_width(op.left) + estimate_row_width(op.right)
+    if isinstance(op, ops.MaterializedJoin):
+        return estimate_row_width(op.join)
+    return INDEXER_WIDTH + sum(
+        estimate_column_width(table_expr[name]) for name in table_expr.columns
+    )
+
+
+def estimate_table_size(table_expr: ir.TableExpr) -> float:
+    """
+    Estimate the number of bytes that the result of a table expression takes
+    :param table_expr:
+    :return:
+    """
+    return estimate_row_count(table_expr) * estimate_row_width(table_expr)
+
+
+def held_input_size(table_expr: ir.TableExpr) -> float:
+    if isinstance(table_expr.op(), ops.PhysicalTable):
+        return 0.0
+    return estimate_table_size(table_expr)
+
+
+def estimate_operator_memory(table_expr: ir.TableExpr) -> Optional[float]:
+    """
+    Estimate the number of bytes that a join, aggregation or sort needs while it
+    runs
+    :param table_expr:
+    :return: Estimated memory or None if the expression is not such an operator
+    """
+    op = table_expr.op()
+    if isinstance(op, ops.Join):
+        inputs = [op.left, op.right]
+        build_rows = min(estimate_row_count(op.left), estimate_row_count(op.right))
+        output_rows = estimate_row_count(table_expr)
+        working_size = build_rows * HASH_ENTRY_WIDTH + output_rows * 2 * INDEXER_WIDTH
+    elif isinstance(op, ops.Aggregation):
+        inputs = [op.table]
+        working_size = estimate_row_count(op.table) * INDEXER_WIDTH
+    elif isinstance(op, ops.Selection) and op.sort_keys:
+        inputs = [op.table]
+        working_size = estimate_row_count(op.table) * INDEXER_WIDTH
+    else:
+        return None
+    return (
+        sum(held_input_size(input_expr) for input_expr in inputs)
+        + working_size
+        + estimate_table_size(table_expr)
+    )
+
+
+def _operator_name(op: ops.Node) -> str:
+    if isinstance(op, ops.Selection):
+        return "Sort"
+    return type(op).__name__
+
+
+def _plan_operator_memory(expr: ir.Expr, memory_limit: int) -> Optional[ir.Expr]:
+    """
+    Return an out-of-core replacement of an operator that would exceed the memory
+    limit, or None if it fits
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    if not isinstance(expr, ir.TableExpr):
+        return None
+    required = estimate_operator_memory(expr)
+    if required is None or required <= memory_limit:
+        return None
+    for planner in OUT_OF_CORE_PLANNERS:
+        replacement = planner(expr, memory_limit)
+        if replacement is not None:
+            return replacement
+    raise MemoryLimitExceeded(
+        f"{_operator_name(expr.op())} is estimated to need "
+        f"{format_memory_size(required)}, more than the memory limit of "
+        f"{format_memory_size(memory_limit)}"
+    )
+
+
+def _plan_limit_memory(expr: ir.Expr, memory_limit: int) -> Optional[ir.Expr]:
+    """
+    Return an out-of-core replacement of a limit over an operator that would
+    exceed the memory limit, or None if the operator fits or is left to be
+    planned on its own
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Limit):
+        return None
+    required = estimate_operator_memory(op.table)
+    if required is None or required <= memory_limit:
+        return None
+    for planner in LIMIT_PLANNERS:
+        replacement = planner(expr, memory_limit)
+        if replacement is not None:
+            return replacement
+    return None
+
+
+def plan_memory(expr: ir.Expr, memory_limit: int) -> ir.Expr:
+    """
+    Check the estimated memory of every join, aggregation and sort against the
+    memory limit, replacing those that exceed it with out-of-core operators
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    expr = rewrite(expr, lambda sub_expr: _plan_limit_memory(sub_expr, memory_limit))
+    expr = rewrite(expr, lambda sub_expr: _plan_operator_memory(sub_expr, memory_limit))
+    for rule in OUT_OF_CORE_REWRITES:
+        expr = rewrite(expr, rule)
+    return expr
@@ -0,0 +1,395 @@
+"""
+Two-phase aggregation that pushes partial aggregates below UNION ALL and joins
+
+An aggregation over UNION ALL materializes the rows of every branch before they
+are grouped. When every aggregate is decomposable, each branch is aggregated on
+its own into partial aggregates and the union of the partials, which holds a
+row per group of each branch, is aggregated again to combine them. Sums and
+counts combine by summing, minimums and maximums by taking the minimum or
+maximum, and averages are computed from the combined sum and count.
+
+Likewise, when the aggregates of an aggregation over an inner equi-join only
+read one side of the join, that side is aggregated by its join keys and by the
+group keys it provides before the join. Every partial row stands for the rows
+of its group, so the other side is joined with far fewer rows and each match
+still contributes the aggregates of all of them. This only pays off when the
+statistics of the side show that grouping it leaves at most MAX_GROUP_RATIO of
+its rows.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ibis.expr.analysis import fully_originate_from
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.optimizer.cardinality import (
+    estimate_distinct_count,
+    estimate_row_count,
+)
+from dataframe_sql.optimizer.join_order import collect_join_inputs, is_inner_join
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+MAX_GROUP_RATIO = 0.5
+
+DECOMPOSABLE_AGGREGATES = (ops.Sum, ops.Count, ops.Min, ops.Max, ops.Mean)
+
+# Partial aggregates are named after the position of the aggregate they belong
+# to, which keeps them apart from the group keys
+_PARTIAL_NAME = "__partial_{position}_{kind}__"
+
+
+class DecomposedAggregate:
+    """
+    Aggregate split into partial aggregates computed over parts of the input,
+    aggregates of the partials that combine them, and for averages the
+    expression that computes the aggregate from the combined sum and count
+    """
+
+    def __init__(
+        self,
+        name: str,
+        partials: List[ir.ValueExpr],
+        combine: Callable[[ir.TableExpr], List[ir.ValueExpr]],
+        finish: Optional[Callable[[ir.TableExpr], ir.ValueExpr]] = None,
+    ):
+        self.name = name
+        self.partials = partials
+        self.combine = combine
+        self.finish = finish
+
+
+def _decompose(
+    metric: ir.ValueExpr, position: int, table: ir.TableExpr
+) -> Optional[DecomposedAggregate]:
+    """
+    Split an aggregate into partial aggregates and the aggregates that combine
+    them
+    :param metric: Aggregate of the aggregation
+    :param position: Position of the aggregate among the metrics
+    :param table: Table that the partial aggregates are computed over, which
+                  replaces the input of the aggregation in COUNT(*)
+    :return: Decomposed aggregate, or None if the aggregate is not decomposable
+    """
+    op = metric.op()
+    if type(op) not in DECOMPOSABLE_AGGREGATES:
+        return None
+    name = metric.get_name()
+    if isinstance(op, ops.Mean):
+        sum_name = _PARTIAL_NAME.format(position=position, kind="sum")
+        count_name = _PARTIAL_NAME.format(position=position, kind="count")
+        return DecomposedAggregate(
+            name,
+            [
+                ops.Sum(op.arg, op.where).to_expr().name(sum_name),
+                ops.Count(op.arg, op.where).to_expr().name(count_name),
+            ],
+            lambda partials: [
+                partials[sum_name].sum().name(sum_name),
+                partials[count_name].sum().name(count_name),
+            ],
+            lambda combined: combined[sum_name] / combined[count_name],
+        )
+    partial_name = _PARTIAL_NAME.format(
+        position=position, kind=type(op).__name__.lower()
+    )
+    if isinstance(op, ops.Count):
+        arg = table if isinstance(op.arg, ir.TableExpr) else op.arg
+        partial = ops.Count(arg, op.where).to_expr().name(partial_name)
+    else:
+        partial = metric.name(partial_name)
+    combine_method = {ops.Min: "min", ops.Max: "max"}.get(type(op), "sum")
+    return DecomposedAggregate(
+        name,
+        [partial],
+        lambda partials: [getattr(partials[partial_name], combine_method)().name(name)],
+    )
+
+
+def _decompose_metrics(
+    metrics: List[ir.ValueExpr], table: ir.TableExpr
+) -> Optional[List[DecomposedAggregate]]:
+    """
+    Decompose every aggregate of an aggregation
+    :param metrics:
+    :param table: Table that the partial aggregates are computed over
+    :return: Decomposed aggregates, or None if an aggregate is not decomposable
+    """
+    decomposed_aggregates = []
+    for position, metric in enumerate(metrics):
+        if not isinstance(metric, ir.ValueExpr):
+            return None
+        decomposed = _decompose(metric, position, table)
+        if decomposed is None:
+            return None
+        decomposed_aggregates.append(decomposed)
+    return decomposed_aggregates
+
+
+def _partial_metrics(aggregates: List[DecomposedAggregate]) -> List[ir.ValueExpr]:
+    return [partial for aggregate in aggregates for partial in aggregate.partials]
+
+
+def _combine(
+    partials: ir.TableExpr,
+    by: List[ir.ValueExpr],
+    aggregates: List[DecomposedAggregate],
+) -> ir.TableExpr:
+    """
+    Return the aggregation of the partial aggregates, followed by a projection
+    that computes averages from their combined sums and counts
+    :param partials: Table of partial aggregates
+    :param by: Group keys over the table of partial aggregates
+    :param aggregates:
+    :return:
+    """
+    metrics = [
+        combined for aggregate in aggregates for combined in aggregate.combine(partials)
+    ]
+    combined = ops.Aggregation(partials, metrics, by).to_expr()
+    if all(aggregate.finish is None for aggregate in aggregates):
+        return combined
+    selections = [combined[by_expr.get_name()] for by_expr in by]
+    for aggregate in aggregates:
+        if aggregate.finish is None:
+            selections.append(combined[aggregate.name])
+        else:
+            selections.append(aggregate.finish(combined).name(aggregate.name))
+    return ops.Selection(combined, selections).to_expr()
+
+
+def _union_all_branches(table: ir.TableExpr) -> Optional[List[ir.TableExpr]]:
+    op = table.op()
+    if not isinstance(op, ops.Union) or op.distinct:
+        return None
+    branches = []
+    for branch in (op.left, op.right):
+        branches.extend(_union_all_branches(branch) or [branch])
+    return branches
+
+
+def _push_below_union(expr: ir.TableExpr) -> Optional[ir.TableExpr]:
+    """
+    Aggregate every branch of a UNION ALL and combine the partial aggregates
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    branches = _union_all_branches(op.table)
+    # Aggregations of the branches are the result of an earlier push down
+    if branches is None or any(
+        isinstance(branch.op(), ops.Aggregation) for branch in branches
+    ):
+        return None
+    aggregates = _decompose_metrics(op.metrics, op.table)
+    if aggregates is None:
+        return None
+    partial = ops.Aggregation(
+        op.table, _partial_metrics(aggregates), op.by, predicates=op.predicates
+    ).to_expr()
+    union_op = op.table.op()
+    partials = [substitute(partial, {union_op: branch}) for branch in branches]
+    union = partials[0]
+    for branch_partial in partials[1:]:
+        union = ops.Union(union, branch_partial, distinct=False).to_expr()
+    by = [union[by_expr.get_name()] for by_expr in op.by]
+    return _combine(union, by, aggregates)
+
+
+def _projected_join(
+    op: ops.Aggregation,
+) -> Optional[Tuple[ir.TableExpr, Dict[str, ir.ValueExpr]]]:
+    """
+    Return the tree of inner joins beneath the projection that the aggregation
+    reads and the expression of every column of the projection
+    :param op:
+    :return: Join and projected expressions by name, or None if the aggregation
+             does not read a projection of inner joins
+    """
+    projection = op.table.op()
+    if (
+        not isinstance(projection, ops.Selection)
+        or projection.predicates
+        or projection.sort_keys
+        or not is_inner_join(projection.table.op())
+    ):
+        return None
+    columns = {}
+    for selection in projection.selections:
+        if not isinstance(selection, ir.ValueExpr):
+            return None
+        columns[selection.get_name()] = selection
+    return projection.table, columns
+
+
+def _touches(expr: ir.Expr, relation: ir.TableExpr) -> bool:
+    roots = set(relation.op().root_tables())
+    return any(root in roots for root in expr.op().root_tables())
+
+
+def _is_column_of(expr: ir.Expr, relation: ir.TableExpr) -> bool:
+    op = expr.op()
+    return isinstance(op, ops.TableColumn) and op.table.op().equals(relation.op())
+
+
+def _aggregated_relation(
+    metrics: List[ir.ValueExpr], relations: List[ir.TableExpr]
+) -> Optional[ir.TableExpr]:
+    """
+    Return the joined table that every aggregate reads, or the largest one when
+    the aggregates read no column, as COUNT(*) does
+    :param metrics:
+    :param relations:
+    :return: Table, or None if the aggregates read several tables
+    """
+    arguments = [
+        arg
+        for metric in metrics
+        for arg in metric.op().flat_args()
+        if isinstance(arg, ir.ValueExpr)
+    ]
+    if not arguments:
+        return max(relations, key=estimate_row_count)
+    candidates = [
+        relation
+        for relation in relations
+        if all(fully_originate_from(arg, [relation]) for arg in arguments)
+    ]
+    if len(candidates) != 1:
+        return None
+    return candidates[0]
+
+
+def _reduces_rows(relation: ir.TableExpr, by: List[ir.ValueExpr]) -> bool:
+    """
+    Return whether grouping the table by the keys is estimated to leave at most
+    MAX_GROUP_RATIO of its rows
+    :param relation:
+    :param by:
+    :return:
+    """
+    rows = estimate_row_count(relation)
+    groups = 1.0
+    for by_expr in by:
+        distinct_count = estimate_distinct_count(by_expr)
+        if distinct_count is None:
+            return False
+        groups *= distinct_count
+    return min(groups, rows) <= rows * MAX_GROUP_RATIO
+
+
+def _push_below_join(expr: ir.TableExpr) -> Optional[ir.TableExpr]:
+    """
+    Aggregate the joined table that the aggregates read by its join keys and its
+    group keys before it is joined with the other tables, and combine the partial
+    aggregates after the joins
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    projected = _projected_join(op)
+    if projected is None:
+        return None
+    join, columns = projected
+    projection_op = op.table.op()
+
+    def resolve_column(sub_expr: ir.Expr) -> Optional[ir.Expr]:
+        sub_op = sub_expr.op()
+        if isinstance(sub_op, ops.TableColumn) and sub_op.table.op().equals(
+            projection_op
+        ):
+            return columns[sub_op.name]
+        return None
+
+    metrics = [rewrite(metric, resolve_column) for metric in op.metrics]
+    relations: List[ir.TableExpr] = []
+    join_predicates: List[ir.BooleanValue] = []
+    collect_join_inputs(join, relations, join_predicates)
+    relation = _aggregated_relation(metrics, relations)
+    # An aggregated table is the result of an earlier push down
+    if relation is None or isinstance(relation.op(), (ops.Join, ops.Aggregation)):
+        return None
+
+    partial_by: Dict[str, ir.ValueExpr] = {}
+    for predicate in join_predicates:
+        if not _touches(predicate, relation):
+            continue
+        predicate_op = predicate.op()
+        if not isinstance(predicate_op, ops.Equals):
+            return None
+        keys = [
+            key
+            for key in (predicate_op.left, predicate_op.right)
+            if _touches(key, relation)
+        ]
+        if len(keys) != 1 or not _is_column_of(keys[0], relation):
+            return None
+        partial_by[keys[0].op().name] = keys[0]
+
+    relation_by_names = []
+    other_by = []
+    for by_expr in op.by:
+        by_expr = rewrite(by_expr, resolve_column)
+        name = by_expr.get_name()
+        if not _touches(by_expr, relation):
+            other_by.append(by_expr)
+        elif not fully_originate_from(by_expr, [relation]) or (
+            name in partial_by and not partial_by[name].equals(by_expr)
+        ):
+            return None
+        else:
+            partial_by[name] = by_expr
+            relation_by_names.append(name)
+    relation_predicates = []
+    other_predicates = []
+    for predicate in op.predicates:
+        predicate = rewrite(predicate, resolve_column)
+        if not _touches(predicate, relation):
+            other_predicates.append(predicate)
+        elif fully_originate_from(predicate, [relation]):
+            relation_predicates.append(predicate)
+        else:
+            return None
+    if not _reduces_rows(relation, list(partial_by.values())):
+        return None
+
+    aggregates = _decompose_metrics(metrics, relation)
+    if aggregates is None:
+        return None
+    partial_metrics = _partial_metrics(aggregates)
+    partials = ops.Aggregation(
+        relation,
+        partial_metrics,
+        [by_expr.name(name) for name, by_expr in partial_by.items()],
+        predicates=relation_predicates,
+    ).to_expr()
+    names = relation_by_names + [partial.get_name() for partial in partial_metrics]
+    selections = [partials[name] for name in names] + other_by
+    if len({selection.get_name() for selection in selections}) != len(selections):
+        return None
+    projection = ops.Selection(
+        substitute(join, {relation.op(): partials}),
+        selections,
+        predicates=other_predicates,
+    ).to_expr()
+    by = [projection[by_expr.get_name()] for by_expr in op.by]
+    return _combine(projection, by, aggregates)
+
+
+def _push_partial_aggregation(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if not isinstance(op, ops.Aggregation) or op.having or op.sort_keys:
+        return None
+    pushed = _push_below_union(expr)
+    if pushed is None:
+        pushed = _push_below_join(expr)
+    return pushed
+
+
+def push_partial_aggregations(expr: ir.Expr) -> ir.Expr:
+    """
+    Push the decomposable aggregates of every aggregation over UNION ALL or over
+    an inner equi-join below it, combining the partial aggregates above
+    :param expr: Ibis expression of the query
+    :return:
+    """
+    return rewrite(expr, _push_partial_aggregation)
@@ -0,0 +1,83 @@
+"""
+Replacement of aggregations that would exceed the memory limit with partitioned
+hash aggregations
+
+The partitions of a partitioned aggregation are buffered in the memory that the
+limit leaves once the input it holds and its result are accounted for. There
+are enough partitions for each one to fit in that memory on its own when the
+groups are spread evenly.
+"""
+from typing import Optional
+
+import ibis.expr.datatypes as dt
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import PartitionedAggregation
+from dataframe_sql.optimizer.cardinality import estimate_row_count
+from dataframe_sql.optimizer.memory import (
+    HASH_ENTRY_WIDTH,
+    INDEXER_WIDTH,
+    OUT_OF_CORE_PLANNERS,
+    estimate_row_width,
+    estimate_table_size,
+    held_input_size,
+)
+
+MIN_PARTITION_ROWS = 1024
+MIN_PARTITIONS = 2
+MAX_PARTITIONS = 256
+
+
+def _partitionable(op: ops.Aggregation) -> bool:
+    """
+    Return whether the aggregation is grouped by columns of its input that can be
+    hashed. Categorical keys are left out, since pandas gives every partition
+    every combination of their categories.
+    :param op:
+    :return:
+    """
+    if not op.by:
+        return False
+    for by_expr in op.by:
+        by_op = by_expr.op()
+        if (
+            not isinstance(by_op, ops.TableColumn)
+            or not by_op.table.equals(op.table)
+            or by_expr.get_name() != by_op.name
+            or isinstance(by_expr.type(), dt.Category)
+        ):
+            return False
+    return True
+
+
+def plan_partitioned_aggregation(
+    expr: ir.TableExpr, memory_limit: int
+) -> Optional[ir.Expr]:
+    """
+    Return a partitioned aggregation of an aggregation that would exceed the
+    memory limit, or None if it is not grouped by columns or even its result would
+    not fit
+    :param expr:
+    :param memory_limit: Limit in bytes
+    :return:
+    """
+    op = expr.op()
+    if not isinstance(op, ops.Aggregation) or not _partitionable(op):
+        return None
+    available = memory_limit - held_input_size(op.table) - estimate_table_size(expr)
+    if available <= 0:
+        return None
+    partition_rows = max(
+        int(
+            available
+            / (estimate_row_width(op.table) + INDEXER_WIDTH + HASH_ENTRY_WIDTH)
+        ),
+        MIN_PARTITION_ROWS,
+    )
+    partitions = int(-(-estimate_row_count(op.table) // partition_rows))
+    partitions = min(max(partitions, MIN_PARTITIONS), MAX_PARTITIONS)
+    return PartitionedAggregation(expr, partitions, partition_rows).to_expr()
+
+
+OUT_OF_CORE_PLANNERS.append(plan_partitioned_aggregation)
@@ -0,0 +1,150 @@
+"""
+Helpers for rewriting ibis expression trees
+"""
+from typing import Callable, Dict, Optional
+
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import SubqueryMembership
+
+RewriteRule = Callable[[ir.Expr], Optional[ir.Expr]]
+
+
+def _keep_name(new_expr: ir.Expr, old_expr: ir.Expr) -> ir.Expr:
+    """
+    Give the new expression the explicit name of the expression it replaces
+    :param new_expr:
+    :param old_expr:
+    :return:
+    """
+    if isinstance(old_expr, ir.ValueExpr) and old_expr._name is not None:
+        if isinstance(new_expr, ir.ValueExpr) and new_expr._name != old_expr._name:
+            return new_expr.name(old_expr._name)
+    return new_expr
+
+
+def rebuild_op(op: ops.Node, args: list) -> ops.Node:
+    """
+    Return a new operation of the same type as op with the given arguments
+    :param op: Operation to copy
+    :param args: New arguments in the order of op.args
+    :return:
+    """
+    if isinstance(op, ops.CrossJoin):
+        return type(op)(args[0], args[1])
+    return type(op)(*args)
+
+
+class ExprRewriter:
+    """
+    Rewrites an ibis expression from the leaves up, applying a rule to every
+    expression in the tree. Results are memoized by operation so that shared
+    subtrees are only rewritten once. Operations that are left as they are
+    memoize None, since equal operations may belong to expressions of different
+    types, such as a literal that is compared with a float column.
+    """
+
+    def __init__(self, rule: RewriteRule):
+        self._rule = rule
+        self._memo: Dict[ops.Node, Optional[ir.Expr]] = {}
+
+    def _rewrite_arg(self, arg):
+        if isinstance(arg, ir.Expr):
+            return self.rewrite(arg)
+        if isinstance(arg, (list, tuple)):
+            return type(arg)(self._rewrite_arg(item) for item in arg)
+        return arg
+
+    @staticmethod
+    def _arg_changed(old_arg, new_arg) -> bool:
+        if isinstance(old_arg, (list, tuple)):
+            return any(
+                ExprRewriter._arg_changed(old, new)
+                for old, new in zip(old_arg, new_arg)
+            )
+        return old_arg is not new_arg
+
+    def rewrite(self, expr: ir.Expr) -> ir.Expr:
+        """
+        Return the rewritten expression
+        :param expr:
+        :return:
+        """
+        op = expr.op()
+        if op not in self._memo:
+            new_args = [self._rewrite_arg(arg) for arg in op.args]
+            new_expr = expr
+            if any(self._arg_changed(old, new) for old, new in zip(op.args, new_args)):
+                new_expr = _keep_name(rebuild_op(op, new_args).to_expr(), expr)
+            replacement = self._rule(new_expr)
+            result = new_expr if replacement is None else replacement
+            self._memo[op] = None if result.op() is op else result
+        result = self._memo[op]
+        if result is None:
+            return expr
+        return _keep_name(result, expr)
+
+
+def rewrite(expr: ir.Expr, rule: RewriteRule) -> ir.Expr:
+    """
+    Apply the rule to every expression in the tree from the leaves up. The rule
+    returns a replacement expression or None to keep the expression as is.
+    :param expr: Expression to rewrite
+    :param rule: Rewrite rule
+    :return:
+    """
+    return ExprRewriter(rule).rewrite(expr)
+
+
+def _is_subquery_arg(op: ops.Node, arg) -> bool:
+    """
+    Return whether the argument is a subquery that runs on its own, so that the
+    tables it reads are not those of the enclosing expression
+    :param op:
+    :param arg:
+    :return:
+    """
+    return isinstance(op, SubqueryMembership) and arg is op.subquery
+
+
+def substitute(expr: ir.Expr, mapping: Dict[ops.Node, ir.Expr]) -> ir.Expr:
+    """
+    Replace every occurrence of the operations in mapping with their expressions
+    :param expr: Expression to substitute into
+    :param mapping: Map of operations to the expressions that replace them
+    :return:
+    """
+    if not mapping:
+        return expr
+    memo: Dict[ops.Node, Optional[ir.Expr]] = {}
+
+    def substitute_arg(arg):
+        if isinstance(arg, ir.Expr):
+            return substitute_expr(arg)
+        if isinstance(arg, (list, tuple)):
+            return type(arg)(substitute_arg(item) for item in arg)
+        return arg
+
+    def substitute_expr(sub_expr: ir.Expr) -> ir.Expr:
+        op = sub_expr.op()
+        if op in mapping:
+            return _keep_name(mapping[op], sub_expr)
+        if op not in memo:
+            new_args = [
+                arg if _is_subquery_arg(op, arg) else substitute_arg(arg)
+                for arg in op.args
+            ]
+            if any(
+                ExprRewriter._arg_changed(old, new)
+                for old, new in zip(op.args, new_args)
+            ):
+                memo[op] = rebuild_op(op, new_args).to_expr()
+            else:
+                memo[op] = None
+        result = memo[op]
+        if result is None:
+            return sub_expr
+        return _keep_name(result, sub_expr)
+
+    return substitute_expr(expr)
@@ -0,0 +1,310 @@
+"""
+Use of the order of tables that are registered as sorted
+
+The rows of a table registered with sorted_by are in ascending order of those
+columns, and filters, projections, limits, samples and DISTINCT keep them in that
+order. Relations in a known order are used in three ways:
+
+- An ORDER BY on a prefix of the columns that a relation is sorted by is dropped,
+  since the rows are already in that order.
+- An aggregation whose group keys are a prefix of the sort columns of its table
+  finds its groups as runs of equal keys instead of hashing them.
+- Comparisons of the first sort column of a relation with literals are replaced
+  by a binary search for the range of rows that satisfies them.
+
+Sort merge joins on the first sort column are chosen from the statistics of the
+table, which know that the column is sorted without checking it.
+"""
+from typing import List, Optional, Tuple
+
+import ibis.expr.datatypes as dt
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import (
+    RunAggregation,
+    SortedRangeScan,
+    TableSample,
+    ZoneMapScan,
+)
+from dataframe_sql.optimizer.cardinality import table_statistics
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+
+# Reductions that an aggregation over runs of equal keys computes
+RUN_REDUCTIONS = (ops.Sum, ops.Min, ops.Max, ops.Mean, ops.Count)
+
+# Comparisons of a column with a literal and the bound of the range of the
+# column that they give, as whether it is a lower bound, an upper bound, or
+# both, and whether it is inclusive
+_RANGE_COMPARISONS = {
+    ops.Greater: (True, False, False),
+    ops.GreaterEqual: (True, False, True),
+    ops.Less: (False, True, False),
+    ops.LessEqual: (False, True, True),
+    ops.Equals: (True, True, True),
+}
+_MIRRORED_COMPARISONS = {
+    ops.Greater: ops.Less,
+    ops.GreaterEqual: ops.LessEqual,
+    ops.Less: ops.Greater,
+    ops.LessEqual: ops.GreaterEqual,
+    ops.Equals: ops.Equals,
+}
+
+
+def _column_name(expr: ir.Expr, table: ir.TableExpr) -> Optional[str]:
+    op = expr.op()
+    if isinstance(op, ops.TableColumn) and op.table.equals(table):
+        return op.name
+    return None
+
+
+def _output_name(op: ops.Selection, name: str) -> Optional[str]:
+    """
+    Return the name in the result of a selection of a column of its table, or
+    None if the selection does not keep the column as it is
+    :param op:
+    :param name:
+    :return:
+    """
+    if not op.selections:
+        return name
+    for selection in op.selections:
+        if isinstance(selection, ir.TableExpr):
+            if selection.equals(op.table):
+                return name
+        elif _column_name(selection, op.table) == name:
+            return selection.get_name()
+    return None
+
+
+def _sort_key_names(op: ops.Selection) -> List[str]:
+    """
+    Return the names of the columns of the table of a selection that it sorts by
+    in ascending order, up to the first sort key that is not one
+    :param op:
+    :return:
+    """
+    names = []
+    for sort_key in op.sort_keys:
+        sort_key_op = sort_key.op()
+        name = _column_name(sort_key_op.expr, op.table)
+        if name is None or not sort_key_op.ascending:
+            break
+        names.append(name)
+    return names
+
+
+def sort_order(table: ir.TableExpr) -> Tuple[str, ...]:
+    """
+    Return the names of the columns of a relation that its rows are known to be
+    in ascending order of, compared in turn
+    :param table:
+    :return:
+    """
+    op = table.op()
+    if isinstance(op, ops.DatabaseTable):
+        statistics = table_statistics(op)
+        return () if statistics is None else statistics.sorted_by
+    if isinstance(
+        op, (ops.Limit, ops.Distinct, TableSample, SortedRangeScan, ZoneMapScan)
+    ):
+        return sort_order(op.table)
+    if not isinstance(op, ops.Selection):
+        return ()
+    names = _sort_key_names(op) if op.sort_keys else list(sort_order(op.table))
+    order = []
+    for name in names:
+        output_name = _output_name(op, name)
+        if output_name is None:
+            break
+        order.append(output_name)
+    return tuple(order)
+
+
+def _eliminate_sort(op: ops.Selection) -> Optional[ops.Selection]:
+    """
+    Return the selection without its sort keys if its table is already in their
+    order, or None if it is not
+    :param op:
+    :return:
+    """
+    if not op.sort_keys:
+        return None
+    names = _sort_key_names(op)
+    if len(names) < len(op.sort_keys):
+        return None
+    if tuple(names) != sort_order(op.table)[: len(names)]:
+        return None
+    return ops.Selection(op.table, op.selections, op.predicates)
+
+
+def _literal_value(expr: ir.Expr):
+    op = expr.op()
+    return op.value if isinstance(op, ops.Literal) else None
+
+
+def range_bounds(predicate: ir.Expr, table: ir.TableExpr, column: str):
+    """
+    Return the bounds of the column that a predicate comparing it with literals
+    gives, as pairs of the value and whether it is inclusive, or None if the
+    predicate is not such a comparison
+    :param predicate:
+    :param table:
+    :param column:
+    :return:
+    """
+    op = predicate.op()
+    if isinstance(op, ops.Between):
+        if _column_name(op.arg, table) != column:
+            return None
+        lower = _literal_value(op.lower_bound)
+        upper = _literal_value(op.upper_bound)
+        if lower is None or upper is None:
+            return None
+        return (lower, True), (upper, True)
+    comparison = type(op)
+    if comparison not in _RANGE_COMPARISONS:
+        return None
+    if _column_name(op.left, table) == column:
+        value = _literal_value(op.right)
+    elif _column_name(op.right, table) == column:
+        value = _literal_value(op.left)
+        comparison = _MIRRORED_COMPARISONS[comparison]
+    else:
+        return None
+    if value is None:
+        return None
+    is_lower, is_upper, inclusive = _RANGE_COMPARISONS[comparison]
+    return (
+        (value, inclusive) if is_lower else None,
+        (value, inclusive) if is_upper else None,
+    )
+
+
+def tighter_bound(bound, other, lower: bool):
+    """
+    Return the tighter of two bounds of the same side of a range
+    :param bound:
+    :param other:
+    :param lower:
+    :return:
+    """
+    if bound is None:
+        return other
+    if other is None:
+        return bound
+    (value, inclusive), (other_value, other_inclusive) = bound, other
+    if value == other_value:
+        return value, inclusive and other_inclusive
+    if (value > other_value) == lower:
+        return bound
+    return other
+
+
+def _plan_range_scan(op: ops.Selection) -> Optional[ir.TableExpr]:
+    """
+    Return the selection reading the range of its table that its comparisons of
+    the first sort column with literals select, or None if it has none
+    :param op:
+    :return:
+    """
+    order = sort_order(op.table)
+    if not order or not op.predicates:
+        return None
+    column = order[0]
+    column_type = op.table.schema()[column]
+    if not isinstance(column_type, (dt.Integer, dt.Floating, dt.Timestamp)):
+        return None
+    lower = upper = None
+    consumed = []
+    remaining = []
+    for predicate in op.predicates:
+        bounds = range_bounds(predicate, op.table, column)
+        if bounds is None:
+            remaining.append(predicate)
+            continue
+        consumed.append(predicate)
+        lower = tighter_bound(lower, bounds[0], lower=True)
+        upper = tighter_bound(upper, bounds[1], lower=False)
+    if not consumed:
+        return None
+    lower_value, lower_inclusive = (None, True) if lower is None else lower
+    upper_value, upper_inclusive = (None, True) if upper is None else upper
+    scan = SortedRangeScan(
+        op.table,
+        column,
+        lower_value,
+        lower_inclusive,
+        upper_value,
+        upper_inclusive,
+        consumed,
+    ).to_expr()
+    if not remaining and not op.selections and not op.sort_keys:
+        return scan
+    mapping = {op.table.op(): scan}
+    return ops.Selection(
+        scan,
+        [substitute(selection, mapping) for selection in op.selections],
+        [substitute(predicate, mapping) for predicate in remaining],
+        [substitute(sort_key, mapping) for sort_key in op.sort_keys],
+    ).to_expr()
+
+
+def _is_run_reduction(metric: ir.Expr, table: ir.TableExpr) -> bool:
+    op = metric.op()
+    if not isinstance(op, RUN_REDUCTIONS) or op.where is not None:
+        return False
+    if isinstance(op, ops.Count) and isinstance(op.arg, ir.TableExpr):
+        return op.arg.equals(table)
+    return _column_name(op.arg, table) is not None
+
+
+def _plan_run_aggregation(expr: ir.TableExpr) -> Optional[ir.TableExpr]:
+    """
+    Return the aggregation over runs of equal keys of an aggregation whose group
+    keys are a prefix of the sort columns of its table, in the same order, or
+    None if they are not. Runs of permuted keys would come out in the order of
+    the sort columns instead of the group keys.
+    :param expr:
+    :return:
+    """
+    op = expr.op()
+    if not op.by or op.having:
+        return None
+    names = [_column_name(key, op.table) for key in op.by]
+    order = sort_order(op.table)
+    if names != list(order[: len(names)]):
+        return None
+    if not all(_is_run_reduction(metric, op.table) for metric in op.metrics):
+        return None
+    return RunAggregation(expr).to_expr()
+
+
+def _use_sort_order(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if isinstance(op, ops.Aggregation):
+        return _plan_run_aggregation(expr)
+    if not isinstance(op, ops.Selection):
+        return None
+    unsorted = _eliminate_sort(op)
+    if unsorted is not None:
+        op = unsorted
+    scan = _plan_range_scan(op)
+    if scan is not None:
+        return scan
+    if unsorted is None:
+        return None
+    if not op.selections and not op.predicates:
+        return op.table
+    return op.to_expr()
+
+
+def use_sort_order(expr: ir.Expr) -> ir.Expr:
+    """
+    Drop the sorts of relations that are already sorted, and group and filter
+    sorted relations by their order
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _use_sort_order)
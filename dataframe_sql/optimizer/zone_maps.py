@@ -0,0 +1,134 @@
+"""
+Skipping of the blocks of tables that a filter cannot match
+
+A table registered with a zone map block size keeps the minimum and maximum of
+every block of rows of its numeric and timestamp columns. A filter of such a
+table that compares columns with literals only needs the blocks whose range of
+each of those columns overlaps the range that the comparisons allow, so the
+filter reads the table through a scan of those blocks. The filter itself is
+kept, since the blocks that are read can still have rows outside of the ranges.
+Tables whose similar values are stored together, such as events stored in the
+order that they happened, have few blocks that overlap a range.
+"""
+from typing import Dict, Optional, Sequence
+
+import ibis.expr.datatypes as dt
+import ibis.expr.operations as ops
+import ibis.expr.types as ir
+
+from dataframe_sql.operations import ZoneMapScan
+from dataframe_sql.optimizer.cardinality import table_statistics
+from dataframe_sql.optimizer.rewrite import rewrite, substitute
+from dataframe_sql.optimizer.sort_order import range_bounds, tighter_bound
+
+
+def _compared_column(predicate: ir.Expr, table: ir.TableExpr) -> Optional[str]:
+    """
+    Return the name of the numeric or timestamp column of the table that a
+    comparison or BETWEEN reads, or None if it reads none
+    :param predicate:
+    :param table:
+    :return:
+    """
+    op = predicate.op()
+    if isinstance(op, ops.Between):
+        operands = [op.arg]
+    elif isinstance(op, ops.Comparison):
+        operands = [op.left, op.right]
+    else:
+        return None
+    for operand in operands:
+        operand_op = operand.op()
+        if (
+            isinstance(operand_op, ops.TableColumn)
+            and operand_op.table.equals(table)
+            and isinstance(operand.type(), (dt.Integer, dt.Floating, dt.Timestamp))
+        ):
+            return operand_op.name
+    return None
+
+
+def _plan_zone_map_scan(
+    table: ir.TableExpr, predicates: Sequence[ir.Expr]
+) -> Optional[ir.TableExpr]:
+    """
+    Return the scan of the blocks of a table that the comparisons with literals
+    of a filter can match, or None if the table keeps no zone maps or the filter
+    has no such comparisons
+    :param table:
+    :param predicates:
+    :return:
+    """
+    if not predicates:
+        return None
+    statistics = table_statistics(table.op())
+    if (
+        statistics is None
+        or statistics.zone_map_block_size is None
+        or statistics.row_count <= statistics.zone_map_block_size
+    ):
+        return None
+    bounds: Dict[str, list] = {}
+    for predicate in predicates:
+        column = _compared_column(predicate, table)
+        if column is None:
+            continue
+        predicate_bounds = range_bounds(predicate, table, column)
+        if predicate_bounds is None:
+            continue
+        lower, upper = bounds.get(column, (None, None))
+        bounds[column] = [
+            tighter_bound(lower, predicate_bounds[0], lower=True),
+            tighter_bound(upper, predicate_bounds[1], lower=False),
+        ]
+    if not bounds:
+        return None
+    ranges = []
+    for column, (lower, upper) in bounds.items():
+        lower_value, lower_inclusive = (None, True) if lower is None else lower
+        upper_value, upper_inclusive = (None, True) if upper is None else upper
+        ranges.append(
+            (column, lower_value, lower_inclusive, upper_value, upper_inclusive)
+        )
+    return ZoneMapScan(table, ranges).to_expr()
+
+
+def _use_zone_map(expr: ir.Expr) -> Optional[ir.Expr]:
+    op = expr.op()
+    if not isinstance(op, (ops.Selection, ops.Aggregation)) or not isinstance(
+        op.table.op(), ops.DatabaseTable
+    ):
+        return None
+    scan = _plan_zone_map_scan(op.table, op.predicates)
+    if scan is None:
+        return None
+    mapping = {op.table.op(): scan}
+    predicates = [substitute(predicate, mapping) for predicate in op.predicates]
+    if isinstance(op, ops.Selection):
+        return ops.Selection(
+            scan,
+            [substitute(selection, mapping) for selection in op.selections],
+            predicates,
+            [substitute(sort_key, mapping) for sort_key in op.sort_keys],
+        ).to_expr()
+    # The pandas backend evaluates the predicates of an aggregation in the scope
+    # of the query, where the scan would be executed again, so they filter the
+    # scan in a selection instead
+    mapping = {op.table.op(): ops.Selection(scan, [], predicates).to_expr()}
+    return ops.Aggregation(
+        mapping[op.table.op()],
+        [substitute(metric, mapping) for metric in op.metrics],
+        [substitute(key, mapping) for key in op.by],
+        [substitute(condition, mapping) for condition in op.having],
+        [],
+        [substitute(sort_key, mapping) for sort_key in op.sort_keys],
+    ).to_expr()
+
+
+def use_zone_maps(expr: ir.Expr) -> ir.Expr:
+    """
+    Read only the blocks of tables with zone maps that their filters can match
+    :param expr:
+    :return:
+    """
+    return rewrite(expr, _use_zone_map)
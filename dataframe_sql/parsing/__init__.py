@@ -0,0 +1,3 @@
+"""
+Parsing of SQL into ibis expressions, extending the sql_to_ibis parser
+"""
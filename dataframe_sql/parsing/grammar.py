@@ -0,0 +1,111 @@
+"""
+Grammar of the SQL dialect, which extends the sql_to_ibis grammar with subquery
+predicates, IN lists of any length, set operations in the FROM clause,
+approximate aggregates and table samples
+"""
+from sql_to_ibis.sql_select_query import _GRAMMAR_TEXT as SQL_TO_IBIS_GRAMMAR_TEXT
+
+SUBQUERY_PREDICATES = (
+    "subquery_in",
+    "not_subquery_in",
+    "exists_expr",
+    "not_exists_expr",
+)
+
+_SUBQUERY_RULES = """\
+subquery_in: expression_math "IN"i "(" set_expr ")"
+not_subquery_in: expression_math "NOT"i "IN"i "(" set_expr ")"
+exists_expr: "EXISTS"i "(" set_expr ")"
+not_exists_expr: "NOT"i "EXISTS"i "(" set_expr ")"
+"""
+
+_SQL_TO_IBIS_IN_LIST_RULES = (
+    'in_expr: expression_math "IN"i "(" [expression_math ","] expression_math ")"\n',
+    'not_in_expr: expression_math "NOT"i "IN"i "(" [expression_math ","] '
+    'expression_math ")"\n',
+)
+
+# Lists made only of number or string literals are lexed as a single token, so
+# that long lists are not parsed and transformed one expression at a time
+_IN_LIST_RULES = r"""
+in_expr: expression_math "IN"i in_values
+not_in_expr: expression_math "NOT"i "IN"i in_values
+in_values: "(" (expression_math ",")* expression_math ")" -> expression_list
+         | NUMBER_LIST -> number_list
+         | STRING_LIST -> string_list
+         | PARAMETER -> array_parameter
+_NUMBER_ITEM: /[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?/
+NUMBER_LIST: "(" /\s*/ _NUMBER_ITEM (/\s*,\s*/ _NUMBER_ITEM)* /\s*/ ")"
+STRING_LIST: /\(\s*'[^']*'(?:\s*,\s*'[^']*')*\s*\)/
+PARAMETER: /:[A-Za-z_][A-Za-z0-9_]*/
+"""
+
+
+_SQL_TO_IBIS_FROM_SUBQUERY_RULE = (
+    'subquery: ( "(" (query_expr | join | cross_join) ")" ) [ [ "AS"i ] alias ]\n'
+)
+_FROM_SUBQUERY_RULE = (
+    'subquery: ( "(" (set_expr | join | cross_join) ")" ) [ [ "AS"i ] alias ]\n'
+)
+
+_SQL_TO_IBIS_TABLE_RULE = 'from_item: name [ [ "AS"i ] alias ] -> table\n'
+_TABLE_RULE = 'from_item: name [ [ "AS"i ] alias ] [ table_sample ] -> table\n'
+_TABLE_SAMPLE_RULES = """\
+table_sample: "TABLESAMPLE"i [SAMPLE_METHOD] "(" NUMBER [ROWS] ")" [_repeatable]
+_repeatable: "REPEATABLE"i "(" NUMBER ")"
+SAMPLE_METHOD: "BERNOULLI"i | "SYSTEM"i
+"""
+
+_SQL_TO_IBIS_AGGREGATION_RULE = (
+    '| AGGREGATION expression_math ")" [window_form] -> sql_aggregation\n'
+)
+# The accuracy of an approximate aggregate is given by its trailing arguments
+_APPROX_AGGREGATION_RULE = (
+    '| APPROX_AGGREGATION expression_math ("," expression_math)* ")" '
+    "-> approx_aggregation\n"
+)
+_APPROX_AGGREGATION_TERMINAL = (
+    'APPROX_AGGREGATION.8: ("approx_count_distinct("i | "approx_percentile("i)\n'
+)
+
+
+def _replace(grammar_text: str, old: str, new: str) -> str:
+    if old not in grammar_text:
+        raise ValueError(f"Rule '{old.strip()}' not found in the sql_to_ibis grammar")
+    return grammar_text.replace(old, new)
+
+
+def _extend_grammar(grammar_text: str) -> str:
+    """
+    Return the grammar with IN, NOT IN, EXISTS and NOT EXISTS predicates over any
+    subquery, which may be correlated with the enclosing query, with IN lists of
+    any length or bound to an array parameter, and with subqueries in the FROM
+    clause that combine queries with UNION, INTERSECT or EXCEPT, with the
+    APPROX_COUNT_DISTINCT and APPROX_PERCENTILE aggregates and with TABLESAMPLE
+    clauses on tables
+    :param grammar_text: sql_to_ibis grammar
+    :return:
+    """
+    grammar_text = _replace(
+        grammar_text,
+        _SQL_TO_IBIS_AGGREGATION_RULE,
+        _SQL_TO_IBIS_AGGREGATION_RULE + " " * 15 + _APPROX_AGGREGATION_RULE,
+    )
+    grammar_text = _replace(
+        grammar_text, _SQL_TO_IBIS_FROM_SUBQUERY_RULE, _FROM_SUBQUERY_RULE
+    )
+    grammar_text = _replace(grammar_text, _SQL_TO_IBIS_TABLE_RULE, _TABLE_RULE)
+    grammar_text = _replace(
+        grammar_text, 'subquery_in: expression_math "IN"i subquery\n', _SUBQUERY_RULES
+    )
+    for in_list_rule in _SQL_TO_IBIS_IN_LIST_RULES:
+        grammar_text = _replace(grammar_text, in_list_rule, "")
+    grammar_text += _IN_LIST_RULES + _APPROX_AGGREGATION_TERMINAL + _TABLE_SAMPLE_RULES
+    return _replace(
+        grammar_text,
+        "| subquery_in |",
+        "| " + " | ".join(SUBQUERY_PREDICATES) + " |",
+    )
+
+
+GRAMMAR_TEXT = _extend_grammar(SQL_TO_IBIS_GRAMMAR_TEXT)
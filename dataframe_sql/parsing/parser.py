@@ -0,0 +1,54 @@
+"""
+Conversion of SQL queries into ibis expressions
+"""
+from copy import deepcopy
+from typing import Any, Dict, Optional
+
+from ibis.expr.types import TableExpr
+from lark import Lark, UnexpectedToken
+from lark.exceptions import VisitError
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+from sql_to_ibis.sql_select_query import TableInfo
+
+from dataframe_sql.parsing.grammar import GRAMMAR_TEXT
+from dataframe_sql.parsing.subqueries import decorrelate_subqueries
+from dataframe_sql.parsing.transformers import SQLTransformer
+
+PARSER = Lark(GRAMMAR_TEXT, parser="lalr")
+
+
+def parse_sql(sql: str, params: Optional[Dict[str, Any]] = None) -> TableExpr:
+    """
+    Return the ibis expression of a query over the registered tables
+    :param sql: SQL query
+    :param params: Values of the array parameters of the query
+    :return:
+    """
+    table_info = TableInfo()
+    try:
+        tree = decorrelate_subqueries(
+            PARSER.parse(sql),
+            table_info.ibis_table_name_map,
+            table_info.column_name_map,
+        )
+        return SQLTransformer(
+            table_info.ibis_table_name_map.copy(),
+            table_info.ibis_table_map.copy(),
+            table_info.column_name_map.copy(),
+            # Deep copy so that resolving ambiguous columns does not change the
+            # registered tables
+            deepcopy(table_info.column_to_table_name),
+            parameters=params,
+        ).transform(tree)
+    except UnexpectedToken as err:
+        message = (
+            f"Expected one of the following input(s): {err.expected}\n"
+            f"Unexpected input at line {err.line}, column {err.column}\n"
+            f"{err.get_context(sql)}"
+        )
+        raise InvalidQueryException(message)
+    except VisitError as err:
+        original_error: Exception = err
+        while isinstance(original_error, VisitError):
+            original_error = original_error.orig_exc
+        raise original_error
@@ -0,0 +1,337 @@
+"""
+Decorrelation of subquery predicates
+
+A correlated subquery references columns of the enclosing query in its WHERE
+clause. Before the parse tree is transformed, every equality between a column of
+the subquery and a column of the enclosing query is removed from the subquery and
+the column of the subquery is selected instead. The subquery then runs once, and
+its rows are matched with the rows of the enclosing query on these correlation
+keys. The columns of the enclosing query are kept in a correlation_keys tree that
+is added to every subquery predicate.
+"""
+from itertools import count
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lark import Token, Tree
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+
+from dataframe_sql.parsing.grammar import SUBQUERY_PREDICATES
+
+CORRELATION_KEY_PREFIX = "__correlation_key_"
+
+# Lower case names and aliases of the tables in the FROM clause of a query mapped to
+# the name of the table, or to None for a derived table with unknown columns
+Scope = Dict[str, Optional[str]]
+
+
+def _name(name_tree: Tree) -> str:
+    token = name_tree.children[0]
+    if token.type == "CNAME":
+        return token.value
+    return token.value[1:-1]
+
+
+def _alias(tree: Tree) -> Optional[str]:
+    for child in tree.children:
+        if isinstance(child, Tree) and child.data == "alias_string":
+            return _name(child.children[0]).lower()
+    return None
+
+
+def _from_items(tree: Tree) -> Iterator[Tree]:
+    if tree.data in ("table", "subquery"):
+        yield tree
+        return
+    for child in tree.children:
+        if isinstance(child, Tree):
+            yield from _from_items(child)
+
+
+def _from_scope(select: Tree, table_name_map: Dict[str, str]) -> Scope:
+    """
+    Return the tables that the columns of a query may reference
+    :param select: Select tree of the query
+    :param table_name_map: Map of lower case table names to table names
+    :return:
+    """
+    scope: Scope = {}
+    for child in select.children:
+        if not isinstance(child, Tree) or child.data != "from_expression":
+            continue
+        for item in _from_items(child):
+            alias = _alias(item)
+            if item.data == "subquery":
+                if alias is not None:
+                    scope[alias] = None
+                continue
+            name = _name(item.children[0]).lower()
+            scope[name] = table_name_map.get(name)
+            if alias is not None:
+                scope[alias] = scope[name]
+    return scope
+
+
+def _column_references(tree: Tree) -> Iterator[Tree]:
+    """
+    Yield the column references of the tree, except those in nested subqueries
+    :param tree:
+    :return:
+    """
+    if tree.data == "column_name":
+        yield tree
+        return
+    for child in tree.children:
+        if isinstance(child, Tree) and child.data != "set_expr":
+            yield from _column_references(child)
+
+
+class _ScopeResolver:
+    """
+    Decides whether the columns referenced in a subquery belong to the subquery or
+    to the enclosing query
+    """
+
+    def __init__(
+        self,
+        inner_scope: Scope,
+        outer_scope: Scope,
+        column_name_map: Dict[str, Dict[str, str]],
+    ):
+        self._inner_scope = inner_scope
+        self._outer_scope = outer_scope
+        self._column_name_map = column_name_map
+
+    def _has_column(self, table_name: Optional[str], column: str) -> bool:
+        if table_name is None:
+            return True
+        return column in self._column_name_map.get(table_name, {})
+
+    def is_outer(self, column_tree: Tree) -> bool:
+        """
+        Return whether the column belongs to the enclosing query
+        :param column_tree: Column reference in the subquery
+        :return:
+        """
+        if any(isinstance(child, Token) for child in column_tree.children):
+            return False
+        names = [_name(child).lower() for child in column_tree.children]
+        if len(names) == 2:
+            return names[0] not in self._inner_scope and names[0] in self._outer_scope
+        if not names or any(
+            self._has_column(table_name, names[0])
+            for table_name in self._inner_scope.values()
+        ):
+            return False
+        return any(
+            self._has_column(table_name, names[0])
+            for table_name in self._outer_scope.values()
+            if table_name is not None
+        )
+
+    def references_outer(self, tree: Tree) -> bool:
+        return any(self.is_outer(column) for column in _column_references(tree))
+
+    def correlation(self, conjunct: Tree) -> Optional[Tuple[Tree, Tree]]:
+        """
+        Return the columns of the subquery and of the enclosing query that the
+        conjunct equates, or None if it is not such an equality
+        :param conjunct:
+        :return:
+        """
+        if conjunct.data != "comparison_type":
+            return None
+        comparison = conjunct.children[0]
+        if comparison.data != "equals" or not all(
+            isinstance(side, Tree) and side.data == "column_name"
+            for side in comparison.children
+        ):
+            return None
+        first, second = comparison.children
+        if self.is_outer(second) and not self.is_outer(first):
+            return first, second
+        if self.is_outer(first) and not self.is_outer(second):
+            return second, first
+        return None
+
+
+def _conjuncts(tree: Tree) -> Iterator[Tree]:
+    if tree.data == "bool_and":
+        for child in tree.children:
+            yield from _conjuncts(child)
+    elif (
+        tree.data in ("where_expr", "bool_expression", "bool_parentheses")
+        and len(tree.children) == 1
+    ):
+        yield from _conjuncts(tree.children[0])
+    else:
+        yield tree
+
+
+def _conjunction(conjuncts: List[Tree]) -> Tree:
+    condition = conjuncts[0]
+    for conjunct in conjuncts[1:]:
+        condition = Tree("bool_and", [condition, conjunct])
+    return condition
+
+
+def _clause(select: Tree, data: str) -> Optional[Tree]:
+    for child in select.children:
+        if isinstance(child, Tree) and child.data == data:
+            return child
+    return None
+
+
+def _check_correlation_allowed(query_expr: Tree, select: Tree):
+    """
+    Reject correlated subqueries whose result depends on the correlation keys in
+    ways other than filtering, such as aggregates or limits
+    :param query_expr:
+    :param select:
+    :return:
+    """
+    aggregates = any(
+        isinstance(child, Tree)
+        and (
+            child.data in ("group_by", "having_expr")
+            or (
+                child.data == "select_expression"
+                and any(True for _ in child.find_data("sql_aggregation"))
+            )
+        )
+        for child in select.children
+    )
+    if aggregates or _clause(query_expr, "limit_count") is not None:
+        raise InvalidQueryException(
+            "Correlated subqueries with aggregation or LIMIT are not supported"
+        )
+
+
+def _key_selection(column: Tree, alias: str) -> Tree:
+    return Tree(
+        "select_expression",
+        [column, Tree("alias_string", [Tree("name", [Token("CNAME", alias)])])],
+    )
+
+
+def _decorrelate(
+    predicate: Tree,
+    outer_scope: Scope,
+    table_name_map: Dict[str, str],
+    column_name_map: Dict[str, Dict[str, str]],
+    key_numbers: Iterator[int],
+):
+    """
+    Move the correlation predicates of the subquery of a subquery predicate into
+    its select list and record the correlated columns of the enclosing query
+    :param predicate: IN, NOT IN, EXISTS or NOT EXISTS tree
+    :param outer_scope: Tables of the enclosing query
+    :param table_name_map: Map of lower case table names to table names
+    :param column_name_map: Map of table names to their lower case column names
+    :param key_numbers: Numbers that make the names of the selected keys unique
+    :return:
+    """
+    outer_keys: List[Tree] = []
+    query_expr = predicate.children[-1].children[0]
+    if query_expr.data == "query_expr":
+        select = query_expr.children[0]
+        where_expr = _clause(select, "where_expr")
+        if where_expr is not None:
+            resolver = _ScopeResolver(
+                _from_scope(select, table_name_map), outer_scope, column_name_map
+            )
+            inner_keys: List[Tree] = []
+            remaining: List[Tree] = []
+            for conjunct in _conjuncts(where_expr):
+                if not resolver.references_outer(conjunct):
+                    remaining.append(conjunct)
+                    continue
+                correlation = resolver.correlation(conjunct)
+                if correlation is None:
+                    raise InvalidQueryException(
+                        "A subquery may only reference the enclosing query in "
+                        "equality predicates combined with AND"
+                    )
+                inner_keys.append(correlation[0])
+                outer_keys.append(correlation[1])
+            if outer_keys:
+                _check_correlation_allowed(query_expr, select)
+                if remaining:
+                    where_expr.children = [_conjunction(remaining)]
+                else:
+                    select.children.remove(where_expr)
+                _select_keys(select, inner_keys, predicate.data, key_numbers)
+    predicate.children.append(Tree("correlation_keys", outer_keys))
+
+
+def _select_keys(
+    select: Tree,
+    inner_keys: List[Tree],
+    predicate_type: str,
+    key_numbers: Iterator[int],
+):
+    """
+    Add the correlation keys to the select list of the subquery. The select list
+    of an EXISTS subquery is replaced, since only the existence of rows matters.
+    :param select:
+    :param inner_keys:
+    :param predicate_type:
+    :param key_numbers:
+    :return:
+    """
+    key_selections = [
+        _key_selection(key, f"{CORRELATION_KEY_PREFIX}{next(key_numbers)}")
+        for key in inner_keys
+    ]
+    positions = [
+        position
+        for position, child in enumerate(select.children)
+        if isinstance(child, Tree) and child.data == "select_expression"
+    ]
+    if predicate_type in ("exists_expr", "not_exists_expr"):
+        for position in reversed(positions):
+            del select.children[position]
+        select.children[positions[0] : positions[0]] = key_selections
+    else:
+        select.children[positions[-1] + 1 : positions[-1] + 1] = key_selections
+
+
+def _subquery_predicates(tree: Tree) -> Iterator[Tree]:
+    if tree.data in SUBQUERY_PREDICATES:
+        yield tree
+        return
+    for child in tree.children:
+        if isinstance(child, Tree) and child.data != "set_expr":
+            yield from _subquery_predicates(child)
+
+
+def decorrelate_subqueries(
+    tree: Tree,
+    table_name_map: Dict[str, str],
+    column_name_map: Dict[str, Dict[str, str]],
+) -> Tree:
+    """
+    Decorrelate every subquery predicate in the WHERE and HAVING clauses of the
+    queries in the parse tree
+    :param tree: Parse tree
+    :param table_name_map: Map of lower case table names to table names
+    :param column_name_map: Map of table names to their lower case column names
+    :return:
+    """
+    key_numbers = count()
+    for select in list(tree.find_data("select")):
+        outer_scope = _from_scope(select, table_name_map)
+        for clause in select.children:
+            if not isinstance(clause, Tree) or clause.data not in (
+                "where_expr",
+                "having_expr",
+            ):
+                continue
+            for predicate in list(_subquery_predicates(clause)):
+                _decorrelate(
+                    predicate,
+                    outer_scope,
+                    table_name_map,
+                    column_name_map,
+                    key_numbers,
+                )
+    return tree
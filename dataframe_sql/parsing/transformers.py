@@ -0,0 +1,529 @@
+"""
+Transformers that turn the parse tree into ibis expressions, extending those of
+sql_to_ibis with subquery predicates, IN lists, approximate aggregates and table
+samples. The current time is read once per query, so that every now() and
+today() of a query, its subqueries included, has the same value.
+"""
+from datetime import datetime
+from functools import reduce
+import operator
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import ibis.expr.operations as ops
+from ibis.expr.types import TableExpr
+from lark import Token, Tree, v_args
+import numpy as np
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+from sql_to_ibis.parsing.sql_parser import SQLTransformer as BaseSQLTransformer
+from sql_to_ibis.parsing.transformers import (
+    InternalTransformer as BaseInternalTransformer,
+)
+from sql_to_ibis.query_info import QueryInfo
+from sql_to_ibis.sql.sql_value_objects import (
+    Aggregate,
+    Column,
+    GroupByColumn,
+    Literal,
+    Table,
+    Value,
+)
+
+from dataframe_sql.execution.sketches import (
+    DEFAULT_COMPRESSION,
+    DEFAULT_PRECISION,
+    validate_compression,
+    validate_precision,
+    validate_quantile,
+)
+from dataframe_sql.operations import (
+    ApproxCountDistinct,
+    ApproxPercentile,
+    InValues,
+    SubqueryMembership,
+    TableSample,
+    ValueSet,
+)
+from dataframe_sql.parsing.grammar import SUBQUERY_PREDICATES
+
+# Rules of the expressions that a HAVING condition cannot read before grouping
+_GROUPED_RULES = frozenset(
+    ("sql_aggregation", "approx_aggregation") + SUBQUERY_PREDICATES
+)
+
+_STRING_ITEM = re.compile(r"'([^']*)'")
+
+
+def parse_number_list(text: str) -> np.ndarray:
+    """
+    Return the numbers of a parenthesized list as an integer array, or as a float
+    array if any of them is not an integer
+    :param text: List such as '(1, 2.5, -3)'
+    :return:
+    """
+    items = text.strip()[1:-1].split(",")
+    try:
+        return np.array(items, dtype=np.int64)
+    except (ValueError, OverflowError):
+        return np.array(items, dtype=np.float64)
+
+
+def parse_string_list(text: str) -> np.ndarray:
+    """
+    Return the strings of a parenthesized list of quoted strings
+    :param text: List such as "('a', 'b')"
+    :return:
+    """
+    return np.array(_STRING_ITEM.findall(text), dtype=object)
+
+
+def _column_ops(expr) -> List[ops.TableColumn]:
+    """
+    Return the columns that an expression reads
+    :param expr:
+    :return:
+    """
+    columns = []
+    pending = [expr]
+    while pending:
+        op = pending.pop().op()
+        if isinstance(op, ops.TableColumn):
+            columns.append(op)
+        else:
+            pending.extend(arg for arg in op.flat_args() if hasattr(arg, "op"))
+    return columns
+
+
+class InternalTransformer(BaseInternalTransformer):
+    """
+    Evaluates subtrees with knowledge of provided tables that are in the proper
+    scope, including subquery predicates
+    """
+
+    def __init__(
+        self,
+        *args,
+        parameters: Optional[Dict[str, Any]] = None,
+        now: Optional[datetime] = None,
+    ):
+        super().__init__(*args)
+        self._parameters = {} if parameters is None else parameters
+        self._now = datetime.now() if now is None else now
+        self._counted_table: Optional[TableExpr] = None
+
+    @classmethod
+    def from_internal_transformer(
+        cls,
+        internal_transformer: BaseInternalTransformer,
+        parameters: Optional[Dict[str, Any]] = None,
+        now: Optional[datetime] = None,
+    ):
+        return cls(
+            internal_transformer._tables,
+            internal_transformer._table_map,
+            internal_transformer._column_name_map,
+            internal_transformer._column_to_table_name,
+            internal_transformer._table_name_map,
+            internal_transformer._alias_registry,
+            parameters=parameters,
+            now=now,
+        )
+
+    def counting_rows_of(self, table: TableExpr) -> "InternalTransformer":
+        """
+        Return a copy of the transformer whose COUNT(*) counts the rows of the
+        table
+        :param table:
+        :return:
+        """
+        transformer = self.from_internal_transformer(self, self._parameters, self._now)
+        transformer._counted_table = table
+        return transformer
+
+    def apply_ibis_aggregation(self, column: Column, aggregation: str):
+        if column.name == "*" and self._counted_table is not None:
+            return self._counted_table.count()
+        return super().apply_ibis_aggregation(column, aggregation)
+
+    def datetime_now(self, _) -> Literal:
+        date_value = Literal(self._now)
+        date_value.set_alias("now()")
+        return date_value
+
+    def date_today(self, _) -> Literal:
+        date_value = Literal(self._now.date())
+        date_value.set_alias("today()")
+        return date_value
+
+    def correlation_keys(self, columns: List[Column]) -> List[Column]:
+        return columns
+
+    def get_table(self, table_or_alias_name) -> Table:
+        """
+        Return the table of a name or alias, which is the FROM item of the query
+        when the query reads the table once, so that a sampled table is only read
+        through the query that samples it
+        :param table_or_alias_name:
+        :return:
+        """
+        if isinstance(table_or_alias_name, str):
+            from_items = [
+                table
+                for table in self._tables
+                if isinstance(table, Table) and table.name == table_or_alias_name
+            ]
+            if len(from_items) == 1:
+                return from_items[0]
+        return super().get_table(table_or_alias_name)
+
+    def _anchor(self):
+        """
+        Return a column of the tables in scope, which gives an uncorrelated EXISTS
+        predicate the shape of the rows it filters
+        :return:
+        """
+        table_expr = self.get_table(self._tables[0]).get_table_expr()
+        return table_expr[table_expr.columns[0]]
+
+    def _membership(
+        self,
+        values: list,
+        subquery: TableExpr,
+        correlation_keys: List[Column],
+        kind: str,
+    ) -> Value:
+        """
+        Return the predicate that matches the values and correlation keys of every
+        row with the columns of the subquery
+        :param values: Values compared with the selected column of the subquery
+        :param subquery: Subquery with its correlation keys selected last
+        :param correlation_keys: Columns of the enclosing query that the subquery
+                                 is correlated with
+        :param kind: Type of subquery predicate
+        :return:
+        """
+        outer_values = [value.get_value() for value in values + correlation_keys]
+        if len(subquery.columns) != len(outer_values) and values:
+            raise InvalidQueryException(
+                "Can only perform 'in' operation on subquery with one column present"
+            )
+        anchor = outer_values[0] if outer_values else self._anchor()
+        return Value(SubqueryMembership(anchor, outer_values, subquery, kind).to_expr())
+
+    def subquery_in(self, children: list) -> Value:
+        value, subquery, correlation_keys = children
+        return self._membership([value], subquery, correlation_keys, "in")
+
+    def not_subquery_in(self, children: list) -> Value:
+        value, subquery, correlation_keys = children
+        return self._membership([value], subquery, correlation_keys, "not_in")
+
+    def exists_expr(self, children: list) -> Value:
+        subquery, correlation_keys = children
+        return self._membership([], subquery, correlation_keys, "exists")
+
+    def not_exists_expr(self, children: list) -> Value:
+        subquery, correlation_keys = children
+        return self._membership([], subquery, correlation_keys, "not_exists")
+
+    def expression_list(self, values: List[Value]) -> List[Value]:
+        return values
+
+    def number_list(self, tokens: List[Token]) -> ValueSet:
+        return ValueSet(parse_number_list(tokens[0].value))
+
+    def string_list(self, tokens: List[Token]) -> ValueSet:
+        return ValueSet(parse_string_list(tokens[0].value))
+
+    def array_parameter(self, tokens: List[Token]) -> ValueSet:
+        name = tokens[0].value[1:]
+        if name not in self._parameters:
+            raise InvalidQueryException(f"No value given for parameter '{name}'")
+        return ValueSet(self._parameters[name])
+
+    def _in_list(
+        self, value: Value, values: Union[ValueSet, List[Value]], kind: str
+    ) -> Value:
+        """
+        Return the IN or NOT IN predicate of the value over a list. Lists of
+        literals are evaluated by probing a hash set, other lists by comparing
+        with each expression.
+        :param value: Value to look up
+        :param values: Set of literal values or list of expressions
+        :param kind: 'in' or 'not_in'
+        :return:
+        """
+        if isinstance(values, list):
+            if not all(isinstance(item, Literal) for item in values):
+                column = value.get_value()
+                matches = reduce(
+                    operator.or_,
+                    (column == item for item in self._get_expression_values(values)),
+                )
+                if kind == "in":
+                    return Value(matches)
+                return Value(~matches & column.notnull())
+            values = ValueSet([item.get_value().op().value for item in values])
+        return Value(InValues(value.get_value(), values, kind).to_expr())
+
+    def in_expr(self, children: list) -> Value:
+        value, values = children
+        return self._in_list(value, values, "in")
+
+    def not_in_expr(self, children: list) -> Value:
+        value, values = children
+        return self._in_list(value, values, "not_in")
+
+    @staticmethod
+    def _approx_arguments(function: str, arguments: List[Value]) -> List[float]:
+        if not all(isinstance(argument, Literal) for argument in arguments):
+            raise InvalidQueryException(
+                f"The arguments of {function} after the first must be numbers"
+            )
+        return [argument.get_value().op().value for argument in arguments]
+
+    def approx_aggregation(self, children: list) -> Aggregate:
+        """
+        Return an APPROX_COUNT_DISTINCT(x[, precision]) or
+        APPROX_PERCENTILE(x, percentile[, compression]) aggregate
+        :param children: Function name token, aggregated column and the literal
+                         arguments that follow it
+        :return:
+        """
+        token, column, *arguments = children
+        function = token.value[:-1].upper()
+        values = self._approx_arguments(function, arguments)
+        try:
+            if function == "APPROX_COUNT_DISTINCT":
+                if len(values) > 1:
+                    raise InvalidQueryException(
+                        "APPROX_COUNT_DISTINCT takes a column and an optional "
+                        "precision"
+                    )
+                precision = values[0] if values else DEFAULT_PRECISION
+                if precision != int(precision):
+                    raise ValueError(
+                        f"The precision of {function} must be an integer, "
+                        f"got {precision}"
+                    )
+                op = ApproxCountDistinct(
+                    column.get_value(), validate_precision(int(precision))
+                )
+            else:
+                if not 1 <= len(values) <= 2:
+                    raise InvalidQueryException(
+                        "APPROX_PERCENTILE takes a column, a percentile and an "
+                        "optional compression"
+                    )
+                compression = values[1] if len(values) > 1 else DEFAULT_COMPRESSION
+                op = ApproxPercentile(
+                    column.get_value(),
+                    validate_quantile(values[0]),
+                    validate_compression(compression),
+                )
+        except ValueError as error:
+            raise InvalidQueryException(str(error)) from error
+        return Aggregate(op.to_expr(), alias=column.alias, typename=column.typename)
+
+
+@v_args(inline=True)
+class SQLTransformer(BaseSQLTransformer):
+    """
+    Transformer for the lark parser of the extended grammar
+    """
+
+    def __init__(self, *args, parameters: Optional[Dict[str, Any]] = None):
+        super().__init__(*args)
+        self._parameters = parameters
+        self._now = datetime.now()
+
+    def select(self, *select_expressions: Tree) -> QueryInfo:
+        query_info = super().select(*select_expressions)
+        query_info.internal_transformer = InternalTransformer.from_internal_transformer(
+            query_info.internal_transformer, self._parameters, self._now
+        )
+        return query_info
+
+    def subquery_in(self, *children) -> Tree:
+        # Evaluated by the internal transformer of the enclosing query
+        return Tree("subquery_in", list(children))
+
+    def table_sample(self, *tokens: Token) -> Tree:
+        """
+        Return the method, size and seed of a TABLESAMPLE clause, where the size
+        is a fraction of the rows for the BERNOULLI and SYSTEM methods, which take
+        a percentage, and a number of rows for the ROWS method
+        :param tokens:
+        :return:
+        """
+        method = "bernoulli"
+        numbers = []
+        for token in tokens:
+            if token.type == "SAMPLE_METHOD":
+                method = token.value.lower()
+            elif token.type == "ROWS":
+                if any(other.type == "SAMPLE_METHOD" for other in tokens):
+                    raise InvalidQueryException(
+                        "A sample of a number of rows takes no sampling method"
+                    )
+                method = "rows"
+            else:
+                numbers.append(float(token.value))
+        size, seed = numbers if len(numbers) > 1 else (numbers[0], None)
+        if method == "rows":
+            if size != int(size):
+                raise InvalidQueryException(
+                    f"The number of rows of a sample must be an integer, got {size}"
+                )
+            size = int(size)
+        elif size > 100:
+            raise InvalidQueryException(
+                f"The percentage of a sample must be between 0 and 100, got {size:g}"
+            )
+        else:
+            size /= 100
+        if seed is not None:
+            if seed != int(seed) or not 0 <= seed < 2 ** 32:
+                raise InvalidQueryException(
+                    f"The REPEATABLE seed must be an integer between 0 and "
+                    f"{2 ** 32 - 1}, got {seed:g}"
+                )
+            seed = int(seed)
+        return Tree("table_sample", [method, size, seed])
+
+    def table(self, table_name, *alias_and_sample) -> Table:
+        """
+        Return the table, sampled if it has a TABLESAMPLE clause. The sample is
+        only the FROM item that it is taken in, so the columns of the query of that
+        FROM item are read from the sample, while other references to the table,
+        in the same query or in others, read the whole table.
+        :param table_name:
+        :param alias_and_sample: Alias and TABLESAMPLE clause, both optional
+        :return:
+        """
+        alias: Union[str, Tree] = ""
+        sample: Optional[Tree] = None
+        for child in alias_and_sample:
+            if isinstance(child, Tree) and child.data == "table_sample":
+                sample = child
+            else:
+                alias = child
+        if sample is None:
+            return super().table(table_name, alias)
+        table = super().table(table_name)
+        sampled_table = Table(
+            value=TableSample(table.get_table_expr(), *sample.children).to_expr(),
+            name=table.name,
+            alias=str(alias.children[0]) if isinstance(alias, Tree) else alias,
+        )
+        if sampled_table.alias:
+            self._alias_registry.add_to_registry(sampled_table.alias, sampled_table)
+        return sampled_table
+
+    @staticmethod
+    def _conjuncts(tree: Tree) -> List[Tree]:
+        """
+        Return the conditions that a boolean expression is the conjunction of
+        :param tree:
+        :return:
+        """
+        if tree.data == "bool_and":
+            return [
+                conjunct
+                for child in tree.children
+                for conjunct in SQLTransformer._conjuncts(child)
+            ]
+        if tree.data in ("bool_expression", "bool_parentheses"):
+            return SQLTransformer._conjuncts(tree.children[0])
+        return [tree]
+
+    def _group_key_predicates(
+        self,
+        having_expr: Tree,
+        group_columns: List[GroupByColumn],
+        internal_transformer: InternalTransformer,
+    ) -> Tuple[Optional[Tree], list]:
+        """
+        Return the HAVING clause without the conditions that only read group keys,
+        and those conditions as predicates. They hold for every row of a group or
+        for none, so they filter the rows before grouping instead of the groups.
+        :param having_expr:
+        :param group_columns:
+        :param internal_transformer:
+        :return:
+        """
+        key_ops = {group_column.value.op() for group_column in group_columns}
+        remaining = []
+        predicates = []
+        for conjunct in self._conjuncts(having_expr.children[0]):
+            if any(
+                subtree.data in _GROUPED_RULES for subtree in conjunct.iter_subtrees()
+            ):
+                remaining.append(conjunct)
+                continue
+            predicate = internal_transformer.transform(conjunct).get_value()
+            for column_op in _column_ops(predicate):
+                if column_op not in key_ops:
+                    raise InvalidQueryException(
+                        self.format_column_needs_agg_or_group_msg(column_op.name)
+                    )
+            predicates.append(predicate)
+        if not remaining:
+            return None, predicates
+        condition = reduce(
+            lambda left, right: Tree("bool_and", [left, right]), remaining
+        )
+        return Tree("having_expr", [condition]), predicates
+
+    def _handle_having_expressions(
+        self,
+        having_expr: Tree,
+        internal_transformer: BaseInternalTransformer,
+        table: TableExpr,
+        aggregates: Dict[str, Aggregate],
+        group_column_names: List[str],
+    ):
+        """
+        Transform the HAVING clause with COUNT(*) counting the rows of the table
+        that is grouped, which the conditions on group keys have filtered
+        """
+        if having_expr and isinstance(internal_transformer, InternalTransformer):
+            internal_transformer = internal_transformer.counting_rows_of(table)
+        return super()._handle_having_expressions(
+            having_expr, internal_transformer, table, aggregates, group_column_names
+        )
+
+    def handle_aggregation(
+        self,
+        aggregates: Dict[str, Aggregate],
+        group_columns: List[GroupByColumn],
+        table: TableExpr,
+        having_expr: Tree,
+        internal_transformer: InternalTransformer,
+        selected_columns: List[Value],
+    ):
+        """
+        Aggregate the table, filtering the rows by the conditions of the HAVING
+        clause that only read group keys before they are grouped
+        """
+        if having_expr is not None and group_columns and aggregates:
+            having_expr, predicates = self._group_key_predicates(
+                having_expr, group_columns, internal_transformer
+            )
+            if predicates:
+                table = table.filter(predicates)
+        return super().handle_aggregation(
+            aggregates,
+            group_columns,
+            table,
+            having_expr,
+            internal_transformer,
+            selected_columns,
+        )
+
+    def _to_ibis_table(self, query_info: Union[QueryInfo, TableExpr]) -> TableExpr:
+        # A subquery in the FROM clause is already an ibis expression once the set
+        # operations it is made of are transformed
+        if isinstance(query_info, TableExpr):
+            return query_info
+        return super()._to_ibis_table(query_info)
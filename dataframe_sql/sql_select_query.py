@@ -1,18 +1,44 @@
 """
 Convert dataframe_sql statement to run on pandas dataframes
 """
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
 import ibis
 from pandas import DataFrame
 from sql_to_ibis import (
-    query as ibis_query,
     register_temp_table as ibis_register,
     remove_temp_table as ibis_remove,
 )
 
+import dataframe_sql.execution  # noqa: F401
+from dataframe_sql.execution.stats import (
+    QueryStats,
+    collect_query_stats,
+    enforce_memory_limit,
+    parse_memory_size,
+)
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.optimizer.compiled_pipeline import compile_pipelines
+from dataframe_sql.optimizer.memory import plan_memory
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.statistics import (
+    register_table_statistics,
+    remove_table_statistics,
+    verify_sort_order,
+)
+
 IBIS_PANDAS_CLIENT = ibis.pandas.PandasClient({})
 
+_SESSION_MEMORY_LIMIT: Optional[int] = None
 
-def register_temp_table(frame: DataFrame, table_name: str):
+
+def register_temp_table(
+    frame: DataFrame,
+    table_name: str,
+    sorted_by: Optional[List[str]] = None,
+    verify_sorted: bool = True,
+    zone_map_block_size: Optional[int] = None,
+):
     """
     Registers related metadata from a :class: ~`pandas.DataFrame` for use with SQL
 
@@ -22,6 +48,26 @@ def register_temp_table(frame: DataFrame, table_name: str):
         :class: ~`pandas.DataFrame` object to register
     table_name : str
         String that will be used to represent the :class: ~`pandas.DataFrame` in SQL
+    sorted_by : list of str, optional
+        Columns that the rows of the frame are in ascending order of, compared in
+        turn. Queries over a sorted table group runs of equal keys instead of
+        hashing them, skip an ORDER BY on a prefix of the columns, merge join on
+        the first column without sorting and find the rows of a range of the
+        first column by binary search.
+    verify_sorted : bool, default True
+        Whether to check that the frame is sorted by the columns of sorted_by and
+        that they have no null values, raising a ValueError if not. A frame that
+        is declared sorted but is not gives wrong results.
+    zone_map_block_size : int, optional
+        Number of rows of the blocks that zone maps are kept for. The zone map of
+        a numeric or timestamp column holds the minimum and maximum of every
+        block of rows, and filters that compare the column with constants skip
+        the blocks that cannot match. They help most when similar values are
+        stored together, as in tables ordered by time. Zone maps are computed
+        for a column when a query first filters it and kept, so the frame must
+        not be changed after it is registered: remove it and register it again
+        after changing it, or queries may skip blocks that now match. By default
+        none are kept.
 
     See Also
     --------
@@ -32,11 +78,24 @@ def register_temp_table(frame: DataFrame, table_name: str):
     --------
     >>> df = pd.read_csv("a_csv_file.csv")
     >>> register_temp_table(df, "my_table_name")
+    >>> register_temp_table(events, "events", sorted_by=["event_time"])
+    >>> register_temp_table(events, "events", zone_map_block_size=65536)
     """
+    sorted_by = [] if sorted_by is None else list(sorted_by)
+    missing = [name for name in sorted_by if name not in frame.columns]
+    if missing:
+        raise ValueError(f"Sort columns {missing} are not columns of the frame")
+    if verify_sorted:
+        verify_sort_order(frame, sorted_by)
+    if zone_map_block_size is not None and zone_map_block_size < 1:
+        raise ValueError(
+            f"Zone map block size must be positive, got {zone_map_block_size}"
+        )
     ibis_register(
         ibis.pandas.from_dataframe(frame, name=table_name, client=IBIS_PANDAS_CLIENT),
         table_name,
     )
+    register_table_statistics(frame, table_name, sorted_by, zone_map_block_size)
 
 
 def remove_temp_table(table_name: str):
@@ -59,9 +118,57 @@ def remove_temp_table(table_name: str):
     >>> remove_temp_table("my_table_name")
     """
     ibis_remove(table_name)
+    remove_table_statistics(table_name)
+
+
+def set_memory_limit(memory_limit: Optional[Union[int, str]]):
+    """
+    Sets the memory limit of every query that does not give its own
+
+    Parameters
+    ----------
+    memory_limit : int or str, optional
+        Number of bytes, or a size such as ``"4GB"`` or ``"512MiB"``. None
+        removes the limit.
+
+    See Also
+    --------
+    get_memory_limit : Returns the memory limit of the session
+    query : Query a registered :class: ~`pandas.DataFrame` using an SQL interface
+
+    Examples
+    --------
+    >>> set_memory_limit("4GB")
+    """
+    global _SESSION_MEMORY_LIMIT
+    _SESSION_MEMORY_LIMIT = (
+        None if memory_limit is None else parse_memory_size(memory_limit)
+    )
+
+
+def get_memory_limit() -> Optional[int]:
+    """
+    Returns the memory limit of the session in bytes, or None if there is none
+
+    See Also
+    --------
+    set_memory_limit : Sets the memory limit of every query that does not give
+                       its own
+    """
+    return _SESSION_MEMORY_LIMIT
 
 
-def query(sql: str) -> DataFrame:
+def query(
+    sql: str,
+    optimize: bool = True,
+    join_strategy: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    return_stats: bool = False,
+    stats_callback: Optional[Callable[[QueryStats], None]] = None,
+    trace_memory: bool = False,
+    memory_limit: Optional[Union[int, str]] = None,
+    engine: str = "pandas",
+) -> Union[DataFrame, Tuple[DataFrame, QueryStats]]:
     """
     Query a registered :class: ~`pandas.DataFrame` using an SQL interface
 
@@ -69,7 +176,9 @@ def query(sql: str) -> DataFrame:
     on the following general syntax:
     SELECT
     col_name | expr [, col_name | expr] ...
-    [FROM table_reference [, table_reference | join_expr]]
+    [FROM table_reference
+      [TABLESAMPLE {[BERNOULLI | SYSTEM] (percentage) | (row_count ROWS)}
+      [REPEATABLE (seed)]] [, table_reference | join_expr]]
     [WHERE where_condition]
     [GROUP BY {col_name | expr }, ... ]
     [HAVING where_condition]
@@ -80,17 +189,104 @@ def query(sql: str) -> DataFrame:
       EXCEPT ( [DISTINCT] | ALL ) ]
     select_expr
 
+    Besides the aggregates SUM, AVG, MIN, MAX and COUNT, the approximate
+    aggregates APPROX_COUNT_DISTINCT(expr [, precision]) and
+    APPROX_PERCENTILE(expr, percentile [, compression]) estimate the number of
+    distinct values with a HyperLogLog sketch of 2 ** precision registers
+    (default 14, about 1% error) and a percentile between 0 and 1 with a
+    t-digest (default compression 100). Higher values are more accurate and
+    take more memory.
+
+    TABLESAMPLE reads a random sample of a table before any other operator
+    runs. BERNOULLI, the default, keeps every row with the given percentage as
+    probability, SYSTEM keeps blocks of consecutive rows, which is faster but
+    less random, and ROWS keeps the given number of rows. The same REPEATABLE
+    seed samples the same rows of the same table.
+
 
     Parameters
     ----------
     sql : str
         SQL string querying the :class: ~`pandas.DataFrame`
+    optimize : bool, default True
+        Whether to apply the query optimizer, which for instance reorders joins
+        between three or more tables based on table statistics
+    join_strategy : str, optional
+        Join algorithm to use for every join, one of ``"hash"``, ``"sort_merge"``,
+        ``"broadcast"`` or ``"grace"``, which spills both inputs to disk. By
+        default the algorithm of each join is chosen from the table statistics.
+        Only applies when optimize is True.
+    params : dict, optional
+        Values of the array parameters of the query by name, such as the list
+        of ids bound to ``:ids`` in ``WHERE id IN :ids``. Binding a long list
+        avoids writing and parsing it as SQL text.
+    return_stats : bool, default False
+        Whether to also return a :class: ~`QueryStats` with the elapsed time, the
+        number of rows and bytes of the result of every operator and the peak
+        resident set size of the process
+    stats_callback : callable, optional
+        Called with the :class: ~`QueryStats` of the query once it has run
+    trace_memory : bool, default False
+        Whether to record the peak memory allocated by the query with
+        tracemalloc, which slows it down. Only applies when statistics are
+        returned or passed to stats_callback.
+    memory_limit : int or str, optional
+        Number of bytes, or a size such as ``"4GB"`` or ``"512MiB"``, that the
+        intermediate results of the query may take. Joins, aggregations and
+        sorts that are estimated from the table statistics to need more are
+        executed out of core where possible. Otherwise, and as soon as the result
+        of an operator exceeds the limit while the query runs,
+        :class: ~`MemoryLimitExceeded` is raised. Sorts spill their runs to disk
+        but not their result, so a sort is only executed out of core if the rows
+        it returns, or under a LIMIT the rows of the limit and its offset, fit in
+        the limit; if they do not, :class: ~`MemoryLimitExceeded` is raised before
+        the query runs. Defaults to the limit set with :func: ~`set_memory_limit`.
+    engine : str, default "pandas"
+        Execution engine, ``"pandas"`` or ``"numba"``. The numba engine compiles
+        every aggregation of a table that it can, optionally through a WHERE
+        clause and a projection, into one loop over the columns of the table,
+        which avoids materializing the filtered rows and projected columns.
+        Compiled loops are cached by the shape of the query and the types of the
+        columns. Without numba installed, or for aggregations it cannot compile,
+        the query runs on pandas.
 
     Returns
     -------
     :class: ~`pandas.DataFrame`
-        The :class: ~`pandas.DataFrame` resulting from the SQL query provided
+        The :class: ~`pandas.DataFrame` resulting from the SQL query provided,
+        together with its :class: ~`QueryStats` if return_stats is True
 
 
     """
-    return ibis_query(sql).execute()
+    limit = (
+        _SESSION_MEMORY_LIMIT
+        if memory_limit is None
+        else parse_memory_size(memory_limit)
+    )
+    if not return_stats and stats_callback is None:
+        return _execute(sql, optimize, join_strategy, params, limit, engine)
+    with collect_query_stats(sql, trace_memory) as stats:
+        result = _execute(sql, optimize, join_strategy, params, limit, engine)
+    stats.record_result(result)
+    if stats_callback is not None:
+        stats_callback(stats)
+    return (result, stats) if return_stats else result
+
+
+def _execute(
+    sql: str,
+    optimize: bool,
+    join_strategy: Optional[str],
+    params: Optional[Dict[str, Any]],
+    memory_limit: Optional[int],
+    engine: str = "pandas",
+) -> DataFrame:
+    ibis_expr = parse_sql(sql, params)
+    if optimize:
+        ibis_expr = optimize_expression(ibis_expr, join_strategy)
+    ibis_expr = compile_pipelines(ibis_expr, engine)
+    if memory_limit is None:
+        return ibis_expr.execute()
+    ibis_expr = plan_memory(ibis_expr, memory_limit)
+    with enforce_memory_limit(memory_limit):
+        return ibis_expr.execute()
@@ -0,0 +1,259 @@
+"""
+Statistics about registered tables that are used when planning queries
+"""
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from pandas import DataFrame, Series
+from pandas.api.types import is_datetime64_dtype, is_numeric_dtype
+
+from dataframe_sql.execution.stats import estimate_size
+
+
+class ColumnStatistics:
+    """
+    Lazily computed statistics for a single column of a registered table
+    """
+
+    def __init__(self, series: Series):
+        self._series = series
+        self._distinct_count: Optional[int] = None
+        self._null_count: Optional[int] = None
+        self._min: Any = None
+        self._max: Any = None
+        self._has_range = False
+        self._is_sorted: Optional[bool] = None
+        self._average_size: Optional[float] = None
+
+    @property
+    def distinct_count(self) -> int:
+        """
+        Number of distinct non null values in the column (at least one)
+        :return:
+        """
+        if self._distinct_count is None:
+            self._distinct_count = max(int(self._series.nunique(dropna=True)), 1)
+        return self._distinct_count
+
+    @property
+    def is_sorted(self) -> bool:
+        """
+        Whether the values of the column are in ascending order
+        :return:
+        """
+        if self._is_sorted is None:
+            self._is_sorted = bool(self._series.is_monotonic_increasing)
+        return self._is_sorted
+
+    @property
+    def average_size(self) -> float:
+        """
+        Average number of bytes that a value of the column takes, including the
+        objects that an object column points to
+        :return:
+        """
+        if self._average_size is None:
+            self._average_size = estimate_size(self._series) / max(len(self._series), 1)
+        return self._average_size
+
+    @property
+    def null_count(self) -> int:
+        """
+        Number of null values in the column
+        :return:
+        """
+        if self._null_count is None:
+            self._null_count = int(self._series.isna().sum())
+        return self._null_count
+
+    def _compute_range(self):
+        if not self._has_range:
+            if is_numeric_dtype(self._series.dtype) and len(self._series):
+                self._min = self._series.min()
+                self._max = self._series.max()
+            self._has_range = True
+
+    @property
+    def min(self):
+        """
+        Minimum value of the column, or None if the column is not numeric
+        :return:
+        """
+        self._compute_range()
+        return self._min
+
+    @property
+    def max(self):
+        """
+        Maximum value of the column, or None if the column is not numeric
+        :return:
+        """
+        self._compute_range()
+        return self._max
+
+
+class ZoneMap:
+    """
+    Minimum and maximum non null value of every block of block_size consecutive
+    rows of a column. The bounds of a block without non null values are null.
+    """
+
+    def __init__(self, series: Series, block_size: int):
+        self.block_size = block_size
+        self.row_count = len(series)
+        blocks = series.groupby(np.arange(len(series)) // block_size)
+        self.minimums = blocks.min().to_numpy()
+        self.maximums = blocks.max().to_numpy()
+
+    @property
+    def block_count(self) -> int:
+        return len(self.minimums)
+
+    def blocks_in_range(
+        self, lower=None, lower_inclusive=True, upper=None, upper_inclusive=True
+    ) -> np.ndarray:
+        """
+        Return whether each block may have values in a range, which blocks without
+        non null values never do
+        :param lower: Lower bound, or None for no lower bound
+        :param lower_inclusive:
+        :param upper: Upper bound, or None for no upper bound
+        :param upper_inclusive:
+        :return:
+        """
+        in_range = ~(Series(self.minimums).isna().to_numpy())
+        if lower is not None:
+            maximums = self.maximums[in_range]
+            in_range[in_range] = (
+                maximums >= lower if lower_inclusive else maximums > lower
+            )
+        if upper is not None:
+            minimums = self.minimums[in_range]
+            in_range[in_range] = (
+                minimums <= upper if upper_inclusive else minimums < upper
+            )
+        return in_range
+
+
+def has_zone_map_type(series: Series) -> bool:
+    """
+    Return whether zone maps are kept for a column, which are those of numbers
+    and timestamps
+    :param series:
+    :return:
+    """
+    return is_numeric_dtype(series.dtype) or is_datetime64_dtype(series.dtype)
+
+
+class TableStatistics:
+    """
+    Statistics for a registered table. Column statistics are only computed when
+    they are first requested. The rows of the table are in ascending order of
+    the columns of sorted_by, compared in turn. If zone_map_block_size is set,
+    the zone maps of its numeric and timestamp columns are computed when they are
+    first requested. Statistics are kept until the table is removed, so
+    they describe the frame as it was when they were computed.
+    """
+
+    def __init__(
+        self,
+        frame: DataFrame,
+        sorted_by: Sequence[str] = (),
+        zone_map_block_size: Optional[int] = None,
+    ):
+        self._frame = frame
+        self.row_count = len(frame)
+        self.sorted_by: Tuple[str, ...] = tuple(sorted_by)
+        self.zone_map_block_size = zone_map_block_size
+        self._column_statistics: Dict[str, ColumnStatistics] = {}
+        self._zone_maps: Dict[str, ZoneMap] = {}
+
+    def column(self, column_name: str) -> ColumnStatistics:
+        """
+        Return the statistics for the given column
+        :param column_name: Name of the column in the registered frame
+        :return:
+        """
+        if column_name not in self._column_statistics:
+            column_statistics = ColumnStatistics(self._frame[column_name])
+            if self.sorted_by[:1] == (column_name,):
+                column_statistics._is_sorted = True
+            self._column_statistics[column_name] = column_statistics
+        return self._column_statistics[column_name]
+
+    def zone_map(self, column_name: str) -> Optional[ZoneMap]:
+        """
+        Return the zone map of the given column, or None if zone maps are not kept
+        for the table or the column
+        :param column_name: Name of the column in the registered frame
+        :return:
+        """
+        if self.zone_map_block_size is None or column_name not in self._frame:
+            return None
+        if column_name not in self._zone_maps:
+            series = self._frame[column_name]
+            if not has_zone_map_type(series):
+                return None
+            self._zone_maps[column_name] = ZoneMap(series, self.zone_map_block_size)
+        return self._zone_maps[column_name]
+
+
+_TABLE_STATISTICS: Dict[str, TableStatistics] = {}
+
+
+def verify_sort_order(frame: DataFrame, sorted_by: Sequence[str]):
+    """
+    Raise a ValueError unless the rows of the frame are in ascending order of the
+    columns, compared in turn, and the columns have no null values
+    :param frame:
+    :param sorted_by:
+    :return:
+    """
+    # Whether each row has the same values as the next in the columns so far
+    equal = np.ones(max(len(frame) - 1, 0), dtype=bool)
+    for name in sorted_by:
+        column = frame[name]
+        if column.isna().any():
+            raise ValueError(f"Sort column '{name}' has null values")
+        values = column.to_numpy()
+        if (equal & (values[:-1] > values[1:])).any():
+            raise ValueError(f"Frame is not sorted by {', '.join(sorted_by)}")
+        equal &= values[:-1] == values[1:]
+
+
+def register_table_statistics(
+    frame: DataFrame,
+    table_name: str,
+    sorted_by: Sequence[str] = (),
+    zone_map_block_size: Optional[int] = None,
+):
+    """
+    Start tracking statistics for a newly registered table
+    :param frame: Registered frame
+    :param table_name: Name the frame was registered under
+    :param sorted_by: Columns that the rows of the frame are sorted by
+    :param zone_map_block_size: Number of rows of the blocks of the zone maps of
+                                the table, or None to keep no zone maps
+    :return:
+    """
+    _TABLE_STATISTICS[table_name] = TableStatistics(
+        frame, sorted_by, zone_map_block_size
+    )
+
+
+def remove_table_statistics(table_name: str):
+    """
+    Stop tracking statistics for a removed table
+    :param table_name: Name the frame was registered under
+    :return:
+    """
+    _TABLE_STATISTICS.pop(table_name, None)
+
+
+def get_table_statistics(table_name: str) -> Optional[TableStatistics]:
+    """
+    Return the statistics for a registered table if there are any
+    :param table_name: Name the frame was registered under
+    :return:
+    """
+    return _TABLE_STATISTICS.get(table_name)
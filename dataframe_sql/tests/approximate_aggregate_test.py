@@ -0,0 +1,142 @@
+"""
+Test cases for the APPROX_COUNT_DISTINCT and APPROX_PERCENTILE aggregates
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.execution.sketches import HyperLogLog, TDigest
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def test_hyperloglog_merge():
+    """
+    Test that merging the sketches of two chunks gives the sketch of both chunks
+    and that the estimate is close to the number of distinct values
+    :return:
+    """
+    values = np.random.RandomState(0).randint(0, 200_000, 300_000)
+    merged = (
+        HyperLogLog(12)
+        .update(values[:100_000])
+        .merge(HyperLogLog(12).update(values[100_000:]))
+    )
+    whole = HyperLogLog(12).update(values)
+    assert (merged.registers == whole.registers).all()
+    assert merged.estimate() == pytest.approx(len(np.unique(values)), rel=0.05)
+    assert HyperLogLog().update(range(100)).estimate() == 100
+
+
+def test_tdigest_merge():
+    """
+    Test that the percentiles of merged t-digests are close in rank to the
+    percentiles of the values of every chunk
+    :return:
+    """
+    values = np.random.RandomState(0).lognormal(size=100_000)
+    chunks = [TDigest().update(chunk) for chunk in np.array_split(values, 4)]
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged.merge(chunk)
+    assert merged.count == len(values)
+    assert len(merged.means) < 200
+    for quantile in (0.01, 0.25, 0.5, 0.75, 0.99):
+        rank = np.mean(values <= merged.quantile(quantile))
+        assert rank == pytest.approx(quantile, abs=0.005)
+    assert merged.quantile(0) == values.min()
+    assert merged.quantile(1) == values.max()
+
+
+def test_approximate_aggregates_group_by_having():
+    """
+    Test the approximate aggregates of every group and filtering groups on them
+    :return:
+    """
+    my_frame = query(
+        """select month, approx_count_distinct(day) as days,
+        approx_percentile(temp, 0.5) as median_temp from forest_fires
+        group by month having approx_count_distinct(day) > 5"""
+    )
+    groups = FOREST_FIRES.groupby("month")
+    days = groups["day"].nunique()
+    expected_months = sorted(days[days > 5].index)
+    assert sorted(my_frame["month"]) == expected_months
+    my_frame = my_frame.set_index("month").loc[expected_months]
+    pd.testing.assert_series_equal(
+        my_frame["days"], days.loc[expected_months], check_names=False
+    )
+    exact = groups["temp"].median().loc[expected_months]
+    assert (abs(my_frame["median_temp"] - exact) <= 0.02 * exact).all()
+
+
+def test_approximate_aggregates_with_null_group_keys():
+    """
+    Test that the rows whose group key is null are left out of every group
+    :return:
+    """
+    register_temp_table(
+        pd.DataFrame(
+            {"g": [1.0, np.nan, 2.0, 1.0, np.nan, 2.0], "x": [1, 2, 3, 4, 5, 3]}
+        ),
+        "null_groups",
+    )
+    try:
+        my_frame = query(
+            """select g, approx_count_distinct(x) as xs,
+            approx_percentile(x, 1.0) as top from null_groups group by g"""
+        )
+    finally:
+        remove_temp_table("null_groups")
+    my_frame = my_frame.sort_values("g").reset_index(drop=True)
+    assert my_frame["g"].tolist() == [1.0, 2.0]
+    assert my_frame["xs"].tolist() == [2, 1]
+    assert my_frame["top"].tolist() == [4, 3]
+
+
+def test_approximate_aggregates_with_accuracy():
+    """
+    Test the approximate aggregates of the whole table with a given precision
+    and compression
+    :return:
+    """
+    my_frame = query(
+        """select approx_count_distinct(area, 8) as areas,
+        approx_percentile(area, 0.9, 500) as area from forest_fires"""
+    )
+    assert my_frame["areas"][0] == pytest.approx(FOREST_FIRES.area.nunique(), rel=0.1)
+    assert my_frame["area"][0] == pytest.approx(
+        FOREST_FIRES.area.quantile(0.9), rel=0.05
+    )
+
+
+@pytest.mark.parametrize(
+    "aggregate",
+    [
+        "approx_count_distinct(area, 2)",
+        "approx_count_distinct(area, 10, 1)",
+        "approx_count_distinct(area, temp)",
+        "approx_percentile(area)",
+        "approx_percentile(area, 1.5)",
+        "approx_percentile(area, 0.5, 1)",
+    ],
+)
+def test_invalid_approximate_aggregates(aggregate):
+    """
+    Test that invalid arguments of the approximate aggregates are rejected
+    :return:
+    """
+    with pytest.raises(InvalidQueryException):
+        query(f"select {aggregate} as value from forest_fires")
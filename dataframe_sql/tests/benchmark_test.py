@@ -0,0 +1,130 @@
+"""
+Test cases for the benchmark runner and suite
+"""
+import json
+
+import pytest
+
+from dataframe_sql.benchmarks.runner import (
+    Benchmark,
+    BenchmarkResult,
+    find_regressions,
+    load_results,
+    measure,
+    save_results,
+)
+from dataframe_sql.benchmarks.suite import (
+    QUERY_SHAPES,
+    _run_from_command_line,
+    run_suite,
+)
+
+
+def test_result_statistics():
+    """
+    Test the statistics reported for the timings of a benchmark
+    :return:
+    """
+    result = BenchmarkResult("shape", [float(timing) for timing in range(1, 21)])
+    assert result.median == 10.5
+    assert result.p95 == pytest.approx(19.05)
+    assert result.min == 1.0
+    assert result.max == 20.0
+    with pytest.raises(ValueError, match="Unknown statistic"):
+        result.statistic("p99")
+
+
+def test_measure_warms_up():
+    """
+    Test that warmup runs are not timed
+    :return:
+    """
+    calls = []
+    result = measure(Benchmark("calls", lambda: calls.append(None)), 3, 5)
+    assert len(calls) == 8
+    assert len(result.timings) == 5
+
+
+def test_results_round_trip(tmp_path):
+    """
+    Test that saved results can be loaded as a baseline
+    :return:
+    """
+    path = tmp_path / "results.json"
+    save_results({"shape": BenchmarkResult("shape", [0.5, 1.5])}, path, {"scale": 2})
+    document = json.loads(path.read_text())
+    assert document["metadata"] == {"scale": 2}
+    assert document["benchmarks"]["shape"]["median"] == 1.0
+    assert load_results(path)["shape"].timings == [0.5, 1.5]
+
+
+def test_find_regressions():
+    """
+    Test that only slowdowns beyond the allowed fraction are regressions
+    :return:
+    """
+    baseline = {
+        "slower": BenchmarkResult("slower", [1.0]),
+        "noisy": BenchmarkResult("noisy", [1.0]),
+        "faster": BenchmarkResult("faster", [1.0]),
+    }
+    results = {
+        "slower": BenchmarkResult("slower", [1.5]),
+        "noisy": BenchmarkResult("noisy", [1.05]),
+        "faster": BenchmarkResult("faster", [0.5]),
+        "new": BenchmarkResult("new", [9.0]),
+    }
+    regressions = find_regressions(results, baseline, max_regression=0.1)
+    assert [regression.name for regression in regressions] == ["slower"]
+    assert regressions[0].ratio == 1.5
+
+
+def test_find_memory_regressions():
+    """
+    Test that peak memory grown beyond the allowed fraction is a regression, and
+    that untraced memory is not compared
+    :return:
+    """
+    baseline = {
+        "grown": BenchmarkResult("grown", [1.0], 1000),
+        "stable": BenchmarkResult("stable", [1.0], 1000),
+        "untraced": BenchmarkResult("untraced", [1.0]),
+    }
+    results = {
+        "grown": BenchmarkResult("grown", [1.0], 2000),
+        "stable": BenchmarkResult("stable", [1.0], 1050),
+        "untraced": BenchmarkResult("untraced", [1.0], 2000),
+    }
+    [regression] = find_regressions(results, baseline, max_memory_regression=0.1)
+    assert (regression.name, regression.statistic) == ("grown", "peak_memory")
+    assert "MiB" in str(regression)
+    assert not find_regressions(results, baseline, max_memory_regression=None)
+
+
+def test_suite_fails_on_regression(tmp_path):
+    """
+    Test that running the suite against a much faster baseline fails
+    :return:
+    """
+    baseline_path = tmp_path / "baseline.json"
+    results_path = tmp_path / "results.json"
+    save_results({"filter": BenchmarkResult("filter", [1e-9])}, baseline_path)
+    arguments = ["--scale", "1", "--warmup", "0", "--repeat", "2", "--filter"]
+    exit_code = _run_from_command_line(
+        arguments
+        + ["^filter$", "--output", str(results_path)]
+        + ["--baseline", str(baseline_path)]
+    )
+    assert exit_code == 1
+    assert list(load_results(results_path)) == ["filter"]
+    assert "filter" in QUERY_SHAPES
+
+
+def test_every_query_shape_runs():
+    """
+    Test that every benchmark of the suite is a valid query
+    :return:
+    """
+    results = run_suite(scale=1, warmup=0, repeat=1)
+    assert list(results) == list(QUERY_SHAPES)
+    assert all(result.peak_memory > 0 for result in results.values())
@@ -0,0 +1,145 @@
+"""
+Test cases for evaluating CASE expressions as selections
+"""
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.execution.case_select import select_branches
+from dataframe_sql.operations import CaseSelect
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def _case_select(sql: str) -> CaseSelect:
+    op = optimize_expression(parse_sql(sql)).op().selections[0].op()
+    assert isinstance(op, CaseSelect)
+    return op
+
+
+def test_select_branches():
+    """
+    Test that every row takes the branch of the first condition it matches and
+    that conditions are not evaluated once every row is matched
+    :return:
+    """
+    columns = [pd.Series([1.0, 5.0, np.nan, 9.0]), pd.Series([3, 2, 1, 0])]
+    branches = select_branches(
+        [
+            ("greater", ("column", 0), ("literal", 4)),
+            ("less", ("column", 1), ("literal", 2)),
+            ("greater", ("column", 0), ("literal", 0)),
+            # Would fail if it were evaluated with every row matched
+            ("column", 2),
+        ],
+        columns,
+    )
+    assert [branch.tolist() for branch in branches] == [[1, 3], [2], [0], [], []]
+
+
+def test_select_branches_with_nulls():
+    """
+    Test that null conditions of columns that numpy cannot hold are not true
+    :return:
+    """
+    columns = [pd.Series([True, None, False, None], dtype=object)]
+    branches = select_branches([("column", 0)], columns)
+    assert [branch.tolist() for branch in branches] == [[0], [1, 2, 3]]
+
+
+def test_duplicate_conditions_removed():
+    """
+    Test that a condition repeating an earlier one is dropped with its result
+    :return:
+    """
+    sql = """select case when wind > 5 then month when temp > 20 then day
+        when wind > 5 then 'mid' else 'other' end as wind_month from forest_fires"""
+    op = _case_select(sql)
+    assert len(op.conditions) == len(op.results) == 2
+    expected = np.select(
+        [FOREST_FIRES.wind > 5, FOREST_FIRES.temp > 20],
+        [FOREST_FIRES.month, FOREST_FIRES.day],
+        "other",
+    )
+    tm.assert_frame_equal(query(sql), pd.DataFrame({"wind_month": expected}))
+
+
+def test_branches_with_same_result_merged():
+    """
+    Test that adjacent branches with the same result are merged and that the
+    last branches with the result of the default are left to the default
+    :return:
+    """
+    sql = """select case when wind > 5 then 'windy' when rh > 80 then 'windy'
+        when temp > 20 then 'hot' when rain > 0 then 'mild' else 'mild' end
+        as weather from forest_fires"""
+    op = _case_select(sql)
+    assert op.conditions[0][0] == "or"
+    assert len(op.conditions) == 2
+    expected = np.select(
+        [FOREST_FIRES.wind > 5, FOREST_FIRES.RH > 80, FOREST_FIRES.temp > 20],
+        ["windy", "windy", "hot"],
+        "mild",
+    )
+    tm.assert_frame_equal(query(sql), pd.DataFrame({"weather": expected}))
+
+
+def test_many_branches():
+    """
+    Test a CASE expression with a branch per bucket of a column and conditions
+    that cannot be fused
+    :return:
+    """
+    branches = " ".join(
+        f"when temp < {bucket} then {bucket}" for bucket in range(5, 35)
+    )
+    sql = f"""select case when month = 'aug' then 0 {branches} else 99 end
+        as bucket from forest_fires"""
+    op = _case_select(sql)
+    assert len(op.conditions) == 31
+    expected = np.select(
+        [FOREST_FIRES.month == "aug"]
+        + [FOREST_FIRES.temp < bucket for bucket in range(5, 35)],
+        [0] + list(range(5, 35)),
+        99,
+    )
+    my_frame = query(sql)
+    tm.assert_frame_equal(my_frame, query(sql, optimize=False))
+    tm.assert_series_equal(
+        my_frame.bucket, pd.Series(expected, name="bucket"), check_dtype=False
+    )
+
+
+def test_timestamp_results():
+    """
+    Test that timestamp columns and timestamp scalars are selected as timestamps
+    :return:
+    """
+    times = pd.DataFrame(
+        {"i": np.arange(8), "t": pd.date_range("2020-04-01", periods=8, freq="D")}
+    )
+    register_temp_table(times, "times")
+    sql = "select case when i > 4 then t else now() end as result from times"
+    try:
+        _case_select(sql)
+        my_frame = query(sql)
+    finally:
+        remove_temp_table("times")
+    assert my_frame.result.dtype == np.dtype("datetime64[ns]")
+    tm.assert_series_equal(my_frame.result[5:], times.t[5:], check_names=False)
+    assert my_frame.result[:5].nunique() == 1
+    assert my_frame.result[0] > times.t.max()
@@ -0,0 +1,111 @@
+"""
+Test cases for eliminating common subexpressions
+"""
+import ibis.expr.operations as ops
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.optimizer.common_subexpressions import (
+    eliminate_common_subexpressions,
+)
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def _operations(expr, operation) -> list:
+    """
+    Return the distinct operations of the given type in the expression
+    :param expr:
+    :param operation:
+    :return:
+    """
+    seen = set()
+    pending = [expr]
+    while pending:
+        op = pending.pop().op()
+        if op not in seen:
+            seen.add(op)
+            pending.extend(arg for arg in op.flat_args() if hasattr(arg, "op"))
+    return [op for op in seen if isinstance(op, operation)]
+
+
+def test_repeated_expression_computed_once():
+    """
+    Test that an expression repeated in the SELECT list and the WHERE clause is
+    computed once in a projection that only keeps the other columns read
+    :return:
+    """
+    sql = """select temp * wind + rain as heat, temp * wind + rain - 2 as lower_heat,
+        month from forest_fires where temp * wind + rain > 30"""
+    expr = eliminate_common_subexpressions(parse_sql(sql))
+    inner = expr.op().table.op()
+    assert isinstance(inner, ops.Selection)
+    assert inner.schema.names == ["month", "_common0"]
+    assert len(_operations(expr, ops.Multiply)) == 1
+    heat = FOREST_FIRES.temp * FOREST_FIRES.wind + FOREST_FIRES.rain
+    pandas_frame = FOREST_FIRES.assign(heat=heat, lower_heat=heat - 2)[heat > 30][
+        ["heat", "lower_heat", "month"]
+    ].reset_index(drop=True)
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+def test_repeated_case_expression():
+    """
+    Test that a CASE expression repeated in the SELECT list and the WHERE
+    clause is computed once
+    :return:
+    """
+    case = "case when wind > 5 then temp when rh > 50 then rain else area end"
+    sql = f"""select {case} as first_value, {case} as second_value
+        from forest_fires where {case} > 10"""
+    expr = eliminate_common_subexpressions(parse_sql(sql))
+    assert len(_operations(expr, ops.SearchedCase)) == 1
+    tm.assert_frame_equal(query(sql), query(sql, optimize=False))
+
+
+def test_single_operations_not_eliminated():
+    """
+    Test that expressions of a single operation are computed where they appear
+    :return:
+    """
+    sql = "select temp * 2 as a, temp * 2 as b from forest_fires"
+    expr = parse_sql(sql)
+    assert eliminate_common_subexpressions(expr) is expr
+
+
+def test_having_reads_aggregated_column():
+    """
+    Test that an aggregate repeated in the HAVING clause is read from the result
+    of the aggregation, and that other aggregates of the clause are aggregated
+    with it and left out of the result
+    :return:
+    """
+    sql = """select month, max(temp) as hottest from forest_fires group by month
+        having max(temp) > 25 and sum(rain) >= 0"""
+    expr = eliminate_common_subexpressions(parse_sql(sql))
+    having = expr.op()
+    assert isinstance(having, ops.Selection)
+    aggregation = having.table.op()
+    assert not aggregation.having
+    assert aggregation.schema.names == ["month", "hottest", "_having0"]
+    assert expr.schema().names == ["month", "hottest"]
+    grouped = FOREST_FIRES.groupby("month")
+    pandas_frame = grouped.temp.max().rename("hottest").reset_index()
+    pandas_frame = pandas_frame[
+        (pandas_frame.hottest > 25).to_numpy() & (grouped.rain.sum() >= 0).to_numpy()
+    ]
+    tm.assert_frame_equal(
+        query(sql).reset_index(drop=True), pandas_frame.reset_index(drop=True)
+    )
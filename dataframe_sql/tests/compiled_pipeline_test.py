@@ -0,0 +1,216 @@
+"""
+Test cases for compiling filter, projection and aggregation pipelines
+"""
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.execution import compiled_pipeline
+from dataframe_sql.execution.compiled_pipeline import (
+    compile_kernel,
+    row_function,
+    run_pipeline,
+)
+from dataframe_sql.operations import CompiledAggregation
+from dataframe_sql.optimizer import (
+    compiled_pipeline as pipeline_planner,
+    optimize_expression,
+)
+from dataframe_sql.optimizer.compiled_pipeline import compile_pipelines
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import register_env_tables, remove_env_tables
+
+GROUPED_QUERY = """select month, sum(temp) as temp, count(*) as fires,
+    count(rain) as rainy, min(rh) as rh, max(area) as area, avg(wind) as wind
+    from forest_fires where temp * 2 > wind + 30 and rh < 60 group by month"""
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+@pytest.fixture
+def python_kernels(monkeypatch):
+    """
+    Plan compiled aggregations and run their kernels as Python functions, as
+    Numba would compile them
+    """
+    monkeypatch.setattr(pipeline_planner, "jit_available", lambda: True)
+    monkeypatch.setattr(compiled_pipeline, "_jit", lambda function: function)
+    monkeypatch.setattr(compiled_pipeline, "_KERNELS", {})
+
+
+def _plan(sql: str):
+    return compile_pipelines(optimize_expression(parse_sql(sql)))
+
+
+def test_compiled_functions():
+    """
+    Test the function of a program and the loop of a filtered aggregation, run
+    as Python functions
+    :return:
+    """
+    columns = (np.array([3.0, 7.0, 1.0]), np.array([2, 9, 0]))
+    function = row_function(
+        ("not", ("less", ("add", ("column", 0), ("column", 1)), ("literal", 5))),
+        lambda python_function: python_function,
+    )
+    assert [function(columns, i) for i in range(3)] == [True, True, False]
+    kernel = compile_kernel(
+        ("greater", ("column", 0), ("column", 1)),
+        [("count_star", None), ("max", ("column", 1))],
+        lambda python_function: python_function,
+    )
+    rows = np.zeros(2, dtype=np.int64)
+    accumulators = (np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2, dtype=np.int64))
+    kernel(3, np.array([0, 1, 1]), columns, rows, accumulators)
+    assert rows.tolist() == [1, 1]
+    assert accumulators[2].tolist() == [2.0, 0.0]
+    assert accumulators[3].tolist() == [1, 1]
+
+
+def test_run_pipeline(python_kernels):
+    """
+    Test that a compiled pipeline skips filtered rows, null values and null keys
+    and leaves out groups without rows
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "key": ["b", "a", "b", None, "c", "a"],
+            "value": [1.0, np.nan, 3.0, 4.0, 5.0, 6.0],
+            "weight": [1, 2, 3, 4, -5, 6],
+        }
+    )
+    keys, values = run_pipeline(
+        data,
+        ["value", "weight"],
+        ("greater", ("column", 1), ("literal", 0)),
+        ["key"],
+        [
+            ("count_star", None),
+            ("count", ("column", 0)),
+            ("sum", ("multiply", ("column", 0), ("column", 1))),
+            ("min", ("column", 0)),
+            ("mean", ("column", 0)),
+        ],
+        [np.dtype(np.int64)] * 2 + [np.dtype(np.float64)] * 3,
+    )
+    tm.assert_frame_equal(keys, pd.DataFrame({"key": ["a", "b"]}))
+    count_star, count, total, minimum, mean = values
+    assert count_star.tolist() == [2, 2]
+    assert count.tolist() == [1, 2]
+    assert total.tolist() == [36.0, 10.0]
+    assert minimum.tolist() == [6.0, 1.0]
+    assert mean.tolist() == [6.0, 2.0]
+
+
+def test_run_pipeline_with_null_keys_of_several_columns(python_kernels):
+    """
+    Test that rows with a null value in any of several group keys are left out
+    :return:
+    """
+    data = pd.DataFrame(
+        {
+            "key": ["b", "a", "b", None, "a"],
+            "sub_key": [1.0, 2.0, np.nan, 1.0, 2.0],
+            "value": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    keys, (total,) = run_pipeline(
+        data,
+        ["value"],
+        None,
+        ["key", "sub_key"],
+        [("sum", ("column", 0))],
+        [np.dtype(np.float64)],
+    )
+    tm.assert_frame_equal(
+        keys, pd.DataFrame({"key": ["a", "b"], "sub_key": [2.0, 1.0]})
+    )
+    assert total.tolist() == [7.0, 1.0]
+
+
+def test_grouped_aggregation_compiled(python_kernels):
+    """
+    Test that a filtered, grouped aggregation is compiled into one pipeline with
+    the result of the pandas engine
+    :return:
+    """
+    compiled = _plan(GROUPED_QUERY).op()
+    assert isinstance(compiled, CompiledAggregation)
+    assert compiled.by == ("month",)
+    assert sorted(compiled.columns) == ["RH", "area", "rain", "temp", "wind"]
+    tm.assert_frame_equal(query(GROUPED_QUERY, engine="numba"), query(GROUPED_QUERY))
+
+
+def test_aggregation_of_projection_compiled(python_kernels):
+    """
+    Test that the columns of a subquery are read through to the expressions that
+    define them, and that an aggregation without matching rows is still one row
+    :return:
+    """
+    sql = """select count(*) as fires, sum(heat) as heat, min(rh) as rh from
+        (select temp + wind as heat, rh from forest_fires where rh > 30) as fires
+        where heat > 1000"""
+    compiled = _plan(sql).op()
+    assert isinstance(compiled, CompiledAggregation)
+    assert compiled.by == ()
+    tm.assert_frame_equal(query(sql, engine="numba"), query(sql))
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        """select month, max(temp) as temp from forest_fires group by month
+        having max(temp) > 25""",
+        "select month, count(*) as fires from forest_fires where month = 'aug' "
+        "group by month",
+        "select count(day) as days from forest_fires",
+    ],
+)
+def test_aggregation_not_compiled(python_kernels, sql):
+    """
+    Test that HAVING clauses, predicates on strings and aggregates of strings are
+    left to pandas
+    :return:
+    """
+    assert not isinstance(_plan(sql).op(), CompiledAggregation)
+
+
+def test_pandas_engine_without_numba(monkeypatch):
+    """
+    Test that the numba engine falls back to pandas when Numba is not installed
+    :return:
+    """
+    monkeypatch.setattr(pipeline_planner, "jit_available", lambda: False)
+    assert not isinstance(_plan(GROUPED_QUERY).op(), CompiledAggregation)
+    tm.assert_frame_equal(query(GROUPED_QUERY, engine="numba"), query(GROUPED_QUERY))
+
+
+def test_unknown_engine():
+    """
+    Test that an unknown engine is rejected
+    :return:
+    """
+    with pytest.raises(ValueError, match="Unknown engine"):
+        query("select * from forest_fires", engine="cython")
+
+
+def test_numba_engine():
+    """
+    Test the numba engine with kernels compiled by Numba, which are cached by
+    the shape of the query
+    :return:
+    """
+    pytest.importorskip("numba")
+    my_frame = query(GROUPED_QUERY, engine="numba")
+    kernels = len(compiled_pipeline._KERNELS)
+    tm.assert_frame_equal(query(GROUPED_QUERY, engine="numba"), my_frame)
+    assert len(compiled_pipeline._KERNELS) == kernels
+    tm.assert_frame_equal(my_frame, query(GROUPED_QUERY))
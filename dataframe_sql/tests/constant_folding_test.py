@@ -0,0 +1,84 @@
+"""
+Test cases for folding constant expressions
+"""
+from datetime import datetime
+
+from freezegun import freeze_time
+import ibis.expr.operations as ops
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.optimizer.constant_folding import fold_constants
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def test_literal_arithmetic_folded():
+    """
+    Test that arithmetic on literals in the SELECT list and the WHERE clause is
+    replaced with its value
+    :return:
+    """
+    sql = """select temp, 1 + 2 * 3 as my_number, 60 * 60 * 24 * temp as seconds
+        from forest_fires where temp > 2 * 10 - 1"""
+    expr = fold_constants(parse_sql(sql))
+    selections = expr.op().selections
+    assert isinstance(selections[1].op(), ops.Literal)
+    assert selections[1].op().value == 7
+    assert selections[2].op().left.op().value == 86400
+    assert expr.op().predicates[0].op().right.op().value == 19
+    pandas_frame = FOREST_FIRES[FOREST_FIRES.temp > 19][["temp"]].reset_index(drop=True)
+    pandas_frame["my_number"] = 7
+    pandas_frame["seconds"] = pandas_frame.temp * 86400
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+def test_failing_constant_not_folded():
+    """
+    Test that an operation on literals that fails is left to fail when the query
+    is executed
+    :return:
+    """
+    expr = parse_sql("select 1 / 0 as ratio from forest_fires")
+    assert fold_constants(expr) is expr
+    with pytest.raises(ZeroDivisionError):
+        query("select 1 / 0 as ratio from forest_fires")
+
+
+def test_now_read_once_per_query():
+    """
+    Test that every now() and today() of a query has the same value
+    :return:
+    """
+    my_frame = query(
+        """select now() as first_now, today() as first_today, now() as second_now,
+        today() as second_today from forest_fires"""
+    )
+    assert (my_frame.first_now == my_frame.second_now).all()
+    assert (my_frame.first_today == my_frame.second_today).all()
+    assert my_frame.first_now[0].date() == my_frame.first_today[0]
+
+
+def test_now_read_per_query():
+    """
+    Test that the current time is read again by every query
+    :return:
+    """
+    with freeze_time(datetime(2020, 1, 1)):
+        first_frame = query("select now() as current from forest_fires")
+    with freeze_time(datetime(2021, 1, 1)):
+        second_frame = query("select now() as current from forest_fires")
+    assert first_frame.current[0] == datetime(2020, 1, 1)
+    assert second_frame.current[0] == datetime(2021, 1, 1)
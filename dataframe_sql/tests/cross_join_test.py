@@ -0,0 +1,98 @@
+"""
+Test cases for turning cross joins filtered by equality predicates into joins
+"""
+from pandas import merge
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.tests.utils import (
+    DIGIMON_MON_LIST,
+    DIGIMON_MOVE_LIST,
+    FOREST_FIRES,
+    fix_naming_inconsistencies,
+    register_env_tables,
+    remove_env_tables,
+    sort_frame,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def test_comma_join_with_where_equality():
+    """
+    Test joining two comma separated tables on an equality in the where clause
+    :return:
+    """
+    my_frame = query(
+        """select temp, digimon from forest_fires, digimon_mon_list
+        where forest_fires.x = digimon_mon_list.memory and temp > 20"""
+    )
+    pandas_frame = merge(
+        FOREST_FIRES[FOREST_FIRES["temp"] > 20],
+        DIGIMON_MON_LIST,
+        left_on="X",
+        right_on="Memory",
+    )[["temp", "Digimon"]].rename(columns={"Digimon": "digimon"})
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+def test_comma_join_aggregation():
+    """
+    Test aggregating two comma separated tables joined in the where clause
+    :return:
+    """
+    my_frame = query(
+        """select count(*) as fires, max(temp) as hottest
+        from forest_fires, digimon_mon_list
+        where forest_fires.x = digimon_mon_list.memory and stage = 'Champion'"""
+    )
+    joined = merge(
+        FOREST_FIRES,
+        DIGIMON_MON_LIST[DIGIMON_MON_LIST["Stage"] == "Champion"],
+        left_on="X",
+        right_on="Memory",
+    )
+    assert my_frame["fires"].tolist() == [len(joined)]
+    assert my_frame["hottest"].tolist() == [joined["temp"].max()]
+
+
+def test_comma_join_overlapping_columns():
+    """
+    Test joining two tables with overlapping column names in the where clause
+    :return:
+    """
+    my_frame = query(
+        """select * from digimon_mon_list, digimon_move_list
+        where digimon_mon_list.attribute = digimon_move_list.attribute
+        and power > 100"""
+    )
+    pandas_frame = merge(
+        DIGIMON_MON_LIST,
+        DIGIMON_MOVE_LIST[DIGIMON_MOVE_LIST["Power"] > 100],
+        on="Attribute",
+    )
+    pandas_frame = fix_naming_inconsistencies(pandas_frame)
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+def test_comma_join_post_join_filter():
+    """
+    Test that predicates between both tables that are not equalities are applied
+    after the join
+    :return:
+    """
+    my_frame = query(
+        """select * from digimon_mon_list, digimon_move_list
+        where digimon_mon_list.attribute = digimon_move_list.attribute
+        and digimon_mon_list.type <> digimon_move_list.type"""
+    )
+    pandas_frame = merge(DIGIMON_MON_LIST, DIGIMON_MOVE_LIST, on="Attribute")
+    pandas_frame = pandas_frame[pandas_frame["Type_x"] != pandas_frame["Type_y"]]
+    pandas_frame = fix_naming_inconsistencies(pandas_frame)
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
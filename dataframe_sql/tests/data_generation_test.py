@@ -0,0 +1,116 @@
+"""
+Test cases for the synthetic versions of the bundled data sets
+"""
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks import data
+from dataframe_sql.tests.utils import DIGIMON_MON_LIST, FOREST_FIRES
+
+
+def test_scale_and_seed():
+    """
+    Test that tables are scaled by row count and deterministic for a seed
+    :return:
+    """
+    fires = data.forest_fires(scale=3, seed=1)
+    assert len(fires) == 3 * len(FOREST_FIRES)
+    assert list(fires.columns) == list(FOREST_FIRES.columns)
+    tm.assert_series_equal(fires.dtypes, FOREST_FIRES.dtypes)
+    tm.assert_frame_equal(fires, data.forest_fires(scale=3, seed=1))
+    assert not fires.equals(data.forest_fires(scale=3, seed=2))
+
+
+def test_similar_distributions():
+    """
+    Test that the columns of a large table follow those of the bundled table
+    :return:
+    """
+    fires = data.forest_fires(scale=200)
+    for column in ["temp", "area", "X"]:
+        assert fires[column].mean() == pytest.approx(
+            FOREST_FIRES[column].mean(), rel=0.02
+        )
+    frequencies = fires["month"].value_counts(normalize=True)
+    expected = FOREST_FIRES["month"].value_counts(normalize=True)
+    assert np.allclose(frequencies[expected.index], expected, atol=0.01)
+
+
+def test_unique_columns():
+    """
+    Test that keys and unique names stay unique and the first copy is unchanged
+    :return:
+    """
+    digimon = data.digimon_mon_list(scale=2.5)
+    assert digimon["Number"].is_unique and digimon["Digimon"].is_unique
+    assert digimon["Number"].is_monotonic_increasing
+    tm.assert_series_equal(
+        digimon["Digimon"].iloc[: len(DIGIMON_MON_LIST)], DIGIMON_MON_LIST["Digimon"]
+    )
+    assert digimon["Digimon"].iloc[len(DIGIMON_MON_LIST)] == "Kuramon_1"
+
+
+def test_unique_unordered_integers():
+    """
+    Test that unique integers that do not increase stay unique, and that unique
+    floating point values are resampled
+    :return:
+    """
+    random_state = np.random.default_rng(0)
+    integers = pd.Series([7, -2, 5, 3], dtype=np.int32)
+    values = data.synthesize_column(integers, 10, random_state)
+    assert values.dtype == np.int32
+    tm.assert_series_equal(pd.Series(values[:4]), integers)
+    assert len(np.unique(values)) == 10
+    measurements = pd.Series([0.5, 1.25, 3.0])
+    values = data.synthesize_column(measurements, 10, random_state)
+    assert set(values) <= set(measurements)
+
+
+def test_cardinality_and_skew():
+    """
+    Test changing the number of distinct values and the skew of a column
+    :return:
+    """
+    fires = data.forest_fires(scale=20, cardinality={"day": 100, "month": 3})
+    assert fires["day"].nunique() == 100
+    assert fires["month"].nunique() == 3
+    skewed = data.forest_fires(scale=20, cardinality={"day": 100}, skew=2.0)
+    frequencies = skewed["day"].value_counts(normalize=True)
+    assert frequencies.iloc[0] == pytest.approx(
+        1 / np.sum(1 / np.arange(1, 101) ** 2), abs=0.02
+    )
+    with pytest.raises(ValueError, match="Unknown columns"):
+        data.forest_fires(cardinality={"not_a_column": 2})
+
+
+def test_query_generated_table():
+    """
+    Test querying a generated table
+    :return:
+    """
+    fires = data.forest_fires(scale=10)
+    register_temp_table(fires, "synthetic_fires")
+    try:
+        my_frame = query(
+            "select month, count(*) as fires from synthetic_fires group by month"
+        )
+    finally:
+        remove_temp_table("synthetic_fires")
+    assert my_frame["fires"].sum() == len(fires)
+
+
+def test_parquet_cache(tmp_path, monkeypatch):
+    """
+    Test that large tables are read back from the Parquet cache
+    :return:
+    """
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv(data.CACHE_DIR_VARIABLE, str(tmp_path))
+    scale = data.MIN_CACHED_ROWS / len(FOREST_FIRES)
+    fires = data.forest_fires(scale=scale)
+    assert len(list(tmp_path.glob("forest_fires-*.parquet"))) == 1
+    tm.assert_frame_equal(fires, data.forest_fires(scale=scale))
@@ -0,0 +1,149 @@
+"""
+Test cases for the external merge sort of ORDER BY under a memory limit
+"""
+import numpy as np
+from pandas import Categorical, DataFrame
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.data import forest_fires
+from dataframe_sql.execution.external_sort import external_sort
+from dataframe_sql.execution.spill import SPILL_DIR_VARIABLE, SpilledFrame
+from dataframe_sql.operations import ExternalSort
+from dataframe_sql.optimizer.memory import (
+    estimate_operator_memory,
+    estimate_table_size,
+    plan_memory,
+)
+from dataframe_sql.parsing.parser import parse_sql
+
+LARGE_FOREST_FIRES = forest_fires(5)
+
+
+def _mixed_frame(rows: int) -> DataFrame:
+    random_state = np.random.RandomState(0)
+    frame = DataFrame(
+        {
+            "number": random_state.randint(0, 20, rows),
+            "real": random_state.rand(rows),
+            "text": random_state.choice(["a", "b", "c", None], rows),
+            "category": Categorical(random_state.choice(["z", "y", "x"], rows)),
+        }
+    )
+    frame.loc[::7, "real"] = np.nan
+    return frame
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_temp_table(LARGE_FOREST_FIRES, "large_forest_fires")
+    yield
+    remove_temp_table("large_forest_fires")
+
+
+@pytest.mark.parametrize(
+    "by,ascending",
+    [
+        (["number"], [True]),
+        (["number", "real"], [False, True]),
+        (["text", "number"], [True, False]),
+        (["category", "real"], [True, False]),
+        (["real"], [False]),
+    ],
+)
+@pytest.mark.parametrize("limit,offset", [(None, 0), (10, 3), (900, 100)])
+def test_external_sort(by, ascending, limit, offset):
+    """
+    Test that merging sorted runs gives the result of a stable sort in memory
+    :return:
+    """
+    frame = _mixed_frame(5000)
+    chunks = (frame.iloc[start : start + 700] for start in range(0, len(frame), 700))
+    result = list(external_sort(chunks, by, ascending, 1024, limit, offset))
+    expected = frame.sort_values(by, ascending=ascending, kind="mergesort")
+    stop = None if limit is None else offset + limit
+    tm.assert_frame_equal(
+        DataFrame().append(result, ignore_index=True).astype(frame.dtypes),
+        expected.iloc[offset:stop].reset_index(drop=True),
+    )
+
+
+def test_spill_files_removed(tmp_path, monkeypatch):
+    """
+    Test that runs are spilled to the spill directory and removed afterwards
+    :return:
+    """
+    monkeypatch.setenv(SPILL_DIR_VARIABLE, str(tmp_path))
+    frame = _mixed_frame(3000)
+    sorted_frames = external_sort([frame], ["real"], run_rows=1024)
+    next(sorted_frames)
+    assert len(list(tmp_path.glob("*/*/*.npy"))) > 0
+    list(sorted_frames)
+    assert not list(tmp_path.iterdir())
+
+
+def test_spilled_frame_round_trip(tmp_path):
+    """
+    Test that spilled blocks are read back with their dtypes
+    :return:
+    """
+    frame = _mixed_frame(100)
+    spilled = SpilledFrame(tmp_path / "frame", frame, 30)
+    assert spilled.blocks == 4
+    tm.assert_frame_equal(spilled.read(), frame)
+    tm.assert_frame_equal(
+        spilled.read_block(1), frame.iloc[30:60].reset_index(drop=True)
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "select * from large_forest_fires order by temp desc, wind asc, area",
+        "select month, temp, wind from large_forest_fires where wind > 2 "
+        "order by month, temp desc",
+    ],
+)
+def test_order_by_under_memory_limit(sql):
+    """
+    Test that an ORDER BY that would exceed the memory limit is sorted externally
+    with the same result
+    :return:
+    """
+    memory_limit = int(estimate_operator_memory(parse_sql(sql))) - 1
+    assert isinstance(plan_memory(parse_sql(sql), memory_limit).op(), ExternalSort)
+    tm.assert_frame_equal(query(sql, memory_limit=memory_limit), query(sql))
+
+
+def test_limit_pushed_into_external_sort():
+    """
+    Test that runs of an external sort under a LIMIT only keep the limited rows
+    :return:
+    """
+    sql = "select * from large_forest_fires order by temp desc, month limit 7"
+    expr = parse_sql(sql)
+    memory_limit = int(estimate_operator_memory(expr.op().table)) - 1
+    sort_op = plan_memory(expr, memory_limit).op()
+    assert isinstance(sort_op, ExternalSort)
+    assert sort_op.limit == 7
+    tm.assert_frame_equal(query(sql, memory_limit=memory_limit), query(sql))
+
+
+def test_limit_over_sort_too_large_for_memory():
+    """
+    Test that a sort under a LIMIT, with or without an OFFSET, whose whole result
+    would not fit in memory only keeps the rows of the limit and its offset
+    :return:
+    """
+    sql = "select * from large_forest_fires order by temp desc, month"
+    sort_expr = parse_sql(sql)
+    memory_limit = int(estimate_table_size(sort_expr)) - 1
+    for expr in [sort_expr.limit(7), sort_expr.limit(7, offset=5)]:
+        sort_op = plan_memory(expr, memory_limit).op()
+        assert isinstance(sort_op, ExternalSort)
+        assert (sort_op.limit, sort_op.offset) == (expr.op().n, expr.op().offset)
+        tm.assert_frame_equal(plan_memory(expr, memory_limit).execute(), expr.execute())
+    tm.assert_frame_equal(
+        query(f"{sql} limit 7", memory_limit=memory_limit), query(f"{sql} limit 7")
+    )
@@ -0,0 +1,179 @@
+"""
+Test cases for fusing arithmetic and boolean expressions
+"""
+import ibis
+import ibis.expr.operations as ops
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.execution.fused import (
+    evaluate_arrays,
+    evaluate_series,
+    execute_fused_expression,
+    numexpr_source,
+)
+from dataframe_sql.operations import FusedExpression
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.optimizer.fusion import compile_expression
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import register_env_tables, remove_env_tables
+
+# (temp * wind + rain / dmc) > 37 or not rh < 50
+PROGRAM = (
+    "or",
+    (
+        "greater",
+        (
+            "add",
+            ("multiply", ("column", 0), ("column", 1)),
+            ("divide", ("column", 2), ("column", 3)),
+        ),
+        ("literal", 37),
+    ),
+    ("not", ("less", ("column", 4), ("literal", 50))),
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def _fused_expressions(expr) -> list:
+    op = expr.op()
+    return [
+        value.op()
+        for value in list(op.selections) + list(op.predicates)
+        if isinstance(value.op(), FusedExpression)
+    ]
+
+
+def test_projection_fused():
+    """
+    Test that an arithmetic projection is evaluated as one fused expression that
+    reads every column once
+    :return:
+    """
+    sql = """select temp * wind + rain / dmc + 37 as heat, temp * temp as x
+        from forest_fires"""
+    (fused,) = _fused_expressions(optimize_expression(parse_sql(sql)))
+    assert [column.get_name() for column in fused.columns] == [
+        "temp",
+        "wind",
+        "rain",
+        "DMC",
+    ]
+    tm.assert_frame_equal(query(sql), query(sql, optimize=False))
+
+
+def test_filter_predicates_fused():
+    """
+    Test that the predicates of a filter are fused into one conjunction, with the
+    comparison of strings as an input
+    :return:
+    """
+    sql = """select * from forest_fires where month = 'mar' and temp > 8
+        and rain >= 0 and area != 0 and dc < 100 and ffmc <= 90.1"""
+    (fused,) = _fused_expressions(optimize_expression(parse_sql(sql)))
+    assert len(fused.columns) == 6
+    tm.assert_frame_equal(query(sql), query(sql, optimize=False))
+
+
+def test_single_operation_not_fused():
+    """
+    Test that expressions with one operation are left to pandas
+    :return:
+    """
+    sql = "select temp * wind as heat from forest_fires where temp > 20"
+    assert not _fused_expressions(optimize_expression(parse_sql(sql)))
+
+
+def test_literal_operations_not_fused():
+    """
+    Test that operations on literals alone are left out of fused expressions, so
+    that dividing by zero fails as it does without the optimizer
+    :return:
+    """
+    sql = "select temp * wind + rain * 2 + 1 / 0 as heat from forest_fires"
+    (heat,) = optimize_expression(parse_sql(sql)).op().selections
+    fused, ratio = heat.op().args
+    assert fused.op().program == (
+        "add",
+        ("multiply", ("column", 0), ("column", 1)),
+        ("multiply", ("column", 2), ("literal", 2)),
+    )
+    assert isinstance(ratio.op(), ops.Divide)
+    with pytest.raises(ZeroDivisionError):
+        query(sql)
+    with pytest.raises(ZeroDivisionError):
+        query("select temp + 1 / 0 as heat from forest_fires")
+
+
+def test_evaluate_arrays_in_blocks():
+    """
+    Test that evaluating in blocks gives the result of pandas, including for
+    division by zero and for integer columns
+    :return:
+    """
+    random_state = np.random.RandomState(0)
+    series = [
+        pd.Series(random_state.randint(-5, 5, 1000)),
+        pd.Series(random_state.random_sample(1000)),
+        pd.Series(random_state.randint(0, 3, 1000)),
+        pd.Series(random_state.randint(0, 3, 1000)),
+        pd.Series(random_state.random_sample(1000) * 100),
+    ]
+    expected = evaluate_series(PROGRAM, series)
+    result = evaluate_arrays(PROGRAM, [column.to_numpy() for column in series], 64)
+    tm.assert_series_equal(pd.Series(result), expected)
+    arithmetic = PROGRAM[1][1]
+    tm.assert_series_equal(
+        pd.Series(
+            evaluate_arrays(arithmetic, [column.to_numpy() for column in series], 100)
+        ),
+        evaluate_series(arithmetic, series),
+    )
+
+
+def test_object_columns_evaluated_with_pandas():
+    """
+    Test that columns that numpy cannot evaluate in blocks, such as numbers held
+    as objects, are evaluated with pandas
+    :return:
+    """
+    table = ibis.table([("x", "int64"), ("y", "float64")], "numbers")
+    fused = compile_expression(table.x * table.y + 1)
+    x_values = pd.Series([1, 2, None], dtype=object)
+    y_values = pd.Series([0.5, 1.5, 2.5])
+    tm.assert_series_equal(
+        execute_fused_expression(fused, x_values, y_values), x_values * y_values + 1
+    )
+
+
+def test_numexpr_source():
+    """
+    Test the numexpr source of a program
+    :return:
+    """
+    assert numexpr_source(PROGRAM) == (
+        "((((c0 * c1) + (c2 / c3)) > 37) | (~(c4 < 50)))"
+    )
+
+
+def test_numexpr_evaluation():
+    """
+    Test that numexpr evaluates a program to the result of pandas
+    :return:
+    """
+    pytest.importorskip("numexpr")
+    random_state = np.random.RandomState(0)
+    series = [pd.Series(random_state.random_sample(1000)) for _ in range(5)]
+    tm.assert_series_equal(
+        pd.Series(evaluate_arrays(PROGRAM, [column.to_numpy() for column in series])),
+        evaluate_series(PROGRAM, series),
+    )
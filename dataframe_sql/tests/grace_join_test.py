@@ -0,0 +1,99 @@
+"""
+Test cases for the grace hash join of joins under a memory limit
+"""
+import numpy as np
+from pandas import DataFrame
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.execution.grace_join import grace_hash_join
+from dataframe_sql.execution.spill import SPILL_DIR_VARIABLE
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.optimizer.memory import estimate_operator_memory, plan_memory
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import join_params, sort_frame
+
+
+def _orders_and_users():
+    random_state = np.random.RandomState(0)
+    orders = DataFrame(
+        {
+            "user_id": random_state.randint(0, 400, 3000).astype(np.float64),
+            "amount": random_state.rand(3000),
+        }
+    )
+    orders.loc[::40, "user_id"] = np.nan
+    users = DataFrame(
+        {"id": np.arange(0, 300), "name": random_state.choice(["a", "b", None], 300)}
+    )
+    return orders, users
+
+
+ORDERS, USERS = _orders_and_users()
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_temp_table(ORDERS, "orders")
+    register_temp_table(USERS, "users")
+    yield
+    remove_temp_table("orders")
+    remove_temp_table("users")
+
+
+def _chunks(frame: DataFrame, rows: int):
+    return (frame.iloc[start : start + rows] for start in range(0, len(frame), rows))
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "right", "outer"])
+def test_grace_hash_join(how, tmp_path, monkeypatch):
+    """
+    Test that joining every pair of partitions gives the rows of the join of the
+    whole inputs, with integer and float keys matching and null keys never
+    matching, and that the spill files are removed afterwards
+    :return:
+    """
+    monkeypatch.setenv(SPILL_DIR_VARIABLE, str(tmp_path))
+    orders, users = ORDERS, USERS
+
+    def merge(left: DataFrame, right: DataFrame) -> DataFrame:
+        return left.merge(right, how, left_on="user_id", right_on="id")
+
+    result = DataFrame().append(
+        list(
+            grace_hash_join(
+                _chunks(orders, 700),
+                _chunks(users, 100),
+                ["user_id"],
+                ["id"],
+                merge,
+                partitions=8,
+                buffer_rows=500,
+                how=how,
+            )
+        )
+    )
+    expected = orders.merge(users, how, left_on="user_id", right_on="id")
+    expected = expected[expected.user_id.notna() | expected.id.isna()]
+    tm.assert_frame_equal(
+        sort_frame(result.astype(expected.dtypes)), sort_frame(expected)
+    )
+    assert not list(tmp_path.iterdir())
+
+
+@join_params
+def test_join_under_memory_limit(sql_join: str, pandas_join: str):
+    """
+    Test that a join that would exceed the memory limit is planned as a grace join
+    with the result of a hash join
+    :return:
+    """
+    sql = f"select * from orders {sql_join} join users on orders.user_id = users.id"
+    expr = optimize_expression(parse_sql(sql))
+    memory_limit = int(estimate_operator_memory(expr.op().table)) - 1
+    join_op = plan_memory(expr, memory_limit).op().table.op()
+    assert (join_op.strategy, join_op.partitions) == ("grace", 2)
+    tm.assert_frame_equal(
+        query(sql, memory_limit=memory_limit), query(sql, join_strategy="hash")
+    )
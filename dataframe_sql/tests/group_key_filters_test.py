@@ -0,0 +1,124 @@
+"""
+Test cases for filtering aggregations by their group keys before grouping
+"""
+import ibis.expr.operations as ops
+import pandas.testing as tm
+import pytest
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+
+from dataframe_sql import query
+import dataframe_sql.execution.aggregation as aggregation
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def _min_temp_by_day(frame):
+    return frame.groupby("day").temp.min().rename("min_temp").reset_index()
+
+
+def test_having_on_group_keys_filters_rows():
+    """
+    Test that the conditions of a HAVING clause that only read group keys filter
+    the rows before they are grouped
+    :return:
+    """
+    sql = """select day, min(temp) as min_temp from forest_fires group by day
+        having min(temp) > 4 and day <> 'mon' and (day = 'sat' or day = 'sun')"""
+    op = parse_sql(sql).op()
+    assert isinstance(op, ops.Aggregation)
+    assert len(op.predicates) == 2
+    assert len(op.having) == 1
+    days = FOREST_FIRES.day
+    pandas_frame = _min_temp_by_day(
+        FOREST_FIRES[(days != "mon") & ((days == "sat") | (days == "sun"))]
+    )
+    pandas_frame = pandas_frame[pandas_frame.min_temp > 4].reset_index(drop=True)
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+def test_having_on_group_keys_and_count_star(optimize):
+    """
+    Test that COUNT(*) in a HAVING clause counts the rows of each group that the
+    conditions on group keys leave
+    :return:
+    """
+    sql = """select month, count(*) as c from forest_fires group by month
+        having month <> 'aug' and count(*) > 10"""
+    counts = (
+        FOREST_FIRES[FOREST_FIRES.month != "aug"]
+        .groupby("month")
+        .size()
+        .rename("c")
+        .reset_index()
+    )
+    pandas_frame = counts[counts.c > 10].reset_index(drop=True)
+    tm.assert_frame_equal(query(sql, optimize=optimize), pandas_frame)
+
+
+def test_having_on_ungrouped_column():
+    """
+    Test that a HAVING condition on a column that is not grouped is rejected
+    :return:
+    """
+    with pytest.raises(InvalidQueryException):
+        query(
+            """select day, min(temp) as min_temp from forest_fires group by day
+            having month = 'aug'"""
+        )
+
+
+def test_filter_of_grouped_subquery():
+    """
+    Test that the conditions on group keys of a filter of an aggregation are
+    applied before grouping and that the other conditions are applied after
+    :return:
+    """
+    sql = """select * from (select day, min(temp) as min_temp from forest_fires
+        group by day) grouped where day <> 'mon' and min_temp > 4"""
+    op = optimize_expression(parse_sql(sql)).op()
+    assert isinstance(op, ops.Selection)
+    assert len(op.predicates) == 1
+    assert len(op.table.op().predicates) == 1
+    pandas_frame = _min_temp_by_day(FOREST_FIRES[FOREST_FIRES.day != "mon"])
+    pandas_frame = pandas_frame[pandas_frame.min_temp > 4].reset_index(drop=True)
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+def test_global_having_skips_aggregates(monkeypatch):
+    """
+    Test that the aggregates of an aggregation without group keys are not
+    computed over the rows when its HAVING clause does not hold
+    :return:
+    """
+    aggregated_rows = []
+    execute_aggregation = aggregation.execute_aggregation_dataframe
+
+    def recording_execute(op, data, **kwargs):
+        aggregated_rows.append(len(data))
+        return execute_aggregation(op, data, **kwargs)
+
+    monkeypatch.setattr(aggregation, "execute_aggregation_dataframe", recording_execute)
+    my_frame = query(
+        """select max(temp) as max_temp, sum(area) as total_area from forest_fires
+        having min(temp) > 100 or max(temp) < 0"""
+    )
+    assert my_frame.empty
+    assert list(my_frame.columns) == ["max_temp", "total_area"]
+    assert aggregated_rows == [0]
+    my_frame = query(
+        "select max(temp) as max_temp from forest_fires having min(temp) > 0"
+    )
+    assert my_frame.max_temp.tolist() == [FOREST_FIRES.temp.max()]
@@ -0,0 +1,137 @@
+"""
+Test cases for IN lists of literal values and bound array parameters
+"""
+import numpy as np
+from pandas import DataFrame, Series
+import pandas.testing as tm
+import pytest
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.execution.in_list import IN_LIST_HASH_THRESHOLD, value_set_matches
+from dataframe_sql.operations import ValueSet
+from dataframe_sql.parsing.transformers import parse_number_list
+from dataframe_sql.tests.utils import (
+    DIGIMON_MON_LIST,
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+NULL_VALUES = DataFrame({"value": [1.0, 2.0, 3.0, np.nan, 5.0]})
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    register_temp_table(NULL_VALUES, "null_values")
+    yield
+    remove_env_tables()
+    remove_temp_table("null_values")
+
+
+def test_long_number_list():
+    """
+    Test an IN list of more numbers than are compared one by one
+    :return:
+    """
+    values = list(range(0, 2000, 7))
+    my_frame = query(
+        f"select * from forest_fires where rh in ({', '.join(map(str, values))})"
+    )
+    pandas_frame = FOREST_FIRES[FOREST_FIRES["RH"].isin(values)].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_long_string_not_in_list():
+    """
+    Test a NOT IN list of many strings
+    :return:
+    """
+    values = list(DIGIMON_MON_LIST["Digimon"].iloc[::3]) + ["not a digimon"]
+    sql_list = ", ".join(f"'{value}'" for value in values)
+    my_frame = query(
+        f"select * from digimon_mon_list where digimon not in ({sql_list})"
+    )
+    pandas_frame = DIGIMON_MON_LIST[
+        ~DIGIMON_MON_LIST["Digimon"].isin(values)
+    ].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_expression_list():
+    """
+    Test an IN list of more than two expressions that are not all literals
+    :return:
+    """
+    my_frame = query("select * from forest_fires where x in (1, y, 3 + 4)")
+    pandas_frame = FOREST_FIRES[
+        FOREST_FIRES["X"].isin([1, 7]) | (FOREST_FIRES["X"] == FOREST_FIRES["Y"])
+    ].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_array_parameter():
+    """
+    Test an IN list bound to an array parameter
+    :return:
+    """
+    values = np.arange(0, 100, 3)
+    my_frame = query(
+        "select * from forest_fires where rh in :values", params={"values": values}
+    )
+    pandas_frame = FOREST_FIRES[FOREST_FIRES["RH"].isin(values)].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_missing_array_parameter():
+    """
+    Test that every parameter of a query must be given a value
+    :return:
+    """
+    with pytest.raises(InvalidQueryException, match="parameter 'values'"):
+        query("select * from forest_fires where rh in :values")
+
+
+@pytest.mark.parametrize(
+    "condition, positions",
+    [
+        ("value in (1, 5, 7)", [0, 4]),
+        ("value not in (1, 5, 7)", [1, 2]),
+        ("value not in :values", []),
+    ],
+)
+def test_in_list_null_semantics(condition: str, positions: list):
+    """
+    Test that null values never match and that NOT IN excludes every row when the
+    list includes a null
+    :return:
+    """
+    my_frame = query(
+        f"select * from null_values where {condition}",
+        params={"values": [1.0, None]},
+    )
+    pandas_frame = NULL_VALUES.iloc[positions].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame, check_index_type=False)
+
+
+def test_value_set_matches():
+    """
+    Test that comparing value by value and probing the hash table agree
+    :return:
+    """
+    values = Series([1.0, 2.0, np.nan, 40.0, 41.0])
+    small_set = ValueSet(np.arange(IN_LIST_HASH_THRESHOLD) * 10)
+    large_set = ValueSet(np.arange(IN_LIST_HASH_THRESHOLD + 1) * 10)
+    expected = [False, False, False, True, False]
+    assert value_set_matches(values, small_set).tolist() == expected
+    assert value_set_matches(values, large_set).tolist() == expected
+
+
+def test_parse_number_list():
+    """
+    Test that lists of integers stay integers and other lists become floats
+    :return:
+    """
+    assert parse_number_list("(1, -2,+3)").dtype == np.int64
+    assert parse_number_list("( 1, 2.5, 1e3 )").tolist() == [1.0, 2.5, 1000.0]
@@ -0,0 +1,199 @@
+"""
+Test cases for the cost based join reordering
+"""
+import ibis
+import ibis.expr.operations as ops
+import numpy as np
+from pandas import DataFrame, merge
+import pandas.testing as tm
+import pytest
+from sql_to_ibis import query as ibis_query
+
+from dataframe_sql import query
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.optimizer.join_order import (
+    JoinEdge,
+    JoinGraph,
+    dynamic_programming_order,
+    greedy_order,
+    written_order,
+)
+from dataframe_sql.tests.utils import (
+    AVOCADO,
+    DIGIMON_MON_LIST,
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+    sort_frame,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+@pytest.fixture
+def star_graph():
+    """
+    Join graph of one large fact table and three dimension tables of very
+    different sizes, with the dimensions written first
+    :return:
+    """
+    client = ibis.pandas.connect(
+        {
+            "tiny": DataFrame({"tiny_key": np.arange(5)}),
+            "small": DataFrame({"small_key": np.arange(50)}),
+            "medium": DataFrame({"medium_key": np.arange(500)}),
+            "fact": DataFrame(
+                {
+                    "fact_tiny": np.arange(10000) % 5,
+                    "fact_small": np.arange(10000) % 50,
+                    "fact_medium": np.arange(10000) % 500,
+                }
+            ),
+        }
+    )
+    tiny, small, medium, fact = (
+        client.table(name) for name in ["tiny", "small", "medium", "fact"]
+    )
+    edges = [
+        JoinEdge(fact.fact_tiny == tiny.tiny_key, 3, 0),
+        JoinEdge(fact.fact_small == small.small_key, 3, 1),
+        JoinEdge(fact.fact_medium == medium.medium_key, 3, 2),
+    ]
+    return JoinGraph([tiny, small, medium, fact], edges)
+
+
+def test_three_table_join():
+    """
+    Test joining three tables with equality predicates in the where clause
+    :return:
+    """
+    my_frame = query(
+        """select temp, digimon, region from forest_fires, digimon_mon_list, avocado
+        where forest_fires.x = digimon_mon_list.memory
+        and avocado.avocado_id = forest_fires.rh"""
+    )
+    pandas_frame = merge(
+        merge(FOREST_FIRES, DIGIMON_MON_LIST, left_on="X", right_on="Memory"),
+        AVOCADO,
+        left_on="RH",
+        right_on="avocado_id",
+    )[["temp", "Digimon", "region"]].rename(columns={"Digimon": "digimon"})
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+def test_three_table_join_with_filter():
+    """
+    Test that predicates that are not join predicates still filter the result of
+    the reordered joins
+    :return:
+    """
+    my_frame = query(
+        """select * from avocado, forest_fires, digimon_mon_list
+        where forest_fires.x = digimon_mon_list.memory
+        and avocado.avocado_id = forest_fires.rh
+        and digimon_mon_list.stage = 'Champion' and avocado.averageprice > 1.2"""
+    )
+    pandas_frame = merge(
+        AVOCADO,
+        merge(FOREST_FIRES, DIGIMON_MON_LIST, left_on="X", right_on="Memory"),
+        left_on="avocado_id",
+        right_on="RH",
+    )
+    pandas_frame = pandas_frame[
+        (pandas_frame["Stage"] == "Champion") & (pandas_frame["AveragePrice"] > 1.2)
+    ]
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+def test_three_table_join_aggregation():
+    """
+    Test aggregating the result of reordered joins
+    :return:
+    """
+    my_frame = query(
+        """select stage, count(*) as fires, max(temp) as hottest
+        from forest_fires, digimon_mon_list, avocado
+        where forest_fires.x = digimon_mon_list.memory
+        and avocado.avocado_id = forest_fires.rh
+        group by stage"""
+    )
+    pandas_frame = (
+        merge(
+            merge(FOREST_FIRES, DIGIMON_MON_LIST, left_on="X", right_on="Memory"),
+            AVOCADO,
+            left_on="RH",
+            right_on="avocado_id",
+        )
+        .groupby("Stage")
+        .agg(fires=("temp", "count"), hottest=("temp", "max"))
+        .reset_index()
+        .rename(columns={"Stage": "stage"})
+    )
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+def test_reordered_joins_are_physical_joins():
+    """
+    Test that the optimizer replaces the cross joins with keyed joins
+    :return:
+    """
+    expr = optimize_expression(
+        ibis_query(
+            """select temp from forest_fires, digimon_mon_list, avocado
+            where forest_fires.x = digimon_mon_list.memory
+            and avocado.avocado_id = forest_fires.rh"""
+        )
+    )
+    join_ops = list(
+        ibis.expr.lineage.traverse(
+            lambda node: (
+                ibis.expr.lineage.proceed,
+                node.op() if isinstance(node.op(), ops.Join) else None,
+            ),
+            expr,
+        )
+    )
+    assert join_ops
+    assert all(isinstance(join_op, PhysicalJoin) for join_op in join_ops)
+    assert all(join_op.predicates for join_op in join_ops)
+
+
+def test_dynamic_programming_avoids_cross_products(star_graph):
+    """
+    Test that every join in the chosen plan has a join predicate and that the
+    fact table is never the build side
+    :return:
+    """
+    plan = dynamic_programming_order(star_graph)
+    assert plan.relations == 0b1111
+
+    def check(node):
+        if node.is_leaf:
+            return
+        assert star_graph.connected(node.left.relations, node.right.relations)
+        assert node.right.rows <= node.left.rows
+        assert not node.right.relations & (1 << 3)
+        check(node.left)
+        check(node.right)
+
+    check(plan)
+
+
+def test_join_order_costs(star_graph):
+    """
+    Test that the dynamic programming plan is at least as cheap as the greedy plan
+    and far cheaper than joining the tables in written order
+    :return:
+    """
+    optimal = dynamic_programming_order(star_graph)
+    greedy = greedy_order(star_graph)
+    written = written_order(star_graph)
+    assert greedy.relations == optimal.relations == written.relations
+    assert optimal.cost <= greedy.cost
+    assert optimal.cost * 4 < written.cost
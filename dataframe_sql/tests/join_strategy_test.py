@@ -0,0 +1,248 @@
+"""
+Test cases for the join algorithms and how they are chosen
+"""
+import ibis
+import numpy as np
+from pandas import DataFrame, Series
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.execution.join_algorithms import (
+    broadcast_join,
+    factorize_join_keys,
+    hash_join,
+    merge_join,
+    sort_merge_join,
+)
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.optimizer.join_strategy import choose_join_strategy
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    DIGIMON_MON_LIST,
+    DIGIMON_MOVE_LIST,
+    fix_naming_inconsistencies,
+    join_params,
+    register_env_tables,
+    remove_env_tables,
+    sort_frame,
+)
+
+join_strategies = pytest.mark.parametrize(
+    "join_strategy", ["hash", "sort_merge", "broadcast", "grace"]
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def pairs(indexers) -> list:
+    left_index, right_index = indexers
+    return sorted(zip(left_index.tolist(), right_index.tolist()))
+
+
+@join_strategies
+@join_params
+def test_join_strategies(sql_join: str, pandas_join: str, join_strategy: str):
+    """
+    Test every join type with every join algorithm
+    :return:
+    """
+    my_frame = query(
+        f"select * from digimon_mon_list {sql_join} join "
+        "digimon_move_list on "
+        "digimon_mon_list.attribute = digimon_move_list.attribute",
+        join_strategy=join_strategy,
+    )
+    pandas_frame = DIGIMON_MON_LIST.merge(
+        DIGIMON_MOVE_LIST, on="Attribute", how=pandas_join
+    )
+    pandas_frame = fix_naming_inconsistencies(pandas_frame)
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "right", "outer"])
+@pytest.mark.parametrize("build_side", ["left", "right"])
+def test_join_algorithms_agree(how: str, build_side: str):
+    """
+    Test that every algorithm pairs the same rows, whichever side is built on
+    :return:
+    """
+    random = np.random.RandomState(0)
+    left_key = Series(random.randint(0, 20, 200))
+    right_key = Series(random.randint(10, 30, 50))
+    left_codes, right_codes = factorize_join_keys([left_key], [right_key], sort=True)
+    expected = pairs(hash_join(left_codes, right_codes, how, "right"))
+    assert pairs(hash_join(left_codes, right_codes, how, build_side)) == expected
+    assert pairs(sort_merge_join(left_codes, right_codes, how)) == expected
+    partitions = list(
+        broadcast_join(left_codes, right_codes, how, build_side, partition_rows=16)
+    )
+    broadcast = (
+        np.concatenate([left_index for left_index, _ in partitions]),
+        np.concatenate([right_index for _, right_index in partitions]),
+    )
+    assert pairs(broadcast) == expected
+
+
+def test_null_keys_do_not_match():
+    """
+    Test that rows with null join keys are not paired with each other
+    :return:
+    """
+    left_codes, right_codes = factorize_join_keys(
+        [Series([1.0, np.nan, 2.0])], [Series([np.nan, 2.0])], sort=False
+    )
+    assert pairs(hash_join(left_codes, right_codes)) == [(2, 1)]
+    assert pairs(hash_join(left_codes, right_codes, "outer")) == [
+        (-1, 0),
+        (0, -1),
+        (1, -1),
+        (2, 1),
+    ]
+
+
+def test_multiple_join_keys():
+    """
+    Test joining on two keys at once
+    :return:
+    """
+    left_codes, right_codes = factorize_join_keys(
+        [Series([1, 1, 2]), Series(["a", "b", "a"])],
+        [Series([1, 2, 1]), Series(["b", "a", "a"])],
+        sort=True,
+    )
+    assert pairs(sort_merge_join(left_codes, right_codes)) == [
+        (0, 2),
+        (1, 0),
+        (2, 1),
+    ]
+
+
+def test_sort_merge_join_is_ordered_by_key():
+    """
+    Test that the sort merge join produces its result in key order
+    :return:
+    """
+    left_codes, right_codes = factorize_join_keys(
+        [Series([3, 1, 2, 1])], [Series([2, 1, 3])], sort=True
+    )
+    left_index, _ = sort_merge_join(left_codes, right_codes)
+    assert left_index.tolist() == [1, 3, 2, 0]
+
+
+def test_choose_join_strategy():
+    """
+    Test that sorted inputs are merged, tiny inputs are broadcast and other joins
+    are hash joins that build on the smaller input
+    :return:
+    """
+    client = ibis.pandas.connect(
+        {
+            "fact": DataFrame({"key": np.arange(200000) % 1000}),
+            "sorted_fact": DataFrame({"key": np.arange(200000)}),
+            "dimension": DataFrame({"key": np.arange(1000)}),
+            "shuffled": DataFrame({"key": np.random.RandomState(0).permutation(5000)}),
+        }
+    )
+    fact, sorted_fact, dimension, shuffled = (
+        client.table(name) for name in ["fact", "sorted_fact", "dimension", "shuffled"]
+    )
+    merge_join = sorted_fact.join(dimension, sorted_fact.key == dimension.key)
+    assert choose_join_strategy(merge_join.op()) == ("sort_merge", "right")
+    broadcast = dimension.join(fact, fact.key == dimension.key)
+    assert choose_join_strategy(broadcast.op()) == ("broadcast", "left")
+    hashed = shuffled.join(dimension, shuffled.key == dimension.key)
+    assert choose_join_strategy(hashed.op()) == ("hash", "right")
+
+
+def test_unknown_join_strategy():
+    """
+    Test that an unknown join strategy is rejected
+    :return:
+    """
+    with pytest.raises(ValueError, match="Unknown join strategy"):
+        query(
+            "select * from digimon_mon_list join digimon_move_list on "
+            "digimon_mon_list.attribute = digimon_move_list.attribute",
+            join_strategy="nested_loop",
+        )
+
+
+@pytest.mark.parametrize("join_strategy", [None, "hash", "sort_merge", "grace"])
+def test_null_keys_never_match(join_strategy):
+    """
+    Test that null join keys match nothing, whether the join algorithm is chosen
+    by the planner or requested
+    :return:
+    """
+    register_temp_table(
+        DataFrame({"lk": [1.0, np.nan, 2.0, np.nan], "a": range(4)}), "null_left"
+    )
+    register_temp_table(
+        DataFrame({"rk": [np.nan, 1.0, np.nan], "b": range(3)}), "null_right"
+    )
+    try:
+        sql = (
+            "select a, b from null_left join null_right on null_left.lk = null_right.rk"
+        )
+        assert isinstance(
+            optimize_expression(parse_sql(sql)).op().table.op(), PhysicalJoin
+        )
+        my_frame = query(sql, join_strategy=join_strategy)
+        tm.assert_frame_equal(my_frame, DataFrame({"a": [0], "b": [1]}))
+        my_frame = query(
+            "select a, b from null_left left join null_right "
+            "on null_left.lk = null_right.rk",
+            join_strategy=join_strategy,
+        )
+        tm.assert_frame_equal(
+            sort_frame(my_frame),
+            DataFrame({"a": [0, 1, 2, 3], "b": [1, np.nan, np.nan, np.nan]}),
+        )
+    finally:
+        remove_temp_table("null_left")
+        remove_temp_table("null_right")
+
+
+def test_broadcast_join_of_empty_probe_input():
+    """
+    Test that a broadcast join whose probe input is empty returns no rows
+    :return:
+    """
+    assert list(broadcast_join(np.array([], dtype=np.int64), np.arange(3))) == []
+    sql = """select * from (select * from digimon_mon_list where number < 0) mons
+        join digimon_move_list on mons.attribute = digimon_move_list.attribute"""
+    my_frame = query(sql, join_strategy="broadcast")
+    assert my_frame.empty
+    assert list(my_frame.columns) == list(query(sql, optimize=False).columns)
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "right", "outer"])
+def test_merge_join_follows_pandas_order(how: str):
+    """
+    Test that the hash join of the planner gives the rows in the order of
+    pandas.merge, and that null keys match nothing
+    :return:
+    """
+    left = DataFrame({"key": [2, 1, 2, 3, 1, 5], "left_row": range(6)})
+    right = DataFrame({"key": [1, 2, 4, 1, 6, 4, 2], "right_row": range(7)})
+    merged = left.merge(right, on="key", how=how)
+    expected = list(
+        zip(
+            merged.left_row.fillna(-1).astype(int).tolist(),
+            merged.right_row.fillna(-1).astype(int).tolist(),
+        )
+    )
+    left_codes, right_codes = factorize_join_keys(
+        [left.key], [right.key], sort=how == "outer"
+    )
+    left_index, right_index = merge_join(left_codes, right_codes, how)
+    assert list(zip(left_index.tolist(), right_index.tolist())) == expected
+    left_index, right_index = merge_join(np.array([-1, 0]), np.array([0, -1]), "inner")
+    assert list(zip(left_index.tolist(), right_index.tolist())) == [(1, 0)]
@@ -0,0 +1,129 @@
+"""
+Test cases for gathering only the columns that are read above filters and joins
+"""
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+import dataframe_sql.execution.late_materialization as late_materialization
+from dataframe_sql.operations import PhysicalJoin
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+READINGS = pd.DataFrame(
+    {
+        "station_id": [1, 2, 3, 1, 2, 4],
+        "reading": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5],
+        "unused": list("abcdef"),
+    }
+)
+STATIONS = pd.DataFrame(
+    {"id": [1, 2, 3], "station": ["north", "south", "east"], "height": [5, 6, 7]}
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    register_temp_table(READINGS, "readings")
+    register_temp_table(STATIONS, "stations")
+    yield
+    remove_env_tables()
+    remove_temp_table("readings")
+    remove_temp_table("stations")
+
+
+@pytest.fixture
+def gathered_columns(monkeypatch):
+    gathered = []
+    gather_rows = late_materialization.gather_rows
+
+    def recording_gather_rows(data, positions, columns=None):
+        gathered.append(list(columns))
+        return gather_rows(data, positions, columns)
+
+    monkeypatch.setattr(late_materialization, "gather_rows", recording_gather_rows)
+    return gathered
+
+
+def test_filtered_projection(gathered_columns):
+    """
+    Test that a filtered projection gathers only the columns that it reads, at
+    the rows that pass the filter
+    :return:
+    """
+    my_frame = query(
+        "select month, temp * wind + rain as spread from forest_fires where area > 5"
+    )
+    assert gathered_columns == [["month", "temp", "wind", "rain"]]
+    pandas_frame = FOREST_FIRES[FOREST_FIRES.area > 5].reset_index(drop=True)
+    pandas_frame = pd.DataFrame(
+        {
+            "month": pandas_frame.month,
+            "spread": pandas_frame.temp * pandas_frame.wind + pandas_frame.rain,
+        }
+    )
+    tm.assert_frame_equal(my_frame, pandas_frame)
+
+
+def test_filtered_aggregation(gathered_columns):
+    """
+    Test that a filtered aggregation gathers only its keys and the columns that
+    it aggregates
+    :return:
+    """
+    my_frame = query(
+        """select day, sum(area) as total_area, count(*) as fires from forest_fires
+        where temp > 20 group by day"""
+    )
+    assert gathered_columns == [["day", "area"]]
+    grouped = FOREST_FIRES[FOREST_FIRES.temp > 20].groupby("day")
+    pandas_frame = pd.DataFrame(
+        {"total_area": grouped.area.sum(), "fires": grouped.size()}
+    ).reset_index()
+    tm.assert_frame_equal(my_frame, pandas_frame)
+
+
+def test_select_all_gathers_every_column(gathered_columns):
+    """
+    Test that a filter that selects every column is left to the pandas backend
+    :return:
+    """
+    my_frame = query("select * from forest_fires where temp > 20")
+    assert not gathered_columns
+    tm.assert_frame_equal(
+        my_frame, FOREST_FIRES[FOREST_FIRES.temp > 20].reset_index(drop=True)
+    )
+
+
+def test_join_gathers_read_columns():
+    """
+    Test that a join gathers only the columns that are read above it, and keeps
+    its number of rows when it gathers none
+    :return:
+    """
+    sql = """select readings.reading, stations.station from readings
+        join stations on readings.station_id = stations.id"""
+    op = optimize_expression(parse_sql(sql), "hash").op()
+    assert isinstance(op.table.op(), PhysicalJoin)
+    assert op.table.op().columns == ("reading", "station")
+    pandas_frame = READINGS.merge(STATIONS, left_on="station_id", right_on="id")
+    pandas_frame = pandas_frame.sort_values("reading").reset_index(drop=True)
+    for join_strategy in ["hash", "sort_merge", "grace"]:
+        my_frame = query(sql, join_strategy=join_strategy)
+        tm.assert_frame_equal(
+            my_frame.sort_values("reading").reset_index(drop=True),
+            pandas_frame[["reading", "station"]],
+        )
+    my_frame = query(
+        """select count(*) as matches from readings
+        join stations on readings.station_id = stations.id""",
+        join_strategy="hash",
+    )
+    assert my_frame.matches.tolist() == [len(pandas_frame)]
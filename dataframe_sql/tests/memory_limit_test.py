@@ -0,0 +1,135 @@
+"""
+Test cases for the memory limit of queries
+"""
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import MemoryLimitExceeded, get_memory_limit, query, set_memory_limit
+from dataframe_sql.execution.stats import format_memory_size, parse_memory_size
+from dataframe_sql.optimizer import memory
+from dataframe_sql.optimizer.memory import estimate_operator_memory
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+SORT_QUERY = "select * from forest_fires order by temp"
+JOIN_QUERY = (
+    "select * from digimon_mon_list inner join digimon_move_list "
+    "on digimon_mon_list.attribute = digimon_move_list.attribute"
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+@pytest.fixture
+def session_memory_limit():
+    yield set_memory_limit
+    set_memory_limit(None)
+
+
+@pytest.mark.parametrize(
+    "size,expected",
+    [
+        (1000, 1000),
+        ("4GB", 4 * 10 ** 9),
+        ("512MiB", 512 * 2 ** 20),
+        ("1.5 kib", 1536),
+        ("2048", 2048),
+    ],
+)
+def test_parse_memory_size(size, expected):
+    """
+    Test the units that memory sizes can be given in
+    :return:
+    """
+    assert parse_memory_size(size) == expected
+
+
+@pytest.mark.parametrize("size", ["4 parsecs", "GB", "-1GB", 0])
+def test_invalid_memory_size(size):
+    """
+    Test that memory sizes without a positive number of known units are rejected
+    :return:
+    """
+    with pytest.raises(ValueError):
+        parse_memory_size(size)
+
+
+def test_query_within_limit():
+    """
+    Test that a query that fits in its memory limit gives the usual result
+    :return:
+    """
+    tm.assert_frame_equal(query(SORT_QUERY, memory_limit="100MB"), query(SORT_QUERY))
+
+
+@pytest.mark.parametrize("sql", [SORT_QUERY, JOIN_QUERY])
+def test_estimate_exceeds_limit(sql):
+    """
+    Test that a query whose sort or join is estimated to exceed the limit fails
+    before it runs
+    :return:
+    """
+    received = []
+    with pytest.raises(MemoryLimitExceeded, match="is estimated to need"):
+        query(sql, memory_limit="10KB", stats_callback=received.append)
+    assert not received
+
+
+def test_result_exceeds_limit():
+    """
+    Test that a query stops when an operator produces more than the limit, even
+    though no estimate exceeded it
+    :return:
+    """
+    with pytest.raises(MemoryLimitExceeded, match="The result of Selection takes"):
+        query("select * from forest_fires where temp > 1", memory_limit="20KB")
+
+
+def test_session_memory_limit(session_memory_limit):
+    """
+    Test that the session memory limit applies to queries without their own
+    :return:
+    """
+    session_memory_limit("10KB")
+    assert get_memory_limit() == 10 ** 4
+    with pytest.raises(MemoryLimitExceeded):
+        query(SORT_QUERY)
+    assert len(query(SORT_QUERY, memory_limit="1GB")) == len(FOREST_FIRES)
+
+
+def test_out_of_core_planner(monkeypatch):
+    """
+    Test that an operator over the limit is handed to the out-of-core planners
+    before the query fails
+    :return:
+    """
+    planned = []
+
+    def planner(expr, memory_limit):
+        planned.append((type(expr.op()).__name__, memory_limit))
+        return expr.op().table.sort_by("temp")
+
+    monkeypatch.setattr(memory, "OUT_OF_CORE_PLANNERS", [planner])
+    my_frame = query(SORT_QUERY, memory_limit=114_000)
+    assert planned[0] == ("Selection", 114_000)
+    tm.assert_frame_equal(my_frame, query(SORT_QUERY))
+
+
+def test_estimate_of_sort():
+    """
+    Test that a sort needs at least room for its sorted copy
+    :return:
+    """
+    estimate = estimate_operator_memory(parse_sql(SORT_QUERY))
+    sorted_frame = query(SORT_QUERY)
+    assert estimate >= sorted_frame.memory_usage(index=True, deep=True).sum()
+    assert format_memory_size(2 ** 30 * 1.5) == "1.5GiB"
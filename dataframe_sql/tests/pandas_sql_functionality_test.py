@@ -298,6 +298,25 @@ def test_agg_w_groupby():
     tm.assert_frame_equal(pandas_frame, my_frame)
 
 
+def test_agg_w_groupby_order_by_group_key():
+    """
+    Test sorting an aggregation by its group keys
+    :return:
+    """
+    my_frame = query(
+        """select day, month, max(temp) as max_temp from forest_fires
+        group by day, month order by month desc, day"""
+    )
+    pandas_frame = (
+        FOREST_FIRES.groupby(["day", "month"])
+        .aggregate(max_temp=("temp", np.max))
+        .reset_index()
+        .sort_values(["month", "day"], ascending=[False, True])
+        .reset_index(drop=True)
+    )
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
 def test_where_clause():
     """
     Test where clause
@@ -358,7 +377,6 @@ def test_limit():
     tm.assert_frame_equal(pandas_frame, my_frame)
 
 
-@ibis_not_implemented
 def test_having_multiple_conditions():
     """
     Test having clause
@@ -381,10 +399,6 @@ def test_having_multiple_conditions():
     tm.assert_frame_equal(pandas_frame, my_frame)
 
 
-@pytest.mark.xfail(
-    raises=ValueError,
-    reason="Still can't do having without a group by in ibis",
-)
 def test_having_one_condition():
     """
     Test having clause
@@ -0,0 +1,160 @@
+"""
+Test cases for pushing partial aggregations below UNION ALL and joins
+"""
+import ibis.expr.operations as ops
+from pandas import concat, merge
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    DIGIMON_MON_LIST,
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+    sort_frame,
+)
+
+UNION_QUERY = """select month, sum(temp) as temp, count(*) as fires,
+    count(rain) as rainy, min(wind) as calmest, max(rh) as rh, avg(area) as area
+    from (select month, temp, rain, wind, rh, area from forest_fires
+        union all
+        select month, temp, rain, wind, rh, area from forest_fires where temp > 20)
+        as fires
+    group by month"""
+
+JOIN_QUERY = """select stage, count(*) as fires, max(temp) as hottest,
+    sum(area) as area, avg(wind) as wind
+    from forest_fires, digimon_mon_list
+    where forest_fires.x = digimon_mon_list.memory
+    group by stage"""
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def _aggregations(expr) -> list:
+    """
+    Return the aggregations in the expression from the top down
+    :param expr:
+    :return:
+    """
+    found = []
+    pending = [expr]
+    while pending:
+        op = pending.pop(0).op()
+        if isinstance(op, ops.Aggregation):
+            found.append(op)
+        pending.extend(arg for arg in op.args if isinstance(arg, type(expr)))
+    return found
+
+
+def _fires_aggregation(frame):
+    return (
+        frame.groupby("month")
+        .agg(
+            temp=("temp", "sum"),
+            fires=("temp", "size"),
+            rainy=("rain", "count"),
+            calmest=("wind", "min"),
+            rh=("RH", "max"),
+            area=("area", "mean"),
+        )
+        .reset_index()
+    )
+
+
+def test_aggregation_below_union_all():
+    """
+    Test that every branch of a UNION ALL is aggregated before the union and that
+    the partial aggregates combine into the aggregates of the union
+    :return:
+    """
+    expr = optimize_expression(parse_sql(UNION_QUERY))
+    combined, *partials = _aggregations(expr)
+    assert isinstance(combined.table.op(), ops.Union)
+    assert len(partials) == 2
+    pandas_frame = _fires_aggregation(
+        concat([FOREST_FIRES, FOREST_FIRES[FOREST_FIRES.temp > 20]])
+    )
+    tm.assert_frame_equal(query(UNION_QUERY), pandas_frame)
+
+
+def test_ungrouped_aggregation_below_union_all():
+    """
+    Test combining partial aggregates of an aggregation without group keys
+    :return:
+    """
+    my_frame = query(
+        """select count(*) as fires, avg(temp) as temp from
+        (select temp from forest_fires union all
+        select temp from forest_fires where temp > 20
+        union all select temp from forest_fires where temp > 25) as fires"""
+    )
+    temp = concat(
+        [
+            FOREST_FIRES.temp,
+            FOREST_FIRES.temp[FOREST_FIRES.temp > 20],
+            FOREST_FIRES.temp[FOREST_FIRES.temp > 25],
+        ]
+    )
+    assert my_frame.fires[0] == len(temp)
+    assert my_frame.temp[0] == pytest.approx(temp.mean())
+
+
+def test_having_not_pushed_below_union_all():
+    """
+    Test that aggregations with a HAVING clause keep aggregating the union
+    :return:
+    """
+    sql = """select month, max(temp) as temp from
+        (select month, temp from forest_fires union all
+        select month, temp from forest_fires) as fires
+        group by month having max(temp) > 25"""
+    expr = optimize_expression(parse_sql(sql))
+    assert len(_aggregations(expr)) == 1
+
+
+def test_aggregation_below_join():
+    """
+    Test that the table that the aggregates read is aggregated by its join key
+    before the join and that the partial aggregates combine into the aggregates
+    of the join
+    :return:
+    """
+    expr = optimize_expression(parse_sql(JOIN_QUERY))
+    _, partial = _aggregations(expr)
+    assert [by_expr.get_name() for by_expr in partial.by] == ["X"]
+    pandas_frame = (
+        merge(FOREST_FIRES, DIGIMON_MON_LIST, left_on="X", right_on="Memory")
+        .groupby("Stage")
+        .agg(
+            fires=("temp", "size"),
+            hottest=("temp", "max"),
+            area=("area", "sum"),
+            wind=("wind", "mean"),
+        )
+        .reset_index()
+        .rename(columns={"Stage": "stage"})
+    )
+    tm.assert_frame_equal(sort_frame(query(JOIN_QUERY)), sort_frame(pandas_frame))
+
+
+def test_aggregation_not_pushed_below_join_without_reduction():
+    """
+    Test that a table is not aggregated before a join when its join keys and
+    group keys barely reduce its rows
+    :return:
+    """
+    sql = """select stage, x, y, month, day, max(temp) as hottest
+        from forest_fires, digimon_mon_list
+        where forest_fires.x = digimon_mon_list.memory
+        group by stage, x, y, month, day"""
+    expr = optimize_expression(parse_sql(sql))
+    assert len(_aggregations(expr)) == 1
@@ -0,0 +1,120 @@
+"""
+Test cases for the partitioned hash aggregation of GROUP BY under a memory limit
+"""
+import ibis.expr.operations as ops
+import numpy as np
+from pandas import DataFrame
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.benchmarks.data import forest_fires
+from dataframe_sql.execution.partitioned_aggregation import hash_aggregate
+from dataframe_sql.execution.spill import SPILL_DIR_VARIABLE, SpilledFrame
+from dataframe_sql.operations import PartitionedAggregation
+from dataframe_sql.optimizer.memory import estimate_operator_memory, plan_memory
+from dataframe_sql.parsing.parser import parse_sql
+
+LARGE_FOREST_FIRES = forest_fires(5)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_temp_table(LARGE_FOREST_FIRES, "large_forest_fires")
+    yield
+    remove_temp_table("large_forest_fires")
+
+
+def _user_events(rows: int, users: int) -> DataFrame:
+    random_state = np.random.RandomState(0)
+    return DataFrame(
+        {
+            "user_id": random_state.randint(0, users, rows),
+            "kind": random_state.choice(["view", "click"], rows),
+            "amount": random_state.rand(rows),
+        }
+    )
+
+
+def _sum_by_user(frame: DataFrame) -> DataFrame:
+    return frame.groupby(["user_id", "kind"]).amount.sum().reset_index()
+
+
+def _hash_aggregate(frame: DataFrame, partitions: int, partition_rows: int):
+    chunks = (frame.iloc[start : start + 500] for start in range(0, len(frame), 500))
+    pieces = hash_aggregate(
+        chunks, ["user_id", "kind"], _sum_by_user, partitions, partition_rows
+    )
+    return (
+        DataFrame()
+        .append(list(pieces))
+        .sort_values(["user_id", "kind"], ignore_index=True)
+    )
+
+
+@pytest.mark.parametrize(
+    "users,partitions,partition_rows", [(2000, 8, 600), (2000, 1, 10_000), (3, 4, 100)]
+)
+def test_hash_aggregate(users, partitions, partition_rows):
+    """
+    Test that aggregating the partitions gives the groups of the in-memory
+    aggregation, including when groups are too large to split
+    :return:
+    """
+    frame = _user_events(5000, users)
+    tm.assert_frame_equal(
+        _hash_aggregate(frame, partitions, partition_rows), _sum_by_user(frame)
+    )
+
+
+def test_partitions_spilled_and_removed(tmp_path, monkeypatch):
+    """
+    Test that partitions are spilled while too many rows are buffered and that
+    the spill files are removed afterwards
+    :return:
+    """
+    monkeypatch.setenv(SPILL_DIR_VARIABLE, str(tmp_path))
+    spilled_frames = []
+    original_init = SpilledFrame.__init__
+
+    def record_spill(self, directory, frame, block_rows):
+        original_init(self, directory, frame, block_rows)
+        spilled_frames.append(len(frame))
+
+    monkeypatch.setattr(SpilledFrame, "__init__", record_spill)
+    frame = _user_events(5000, 2000)
+    tm.assert_frame_equal(_hash_aggregate(frame, 16, 600), _sum_by_user(frame))
+    # Every partition fits once the input is read, so no row is spilled twice
+    assert spilled_frames and sum(spilled_frames) <= len(frame)
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "select day, month, min(temp), max(temp) from large_forest_fires "
+        "group by day, month",
+        "select X, Y, month, sum(wind), avg(temp), count(area), count(*) "
+        "from large_forest_fires group by X, Y, month",
+        "select month, sum(rain) as total_rain from large_forest_fires "
+        "where temp > 15 group by month order by total_rain desc",
+        "select day, month, sum(area) as area from large_forest_fires "
+        "group by day, month having max(temp) > 25",
+    ],
+)
+def test_group_by_under_memory_limit(sql):
+    """
+    Test that an aggregation that would exceed the memory limit is partitioned
+    with the same result
+    :return:
+    """
+    expr = parse_sql(sql)
+    aggregation = expr
+    while not isinstance(aggregation.op(), ops.Aggregation):
+        aggregation = aggregation.op().table
+    memory_limit = int(estimate_operator_memory(aggregation)) - 1
+    planned = plan_memory(expr, memory_limit)
+    assert isinstance(planned.op(), PartitionedAggregation) or isinstance(
+        planned.op().table.op(), PartitionedAggregation
+    )
+    tm.assert_frame_equal(query(sql, memory_limit=memory_limit), query(sql))
@@ -0,0 +1,101 @@
+"""
+Test cases for the execution statistics of queries
+"""
+import tracemalloc
+
+from pandas import DataFrame
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import QueryStats, query
+from dataframe_sql.execution.stats import estimate_size
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+AGGREGATION_QUERY = (
+    "select month, sum(temp) as temp from forest_fires where wind > 3 group by month"
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def test_returned_stats():
+    """
+    Test that the statistics are returned with the same result as without them
+    :return:
+    """
+    my_frame, stats = query(AGGREGATION_QUERY, return_stats=True)
+    tm.assert_frame_equal(my_frame, query(AGGREGATION_QUERY))
+    assert isinstance(stats, QueryStats)
+    assert stats.sql == AGGREGATION_QUERY
+    assert stats.elapsed > 0
+    assert stats.result_rows == len(my_frame)
+    assert stats.peak_traced_memory is None
+
+
+def test_operator_sizes():
+    """
+    Test that the result of every operator is accounted for, except the tables
+    :return:
+    """
+    _, stats = query(AGGREGATION_QUERY, return_stats=True)
+    operators = [operator.operator for operator in stats.operators]
+    assert "PandasTable" not in operators
+    assert operators[-1] == "Aggregation"
+    filter_mask = stats.operators[operators.index("Greater")]
+    assert filter_mask.rows == len(FOREST_FIRES)
+    assert filter_mask.size >= len(FOREST_FIRES)
+    assert stats.peak_intermediate_size == max(
+        operator.size for operator in stats.operators
+    )
+    assert stats.total_intermediate_size >= stats.peak_intermediate_size
+
+
+def test_stats_callback():
+    """
+    Test that the statistics can be received by a callback instead
+    :return:
+    """
+    received = []
+    my_frame = query(
+        "select * from forest_fires", stats_callback=received.append, trace_memory=True
+    )
+    assert isinstance(my_frame, DataFrame)
+    [stats] = received
+    assert stats.result_rows == len(FOREST_FIRES)
+    assert stats.peak_traced_memory > 0
+    assert not tracemalloc.is_tracing()
+    assert stats.to_dict()["result_bytes"] == stats.result_size
+
+
+def test_no_stats_collected_by_default():
+    """
+    Test that queries outside of a collection record nothing
+    :return:
+    """
+    received = []
+    query(AGGREGATION_QUERY, stats_callback=received.append)
+    query(AGGREGATION_QUERY)
+    _, stats = query(AGGREGATION_QUERY, return_stats=True)
+    assert len(received) == 1
+    assert len(received[0].operators) == len(stats.operators)
+
+
+def test_estimate_size_counts_strings():
+    """
+    Test that the strings of object columns are included in the size of a frame
+    :return:
+    """
+    numbers = DataFrame({"value": range(1000)})
+    strings = DataFrame({"value": [f"string number {i}" for i in range(1000)]})
+    assert estimate_size(numbers) == numbers.memory_usage(index=True).sum()
+    assert estimate_size(strings) > strings.memory_usage(index=True).sum() + 40000
+    assert estimate_size(strings["value"]) > 40000
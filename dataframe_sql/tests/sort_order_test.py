@@ -0,0 +1,146 @@
+"""
+Test cases for using the order of tables that are registered as sorted
+"""
+import ibis.expr.operations as ops
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.operations import RunAggregation, SortedRangeScan
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.parsing.parser import parse_sql
+
+SORTED_FRAME = pd.DataFrame(
+    {
+        "key": np.repeat(np.arange(20), 5),
+        "sub_key": np.tile(np.arange(5), 20),
+        "value": np.arange(100, dtype=np.float64) % 7,
+        "label": ["a", "b", "c", "d"] * 25,
+    }
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_temp_table(SORTED_FRAME, "sorted_frame", sorted_by=["key", "sub_key"])
+    yield
+    remove_temp_table("sorted_frame")
+
+
+def test_unsorted_table_rejected():
+    """
+    Test that a table that is not in the order that it is registered with is
+    rejected unless it is not verified
+    :return:
+    """
+    shuffled = SORTED_FRAME.iloc[::-1]
+    with pytest.raises(ValueError):
+        register_temp_table(shuffled, "shuffled", sorted_by=["key"])
+    with pytest.raises(ValueError):
+        register_temp_table(SORTED_FRAME, "shuffled", sorted_by=["missing"])
+    register_temp_table(shuffled, "shuffled", sorted_by=["key"], verify_sorted=False)
+    remove_temp_table("shuffled")
+
+
+def test_group_by_sort_prefix_uses_runs():
+    """
+    Test that grouping by a prefix of the sort columns aggregates runs of equal
+    keys
+    :return:
+    """
+    sql = """select key, sum(value) as total, min(value) as lowest,
+        max(sub_key) as highest, avg(value) as mean_value, count(*) as rows_
+        from sorted_frame where sub_key > 0 group by key"""
+    assert isinstance(optimize_expression(parse_sql(sql)).op(), RunAggregation)
+    pandas_frame = (
+        SORTED_FRAME[SORTED_FRAME.sub_key > 0]
+        .groupby("key")
+        .agg(
+            total=("value", "sum"),
+            lowest=("value", "min"),
+            highest=("sub_key", "max"),
+            mean_value=("value", "mean"),
+            rows_=("value", "size"),
+        )
+        .reset_index()
+    )
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+def test_group_by_non_prefix_uses_hashing():
+    """
+    Test that grouping by columns that are not a prefix of the sort columns is
+    left to the hash aggregation
+    :return:
+    """
+    sql = "select sub_key, sum(value) as total from sorted_frame group by sub_key"
+    assert isinstance(optimize_expression(parse_sql(sql)).op(), ops.Aggregation)
+    pandas_frame = (
+        SORTED_FRAME.groupby("sub_key").value.sum().rename("total").reset_index()
+    )
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+def test_group_by_permuted_sort_prefix_uses_hashing():
+    """
+    Test that grouping by the sort columns in another order is left to the hash
+    aggregation, whose groups are in the order of the group keys
+    :return:
+    """
+    sql = """select sub_key, key, sum(value) as total from sorted_frame
+        group by sub_key, key"""
+    assert isinstance(optimize_expression(parse_sql(sql)).op(), ops.Aggregation)
+    pandas_frame = (
+        SORTED_FRAME.groupby(["sub_key", "key"])
+        .value.sum()
+        .rename("total")
+        .reset_index()
+    )
+    tm.assert_frame_equal(query(sql), pandas_frame)
+
+
+def test_order_by_sort_prefix_dropped():
+    """
+    Test that ordering a sorted table by a prefix of its sort columns does not
+    sort it again, and that ordering it otherwise does
+    :return:
+    """
+    expr = optimize_expression(
+        parse_sql("select key, sub_key from sorted_frame order by key, sub_key")
+    )
+    assert not expr.op().sort_keys
+    tm.assert_frame_equal(
+        query("select key, value from sorted_frame order by key"),
+        SORTED_FRAME[["key", "value"]],
+    )
+    tm.assert_frame_equal(
+        query("select key, value from sorted_frame order by value, key"),
+        SORTED_FRAME[["key", "value"]]
+        .sort_values(["value", "key"])
+        .reset_index(drop=True),
+    )
+
+
+def test_range_filter_uses_binary_search():
+    """
+    Test that comparisons of the first sort column with literals select a range
+    of rows, and that the other conditions still filter it
+    :return:
+    """
+    sql = """select * from sorted_frame
+        where key >= 3 and 8 > key and key > 2 and label <> 'a'"""
+    op = optimize_expression(parse_sql(sql)).op()
+    assert isinstance(op, ops.Selection)
+    assert isinstance(op.table.op(), SortedRangeScan)
+    assert len(op.predicates) == 1
+    keys = SORTED_FRAME.key
+    pandas_frame = SORTED_FRAME[
+        (keys >= 3) & (keys < 8) & (SORTED_FRAME.label != "a")
+    ].reset_index(drop=True)
+    tm.assert_frame_equal(query(sql), pandas_frame)
+    tm.assert_frame_equal(
+        query("select * from sorted_frame where key between 30 and 40"),
+        SORTED_FRAME.iloc[:0],
+    )
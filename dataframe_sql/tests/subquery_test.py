@@ -0,0 +1,201 @@
+"""
+Test cases for IN, NOT IN, EXISTS and NOT EXISTS subqueries
+"""
+import numpy as np
+from pandas import DataFrame
+import pandas.testing as tm
+import pytest
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.execution.join_algorithms import factorize_join_keys, semi_join
+from dataframe_sql.tests.utils import (
+    DIGIMON_MON_LIST,
+    DIGIMON_MOVE_LIST,
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+    sort_frame,
+)
+
+NULL_VALUES = DataFrame(
+    {"value": [1.0, 2.0, 3.0, np.nan, 5.0], "value_group": [1, 1, 2, 2, 3]}
+)
+NULL_SUBQUERY_VALUES = DataFrame(
+    {"subquery_value": [1.0, 3.0, np.nan, 7.0], "subquery_group": [1, 2, 2, 9]}
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    register_temp_table(NULL_VALUES, "null_values")
+    register_temp_table(NULL_SUBQUERY_VALUES, "null_subquery_values")
+    yield
+    remove_env_tables()
+    remove_temp_table("null_values")
+    remove_temp_table("null_subquery_values")
+
+
+def test_in_subquery():
+    """
+    Test filtering on the values selected by a subquery
+    :return:
+    """
+    my_frame = query(
+        """select * from digimon_mon_list where attribute in
+        (select attribute from digimon_move_list where power > 100)"""
+    )
+    strong_attributes = DIGIMON_MOVE_LIST.loc[
+        DIGIMON_MOVE_LIST["Power"] > 100, "Attribute"
+    ]
+    pandas_frame = DIGIMON_MON_LIST[
+        DIGIMON_MON_LIST["Attribute"].isin(strong_attributes)
+    ].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_not_in_subquery():
+    """
+    Test filtering out the values selected by a subquery
+    :return:
+    """
+    my_frame = query(
+        """select * from forest_fires where x not in
+        (select memory from digimon_mon_list where stage = 'Rookie')"""
+    )
+    rookie_memory = DIGIMON_MON_LIST.loc[
+        DIGIMON_MON_LIST["Stage"] == "Rookie", "Memory"
+    ]
+    pandas_frame = FOREST_FIRES[~FOREST_FIRES["X"].isin(rookie_memory)].reset_index(
+        drop=True
+    )
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_correlated_exists():
+    """
+    Test filtering on the existence of matching rows in a correlated subquery
+    :return:
+    """
+    my_frame = query(
+        """select * from forest_fires where exists
+        (select * from digimon_mon_list
+        where digimon_mon_list.memory = forest_fires.x and stage = 'Rookie')"""
+    )
+    rookie_memory = DIGIMON_MON_LIST.loc[
+        DIGIMON_MON_LIST["Stage"] == "Rookie", "Memory"
+    ]
+    pandas_frame = FOREST_FIRES[FOREST_FIRES["X"].isin(rookie_memory)].reset_index(
+        drop=True
+    )
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+def test_correlated_not_exists():
+    """
+    Test filtering on the absence of matching rows in a correlated subquery that
+    references the enclosing query through an alias
+    :return:
+    """
+    my_frame = query(
+        """select digimon, stage from digimon_mon_list mon where not exists
+        (select * from digimon_move_list
+        where digimon_move_list.attribute = mon.attribute and type = 'Fixed')"""
+    )
+    fixed_attributes = DIGIMON_MOVE_LIST.loc[
+        DIGIMON_MOVE_LIST["Type"] == "Fixed", "Attribute"
+    ]
+    pandas_frame = (
+        DIGIMON_MON_LIST[~DIGIMON_MON_LIST["Attribute"].isin(fixed_attributes)][
+            ["Digimon", "Stage"]
+        ]
+        .rename(columns={"Digimon": "digimon", "Stage": "stage"})
+        .reset_index(drop=True)
+    )
+    tm.assert_frame_equal(pandas_frame, my_frame)
+
+
+@pytest.mark.parametrize(
+    "condition, positions",
+    [
+        ("value in (select subquery_value from null_subquery_values)", [0, 2]),
+        ("value not in (select subquery_value from null_subquery_values)", []),
+        (
+            """value not in (select subquery_value from null_subquery_values
+            where subquery_value > 2)""",
+            [0, 1, 4],
+        ),
+        (
+            """value not in (select subquery_value from null_subquery_values
+            where subquery_value > 100)""",
+            [0, 1, 2, 3, 4],
+        ),
+        (
+            """value in (select subquery_value from null_subquery_values
+            where subquery_group = value_group)""",
+            [0, 2],
+        ),
+        (
+            """value not in (select subquery_value from null_subquery_values
+            where subquery_group = null_values.value_group)""",
+            [1, 4],
+        ),
+        (
+            """not exists (select * from null_subquery_values
+            where subquery_group = value_group and subquery_value > 2)""",
+            [0, 1, 4],
+        ),
+    ],
+)
+def test_subquery_null_semantics(condition: str, positions: list):
+    """
+    Test that null values never match and that NOT IN excludes every row when the
+    subquery values that it is compared with include a null
+    :return:
+    """
+    my_frame = query(f"select * from null_values where {condition}")
+    pandas_frame = NULL_VALUES.iloc[positions].reset_index(drop=True)
+    tm.assert_frame_equal(pandas_frame, my_frame, check_index_type=False)
+
+
+def test_subquery_with_reordered_joins():
+    """
+    Test that the optimizer does not rewrite the tables of a subquery that are also
+    tables of the enclosing query
+    :return:
+    """
+    my_frame = query(
+        """select value, subquery_value from null_values, null_subquery_values
+        where null_values.value_group = null_subquery_values.subquery_group
+        and value > 1 and (value_group in
+        (select value_group from null_values where value < 2)
+        or subquery_value > 5)"""
+    )
+    pandas_frame = DataFrame({"value": [2.0], "subquery_value": [1.0]})
+    tm.assert_frame_equal(sort_frame(pandas_frame), sort_frame(my_frame))
+
+
+def test_unsupported_correlation():
+    """
+    Test that a subquery may only be correlated through equality predicates
+    :return:
+    """
+    with pytest.raises(InvalidQueryException, match="equality predicates"):
+        query(
+            """select * from null_values where exists
+            (select * from null_subquery_values where subquery_value > value)"""
+        )
+
+
+def test_semi_join():
+    """
+    Test that null keys never match in a semi join
+    :return:
+    """
+    left_codes, right_codes = factorize_join_keys(
+        [DataFrame({"key": [1.0, np.nan, 2.0, 4.0]})["key"]],
+        [DataFrame({"key": [np.nan, 2.0, 4.0, 4.0]})["key"]],
+        sort=False,
+    )
+    assert semi_join(left_codes, right_codes).tolist() == [False, False, True, True]
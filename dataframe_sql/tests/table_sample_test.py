@@ -0,0 +1,143 @@
+"""
+Test cases for the TABLESAMPLE clause
+"""
+import ibis.expr.operations as ops
+import numpy as np
+import pandas.testing as tm
+import pytest
+from sql_to_ibis.exceptions.sql_exception import InvalidQueryException
+
+from dataframe_sql import query
+from dataframe_sql.execution.sample import sample_positions
+from dataframe_sql.operations import TableSample
+from dataframe_sql.parsing.parser import parse_sql
+from dataframe_sql.tests.utils import (
+    FOREST_FIRES,
+    register_env_tables,
+    remove_env_tables,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_env_tables()
+    yield
+    remove_env_tables()
+
+
+def _sample(expr) -> TableSample:
+    op = expr.op()
+    while not isinstance(op, TableSample):
+        op = op.table.op()
+    return op
+
+
+def test_sample_positions():
+    """
+    Test the number, order and blocks of the sampled rows of every method
+    :return:
+    """
+    bernoulli = sample_positions(100_000, "bernoulli", 0.1, seed=0)
+    assert len(bernoulli) == pytest.approx(10_000, rel=0.05)
+    assert np.all(np.diff(bernoulli) > 0)
+    system = sample_positions(100_000, "system", 0.1, seed=0, block_rows=100)
+    assert len(system) % 100 == 0
+    assert np.all(
+        system.reshape(-1, 100) == system.reshape(-1, 100)[:, :1] + np.arange(100)
+    )
+    rows = sample_positions(100_000, "rows", 50, seed=0)
+    assert len(np.unique(rows)) == 50
+    assert np.all(np.diff(rows) > 0)
+    assert sample_positions(10, "rows", 50).tolist() == list(range(10))
+    assert sample_positions(1000, "system", 1.0).tolist() == list(range(1000))
+
+
+@pytest.mark.parametrize(
+    "sample, method, size, seed",
+    [
+        ("tablesample (10)", "bernoulli", 0.1, None),
+        ("tablesample bernoulli (2.5) repeatable (42)", "bernoulli", 0.025, 42),
+        ("tablesample system (50)", "system", 0.5, None),
+        ("as fires tablesample (7 rows) repeatable (0)", "rows", 7, 0),
+    ],
+)
+def test_parse_table_sample(sample, method, size, seed):
+    """
+    Test the method, size and seed of the TABLESAMPLE clauses
+    :return:
+    """
+    op = _sample(parse_sql(f"select * from forest_fires {sample}"))
+    assert isinstance(op.table.op(), ops.DatabaseTable)
+    assert (op.method, op.size, op.seed) == (method, size, seed)
+
+
+def test_repeatable_sample():
+    """
+    Test that a REPEATABLE seed samples the same rows, which are rows of the table
+    :return:
+    """
+    sql = "select * from forest_fires tablesample bernoulli (20) repeatable (7)"
+    my_frame = query(sql)
+    tm.assert_frame_equal(my_frame, query(sql))
+    positions = sample_positions(len(FOREST_FIRES), "bernoulli", 0.2, seed=7)
+    tm.assert_frame_equal(my_frame, FOREST_FIRES.iloc[positions].reset_index(drop=True))
+
+
+def test_sample_before_filter_and_aggregation():
+    """
+    Test that the sample is taken before the filter, the aggregation and the
+    qualified and aliased columns that read the table
+    :return:
+    """
+    my_frame = query(
+        """select count(*) as fires, max(fires.temp) as temp
+        from forest_fires as fires tablesample (100 rows) repeatable (3)
+        where temp > 20"""
+    )
+    sampled = FOREST_FIRES.iloc[sample_positions(len(FOREST_FIRES), "rows", 100, 3)]
+    sampled = sampled[sampled.temp > 20]
+    assert my_frame["fires"][0] == len(sampled)
+    assert my_frame["temp"][0] == sampled.temp.max()
+
+
+@pytest.mark.parametrize(
+    "sample",
+    [
+        "tablesample bernoulli (150)",
+        "tablesample system (5 rows)",
+        "tablesample (2.5 rows)",
+        "tablesample (10) repeatable (1.5)",
+    ],
+)
+def test_invalid_table_sample(sample):
+    """
+    Test that invalid TABLESAMPLE clauses are rejected
+    :return:
+    """
+    with pytest.raises(InvalidQueryException):
+        query(f"select * from forest_fires {sample}")
+
+
+def test_sample_only_replaces_its_from_item():
+    """
+    Test that the other references to a sampled table, in a self join, another
+    branch of a union or a subquery, read the whole table
+    :return:
+    """
+    sample = "tablesample (20 rows) repeatable (3)"
+    my_frame = query(
+        f"""select count(*) as pairs from forest_fires as fires {sample}
+        cross join forest_fires as others"""
+    )
+    assert my_frame["pairs"][0] == 20 * len(FOREST_FIRES)
+    my_frame = query(
+        f"""select count(*) as fires from forest_fires {sample}
+        union all select count(*) as fires from forest_fires"""
+    )
+    assert my_frame["fires"].tolist() == [20, len(FOREST_FIRES)]
+    my_frame = query(
+        f"""select count(*) as fires from forest_fires where temp in
+        (select temp from forest_fires {sample})"""
+    )
+    sampled = FOREST_FIRES.iloc[sample_positions(len(FOREST_FIRES), "rows", 20, 3)]
+    assert my_frame["fires"][0] == FOREST_FIRES.temp.isin(sampled.temp).sum()
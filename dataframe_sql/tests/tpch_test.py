@@ -0,0 +1,98 @@
+"""
+Test cases for the TPC-H workload
+"""
+import numpy as np
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query
+from dataframe_sql.benchmarks.suite import registered_tables
+from dataframe_sql.benchmarks.tpch import QUERIES, generate_tables, run_tpch
+
+TABLES = generate_tables(0.01)
+
+
+@pytest.fixture
+def tpch_tables():
+    with registered_tables(TABLES):
+        yield
+
+
+def test_generated_tables():
+    """
+    Test the row counts and keys of the generated tables
+    :return:
+    """
+    assert {name: len(TABLES[name]) for name in ["supplier", "part", "customer"]} == {
+        "supplier": 100,
+        "part": 2000,
+        "customer": 1500,
+    }
+    orders = TABLES["orders"]
+    lineitem = TABLES["lineitem"]
+    assert len(orders) == 15000
+    assert lineitem["l_orderkey"].isin(orders["o_orderkey"]).all()
+    assert not (orders["o_custkey"] % 3 == 0).any()
+    partsupp_keys = set(
+        zip(TABLES["partsupp"]["ps_partkey"], TABLES["partsupp"]["ps_suppkey"])
+    )
+    assert len(partsupp_keys) == len(TABLES["partsupp"])
+    assert set(zip(lineitem["l_partkey"], lineitem["l_suppkey"])) <= partsupp_keys
+    assert (lineitem["l_receiptdate"] > lineitem["l_shipdate"]).all()
+    tm.assert_frame_equal(orders, generate_tables(0.01)["orders"])
+
+
+@pytest.mark.usefixtures("tpch_tables")
+def test_pricing_summary_report():
+    """
+    Test query 1 against pandas
+    :return:
+    """
+    lineitem = TABLES["lineitem"]
+    lineitem = lineitem[lineitem["l_shipdate"] <= "1998-09-02"]
+    disc_price = lineitem["l_extendedprice"] * (1 - lineitem["l_discount"])
+    pandas_frame = (
+        lineitem.assign(disc_price=disc_price)
+        .groupby(["l_returnflag", "l_linestatus"])
+        .agg(
+            sum_qty=("l_quantity", "sum"),
+            sum_disc_price=("disc_price", "sum"),
+            count_order=("l_quantity", "size"),
+        )
+        .reset_index()
+    )
+    my_frame = query(QUERIES[1])
+    tm.assert_frame_equal(
+        pandas_frame,
+        my_frame[list(pandas_frame.columns)],
+        check_dtype=False,
+    )
+
+
+@pytest.mark.usefixtures("tpch_tables")
+def test_forecasting_revenue_change():
+    """
+    Test query 6 against pandas
+    :return:
+    """
+    lineitem = TABLES["lineitem"]
+    lineitem = lineitem[
+        (lineitem["l_shipdate"] >= "1994-01-01")
+        & (lineitem["l_shipdate"] < "1995-01-01")
+        & lineitem["l_discount"].between(0.05, 0.07)
+        & (lineitem["l_quantity"] < 24)
+    ]
+    revenue = (lineitem["l_extendedprice"] * lineitem["l_discount"]).sum()
+    assert np.isclose(query(QUERIES[6])["revenue"][0], revenue)
+
+
+def test_run_tpch():
+    """
+    Test that every supported query runs and reports its time and peak memory
+    :return:
+    """
+    results = run_tpch(0.01, warmup=0, repeat=1)
+    assert list(results) == [f"q{number:02d}" for number in QUERIES]
+    assert all(result.peak_memory > 0 for result in results.values())
+    with pytest.raises(ValueError, match="not supported"):
+        run_tpch(0.01, [2])
@@ -103,3 +103,13 @@ join_params = pytest.mark.parametrize(
         ("right", "right"),
     ],
 )
+
+
+def sort_frame(frame: DataFrame) -> DataFrame:
+    """
+    Return the frame sorted by all of its columns with a fresh index, for comparing
+    results whose row order is not defined by the query
+    :param frame:
+    :return:
+    """
+    return frame.sort_values(by=list(frame.columns)).reset_index(drop=True)
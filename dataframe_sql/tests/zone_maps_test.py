@@ -0,0 +1,112 @@
+"""
+Test cases for skipping the blocks of tables with zone maps
+"""
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from dataframe_sql import query, register_temp_table, remove_temp_table
+from dataframe_sql.operations import ZoneMapScan
+from dataframe_sql.optimizer import optimize_expression
+from dataframe_sql.parsing.parser import parse_sql
+
+EVENTS = pd.DataFrame(
+    {
+        "event_time": pd.date_range("2020-01-01", periods=1000, freq="H"),
+        "reading": np.arange(1000, dtype=np.float64),
+        "level": np.arange(1000) % 10,
+        "kind": ["low", "high"] * 500,
+    }
+)
+EVENTS.loc[100:199, "reading"] = np.nan
+
+
+@pytest.fixture(autouse=True, scope="module")
+def module_setup_teardown():
+    register_temp_table(EVENTS, "events", zone_map_block_size=100)
+    yield
+    remove_temp_table("events")
+
+
+def test_filter_skips_blocks():
+    """
+    Test that a filter on a column whose values are clustered skips the blocks
+    that cannot match and counts them in the query statistics
+    :return:
+    """
+    sql = """select * from events
+        where event_time >= '2020-02-01' and reading < 850 and kind = 'low'"""
+    op = optimize_expression(parse_sql(sql)).op()
+    assert isinstance(op.table.op(), ZoneMapScan)
+    assert len(op.table.op().ranges) == 2
+    my_frame, stats = query(sql, return_stats=True)
+    pandas_frame = EVENTS[
+        (EVENTS.event_time >= "2020-02-01")
+        & (EVENTS.reading < 850)
+        & (EVENTS.kind == "low")
+    ].reset_index(drop=True)
+    tm.assert_frame_equal(my_frame, pandas_frame)
+    [scan] = [operator for operator in stats.operators if operator.blocks]
+    assert scan.blocks == 10
+    # Blocks before February, the block of nulls and the blocks from 850 on
+    assert scan.blocks_skipped == 8
+    assert stats.blocks_skipped == 8
+    assert stats.to_dict()["operators"][0]["blocks_skipped"] == 8
+
+
+def test_aggregation_filter_skips_blocks():
+    """
+    Test that the filter of an aggregation skips the blocks that cannot match
+    :return:
+    """
+    sql = """select kind, sum(reading) as total from events
+        where reading between 250 and 420 or level = 3 group by kind"""
+    assert not isinstance(
+        optimize_expression(parse_sql(sql)).op().table.op(), ZoneMapScan
+    )
+    sql = """select kind, sum(reading) as total from events
+        where reading between 250 and 420 group by kind"""
+    my_frame, stats = query(sql, return_stats=True)
+    selected = EVENTS[EVENTS.reading.between(250, 420)]
+    pandas_frame = selected.groupby("kind").reading.sum().rename("total")
+    tm.assert_frame_equal(my_frame, pandas_frame.reset_index())
+    # Only the blocks from 200 to 499 are read
+    assert stats.blocks_skipped == 7
+
+
+def test_no_blocks_match():
+    """
+    Test that a filter that no block can match returns no rows
+    :return:
+    """
+    my_frame = query("select reading, level from events where level > 20")
+    tm.assert_frame_equal(my_frame, EVENTS[["reading", "level"]].iloc[:0])
+
+
+def test_invalid_block_size():
+    """
+    Test that a block size that is not positive is rejected
+    :return:
+    """
+    with pytest.raises(ValueError):
+        register_temp_table(EVENTS, "invalid_events", zone_map_block_size=0)
+
+
+def test_register_again_after_change():
+    """
+    Test that removing a changed frame and registering it again computes its
+    zone maps again
+    :return:
+    """
+    frame = pd.DataFrame({"value": np.arange(1000) % 900})
+    register_temp_table(frame, "changed", zone_map_block_size=100)
+    try:
+        sql = "select count(*) as matches from changed where value > 900"
+        assert query(sql)["matches"][0] == 0
+        frame["value"] = np.arange(1000)
+        remove_temp_table("changed")
+        register_temp_table(frame, "changed", zone_map_block_size=100)
+        assert query(sql)["matches"][0] == 99
+    finally:
+        remove_temp_table("changed")